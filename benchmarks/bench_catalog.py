@@ -0,0 +1,65 @@
+"""
+Measure how long it takes to seed a catalog of prompt models one at a time, as
+`/create_model` does, compared to a bulk import in a single transaction, as `/import` does.
+
+Usage:
+    poetry run python benchmarks/bench_catalog.py [--models 2000] [--db sqlite:///bench.db]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from prompt_chain.prompt_lib.catalog import dump_catalog, parse_catalog
+from prompt_chain.prompt_lib.db_manager import DatabaseManager
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--models", type=int, default=2000)
+    parser.add_argument("--db", default=None, help="Defaults to a temporary sqlite file")
+    args = parser.parse_args()
+
+    lines = [
+        json.dumps(
+            {
+                "kind": "model",
+                "name": f"model_{i}",
+                "system_prompt": "Classify the article " * 20,
+                "user_prompt_schema": {"article_text": "str", "tags": ["str"]},
+                "response_schema": {"label": "str", "confidence": "float"},
+            }
+        )
+        for i in range(args.models)
+    ]
+
+    start = time.perf_counter()
+    catalog = parse_catalog(lines)
+    print(f"validation     {args.models} models in {time.perf_counter() - start:.2f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in ["one at a time", "bulk import"]:
+            db_url = args.db or f"sqlite:///{os.path.join(tmp, label.replace(' ', '_'))}.db"
+            db_manager = DatabaseManager(db_url)
+            start = time.perf_counter()
+            if label == "bulk import":
+                db_manager.import_catalog(catalog.models, catalog.chains)
+            else:
+                for model in catalog.models:
+                    db_manager.add_prompt_model(
+                        model.name,
+                        model.system_prompt,
+                        model.user_prompt_schema,
+                        model.response_schema,
+                    )
+            print(f"{label:<14} {args.models} models in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        exported = sum(1 for _ in dump_catalog(db_manager))
+        print(f"export         {exported} lines in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Measure how a step's latency grows with document length, with and without chunking.
+
+A simulated provider takes a fixed overhead plus a time per prompt token to answer, as
+prefill does. The same summarization step is run on documents of increasing length,
+once sending the whole document, and once split into chunks that run in parallel and are
+merged with the default reducers.
+
+Usage:
+    PYTHONPATH=. poetry run python benchmarks/bench_chunking.py [--chunk-tokens 1000] [--parallel 8]
+"""
+
+import argparse
+import time
+from typing import Any
+from unittest.mock import Mock
+
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.chain_executor import ChainExecutor
+from prompt_chain.prompt_lib.models import ChainConfig, ChainStep, ChunkingConfig, PromptModel
+from prompt_chain.prompt_lib.token_estimator import estimate_tokens
+
+MODEL = PromptModel(
+    id=1,
+    name="summarizer",
+    system_prompt="Summarize the article",
+    user_prompt={"article_text": "str"},
+    response={"summary": "str", "crime_detected": "bool"},
+    created_at="",
+    updated_at="",
+)
+
+
+class SimulatedProvider:
+    def __init__(self, overhead: float, per_token: float) -> None:
+        self.overhead = overhead
+        self.per_token = per_token
+
+    def post(self, url: str, headers: Any, json: dict[str, Any], timeout: Any = None) -> Any:
+        prompt_tokens = estimate_tokens(json["messages"][1]["content"])
+        time.sleep(self.overhead + prompt_tokens * self.per_token)
+        content = {"summary": "A break-in was reported.", "crime_detected": True}
+        return {"choices": [{"message": {"content": codec.dumps(content)}}]}
+
+
+def measure(executor: ChainExecutor, chain: ChainConfig, text: str) -> float:
+    start = time.perf_counter()
+    executor.execute_chain(chain, {"text": text})
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunk-tokens", type=int, default=1000)
+    parser.add_argument("--overlap-tokens", type=int, default=50)
+    parser.add_argument("--parallel", type=int, default=8)
+    parser.add_argument("--overhead", type=float, default=0.05)
+    parser.add_argument("--per-token", type=float, default=0.00005)
+    args = parser.parse_args()
+
+    db_manager = Mock()
+    db_manager.get_prompt_model.return_value = MODEL
+    executor = ChainExecutor(
+        db_manager,
+        SimulatedProvider(args.overhead, args.per_token),  # type: ignore[arg-type]
+        None,
+    )
+    mapping = {"article_text": "initial_input.text"}
+    whole = ChainConfig(
+        name="whole",
+        steps=[ChainStep(name="summarizer", input_mapping=mapping, max_tokens=200)],
+        final_output_mapping={"summary": "step_0.summary"},
+    )
+    chunked = ChainConfig(
+        name="chunked",
+        steps=[
+            ChainStep(
+                name="summarizer",
+                input_mapping=mapping,
+                max_tokens=200,
+                chunking=ChunkingConfig(
+                    input_field="article_text",
+                    chunk_tokens=args.chunk_tokens,
+                    overlap_tokens=args.overlap_tokens,
+                    max_parallel=args.parallel,
+                ),
+            )
+        ],
+        final_output_mapping={"summary": "step_0.summary"},
+    )
+
+    sentence = "Local police reported a break-in at the downtown jewelry store last night. "
+    print(f"{'tokens':>8} {'whole':>10} {'chunked':>10}")
+    for repeats in (100, 400, 1600, 6400):
+        text = sentence * repeats
+        print(
+            f"{estimate_tokens(text):>8} {measure(executor, whole, text) * 1000:>8.0f}ms "
+            f"{measure(executor, chunked, text) * 1000:>8.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
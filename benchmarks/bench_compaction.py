@@ -0,0 +1,55 @@
+"""
+Measure how much prompt compaction shrinks the user message of a long-document step,
+and what it costs to compute.
+
+Compares the prompt tokens, as estimated locally, of the original `json.dumps`
+encoding, the compact codec encoding, and the compact encoding after excluding fields
+and truncating the document.
+
+Usage:
+    poetry run python benchmarks/bench_compaction.py [--paragraphs 200] [--max-tokens 1500]
+"""
+
+import argparse
+import json
+import time
+
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.compaction import compact
+from prompt_chain.prompt_lib.models import CompactionConfig
+from prompt_chain.prompt_lib.token_estimator import estimate_tokens
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paragraphs", type=int, default=200)
+    parser.add_argument("--max-tokens", type=int, default=1500)
+    args = parser.parse_args()
+
+    paragraph = "Local police reported a break-in at the downtown jewelry store last night. " * 5
+    step_input = {
+        "article_text": "\n\n".join([paragraph] * args.paragraphs),
+        "metadata": {"source": "newswire", "raw_html": f"<article>{paragraph}</article>" * 20},
+        "entities": [{"name": f"entity_{i}", "score": i / 10} for i in range(50)],
+    }
+    config = CompactionConfig(
+        exclude=["metadata.raw_html", "entities"],
+        max_field_tokens={"article_text": args.max_tokens},
+        truncation="middle",
+    )
+
+    start = time.perf_counter()
+    compacted = compact(step_input, config)
+    compact_ms = (time.perf_counter() - start) * 1000
+
+    for label, text in [
+        ("json.dumps", json.dumps(step_input)),
+        ("compact codec", codec.dumps(step_input)),
+        ("compacted", codec.dumps(compacted)),
+    ]:
+        print(f"{label:<14} {len(text):>9} chars  ~{estimate_tokens(text):>7} tokens")
+    print(f"compaction took {compact_ms:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare the CPU cost of serializing a large chain output through FastAPI's default
+`JSONResponse` (with `jsonable_encoder`) against `FastJSONResponse`, and of the JSON
+encode/parse calls made per step, for the stdlib and the configured codec.
+
+Usage:
+    poetry run python benchmarks/bench_json_codec.py [--requests 200] [--steps 50]
+
+Install the `fast` extra (orjson) to measure the fast path; without it the codec falls
+back to the standard library.
+"""
+
+import argparse
+import json
+import time
+from collections.abc import Callable
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from prompt_chain.api import FastJSONResponse
+from prompt_chain.prompt_lib import codec
+
+
+def large_chain_output(steps: int) -> dict[str, Any]:
+    article = "Local police reported a break-in at the downtown jewelry store last night. " * 40
+    return {
+        f"step_{i}": {
+            "article_text": article,
+            "crime_detected": i % 2 == 0,
+            "confidence": i / steps,
+            "entities": [{"name": f"entity_{j}", "score": j / 10} for j in range(20)],
+        }
+        for i in range(steps)
+    }
+
+
+def cpu_ms_per_call(fn: Callable[[], Any], calls: int) -> float:
+    start = time.process_time()
+    for _ in range(calls):
+        fn()
+    return (time.process_time() - start) * 1000 / calls
+
+
+def compare(label: str, baseline: Callable[[], Any], fast: Callable[[], Any], calls: int) -> None:
+    baseline_ms = cpu_ms_per_call(baseline, calls)
+    fast_ms = cpu_ms_per_call(fast, calls)
+    print(
+        f"{label:<22} default {baseline_ms:8.3f}ms  {codec.codec.name} {fast_ms:8.3f}ms  "
+        f"saved {baseline_ms - fast_ms:8.3f}ms/request ({baseline_ms / fast_ms:.1f}x)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--steps", type=int, default=50)
+    args = parser.parse_args()
+
+    result = {"result": large_chain_output(args.steps)}
+    encoded = json.dumps(result)
+    print(f"Payload size: {len(encoded) / 1024:.0f}KiB, codec: {codec.codec.name}")
+
+    compare(
+        "API response",
+        lambda: JSONResponse(jsonable_encoder(result)),
+        lambda: FastJSONResponse(result),
+        args.requests,
+    )
+    compare("encode", lambda: json.dumps(result), lambda: codec.dumps(result), args.requests)
+    compare("parse", lambda: json.loads(encoded), lambda: codec.loads(encoded), args.requests)
+
+
+if __name__ == "__main__":
+    main()
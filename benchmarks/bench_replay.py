@@ -0,0 +1,146 @@
+"""
+Replay recorded provider calls through the chain executor to measure it offline.
+
+Records a cassette of a two-step chain run over many inputs against a simulated provider
+with random latencies, then replays it through `ChainExecutor` and `ProviderClient` from
+several threads, as with CASSETTE_MODE=replay. Replaying at a latency scale of 0 measures
+the executor's own overhead, and at 1 the end-to-end latency the recorded traffic had.
+
+Usage:
+    PYTHONPATH=. poetry run python benchmarks/bench_replay.py [--executions 200] [--threads 8]
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from unittest.mock import Mock
+
+import requests
+
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.cassette import CassetteWebClient
+from prompt_chain.prompt_lib.chain_executor import ChainExecutor
+from prompt_chain.prompt_lib.models import ChainConfig, ChainStep, PromptModel
+from prompt_chain.prompt_lib.provider_client import ProviderClient
+from prompt_chain.prompt_lib.scheduler import FairScheduler
+
+MODELS = {
+    "classifier": PromptModel(
+        id=1,
+        name="classifier",
+        system_prompt="Classify the article",
+        user_prompt={"article": "str"},
+        response={"label": "str", "confidence": "float"},
+        created_at="",
+        updated_at="",
+    ),
+    "summarizer": PromptModel(
+        id=2,
+        name="summarizer",
+        system_prompt="Summarize the article for its label",
+        user_prompt={"article": "str", "label": "str"},
+        response={"summary": "str", "keywords": ["str"]},
+        created_at="",
+        updated_at="",
+    ),
+}
+CHAIN = ChainConfig(
+    name="bench_chain",
+    steps=[
+        ChainStep(name="classifier", input_mapping={"article": "initial_input.article"}),
+        ChainStep(
+            name="summarizer",
+            input_mapping={"article": "initial_input.article", "label": "previous_step.label"},
+        ),
+    ],
+    final_output_mapping={"label": "step_0.label", "summary": "step_1.summary"},
+)
+
+
+class SimulatedProvider:
+    """Stands in for the provider's HTTP API while recording, with random latencies."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        time.sleep(random.expovariate(1 / self.latency))
+        request = codec.loads(kwargs["data"])
+        if "label" in request["messages"][-1]["content"]:
+            content = {"summary": "A short summary. " * 10, "keywords": ["police", "city"]}
+        else:
+            content = {"label": "crime", "confidence": 0.9}
+        response = requests.Response()
+        response.status_code = 200
+        response._content = codec.dumps_bytes(
+            {
+                "choices": [{"message": {"content": codec.dumps(content)}}],
+                "usage": {"prompt_tokens": 300, "completion_tokens": 60},
+            }
+        )
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def run(client: CassetteWebClient, inputs: list[dict[str, Any]], threads: int) -> list[float]:
+    db_manager = Mock()
+    db_manager.get_prompt_model.side_effect = lambda name, version=None: MODELS[name]
+    provider = ProviderClient(client, None, scheduler=FairScheduler(capacity=threads))
+    executor = ChainExecutor(db_manager, client, None, provider=provider)
+
+    def execute(initial_input: dict[str, Any]) -> float:
+        start = time.perf_counter()
+        executor.execute_chain(CHAIN, initial_input)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(threads) as pool:
+        return list(pool.map(execute, inputs))
+
+
+def report(label: str, latencies: list[float], elapsed: float) -> None:
+    quantiles = statistics.quantiles(latencies, n=20)
+    print(
+        f"{label:<18} {len(latencies) / elapsed:>8.1f} executions/s  "
+        f"p50 {quantiles[9] * 1000:>8.2f}ms  p95 {quantiles[18] * 1000:>8.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--executions", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean simulated latency")
+    args = parser.parse_args()
+
+    random.seed(0)
+    inputs = [
+        {"article": f"Article {i}: " + "Police reported a break-in. " * 50}
+        for i in range(args.executions)
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "calls.jsonl.gz"
+
+        recorder = CassetteWebClient(path, "record")
+        recorder.client = SimulatedProvider(args.latency)  # type: ignore[assignment]
+        start = time.perf_counter()
+        with recorder:
+            latencies = run(recorder, inputs, args.threads)
+        report("record", latencies, time.perf_counter() - start)
+        print(f"cassette: {path.stat().st_size / 1024:.1f} KiB for {2 * args.executions} calls")
+
+        for scale in (1.0, 0.0):
+            with CassetteWebClient(path, "replay", latency_scale=scale) as replay:
+                start = time.perf_counter()
+                latencies = run(replay, inputs, args.threads)
+                report(f"replay at {scale:g}x", latencies, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
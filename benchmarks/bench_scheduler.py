@@ -0,0 +1,74 @@
+"""
+Measure how long interactive provider calls wait for a slot while a bulk job floods the
+scheduler.
+
+A batch tenant queues a large burst of calls, then interactive calls from other tenants
+arrive at a steady rate. Each call holds its slot for a simulated provider latency.
+Compares the interactive wait when every call shares one flow and class, which is plain
+FIFO, against per-tenant flows with the bulk job in the batch class.
+
+Usage:
+    poetry run python benchmarks/bench_scheduler.py [--capacity 8] [--bulk 400] [--latency 0.02]
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+from prompt_chain.prompt_lib.scheduler import FairScheduler
+
+
+def run(scheduler: FairScheduler, args: argparse.Namespace, fair: bool) -> list[float]:
+    waits: list[float] = []
+    lock = threading.Lock()
+
+    def call(flow: str, priority: str, record: bool) -> None:
+        start = time.monotonic()
+        with scheduler.slot(flow, priority):
+            waited = time.monotonic() - start
+            time.sleep(args.latency)
+        if record:
+            with lock:
+                waits.append(waited)
+
+    threads = [
+        threading.Thread(target=call, args=("bulk", "batch" if fair else "interactive", False))
+        for _ in range(args.bulk)
+    ]
+    for thread in threads:
+        thread.start()
+    for i in range(args.interactive):
+        time.sleep(args.latency / 2)
+        thread = threading.Thread(
+            target=call, args=(f"tenant_{i % 5}" if fair else "bulk", "interactive", True)
+        )
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return waits
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--bulk", type=int, default=400)
+    parser.add_argument("--interactive", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    for label, fair in [("fifo", False), ("fair", True)]:
+        scheduler = FairScheduler(capacity=args.capacity)
+        start = time.monotonic()
+        waits = sorted(run(scheduler, args, fair))
+        elapsed = time.monotonic() - start
+        p95 = waits[int(len(waits) * 0.95) - 1]
+        print(
+            f"{label:<5} interactive wait p50 {statistics.median(waits) * 1000:8.1f}ms"
+            f"  p95 {p95 * 1000:8.1f}ms  total {elapsed:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Measure the LLM calls a semantic cache saves on a stream of near-duplicate inputs.
+
+A stream of articles is generated where each is either new or a light edit of an earlier
+one, as with syndicated news or retried submissions. The stream is run through a
+summarization step against a simulated provider with and without `SemanticCache`, at a
+few thresholds, reporting the calls made, the hit rate, and the false hits found by
+auditing every hit. It also times lookups against a full index.
+
+Usage:
+    PYTHONPATH=. poetry run python benchmarks/bench_semantic_cache.py [--inputs 500] [--duplicates 0.4]
+"""
+
+import argparse
+import logging
+import random
+import time
+from typing import Any
+from unittest.mock import Mock
+
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.chain_executor import ChainExecutor
+from prompt_chain.prompt_lib.metrics import Metrics
+from prompt_chain.prompt_lib.models import ChainConfig, ChainStep, PromptModel
+from prompt_chain.prompt_lib.semantic_cache import SemanticCache, embed, numpy
+
+MODEL = PromptModel(
+    id=1,
+    name="summarizer",
+    system_prompt="Summarize the article",
+    user_prompt={"article": "str"},
+    response={"summary": "str"},
+    created_at="",
+    updated_at="",
+)
+CHAIN = ChainConfig(
+    name="summarize",
+    steps=[ChainStep(name="summarizer", input_mapping={"article": "initial_input.article"})],
+    final_output_mapping={"summary": "step_0.summary"},
+)
+WORDS = (
+    "police city council budget store report night officers school storm road fire "
+    "market river court mayor hospital festival bridge train museum park election"
+).split()
+
+
+class SimulatedProvider:
+    """Answers with a summary of the article's first words, so some edits change it."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def post(self, url: str, headers: Any, json: dict[str, Any], timeout: Any = None) -> Any:
+        self.calls += 1
+        article = codec.loads(json["messages"][1]["content"])["article"]
+        content = {"summary": "About " + ", ".join(article.split()[:3])}
+        return {"choices": [{"message": {"content": codec.dumps(content)}}]}
+
+
+def article(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(120))
+
+
+def edit(text: str, rng: random.Random) -> str:
+    words = text.split()
+    for _ in range(3):
+        words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return " ".join(words)
+
+
+def stream(inputs: int, duplicates: float, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    articles: list[str] = []
+    for _ in range(inputs):
+        if articles and rng.random() < duplicates:
+            articles.append(edit(rng.choice(articles), rng))
+        else:
+            articles.append(article(rng))
+    return articles
+
+
+def run(articles: list[str], cache: SemanticCache | None) -> tuple[int, Metrics]:
+    db_manager = Mock()
+    db_manager.get_prompt_model.return_value = MODEL
+    provider = SimulatedProvider()
+    metrics = cache.metrics if cache else Metrics()
+    executor = ChainExecutor(
+        db_manager,
+        provider,  # type: ignore[arg-type]
+        "fake_api_key",
+        metrics=metrics,
+        semantic_cache=cache,
+    )
+    for text in articles:
+        executor.execute_chain(CHAIN, {"article": text})
+    return provider.calls, metrics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--inputs", type=int, default=500)
+    parser.add_argument("--duplicates", type=float, default=0.4)
+    parser.add_argument("--entries", type=int, default=5000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    articles = stream(args.inputs, args.duplicates)
+    calls, _ = run(articles, None)
+    print(f"{'no cache':<16} {calls:>6} calls")
+    for threshold in (0.95, 0.9, 0.8):
+        cache = SemanticCache(threshold=threshold, audit_rate=1)
+        calls, metrics = run(articles, cache)
+        audits = metrics.counter("semantic_cache.audits", model="summarizer")
+        false_hits = metrics.counter("semantic_cache.false_hits", model="summarizer")
+        print(
+            f"threshold {threshold:<6} {calls - audits:>6.0f} calls  "
+            f"{audits / len(articles):>6.1%} hits  {false_hits:>4.0f} false hits"
+        )
+
+    rng = random.Random(1)
+    cache = SemanticCache()
+    index = cache.index_factory(args.entries, cache.dimensions)
+    texts = [article(rng) for _ in range(args.entries)]
+    for text in texts:
+        index.add(embed(text, cache.dimensions), None)
+    queries = [embed(edit(text, rng), cache.dimensions) for text in texts[:50]]
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query)
+    elapsed = (time.perf_counter() - start) / len(queries)
+    backend = "numpy" if numpy is not None else "python"
+    print(f"search of {args.entries} entries ({backend}): {elapsed * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
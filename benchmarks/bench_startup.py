@@ -0,0 +1,77 @@
+"""
+Measure the cold start of the API: the time to import `prompt_chain.api` in a fresh
+interpreter, and the time for the lifespan warm-up to complete.
+
+Usage:
+    poetry run python benchmarks/bench_startup.py [--runs 10] [--budget-ms 600]
+
+Exits with a non-zero status if the median import time exceeds the budget.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import prompt_chain.api
+print(time.perf_counter() - start)
+"""
+
+WARMUP_SNIPPET = """
+import time
+import prompt_chain.api as api
+start = time.perf_counter()
+api.manager.warm_up()
+print(time.perf_counter() - start)
+"""
+
+# Modules that should only be loaded once a dependency is first used.
+LAZY_MODULES = ["sqlalchemy", "requests", "uvicorn", "prompt_chain.prompt_lib.db_manager"]
+
+
+def measure(snippet: str, runs: int, env: dict[str, str] | None = None) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", snippet], capture_output=True, text=True, check=True, env=env
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]) * 1000)
+    return timings
+
+
+def eagerly_loaded_modules() -> list[str]:
+    snippet = "import sys, prompt_chain.api; print(','.join(sorted(sys.modules)))"
+    output = subprocess.run(
+        [sys.executable, "-c", snippet], capture_output=True, text=True, check=True
+    ).stdout
+    loaded = set(output.strip().split(","))
+    return [module for module in LAZY_MODULES if module in loaded]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=600.0)
+    args = parser.parse_args()
+
+    import_ms = measure(IMPORT_SNIPPET, args.runs)
+    warmup_ms = measure(WARMUP_SNIPPET, args.runs, env={**os.environ, "DB_URL": "sqlite://"})
+    print(f"import prompt_chain.api: median {statistics.median(import_ms):.1f}ms")
+    print(f"manager.warm_up():       median {statistics.median(warmup_ms):.1f}ms")
+
+    eager = eagerly_loaded_modules()
+    if eager:
+        print(f"Modules that should be lazy were imported eagerly: {', '.join(eager)}")
+
+    if statistics.median(import_ms) > args.budget_ms or eager:
+        print(f"Startup budget of {args.budget_ms:.0f}ms exceeded")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Compare the throughput of the pydantic and fast validation engines, both for compiling
+a schema into a validator and for validating data with it.
+
+Usage:
+    poetry run python benchmarks/bench_validators.py [--iterations 20000]
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+from typing import Any
+
+from prompt_chain.prompt_lib.validators import compile_validator
+
+SCHEMA = {
+    "article_text": "str",
+    "crime_detected": "bool",
+    "confidence": "float",
+    "mentions": ["str"],
+    "location": {"city": "str", "street": "str", "coordinates": ("float", "float")},
+    "suspects": [{"name": "str", "age": "int", "armed": "bool"}],
+}
+
+DATA = {
+    "article_text": "Local police reported a break-in at the downtown jewelry store." * 10,
+    "crime_detected": "true",
+    "confidence": 0.93,
+    "mentions": ["police", "jewelry store", "security camera"],
+    "location": {"city": "Springfield", "street": "Main St", "coordinates": [39.78, -89.65]},
+    "suspects": [{"name": f"suspect_{i}", "age": "34", "armed": False} for i in range(5)],
+}
+
+
+def per_second(fn: Callable[[], Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = {}
+    for engine in ("pydantic", "fast"):
+        validator = compile_validator(SCHEMA, engine=engine)
+        compiles = per_second(
+            lambda: compile_validator(SCHEMA, engine=engine), max(args.iterations // 100, 1)
+        )
+        validations = per_second(lambda: validator(DATA), args.iterations)
+        results[engine] = (compiles, validations)
+        print(f"{engine:<9} compile {compiles:>10,.0f}/s   validate {validations:>10,.0f}/s")
+
+    pydantic, fast = results["pydantic"], results["fast"]
+    print(
+        f"fast/pydantic: compile {fast[0] / pydantic[0]:.1f}x, validate {fast[1] / pydantic[1]:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ import ReactFlow, {
 } from 'reactflow';
 import 'reactflow/dist/style.css';
 import axios from 'axios';
-import ModelNode from './ModelNode';
+import ModelNode, { PHASE_COLORS } from './ModelNode';
 import AddModelForm from './AddModelForm';
 import AddChainForm from './AddChainForm';
 
@@ -30,6 +30,7 @@ const GraphUIContent = () => {
   const [showChainExecutionModal, setShowChainExecutionModal] = useState(false);
   const [chainInput, setChainInput] = useState('');
   const [chainResult, setChainResult] = useState(null);
+  const [timeline, setTimeline] = useState(null);
   const [errorMessage, setErrorMessage] = useState('');
 
   useEffect(() => {
@@ -77,6 +78,41 @@ const GraphUIContent = () => {
     }
   };
 
+  // Overlays where the time of an execution went on the nodes of the models its steps ran.
+  const fetchTimeline = async (executionId) => {
+    try {
+      const response = await axios.get(`${API_BASE}/executions/${executionId}/timeline`);
+      const byModel = {};
+      response.data.steps.forEach((step) => {
+        const timing = byModel[step.model_name] || { latency_ms: 0, totals: {}, steps: 0 };
+        timing.latency_ms += step.latency_ms;
+        timing.steps += 1;
+        Object.entries(step.totals).forEach(([phase, ms]) => {
+          timing.totals[phase] = (timing.totals[phase] || 0) + ms;
+        });
+        byModel[step.model_name] = timing;
+      });
+      const slowest = Math.max(...Object.values(byModel).map((timing) => timing.latency_ms));
+      Object.values(byModel).forEach((timing) => {
+        timing.hottest = timing.latency_ms === slowest;
+      });
+      setTimeline(response.data);
+      setNodes((nds) => nds.map((node) => ({
+        ...node,
+        data: { ...node.data, timing: byModel[node.data.label] || null },
+      })));
+    } catch (error) {
+      // The timeline is only available when the execution history is enabled.
+      console.warn("Could not fetch the execution timeline:", error);
+      setTimeline(null);
+    }
+  };
+
+  const clearTimeline = () => {
+    setTimeline(null);
+    setNodes((nds) => nds.map((node) => ({ ...node, data: { ...node.data, timing: null } })));
+  };
+
   const onConnect = useCallback((params) => setEdges((eds) => addEdge(params, eds)), [setEdges]);
 
   const handleAddModel = async (modelData) => {
@@ -104,6 +140,7 @@ const GraphUIContent = () => {
   const handleChainSelection = async (e) => {
     const chainName = e.target.value;
     setSelectedChain(chainName);
+    clearTimeline();
     if (chainName) {
       try {
         const response = await axios.get(`${API_BASE}/get_chain/${chainName}`);
@@ -174,6 +211,9 @@ const GraphUIContent = () => {
       });
       setChainResult(response.data.result);
       setErrorMessage('');
+      if (response.data.metadata?.execution_id) {
+        await fetchTimeline(response.data.metadata.execution_id);
+      }
     } catch (error) {
       console.error("Error running chain:", error);
       setErrorMessage(`Error running chain: ${error.response?.data?.detail || error.message}`);
@@ -352,6 +392,43 @@ const GraphUIContent = () => {
                 </pre>
               </div>
             )}
+            {timeline && (
+              <div className="mt-4">
+                <h3 className="font-bold mb-2">
+                  Timeline: {timeline.latency_ms.toFixed(1)}ms
+                </h3>
+                {timeline.steps.map((step) => (
+                  <div key={step.step_index} className="flex items-center mb-1 text-xs">
+                    <div className="w-40 truncate" title={step.model_name}>
+                      {step.step_index + 1}. {step.model_name}
+                    </div>
+                    <div className="relative flex-grow h-4 bg-gray-100 rounded">
+                      {step.phases.map((phase, index) => (
+                        <div
+                          key={index}
+                          title={`${phase.phase}: ${phase.duration_ms.toFixed(1)}ms`}
+                          className="absolute h-full"
+                          style={{
+                            left: `${(phase.start_ms / timeline.latency_ms) * 100}%`,
+                            width: `max(1px, ${(phase.duration_ms / timeline.latency_ms) * 100}%)`,
+                            backgroundColor: PHASE_COLORS[phase.phase] || '#94a3b8',
+                          }}
+                        />
+                      ))}
+                    </div>
+                    <div className="w-20 text-right">{step.latency_ms.toFixed(1)}ms</div>
+                  </div>
+                ))}
+                <div className="flex flex-wrap mt-2 text-xs text-gray-600">
+                  {Object.entries(PHASE_COLORS).map(([phase, color]) => (
+                    <span key={phase} className="mr-3 flex items-center">
+                      <span className="inline-block w-3 h-3 mr-1 rounded" style={{ backgroundColor: color }} />
+                      {phase}
+                    </span>
+                  ))}
+                </div>
+              </div>
+            )}
           </div>
         </div>
       )}
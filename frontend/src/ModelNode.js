@@ -1,6 +1,46 @@
 import React, { memo, useState } from 'react';
 import { Handle, Position } from 'reactflow';
 
+export const PHASE_COLORS = {
+  model_lookup: '#6366f1',
+  mapping: '#a855f7',
+  validator_build: '#ec4899',
+  input_validation: '#f97316',
+  compaction: '#eab308',
+  cache_lookup: '#84cc16',
+  provider_call: '#22c55e',
+  parsing: '#14b8a6',
+  output_validation: '#0ea5e9',
+  reduce: '#64748b',
+};
+
+const formatMs = (ms) => (ms >= 1000 ? `${(ms / 1000).toFixed(2)}s` : `${ms.toFixed(1)}ms`);
+
+const TimingOverlay = ({ timing }) => {
+  const phases = Object.entries(timing.totals).sort((a, b) => b[1] - a[1]);
+  const phaseTotal = phases.reduce((sum, [, ms]) => sum + ms, 0) || 1;
+  return (
+    <div className="mb-2">
+      <div className={`text-sm font-semibold ${timing.hottest ? 'text-red-600' : 'text-gray-700'}`}>
+        {formatMs(timing.latency_ms)}
+        {timing.steps > 1 && <span className="font-normal text-gray-500"> over {timing.steps} steps</span>}
+      </div>
+      <div className="flex h-2 rounded overflow-hidden mt-1 bg-gray-100">
+        {phases.map(([phase, ms]) => (
+          <div
+            key={phase}
+            title={`${phase}: ${formatMs(ms)}`}
+            style={{ width: `${(ms / phaseTotal) * 100}%`, backgroundColor: PHASE_COLORS[phase] || '#94a3b8' }}
+          />
+        ))}
+      </div>
+      <div className="text-xs text-gray-500 mt-1">
+        {phases.slice(0, 3).map(([phase, ms]) => `${phase} ${formatMs(ms)}`).join(' · ')}
+      </div>
+    </div>
+  );
+};
+
 const ModelNode = ({ data }) => {
   const [expanded, setExpanded] = useState(false);
 
@@ -15,6 +55,7 @@ const ModelNode = ({ data }) => {
     >
       <Handle type="target" position={Position.Top} className="w-3 h-3" />
       <div className="font-bold text-lg mb-2">{data.label || 'Unnamed Model'}</div>
+      {data.timing && <TimingOverlay timing={data.timing} />}
       {expanded ? (
         <>
           <div className="text-sm text-gray-600 mb-2">
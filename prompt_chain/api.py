@@ -1,21 +1,43 @@
-import json
 import logging
+import threading
+from collections.abc import AsyncIterable, AsyncIterator, Callable
+from contextlib import AbstractContextManager, asynccontextmanager, nullcontext
 from typing import Any
 
-import uvicorn
-from fastapi import Body, FastAPI, HTTPException
+from fastapi import Body, FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from requests import RequestException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
 
+from prompt_chain.config import CATALOG_DIR, CHAIN_DEADLINE_SECONDS, WARMUP_ENABLED
 from prompt_chain.dependencies import DependencyManager
-from prompt_chain.prompt_lib.exceptions import DatabaseManagerException
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.deadline import Deadline
+from prompt_chain.prompt_lib.exceptions import (
+    BudgetExceededException,
+    CatalogImportException,
+    ChainTypeException,
+    DatabaseManagerException,
+    DeadlineExceededException,
+    IdempotencyKeyInProgressException,
+    IdempotencyKeyMismatchException,
+    InvalidResponseException,
+    OutputValidationException,
+    OverloadedException,
+)
 from prompt_chain.prompt_lib.models import (
     ChainConfig,
     ChainExecutionRequest,
+    ExecutionRecord,
     ModelInput,
+    ModelUpdate,
     OpenAIRequest,
     PromptModel,
 )
+from prompt_chain.prompt_lib.timeline import phase_totals
+from prompt_chain.prompt_lib.type_checker import check_chain
+from prompt_chain.prompt_lib.validators import validator_cache
 
 logging.basicConfig(
     level=logging.INFO,
@@ -26,7 +48,39 @@ logging.basicConfig(
 )
 LOGGER = logging.getLogger(__name__)
 manager = DependencyManager()
-app = FastAPI()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    A JSON response rendered with the configured codec.
+
+    Endpoints on the hot path return this directly, which also skips FastAPI's
+    response model validation and `jsonable_encoder` pass over already JSON-shaped data.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return codec.dumps_bytes(content)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    if WARMUP_ENABLED:
+        # Warmed up in the background, so that /ready can report it while it runs.
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    else:
+        manager.ready = True
+    yield
+    manager.close()
+
+
+def _warm_up() -> None:
+    try:
+        manager.warm_up()
+    except Exception as e:
+        LOGGER.error(f"Warm-up failed, the API stays unready: {str(e)}")
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],  # React app's address
@@ -36,26 +90,62 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(OverloadedException)
+async def overloaded(request: Request, exc: OverloadedException) -> FastJSONResponse:
+    return FastJSONResponse(
+        {"detail": str(exc)}, status_code=503, headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 @app.get("/")
 async def root() -> dict[str, str]:
     return {"message": "Hello World"}
 
 
+@app.get("/ready")
+async def ready() -> dict[str, str]:
+    if not manager.ready:
+        raise HTTPException(status_code=503, detail="Warm-up in progress")
+    return {"status": "ready"}
+
+
+@app.get("/metrics")
+async def metrics() -> dict[str, dict[str, float]]:
+    return manager.metrics.snapshot()
+
+
 @app.get("/get_models")
 async def get_models() -> dict[str, list[str]]:
-    models = manager.db_manager.get_all_models()
+    models = manager.model_source.get_all_models()
     return {"models": models}
 
 
 @app.get("/get_model/{model_name}")
-async def get_model(model_name: str) -> PromptModel | dict[None, None]:
-    model = manager.db_manager.get_prompt_model(model_name)
+async def get_model(model_name: str, version: str | None = None) -> PromptModel | dict[None, None]:
+    model = manager.model_source.get_prompt_model(model_name, version)
     if model:
         return model
     else:
         return {}
 
 
+@app.get("/get_model_versions/{model_name}")
+async def get_model_versions(model_name: str) -> dict[str, list[PromptModel]]:
+    """
+    Get every version of a prompt model, oldest first.
+
+    Args:
+        model_name (str): The name of the model.
+
+    Returns:
+        dict: The versions, each with its version number and content hash.
+    """
+    versions = manager.db_manager.get_prompt_model_versions(model_name)
+    if not versions:
+        raise HTTPException(status_code=404, detail=f"No model found with name: {model_name}")
+    return {"versions": versions}
+
+
 @app.post("/create_model")
 async def create_model(model_input: ModelInput = Body(...)) -> dict[str, str]:
     """
@@ -86,18 +176,21 @@ async def create_model(model_input: ModelInput = Body(...)) -> dict[str, str]:
         "response_schema": {
             "result": "str",
             "confidence": "float"
-        }
+        },
+        "backends": ["gpt-4o-mini", "gpt-3.5-turbo"]
     }
     ```
     Returns:
         A dictionary with a message indicating success or failure.
     """
+    _check_catalog_writable()
     try:
         model = manager.db_manager.add_prompt_model(
             name=model_input.name,
             system_prompt=model_input.system_prompt,
             user_prompt_schema=model_input.user_prompt_schema,
             response_schema=model_input.response_schema,
+            backends=model_input.backends,
         )
         if not model:
             return {"message": "Failed to create model"}
@@ -107,49 +200,100 @@ async def create_model(model_input: ModelInput = Body(...)) -> dict[str, str]:
         return {"message": f"Error: {str(e)}"}
 
 
+@app.post("/update_model")
+async def update_model(model_update: ModelUpdate = Body(...)) -> dict[str, Any]:
+    """
+    Update a prompt model, creating a new immutable version if its content changed.
+
+    Only the fields that are given are changed. Chains keep running the version they were
+    pinned to when they were created, so an update does not affect them until they are
+    created again with the new version.
+
+    Example input:
+    ```
+    {
+        "name": "example_model",
+        "system_prompt": "This is a better system prompt"
+    }
+    ```
+    Returns:
+        A dictionary with the model's current version number and hash.
+    """
+    _check_catalog_writable()
+    try:
+        model = manager.db_manager.update_prompt_model(
+            name=model_update.name,
+            system_prompt=model_update.system_prompt,
+            user_prompt_schema=model_update.user_prompt_schema,
+            response_schema=model_update.response_schema,
+            backends=model_update.backends,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except DatabaseManagerException as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"message": "Model updated successfully", "version": model.version, "hash": model.hash}
+
+
 @app.post("/call_openai")
-async def call_openai(request: OpenAIRequest) -> dict[str, str]:
+def call_openai(
+    request: OpenAIRequest, idempotency_key: str | None = Header(None)
+) -> FastJSONResponse:
     """
     Call the OpenAI API with the specified model and dynamic user input.
 
+    The call is routed and failed over across the model's backends like a chain step's,
+    and is limited to CHAIN_DEADLINE_SECONDS.
+
     Args:
         request (OpenAIRequest): Contains model_name and user_input.
+        idempotency_key (str | None): The optional Idempotency-Key header. A retry with the
+            same key gets the response of the first call instead of calling the API again.
 
     Returns:
         dict: The response from the OpenAI API if it meets the response schema for the model.
     """
-    try:
-        model = manager.db_manager.get_prompt_model(request.name)
-        if not model:
-            raise HTTPException(status_code=404, detail=f"No model found with name: {request.name}")
+    return _respond_idempotently(
+        idempotency_key, "call_openai", request, lambda: _call_openai(request)
+    )
 
-        try:
-            manager.db_manager.validate_user_input(request.name, request.user_input)
-        except ValueError as e:
-            raise HTTPException(status_code=422, detail=str(e))
 
-        headers = {
-            "Authorization": f"Bearer {manager.openai_api_key}",
-            "Content-Type": "application/json",
-        }
-        data = {
-            "model": "gpt-3.5-turbo",
-            "messages": [
-                {"role": "system", "content": model.system_prompt},
-                {"role": "user", "content": json.dumps(request.user_input)},
-            ],
-        }
+def _call_openai(request: OpenAIRequest) -> dict[str, Any]:
+    # Imported here so that importing the API does not pull in requests.
+    from requests import RequestException
 
-        response = manager.web_client.post(
-            "https://api.openai.com/v1/chat/completions", headers=headers, json=data
-        )
-        shaped_response = response["choices"][0]["message"]["content"]
+    model = manager.model_source.get_prompt_model(request.name)
+    if not model:
+        raise HTTPException(status_code=404, detail=f"No model found with name: {request.name}")
 
-        manager.db_manager.validate_llm_response(request.name, shaped_response)
-        return {"response": shaped_response}
+    try:
+        validator_cache.get(model.user_prompt)(request.user_input)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-    except (ValueError, RequestException) as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    deadline = Deadline(CHAIN_DEADLINE_SECONDS)
+    try:
+        with _admit(deadline.remaining()):
+            output = manager.chain_executor.call_model(
+                model,
+                request.user_input,
+                deadline=deadline,
+                flow=request.tenant_id or request.name,
+                priority=request.priority,
+            )
+        validator_cache.get(model.response)(output)
+    except DeadlineExceededException as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except (TimeoutError, RequestException) as e:
+        LOGGER.error(f"Provider call for model {model.name} failed: {str(e)}")
+        raise HTTPException(
+            status_code=502, detail=f"The provider call for model {model.name} failed"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=502, detail=f"Model {model.name} returned an invalid response: {str(e)}"
+        )
+    return {"response": codec.dumps(output)}
 
 
 @app.post("/create_chain")
@@ -157,12 +301,19 @@ async def create_chain(chain_config: ChainConfig = Body(...)) -> dict[str, str]:
     """
     Create a new chain configuration.
 
+    Steps without a `model_version` are pinned to their model's current version, so later
+    updates to the model do not change the chain. The chain is type checked against the
+    schemas of its models first, see /check_chain.
+
     Args:
         chain_config (ChainConfig): The configuration for the new chain.
 
     Returns:
         dict: A message indicating whether the chain was created successfully.
 
+    Raises:
+        HTTPException: 422 with every type error if a step would get invalid input.
+
     Example:
     ```
         Request body:
@@ -205,6 +356,11 @@ async def create_chain(chain_config: ChainConfig = Body(...)) -> dict[str, str]:
         - The "final_output_mapping" defines how the chain's final output is constructed from the results of its steps.
     ```
     """
+    _check_catalog_writable()
+    try:
+        check_chain(chain_config, manager.db_manager.get_prompt_model)
+    except ChainTypeException as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
     try:
         success = manager.db_manager.add_chain_config(chain_config)
         if success:
@@ -215,23 +371,120 @@ async def create_chain(chain_config: ChainConfig = Body(...)) -> dict[str, str]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/check_chain")
+async def check_chain_types(chain_config: ChainConfig = Body(...)) -> dict[str, Any]:
+    """
+    Type check a chain against the schemas of its models without creating or running it.
+
+    Every `input_mapping` source is resolved to the type declared by the response schema
+    it comes from, and checked against the user prompt schema field it feeds, so chains
+    that would fail input validation part way through are caught before any LLM call.
+
+    Returns:
+        dict: The inferred `input_schema` the chain's initial input must match, and the
+            `output_schema` of its final output.
+
+    Raises:
+        HTTPException: 422 with every type error if a step would get invalid input.
+    """
+    try:
+        signature = check_chain(chain_config, manager.model_source.get_prompt_model)
+    except ChainTypeException as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    return {"input_schema": signature.input_schema, "output_schema": signature.output_schema}
+
+
 @app.get("/get_chains")
 async def get_chains() -> dict[str, list[str]]:
-    chains = manager.db_manager.get_all_chain_configs()
+    chains = manager.model_source.get_all_chain_configs()
     return {"chains": chains}
 
 
 @app.get("/get_chain/{chain_name}")
 async def get_chain(chain_name: str) -> ChainConfig | dict[None, None]:
-    chain = manager.db_manager.get_chain_config(chain_name)
+    chain = manager.model_source.get_chain_config(chain_name)
     if chain:
         return chain
     else:
         return {}
 
 
+@app.post("/import")
+async def import_catalog(request: Request) -> dict[str, Any]:
+    """
+    Import prompt models and chains from a JSONL body, creating or updating them by name.
+
+    Each line is a JSON object with a "kind" of "model", with the fields of /create_model,
+    or "chain", with the fields of /create_chain, as produced by /export:
+    ```
+    {"kind": "model", "name": "summarizer", "system_prompt": "...", "user_prompt_schema": {"text": "str"}, "response_schema": {"summary": "str"}}
+    {"kind": "chain", "name": "summary_chain", "steps": [...], "final_output_mapping": {...}}
+    ```
+    Every line is validated before anything is written, and everything is written in a
+    single transaction, so either the whole catalog is imported or none of it is.
+
+    Returns:
+        dict: How many models and chains were created and updated.
+
+    Raises:
+        HTTPException: 422 with the errors of every invalid line, 409 if the catalog is
+            loaded from CATALOG_DIR, or 500 if writing fails.
+    """
+    _check_catalog_writable()
+    lines = [line async for line in _iter_lines(request.stream())]
+    try:
+        return await run_in_threadpool(_import_catalog, lines)
+    except CatalogImportException as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    except DatabaseManagerException as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _import_catalog(lines: list[bytes]) -> dict[str, Any]:
+    # Imported here so that importing the API does not pull in SQLAlchemy.
+    from prompt_chain.prompt_lib.catalog import parse_catalog
+
+    catalog = parse_catalog(lines)
+    return manager.db_manager.import_catalog(catalog.models, catalog.chains)
+
+
+def _check_catalog_writable() -> None:
+    if CATALOG_DIR:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Models and chains are loaded from {CATALOG_DIR}, edit the files there instead",
+        )
+
+
+async def _iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+@app.get("/export")
+def export_catalog() -> StreamingResponse:
+    """
+    Export every prompt model and chain as JSONL, in the format read by /import.
+
+    Returns:
+        StreamingResponse: One JSON object per line, models first, streamed as they are
+            read from the database.
+    """
+    from prompt_chain.prompt_lib.catalog import dump_catalog
+
+    return StreamingResponse(dump_catalog(manager.db_manager), media_type="application/x-ndjson")
+
+
 @app.post("/execute_chain")
-async def execute_chain(request: ChainExecutionRequest) -> dict[str, Any]:
+def execute_chain(
+    request: ChainExecutionRequest, idempotency_key: str | None = Header(None)
+) -> FastJSONResponse:
     """
     Execute a chain with the specified chain name and initial input.
 
@@ -256,6 +509,13 @@ async def execute_chain(request: ChainExecutionRequest) -> dict[str, Any]:
             "result": {
                 "original_text": "The new product launch was a great success. Customer feedback has been overwhelmingly positive, with many praising the innovative features and user-friendly design.",
                 "sentiment": 0.8
+            },
+            "metadata": {
+                "execution_id": "3f1c0c4e9d5b4f8e8a7b6c5d4e3f2a1b",
+                "latency_ms": 1834.2,
+                "prompt_tokens": 212,
+                "completion_tokens": 31,
+                "cost_usd": 0.0001525
             }
         }
     ```
@@ -264,21 +524,204 @@ async def execute_chain(request: ChainExecutionRequest) -> dict[str, Any]:
         The structure of the initial_input and the result will depend on how your specific chain is configured.
         The example above assumes a sentiment analysis chain that takes an article as input and
         returns the original text along with a sentiment score.
+        An optional "deadline_seconds" bounds the whole execution. Each step's LLM call is
+        limited to the remaining budget, and the request fails with a 504 once it passes.
+        If the chain has a token_budget or cost_budget, the request fails with a 402 once
+        the execution has used it up.
+        When more executions are in flight and queued than the API admits, the request is
+        shed with a 503 and a Retry-After header.
+        With an Idempotency-Key header, a retry of the request attaches to the execution
+        still running for that key, or gets its stored response once it has completed.
     """
+    return _respond_idempotently(
+        idempotency_key, "execute_chain", request, lambda: _execute_chain(request)
+    )
+
+
+def _execute_chain(request: ChainExecutionRequest) -> dict[str, Any]:
     try:
-        chain_config = manager.db_manager.get_chain_config(request.chain_name)
+        chain_config = manager.model_source.get_chain_config(request.chain_name)
         if not chain_config:
             raise HTTPException(
                 status_code=404, detail=f"No chain found with name: {request.chain_name}"
             )
 
-        result = manager.chain_executor.execute_chain(chain_config, request.initial_input)
-        return {"result": result}
+        deadline = Deadline(request.deadline_seconds or CHAIN_DEADLINE_SECONDS)
+        with _admit(deadline.remaining()):
+            execution = manager.chain_executor.run_chain(
+                chain_config,
+                request.initial_input,
+                deadline=deadline,
+                tenant_id=request.tenant_id,
+                priority=request.priority,
+            )
+        return {
+            "result": execution.output,
+            "metadata": {
+                "execution_id": execution.id,
+                "latency_ms": execution.latency_ms,
+                "prompt_tokens": execution.prompt_tokens,
+                "completion_tokens": execution.completion_tokens,
+                "cost_usd": execution.cost_usd,
+            },
+        }
+    except DeadlineExceededException as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except BudgetExceededException as e:
+        raise HTTPException(status_code=402, detail=str(e))
+    except (InvalidResponseException, OutputValidationException) as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
 
 
+@app.post("/queue_chain")
+async def queue_chain(request: ChainExecutionRequest) -> dict[str, Any]:
+    """
+    Queue a chain execution to be picked up by a worker (see `prompt_chain.worker`).
+
+    Args:
+        request (ChainExecutionRequest): Contains chain_name and initial_input.
+
+    Returns:
+        dict: The id and status of the queued work item, to be polled via /get_queued_chain.
+    """
+    try:
+        chain_config = manager.model_source.get_chain_config(request.chain_name)
+        if not chain_config:
+            raise HTTPException(
+                status_code=404, detail=f"No chain found with name: {request.chain_name}"
+            )
+        item_id = manager.work_queue.enqueue(request.chain_name, request.initial_input)
+        return {"id": item_id, "status": "pending"}
+    except DatabaseManagerException as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/get_queued_chain/{item_id}")
+async def get_queued_chain(item_id: int) -> dict[str, Any]:
+    item = manager.work_queue.get(item_id)
+    if not item:
+        raise HTTPException(status_code=404, detail=f"No queued chain found with id: {item_id}")
+    return {"id": item.id, "status": item.status, "result": item.result, "error": item.error}
+
+
+@app.get("/get_executions/{chain_name}")
+async def get_executions(chain_name: str, limit: int = 20) -> dict[str, list[ExecutionRecord]]:
+    """
+    Get the most recent executions of a chain, newest first.
+
+    Args:
+        chain_name (str): The name of the chain.
+        limit (int): The maximum number of executions to return.
+
+    Returns:
+        dict: The executions with their inputs, outputs, latencies and errors, and those of
+            each of their steps.
+    """
+    if not manager.history:
+        raise HTTPException(status_code=404, detail="Execution history is disabled")
+    try:
+        return {"executions": manager.history.get_recent_executions(chain_name, limit)}
+    except DatabaseManagerException as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/executions/{execution_id}/timeline")
+async def get_execution_timeline(execution_id: str) -> dict[str, Any]:
+    """
+    Get where the time of an execution went, phase by phase for each of its steps.
+
+    Args:
+        execution_id (str): The id of the execution, as returned by /execute_chain.
+
+    Returns:
+        dict: The execution's status and latency, and for each step its latency, its phases
+            in the order they started, with their start in ms from the start of the
+            execution and their duration, and the total time of each phase.
+    """
+    if not manager.history:
+        raise HTTPException(status_code=404, detail="Execution history is disabled")
+    try:
+        execution = manager.history.get_execution(execution_id)
+    except DatabaseManagerException as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if execution is None:
+        raise HTTPException(status_code=404, detail=f"No execution found with id: {execution_id}")
+    return {
+        "execution_id": execution.id,
+        "chain_name": execution.chain_name,
+        "status": execution.status,
+        "latency_ms": execution.latency_ms,
+        "steps": [
+            {
+                "step_index": step.step_index,
+                "model_name": step.model_name,
+                "latency_ms": step.latency_ms,
+                "error": step.error,
+                "phases": sorted(step.timeline, key=lambda phase: phase.start_ms),
+                "totals": phase_totals(step.timeline),
+            }
+            for step in execution.steps
+        ],
+    }
+
+
+def _admit(timeout: float | None = None) -> AbstractContextManager[None]:
+    """
+    Hold one of the API's execution slots, see `AdmissionController`.
+
+    Raises:
+        OverloadedException: If the request was shed, which is returned as a 503 with a
+            Retry-After header.
+    """
+    admission = manager.admission
+    return admission.admit(timeout) if admission else nullcontext()
+
+
+def _respond_idempotently(
+    idempotency_key: str | None,
+    endpoint: str,
+    request: BaseModel,
+    handler: Callable[[], dict[str, Any]],
+) -> FastJSONResponse:
+    """
+    Run a request handler at most once per idempotency key.
+
+    Successful responses and deterministic client errors (see `STORED_CLIENT_ERRORS`) are
+    stored and returned again for retries with the same key, with their original status
+    code.
+
+    Raises:
+        HTTPException: 422 if the key was used for a different request, or 409 if the
+            request holding the key is still running after IDEMPOTENCY_WAIT_TIMEOUT.
+    """
+    if idempotency_key is None:
+        return FastJSONResponse(handler())
+
+    # Imported here so that importing the API does not pull in SQLAlchemy.
+    from prompt_chain.prompt_lib.idempotency import fingerprint
+
+    def run_handler() -> tuple[int, Any]:
+        try:
+            return 200, handler()
+        except HTTPException as e:
+            return e.status_code, {"detail": e.detail}
+
+    try:
+        status_code, body = manager.idempotency.run(
+            idempotency_key, fingerprint(endpoint, request.model_dump(mode="json")), run_handler
+        )
+    except IdempotencyKeyMismatchException as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyKeyInProgressException as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return FastJSONResponse(body, status_code=status_code)
+
+
 def run() -> None:
+    import uvicorn
+
     uvicorn.run(app)
 
 
@@ -1,5 +1,131 @@
+import json
 import os
+from typing import Any
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_API_URL = os.getenv("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions")
 
 DB_URL = os.getenv("DB_URL", "sqlite:///prompt_chain.db")
+
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "1.0"))
+WORKER_HEARTBEAT_INTERVAL = float(os.getenv("WORKER_HEARTBEAT_INTERVAL", "10.0"))
+WORKER_LEASE_TIMEOUT = float(os.getenv("WORKER_LEASE_TIMEOUT", "60.0"))
+WORKER_MAX_ATTEMPTS = int(os.getenv("WORKER_MAX_ATTEMPTS", "3"))
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_CHAINS = [name for name in os.getenv("WARMUP_CHAINS", "").split(",") if name]
+WARMUP_CHAIN_LIMIT = int(os.getenv("WARMUP_CHAIN_LIMIT", "20"))
+# Without WARMUP_CHAINS, the chains run most often over this many days are warmed up.
+WARMUP_HISTORY_DAYS = float(os.getenv("WARMUP_HISTORY_DAYS", "7"))
+# Kept short, so an unreachable provider endpoint cannot hold up the warm-up.
+WARMUP_CONNECT_TIMEOUT = float(os.getenv("WARMUP_CONNECT_TIMEOUT", "2.0"))
+
+JSON_CODEC = os.getenv("JSON_CODEC", "auto")
+
+VALIDATION_ENGINE = os.getenv("VALIDATION_ENGINE", "pydantic")
+
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_MAX_RATE = float(os.getenv("HEDGE_MAX_RATE", "0.05"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+CHAIN_DEADLINE_SECONDS = (
+    float(os.environ["CHAIN_DEADLINE_SECONDS"]) if os.getenv("CHAIN_DEADLINE_SECONDS") else None
+)
+
+REPAIR_MAX_ATTEMPTS = int(os.getenv("REPAIR_MAX_ATTEMPTS", "1"))
+
+# Off by default: the history stores chain inputs and outputs, which may hold user data.
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "false").lower() == "true"
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "1.0"))
+HISTORY_FLUSH_SIZE = int(os.getenv("HISTORY_FLUSH_SIZE", "100"))
+HISTORY_MAX_BUFFER_SIZE = int(os.getenv("HISTORY_MAX_BUFFER_SIZE", "10000"))
+HISTORY_MAX_PAYLOAD_BYTES = int(os.getenv("HISTORY_MAX_PAYLOAD_BYTES", "16384"))
+HISTORY_COMPRESS = os.getenv("HISTORY_COMPRESS", "false").lower() == "true"
+
+# Prices in USD per 1000 tokens, keyed by provider model.
+MODEL_PRICES: dict[str, dict[str, float]] = json.loads(
+    os.getenv("MODEL_PRICES", '{"gpt-3.5-turbo": {"prompt": 0.0005, "completion": 0.0015}}')
+)
+
+MAX_TOKENS_AUTO = os.getenv("MAX_TOKENS_AUTO", "true").lower() == "true"
+MAX_TOKENS_MARGIN = float(os.getenv("MAX_TOKENS_MARGIN", "0.5"))
+# Generous, so that strings without a length hint, such as summaries, are not cut off.
+MAX_TOKENS_DEFAULT_STR_TOKENS = int(os.getenv("MAX_TOKENS_DEFAULT_STR_TOKENS", "1024"))
+MAX_TOKENS_DEFAULT_LIST_LENGTH = int(os.getenv("MAX_TOKENS_DEFAULT_LIST_LENGTH", "8"))
+# The most completion tokens each provider model can generate in one response.
+MODEL_MAX_OUTPUT_TOKENS: dict[str, int] = json.loads(
+    os.getenv("MODEL_MAX_OUTPUT_TOKENS", '{"gpt-3.5-turbo": 4096}')
+)
+MAX_OUTPUT_TOKENS_DEFAULT = int(os.getenv("MAX_OUTPUT_TOKENS_DEFAULT", "4096"))
+
+IDEMPOTENCY_STORE = os.getenv("IDEMPOTENCY_STORE", "memory")
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_LOCK_TIMEOUT = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "600"))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "120"))
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "16"))
+ADMISSION_MAX_QUEUE_SIZE = int(os.getenv("ADMISSION_MAX_QUEUE_SIZE", "16"))
+ADMISSION_MAX_QUEUE_AGE = float(os.getenv("ADMISSION_MAX_QUEUE_AGE", "5.0"))
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+SCHEDULER_CAPACITY = int(os.getenv("SCHEDULER_CAPACITY", "16"))
+# Relative concurrency shares of the priority classes, and weights of tenants within them.
+SCHEDULER_CLASS_SHARES: dict[str, float] = json.loads(
+    os.getenv("SCHEDULER_CLASS_SHARES", '{"interactive": 3, "batch": 1}')
+)
+SCHEDULER_FLOW_WEIGHTS: dict[str, float] = json.loads(os.getenv("SCHEDULER_FLOW_WEIGHTS", "{}"))
+SCHEDULER_DEFAULT_PRIORITY = os.getenv("SCHEDULER_DEFAULT_PRIORITY", "interactive")
+
+# Adapts the scheduler's capacity to the provider, starting from SCHEDULER_CAPACITY.
+ADAPTIVE_CONCURRENCY_ENABLED = os.getenv("ADAPTIVE_CONCURRENCY_ENABLED", "true").lower() == "true"
+ADAPTIVE_CONCURRENCY_MIN = int(os.getenv("ADAPTIVE_CONCURRENCY_MIN", "1"))
+ADAPTIVE_CONCURRENCY_MAX = int(os.getenv("ADAPTIVE_CONCURRENCY_MAX", "64"))
+ADAPTIVE_CONCURRENCY_BACKOFF = float(os.getenv("ADAPTIVE_CONCURRENCY_BACKOFF", "0.5"))
+ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE = float(
+    os.getenv("ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE", "2.0")
+)
+
+# A JSON list of endpoints to spread LLM calls across, each with a "url", an "api_key" or
+# the name of the environment variable holding it as "api_key_env", and optionally a
+# "name" and "requests_per_minute". Defaults to OPENAI_API_URL with OPENAI_API_KEY.
+PROVIDER_ENDPOINTS: list[dict[str, Any]] = json.loads(os.getenv("PROVIDER_ENDPOINTS", "[]"))
+PROVIDER_MAX_FAILURES = int(os.getenv("PROVIDER_MAX_FAILURES", "3"))
+PROVIDER_EJECTION_SECONDS = float(os.getenv("PROVIDER_EJECTION_SECONDS", "30"))
+PROVIDER_MAX_EJECTION_SECONDS = float(os.getenv("PROVIDER_MAX_EJECTION_SECONDS", "300"))
+
+# Routes each LLM call to the fastest healthy of its model's backends.
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+ROUTER_SMOOTHING = float(os.getenv("ROUTER_SMOOTHING", "0.2"))
+ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))
+ROUTER_COOLDOWN_SECONDS = float(os.getenv("ROUTER_COOLDOWN_SECONDS", "30"))
+STEP_MAX_RETRIES = int(os.getenv("STEP_MAX_RETRIES", "1"))
+
+# The most chunks of a chunked step's input run at once, unless the step sets max_parallel.
+CHUNK_MAX_PARALLEL = int(os.getenv("CHUNK_MAX_PARALLEL", "8"))
+
+# A directory of JSON, JSONL or YAML files to serve models and chains from, instead of the
+# database. Checked for changes every CATALOG_RELOAD_INTERVAL seconds, or never if 0.
+CATALOG_DIR = os.getenv("CATALOG_DIR")
+CATALOG_RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", "2"))
+
+# Records every LLM call to CASSETTE_PATH ("record"), or answers them from it without calling
+# the provider ("replay"), waiting the recorded latency times CASSETTE_LATENCY_SCALE.
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off").lower()
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassettes/calls.jsonl.gz")
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "1"))
+
+# Serves a step's cached output for an input whose long strings are at least
+# SEMANTIC_CACHE_THRESHOLD similar to a cached one's, and the rest equal. Thresholds per model
+# are a JSON object of model names to thresholds, where one above 1 disables caching.
+# A share SEMANTIC_CACHE_AUDIT_RATE of the hits is executed anyway to count false hits.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_THRESHOLDS: dict[str, float] = json.loads(
+    os.getenv("SEMANTIC_CACHE_THRESHOLDS", "{}")
+)
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+SEMANTIC_CACHE_DIMENSIONS = int(os.getenv("SEMANTIC_CACHE_DIMENSIONS", "1024"))
+SEMANTIC_CACHE_AUDIT_RATE = float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", "0.01"))
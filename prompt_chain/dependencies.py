@@ -1,7 +1,89 @@
-from prompt_chain.config import DB_URL, OPENAI_API_KEY
-from prompt_chain.prompt_lib.chain_executor import ChainExecutor
-from prompt_chain.prompt_lib.db_manager import DatabaseManager
-from prompt_chain.prompt_lib.web_client import WebClient
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+
+from prompt_chain.config import (
+    ADAPTIVE_CONCURRENCY_BACKOFF,
+    ADAPTIVE_CONCURRENCY_ENABLED,
+    ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE,
+    ADAPTIVE_CONCURRENCY_MAX,
+    ADAPTIVE_CONCURRENCY_MIN,
+    ADMISSION_ENABLED,
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MAX_QUEUE_AGE,
+    ADMISSION_MAX_QUEUE_SIZE,
+    CASSETTE_LATENCY_SCALE,
+    CASSETTE_MODE,
+    CASSETTE_PATH,
+    CATALOG_DIR,
+    CATALOG_RELOAD_INTERVAL,
+    DB_URL,
+    HEDGE_ENABLED,
+    HEDGE_MAX_RATE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_PERCENTILE,
+    HISTORY_COMPRESS,
+    HISTORY_ENABLED,
+    HISTORY_FLUSH_INTERVAL,
+    HISTORY_FLUSH_SIZE,
+    HISTORY_MAX_BUFFER_SIZE,
+    HISTORY_MAX_PAYLOAD_BYTES,
+    IDEMPOTENCY_LOCK_TIMEOUT,
+    IDEMPOTENCY_STORE,
+    IDEMPOTENCY_TTL,
+    IDEMPOTENCY_WAIT_TIMEOUT,
+    OPENAI_API_KEY,
+    OPENAI_API_URL,
+    PROVIDER_EJECTION_SECONDS,
+    PROVIDER_ENDPOINTS,
+    PROVIDER_MAX_EJECTION_SECONDS,
+    PROVIDER_MAX_FAILURES,
+    ROUTER_COOLDOWN_SECONDS,
+    ROUTER_ENABLED,
+    ROUTER_MAX_ERROR_RATE,
+    ROUTER_SMOOTHING,
+    SCHEDULER_CAPACITY,
+    SCHEDULER_CLASS_SHARES,
+    SCHEDULER_DEFAULT_PRIORITY,
+    SCHEDULER_ENABLED,
+    SCHEDULER_FLOW_WEIGHTS,
+    SEMANTIC_CACHE_AUDIT_RATE,
+    SEMANTIC_CACHE_DIMENSIONS,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_THRESHOLDS,
+    SEMANTIC_CACHE_TTL_SECONDS,
+    WARMUP_CHAIN_LIMIT,
+    WARMUP_CHAINS,
+    WARMUP_CONNECT_TIMEOUT,
+    WARMUP_HISTORY_DAYS,
+    WORKER_MAX_ATTEMPTS,
+)
+from prompt_chain.prompt_lib.exceptions import DatabaseManagerException
+from prompt_chain.prompt_lib.metrics import Metrics
+
+# The prompt_lib modules pull in SQLAlchemy and requests, so they are only imported
+# once a dependency is first used. This keeps the import of the API module cheap.
+if TYPE_CHECKING:
+    from prompt_chain.prompt_lib.admission import AdmissionController
+    from prompt_chain.prompt_lib.chain_executor import ChainExecutor
+    from prompt_chain.prompt_lib.concurrency import AIMDLimiter
+    from prompt_chain.prompt_lib.db_manager import DatabaseManager
+    from prompt_chain.prompt_lib.endpoint_pool import EndpointPool
+    from prompt_chain.prompt_lib.file_catalog import FileCatalog
+    from prompt_chain.prompt_lib.hedging import Hedger
+    from prompt_chain.prompt_lib.history import ExecutionHistory
+    from prompt_chain.prompt_lib.idempotency import IdempotencyManager
+    from prompt_chain.prompt_lib.model_source import ModelSource
+    from prompt_chain.prompt_lib.provider_client import ProviderClient
+    from prompt_chain.prompt_lib.router import BackendRouter
+    from prompt_chain.prompt_lib.scheduler import FairScheduler
+    from prompt_chain.prompt_lib.semantic_cache import SemanticCache
+    from prompt_chain.prompt_lib.web_client import WebClient
+    from prompt_chain.prompt_lib.work_queue import WorkQueue
+
+LOGGER = logging.getLogger(__name__)
 
 
 class DependencyManager:
@@ -10,17 +92,56 @@ class DependencyManager:
         self._web_client: WebClient | None = None
         self._openai_api_key: str | None = OPENAI_API_KEY
         self._chain_executor: ChainExecutor | None = None
+        self._work_queue: WorkQueue | None = None
+        self._hedger: Hedger | None = None
+        self._history: ExecutionHistory | None = None
+        self._idempotency: IdempotencyManager | None = None
+        self._admission: AdmissionController | None = None
+        self._scheduler: FairScheduler | None = None
+        self._provider: ProviderClient | None = None
+        self._limiter: AIMDLimiter | None = None
+        self._endpoint_pool: EndpointPool | None = None
+        self._router: BackendRouter | None = None
+        self._file_catalog: FileCatalog | None = None
+        self._semantic_cache: SemanticCache | None = None
+        self.metrics = Metrics()
+        self.ready = False
 
     @property
-    def db_manager(self) -> DatabaseManager:
+    def db_manager(self) -> "DatabaseManager":
         if self._db_manager is None:
+            from prompt_chain.prompt_lib.db_manager import DatabaseManager
+
             self._db_manager = DatabaseManager(DB_URL)
         return self._db_manager
 
     @property
-    def web_client(self) -> WebClient:
+    def model_source(self) -> "ModelSource":
+        """Where chains read their models and configs: the file catalog or the database."""
+        if not CATALOG_DIR:
+            return self.db_manager
+        if self._file_catalog is None:
+            from prompt_chain.prompt_lib.file_catalog import FileCatalog
+
+            self._file_catalog = FileCatalog(
+                CATALOG_DIR, reload_interval=CATALOG_RELOAD_INTERVAL, metrics=self.metrics
+            )
+        return self._file_catalog
+
+    @property
+    def web_client(self) -> "WebClient":
         if self._web_client is None:
-            self._web_client = WebClient()
+            if CASSETTE_MODE != "off":
+                from prompt_chain.prompt_lib.cassette import CassetteWebClient
+
+                LOGGER.info(f"Using cassette {CASSETTE_PATH} in {CASSETTE_MODE} mode")
+                self._web_client = CassetteWebClient(
+                    CASSETTE_PATH, CASSETTE_MODE, latency_scale=CASSETTE_LATENCY_SCALE
+                )
+            else:
+                from prompt_chain.prompt_lib.web_client import WebClient
+
+                self._web_client = WebClient()
         return self._web_client
 
     @property
@@ -30,9 +151,232 @@ class DependencyManager:
         return self._openai_api_key
 
     @property
-    def chain_executor(self) -> ChainExecutor:
+    def chain_executor(self) -> "ChainExecutor":
         if self._chain_executor is None:
+            from prompt_chain.prompt_lib.chain_executor import ChainExecutor
+
             self._chain_executor = ChainExecutor(
-                self.db_manager, self.web_client, self.openai_api_key
+                self.db_manager,
+                self.web_client,
+                self._openai_api_key,
+                hedger=self.hedger,
+                metrics=self.metrics,
+                history=self.history,
+                provider=self.provider,
+                model_source=self.model_source,
+                semantic_cache=self.semantic_cache,
             )
         return self._chain_executor
+
+    @property
+    def semantic_cache(self) -> "SemanticCache | None":
+        if self._semantic_cache is None and SEMANTIC_CACHE_ENABLED:
+            from prompt_chain.prompt_lib.semantic_cache import SemanticCache
+
+            self._semantic_cache = SemanticCache(
+                threshold=SEMANTIC_CACHE_THRESHOLD,
+                thresholds=SEMANTIC_CACHE_THRESHOLDS,
+                max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+                ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS or None,
+                dimensions=SEMANTIC_CACHE_DIMENSIONS,
+                audit_rate=SEMANTIC_CACHE_AUDIT_RATE,
+                metrics=self.metrics,
+            )
+        return self._semantic_cache
+
+    @property
+    def scheduler(self) -> "FairScheduler | None":
+        if self._scheduler is None and SCHEDULER_ENABLED:
+            from prompt_chain.prompt_lib.scheduler import FairScheduler
+
+            self._scheduler = FairScheduler(
+                capacity=SCHEDULER_CAPACITY,
+                class_shares=SCHEDULER_CLASS_SHARES,
+                flow_weights=SCHEDULER_FLOW_WEIGHTS,
+                default_priority=SCHEDULER_DEFAULT_PRIORITY,
+                metrics=self.metrics,
+            )
+        return self._scheduler
+
+    @property
+    def provider(self) -> "ProviderClient":
+        if self._provider is None:
+            from prompt_chain.prompt_lib.provider_client import ProviderClient
+
+            pool = self.endpoint_pool
+            self._provider = ProviderClient(
+                self.web_client,
+                # With an endpoint pool, each endpoint has its own key, and replayed calls
+                # need none.
+                self._openai_api_key if pool or CASSETTE_MODE == "replay" else self.openai_api_key,
+                OPENAI_API_URL,
+                scheduler=self.scheduler,
+                limiter=self.limiter,
+                pool=pool,
+                router=self.router,
+            )
+        return self._provider
+
+    @property
+    def endpoint_pool(self) -> "EndpointPool | None":
+        if self._endpoint_pool is None and PROVIDER_ENDPOINTS:
+            from prompt_chain.prompt_lib.endpoint_pool import EndpointPool, endpoints_from_config
+
+            self._endpoint_pool = EndpointPool(
+                endpoints_from_config(PROVIDER_ENDPOINTS),
+                max_failures=PROVIDER_MAX_FAILURES,
+                ejection_seconds=PROVIDER_EJECTION_SECONDS,
+                max_ejection_seconds=PROVIDER_MAX_EJECTION_SECONDS,
+                metrics=self.metrics,
+            )
+        return self._endpoint_pool
+
+    @property
+    def router(self) -> "BackendRouter | None":
+        if self._router is None and ROUTER_ENABLED:
+            from prompt_chain.prompt_lib.router import BackendRouter
+
+            self._router = BackendRouter(
+                smoothing=ROUTER_SMOOTHING,
+                max_error_rate=ROUTER_MAX_ERROR_RATE,
+                cooldown_seconds=ROUTER_COOLDOWN_SECONDS,
+                metrics=self.metrics,
+            )
+        return self._router
+
+    @property
+    def limiter(self) -> "AIMDLimiter | None":
+        # The limiter works by setting the scheduler's capacity, so it needs the scheduler.
+        if self._limiter is None and ADAPTIVE_CONCURRENCY_ENABLED and SCHEDULER_ENABLED:
+            from prompt_chain.prompt_lib.concurrency import AIMDLimiter
+
+            self._limiter = AIMDLimiter(
+                initial_limit=SCHEDULER_CAPACITY,
+                min_limit=ADAPTIVE_CONCURRENCY_MIN,
+                max_limit=ADAPTIVE_CONCURRENCY_MAX,
+                backoff=ADAPTIVE_CONCURRENCY_BACKOFF,
+                latency_tolerance=ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE,
+                metrics=self.metrics,
+            )
+        return self._limiter
+
+    @property
+    def hedger(self) -> "Hedger | None":
+        if self._hedger is None and HEDGE_ENABLED:
+            from prompt_chain.prompt_lib.hedging import Hedger
+
+            self._hedger = Hedger(
+                percentile=HEDGE_PERCENTILE,
+                max_hedge_rate=HEDGE_MAX_RATE,
+                min_samples=HEDGE_MIN_SAMPLES,
+                metrics=self.metrics,
+            )
+        return self._hedger
+
+    @property
+    def history(self) -> "ExecutionHistory | None":
+        if self._history is None and HISTORY_ENABLED:
+            from prompt_chain.prompt_lib.history import ExecutionHistory
+
+            self._history = ExecutionHistory(
+                self.db_manager,
+                flush_interval=HISTORY_FLUSH_INTERVAL,
+                flush_size=HISTORY_FLUSH_SIZE,
+                max_buffer_size=HISTORY_MAX_BUFFER_SIZE,
+                max_payload_bytes=HISTORY_MAX_PAYLOAD_BYTES,
+                compress=HISTORY_COMPRESS,
+                metrics=self.metrics,
+            )
+        return self._history
+
+    @property
+    def idempotency(self) -> "IdempotencyManager":
+        if self._idempotency is None:
+            from prompt_chain.prompt_lib.idempotency import (
+                DatabaseIdempotencyStore,
+                IdempotencyManager,
+                IdempotencyStore,
+                InMemoryIdempotencyStore,
+            )
+
+            store: IdempotencyStore
+            if IDEMPOTENCY_STORE == "db":
+                store = DatabaseIdempotencyStore(
+                    self.db_manager, ttl=IDEMPOTENCY_TTL, lock_timeout=IDEMPOTENCY_LOCK_TIMEOUT
+                )
+            else:
+                store = InMemoryIdempotencyStore(
+                    ttl=IDEMPOTENCY_TTL, lock_timeout=IDEMPOTENCY_LOCK_TIMEOUT
+                )
+            self._idempotency = IdempotencyManager(
+                store, wait_timeout=IDEMPOTENCY_WAIT_TIMEOUT, metrics=self.metrics
+            )
+        return self._idempotency
+
+    @property
+    def admission(self) -> "AdmissionController | None":
+        if self._admission is None and ADMISSION_ENABLED:
+            from prompt_chain.prompt_lib.admission import AdmissionController
+
+            self._admission = AdmissionController(
+                max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+                max_queue_size=ADMISSION_MAX_QUEUE_SIZE,
+                max_queue_age=ADMISSION_MAX_QUEUE_AGE,
+                metrics=self.metrics,
+            )
+        return self._admission
+
+    @property
+    def work_queue(self) -> "WorkQueue":
+        if self._work_queue is None:
+            from prompt_chain.prompt_lib.work_queue import WorkQueue
+
+            self._work_queue = WorkQueue(self.db_manager, max_attempts=WORKER_MAX_ATTEMPTS)
+        return self._work_queue
+
+    def warm_up(self) -> None:
+        """
+        Build every dependency and prime the caches used on the request path.
+
+        This connects to the database, opens a connection to the LLM provider and compiles
+        the validators of the configured warm-up chains (WARMUP_CHAINS). If none are
+        configured, the WARMUP_CHAIN_LIMIT chains run most often in the last
+        WARMUP_HISTORY_DAYS are taken from the execution history, if it is enabled.
+        """
+        self.db_manager.warm_up()
+        for endpoint in PROVIDER_ENDPOINTS or [{"url": OPENAI_API_URL}]:
+            self.web_client.warm_up(endpoint["url"], timeout=WARMUP_CONNECT_TIMEOUT)
+        try:
+            chain_executor = self.chain_executor
+        except ValueError as e:
+            LOGGER.warning(f"Skipping validator warm-up: {str(e)}")
+        else:
+            chain_names = WARMUP_CHAINS or self._busiest_chains()
+            for chain_name in chain_names[:WARMUP_CHAIN_LIMIT]:
+                chain_config = self.model_source.get_chain_config(chain_name)
+                if chain_config:
+                    chain_executor.precompile(chain_config)
+        self.ready = True
+        LOGGER.info("Warm-up completed")
+
+    def _busiest_chains(self) -> list[str]:
+        if self.history is None:
+            LOGGER.info("Skipping validator warm-up: set WARMUP_CHAINS or enable HISTORY_ENABLED")
+            return []
+        since = datetime.now(timezone.utc) - timedelta(days=WARMUP_HISTORY_DAYS)
+        try:
+            return self.history.get_busiest_chains(WARMUP_CHAIN_LIMIT, since)
+        except DatabaseManagerException as e:
+            LOGGER.warning(f"Skipping validator warm-up: {str(e)}")
+            return []
+
+    def close(self) -> None:
+        """Flush buffered execution history and release background resources."""
+        if self._history is not None:
+            self._history.close()
+        if self._hedger is not None:
+            self._hedger.close()
+        if self._file_catalog is not None:
+            self._file_catalog.close()
+        if self._web_client is not None:
+            self._web_client.close()
@@ -0,0 +1,131 @@
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from prompt_chain.prompt_lib.exceptions import OverloadedException
+from prompt_chain.prompt_lib.metrics import Metrics
+
+# Weight of the latest execution in the moving average used to estimate Retry-After.
+DURATION_SMOOTHING = 0.2
+
+
+class AdmissionController:
+    """
+    Caps the number of executions in flight and sheds the load beyond it.
+
+    Up to `max_in_flight` executions run at once. Further requests wait in a FIFO queue
+    of at most `max_queue_size` entries, for at most `max_queue_age` seconds, and each
+    finished execution hands its slot straight to the oldest waiter. A request that finds
+    the queue full, or is still queued when its wait runs out, is rejected immediately
+    rather than being left to time out, with a Retry-After estimated from recent
+    execution times.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 16,
+        max_queue_size: int = 16,
+        max_queue_age: float = 5.0,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queue_size = max_queue_size
+        self.max_queue_age = max_queue_age
+        self.metrics = metrics or Metrics()
+        self._in_flight = 0
+        self._queue: deque[threading.Event] = deque()
+        self._average_duration: float | None = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def admit(self, timeout: float | None = None) -> Iterator[None]:
+        """
+        Hold an execution slot for the duration of the block.
+
+        Args:
+            timeout (float | None): The longest the caller can wait in the queue, e.g. the
+                remaining time of its deadline, if shorter than `max_queue_age`.
+
+        Raises:
+            OverloadedException: If the request was shed instead of admitted.
+        """
+        self.acquire(timeout)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def acquire(self, timeout: float | None = None) -> None:
+        """
+        Take an execution slot, waiting in the queue if none is free.
+
+        Raises:
+            OverloadedException: If the queue is full, or no slot freed up in time.
+        """
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._queue:
+                self._in_flight += 1
+                self._admitted(0.0)
+                return
+            if len(self._queue) >= self.max_queue_size:
+                raise self._reject("queue_full", "Too many requests queued")
+            waiter = threading.Event()
+            self._queue.append(waiter)
+            self._update_gauges()
+
+        start = time.monotonic()
+        wait = self.max_queue_age if timeout is None else min(self.max_queue_age, timeout)
+        if not waiter.wait(wait):
+            with self._lock:
+                # The slot may have been handed over just as the wait ran out.
+                if not waiter.is_set():
+                    self._queue.remove(waiter)
+                    raise self._reject("queue_timeout", f"Request queued for over {wait:.1f}s")
+        with self._lock:
+            self._admitted(time.monotonic() - start)
+
+    def release(self, duration: float | None = None) -> None:
+        """
+        Give back an execution slot, handing it to the oldest waiter if there is one.
+
+        Args:
+            duration (float | None): How long the execution held the slot, in seconds.
+        """
+        with self._lock:
+            if duration is not None:
+                self._average_duration = (
+                    duration
+                    if self._average_duration is None
+                    else DURATION_SMOOTHING * duration
+                    + (1 - DURATION_SMOOTHING) * self._average_duration
+                )
+            if self._queue:
+                self._queue.popleft().set()
+            else:
+                self._in_flight -= 1
+            self._update_gauges()
+
+    def retry_after(self) -> int:
+        """Estimate, in whole seconds, how long until the queue has drained."""
+        if self._average_duration is None:
+            return 1
+        batches = (len(self._queue) + 1) / max(1, self.max_in_flight)
+        return max(1, math.ceil(self._average_duration * batches))
+
+    def _admitted(self, waited: float) -> None:
+        self.metrics.increment("admission.admitted")
+        self.metrics.increment("admission.queue_wait_ms", waited * 1000)
+        self._update_gauges()
+
+    def _reject(self, reason: str, message: str) -> OverloadedException:
+        self.metrics.increment("admission.rejected", reason=reason)
+        self._update_gauges()
+        return OverloadedException(message, self.retry_after())
+
+    def _update_gauges(self) -> None:
+        self.metrics.set_gauge("admission.in_flight", self._in_flight)
+        self.metrics.set_gauge("admission.queue_depth", len(self._queue))
@@ -0,0 +1,96 @@
+import math
+
+from prompt_chain.prompt_lib.exceptions import BudgetExceededException
+from prompt_chain.prompt_lib.models import ExecutionRecord
+
+
+class Budget:
+    """
+    A token and cost allowance for a chain execution.
+
+    Usage is read from the execution record, so it includes every LLM call made so far,
+    repairs and hedges included. A budget created without limits is never exceeded.
+    Prices are in USD per 1000 tokens, keyed by backend, as in MODEL_PRICES.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int | None = None,
+        max_cost: float | None = None,
+        prices: dict[str, dict[str, float]] | None = None,
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.prices = prices or {}
+
+    def check(self, execution: ExecutionRecord, action: str) -> None:
+        """
+        Raise if the execution has used up its tokens or cost allowance.
+
+        Args:
+            execution (ExecutionRecord): The execution whose usage is checked.
+            action (str): What was about to be done, used in the error message.
+
+        Raises:
+            BudgetExceededException: If the budget has been used up.
+        """
+        tokens, cost = self._used(execution)
+        if self.max_tokens is not None and tokens >= self.max_tokens:
+            raise BudgetExceededException(
+                f"Token budget of {self.max_tokens} exhausted before {action} ({tokens} used)"
+            )
+        if self.max_cost is not None and cost >= self.max_cost:
+            raise BudgetExceededException(
+                f"Cost budget of ${self.max_cost} exhausted before {action} (${cost:.6f} used)"
+            )
+
+    def completion_tokens_left(
+        self, execution: ExecutionRecord, prompt_tokens: int, action: str, backend: str
+    ) -> int | None:
+        """
+        Get how many completion tokens the next call can use without exceeding the budget.
+
+        Args:
+            execution (ExecutionRecord): The execution whose usage is checked.
+            prompt_tokens (int): The estimated prompt tokens of the next call.
+            action (str): What is about to be done, used in the error message.
+            backend (str): The provider model the call is sent to, which sets its price.
+
+        Returns:
+            int | None: The completion token limit, or None if the budget has no limits.
+
+        Raises:
+            BudgetExceededException: If the prompt alone would use up the budget, or if the
+                budget has a cost limit and the backend has no price.
+        """
+        tokens, cost = self._used(execution)
+        limits = []
+        if self.max_tokens is not None:
+            limits.append(self.max_tokens - tokens - prompt_tokens)
+        if self.max_cost is not None and backend not in self.prices:
+            raise BudgetExceededException(
+                f"No price for backend {backend}, so the cost budget cannot cover {action}"
+            )
+        prices = self.prices.get(backend, {})
+        completion_price = prices.get("completion", 0.0) / 1000
+        if self.max_cost is not None and completion_price > 0:
+            prompt_cost = prompt_tokens * prices.get("prompt", 0.0) / 1000
+            # Rounded first so float error cannot cost a token, e.g. 0.7 - 0.2 = 0.4999...
+            limits.append(
+                math.floor(round((self.max_cost - cost - prompt_cost) / completion_price, 6))
+            )
+        if not limits:
+            return None
+        if min(limits) <= 0:
+            raise BudgetExceededException(
+                f"Budget too small for the prompt of {action} (~{prompt_tokens} tokens)"
+            )
+        return min(limits)
+
+    @staticmethod
+    def _used(execution: ExecutionRecord) -> tuple[int, float]:
+        tokens = sum(
+            (step.prompt_tokens or 0) + (step.completion_tokens or 0) for step in execution.steps
+        )
+        cost = sum(step.cost_usd or 0.0 for step in execution.steps)
+        return tokens, cost
@@ -0,0 +1,189 @@
+import gzip
+import hashlib
+import io
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from collections.abc import Mapping
+from pathlib import Path
+from typing import IO, Any
+
+import requests
+
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.exceptions import CassetteMissException
+from prompt_chain.prompt_lib.web_client import WebClient
+
+LOGGER = logging.getLogger(__name__)
+
+
+def request_key(json_body: dict[str, Any] | None) -> str:
+    """
+    Hash a request body into the key its recorded responses are looked up by.
+
+    The URL and headers are left out, so that calls spread across equivalent endpoints
+    and credentials replay the same way, and so no API key ends up in a cassette.
+    """
+    payload = json.dumps(json_body, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _open(path: Path, mode: str) -> IO[str]:
+    if path.suffix == ".gz":
+        return io.TextIOWrapper(gzip.GzipFile(path, mode), encoding="utf-8")
+    return path.open(mode, encoding="utf-8")
+
+
+class CassetteWebClient(WebClient):
+    """
+    A web client that records provider calls to a cassette file, or replays them from one.
+
+    A cassette holds one JSON line per call, gzipped if the path ends in .gz, with the
+    request body, the response or error, and how long the call took. In "record" mode
+    every call is made for real and appended to the cassette. In "replay" mode no call
+    is made: each request is answered with the next recorded response to the same
+    request body, after the recorded latency multiplied by `latency_scale`, so that
+    production traffic can be run through the whole stack offline. Recorded errors are
+    raised again, and a latency longer than the request's timeout raises a timeout.
+    Responses to a request that was recorded several times are served in the recorded
+    order, starting over once all have been served.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        mode: str,
+        latency_scale: float = 1.0,
+        timeout: float = 120,
+    ) -> None:
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        super().__init__(timeout)
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._file: IO[str] | None = None
+        self._recorded: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        self._queues: dict[str, deque[dict[str, Any]]] = {}
+        if mode == "record":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = _open(self.path, "a")
+        else:
+            self._load()
+
+    def post(
+        self,
+        url: str,
+        headers: Mapping[str, str],
+        json: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> dict[str, Any] | Any:
+        if self.mode == "replay":
+            return self._replay(json, timeout)
+        return self._record(url, headers, json, timeout)
+
+    def warm_up(self, url: str, timeout: float | None = None) -> None:
+        if self.mode == "record":
+            super().warm_up(url, timeout)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        super().close()
+
+    def _record(
+        self,
+        url: str,
+        headers: Mapping[str, str],
+        json_body: dict[str, Any] | None,
+        timeout: float | None,
+    ) -> dict[str, Any] | Any:
+        entry: dict[str, Any] = {"key": request_key(json_body), "url": url, "request": json_body}
+        start = time.perf_counter()
+        try:
+            response = super().post(url, headers, json_body, timeout)
+        except Exception as e:
+            entry["error"] = _describe_error(e)
+            raise
+        else:
+            entry["response"] = response
+            return response
+        finally:
+            entry["latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            self._write(entry)
+
+    def _write(self, entry: dict[str, Any]) -> None:
+        line = codec.dumps(entry)
+        with self._lock:
+            if self._file is None:
+                LOGGER.warning("Cassette is closed, not recording a call")
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def _load(self) -> None:
+        with _open(self.path, "r") as file:
+            for line in file:
+                if line.strip():
+                    entry = codec.loads(line)
+                    self._recorded[entry["key"]].append(entry)
+        self._queues = {key: deque(entries) for key, entries in self._recorded.items()}
+        LOGGER.info(
+            f"Loaded {sum(len(entries) for entries in self._recorded.values())} calls "
+            f"from cassette {self.path}"
+        )
+
+    def _replay(self, json_body: dict[str, Any] | None, timeout: float | None) -> dict[str, Any]:
+        key = request_key(json_body)
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is None:
+                raise CassetteMissException(f"No call recorded for request {key} in {self.path}")
+            if not queue:
+                queue.extend(self._recorded[key])
+            entry = queue.popleft()
+
+        latency = entry.get("latency_ms", 0.0) / 1000 * self.latency_scale
+        timeout = timeout if timeout is not None else self._timeout
+        if latency > timeout:
+            time.sleep(timeout)
+            raise requests.Timeout(
+                f"Replayed call took {latency:.3f}s, over the {timeout}s timeout"
+            )
+        time.sleep(latency)
+        if "error" in entry:
+            raise _rebuild_error(entry["error"])
+        return entry["response"]  # type: ignore[no-any-return]
+
+
+def _describe_error(error: Exception) -> dict[str, Any]:
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return {
+            "type": "http",
+            "status": error.response.status_code,
+            "body": error.response.text,
+            "message": str(error),
+        }
+    if isinstance(error, requests.Timeout):
+        return {"type": "timeout", "message": str(error)}
+    if isinstance(error, requests.RequestException):
+        return {"type": "connection", "message": str(error)}
+    return {"type": "invalid_response", "message": str(error)}
+
+
+def _rebuild_error(error: dict[str, Any]) -> Exception:
+    if error["type"] == "http":
+        response = requests.Response()
+        response.status_code = error["status"]
+        response._content = error.get("body", "").encode("utf-8")
+        return requests.HTTPError(error["message"], response=response)
+    if error["type"] == "timeout":
+        return requests.Timeout(error["message"])
+    if error["type"] == "connection":
+        return requests.ConnectionError(error["message"])
+    return ValueError(error["message"])
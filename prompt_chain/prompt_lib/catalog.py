@@ -0,0 +1,129 @@
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic import ValidationError
+
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.db_manager import DatabaseManager
+from prompt_chain.prompt_lib.exceptions import CatalogImportException
+from prompt_chain.prompt_lib.models import ChainConfig, DynamicModel, ModelInput
+
+# The most errors reported for an import, so a broken file does not produce a huge response.
+MAX_REPORTED_ERRORS = 100
+
+
+@dataclass
+class Catalog:
+    """Prompt models and chain configs to import."""
+
+    models: list[ModelInput] = field(default_factory=list)
+    chains: list[ChainConfig] = field(default_factory=list)
+
+
+def parse_catalog(lines: Iterable[str | bytes]) -> Catalog:
+    """
+    Parse and validate a JSONL catalog of prompt models and chain configs.
+
+    Each non-empty line is a JSON object with a "kind" of "model", with the fields of
+    ModelInput, or "chain", with the fields of ChainConfig. Every line is validated,
+    including compiling the model schemas with DynamicModel, before anything is written,
+    and all the errors are reported together.
+
+    Args:
+        lines (Iterable[str | bytes]): The lines of the catalog.
+
+    Returns:
+        Catalog: The validated models and chains.
+
+    Raises:
+        CatalogImportException: If any line is invalid, or a name appears twice.
+    """
+    catalog = Catalog()
+    errors: list[str] = []
+    seen: dict[tuple[str, str], int] = {}
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            kind, entry = _parse_line(line)
+        except (ValueError, ValidationError) as e:
+            errors.append(f"Line {line_number}: {str(e)}")
+            continue
+        first = seen.setdefault((kind, entry.name), line_number)
+        if first != line_number:
+            errors.append(
+                f"Line {line_number}: duplicate {kind} {entry.name}, first on line {first}"
+            )
+        elif isinstance(entry, ModelInput):
+            catalog.models.append(entry)
+        else:
+            catalog.chains.append(entry)
+
+    if errors:
+        raise CatalogImportException(
+            f"Catalog has {len(errors)} invalid line(s)", errors[:MAX_REPORTED_ERRORS]
+        )
+    return catalog
+
+
+def _parse_line(line: str | bytes) -> tuple[str, ModelInput | ChainConfig]:
+    data = codec.loads(line)
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    return parse_entry(data)
+
+
+def parse_entry(data: dict[str, Any]) -> tuple[str, ModelInput | ChainConfig]:
+    """
+    Validate a catalog entry, compiling the schemas of a model with DynamicModel.
+
+    Args:
+        data (dict[str, Any]): The entry, with a "kind" of "model" or "chain".
+
+    Returns:
+        tuple[str, ModelInput | ChainConfig]: The kind and the validated entry.
+
+    Raises:
+        ValueError: If the entry is invalid. This includes pydantic's ValidationError.
+    """
+    data = dict(data)
+    kind = data.pop("kind", None)
+    if kind == "model":
+        model = ModelInput.model_validate(data)
+        DynamicModel.create_from_schema(model.user_prompt_schema, f"{model.name}_Input")
+        DynamicModel.create_from_schema(model.response_schema, f"{model.name}_Output")
+        return kind, model
+    if kind == "chain":
+        return kind, ChainConfig.model_validate(data)
+    raise ValueError(f'Unknown kind: {kind}, expected "model" or "chain"')
+
+
+def dump_catalog(db_manager: DatabaseManager) -> Iterator[bytes]:
+    """
+    Export every prompt model and chain config as JSONL, in the format read by
+    `parse_catalog`. Models come first, so the output can be imported as it is.
+
+    Args:
+        db_manager (DatabaseManager): The database to export.
+
+    Yields:
+        bytes: One line of JSON per model or chain, ending in a newline.
+    """
+    for model in db_manager.iter_prompt_models():
+        yield _dump_line(
+            {
+                "kind": "model",
+                "name": model.name,
+                "system_prompt": model.system_prompt,
+                "user_prompt_schema": model.user_prompt,
+                "response_schema": model.response,
+                "backends": model.backends,
+            }
+        )
+    for chain in db_manager.iter_chain_configs():
+        yield _dump_line({"kind": "chain", **chain.model_dump()})
+
+
+def _dump_line(entry: dict[str, Any]) -> bytes:
+    return codec.dumps_bytes(entry) + b"\n"
@@ -1,25 +1,105 @@
-import json
 import logging
-from typing import Any, cast
-
-from pydantic import ValidationError
-
+import re
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any
+
+from requests import RequestException
+
+from prompt_chain.config import (
+    CHUNK_MAX_PARALLEL,
+    MAX_OUTPUT_TOKENS_DEFAULT,
+    MAX_TOKENS_AUTO,
+    MAX_TOKENS_DEFAULT_LIST_LENGTH,
+    MAX_TOKENS_DEFAULT_STR_TOKENS,
+    MAX_TOKENS_MARGIN,
+    MODEL_MAX_OUTPUT_TOKENS,
+    MODEL_PRICES,
+    REPAIR_MAX_ATTEMPTS,
+    STEP_MAX_RETRIES,
+)
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.budget import Budget
+from prompt_chain.prompt_lib.chunking import reduce_outputs, split_text
+from prompt_chain.prompt_lib.compaction import compact, count_tokens
 from prompt_chain.prompt_lib.db_manager import DatabaseManager
-from prompt_chain.prompt_lib.models import ChainConfig, DynamicModel, PromptModel
+from prompt_chain.prompt_lib.deadline import Deadline
+from prompt_chain.prompt_lib.exceptions import (
+    DeadlineExceededException,
+    InvalidResponseException,
+    OutputValidationException,
+)
+from prompt_chain.prompt_lib.hedging import Hedger
+from prompt_chain.prompt_lib.history import ExecutionHistory
+from prompt_chain.prompt_lib.metrics import Metrics
+from prompt_chain.prompt_lib.model_source import ModelSource
+from prompt_chain.prompt_lib.models import (
+    ChainConfig,
+    ChainStep,
+    ChunkingConfig,
+    ExecutionRecord,
+    PromptModel,
+    StepRecord,
+)
+from prompt_chain.prompt_lib.provider_client import ProviderClient, is_provider_failure
+from prompt_chain.prompt_lib.semantic_cache import SemanticCache
+from prompt_chain.prompt_lib.timeline import Timeline
+from prompt_chain.prompt_lib.token_estimator import (
+    estimate_completion_tokens,
+    estimate_message_tokens,
+    estimate_prompt_tokens,
+)
+from prompt_chain.prompt_lib.validators import validator_cache
 from prompt_chain.prompt_lib.web_client import WebClient
 
+OPENAI_MODEL = "gpt-3.5-turbo"
+CODE_FENCE_PATTERN = re.compile(r"```[a-zA-Z]*\s*(.*?)\s*```", re.DOTALL)
+REPAIR_PROMPT = (
+    "Your previous response could not be used: {error}\n"
+    "Reply again with only a JSON object matching the required schema: {schema}"
+)
+
 
 class ChainExecutor:
     def __init__(
-        self, db_manager: DatabaseManager, web_client: WebClient, openai_api_key: str | None
+        self,
+        db_manager: DatabaseManager,
+        web_client: WebClient,
+        openai_api_key: str | None,
+        hedger: Hedger | None = None,
+        max_repair_attempts: int = REPAIR_MAX_ATTEMPTS,
+        metrics: Metrics | None = None,
+        history: ExecutionHistory | None = None,
+        provider: ProviderClient | None = None,
+        max_retries: int = STEP_MAX_RETRIES,
+        model_source: ModelSource | None = None,
+        semantic_cache: SemanticCache | None = None,
     ) -> None:
         self.db_manager = db_manager
+        self.model_source: ModelSource = model_source or db_manager
         self.web_client = web_client
-        self._openai_api_key = openai_api_key
+        self.provider = provider or ProviderClient(web_client, openai_api_key)
+        self.hedger = hedger
+        self.max_repair_attempts = max_repair_attempts
+        self.max_retries = max_retries
+        self.metrics = metrics or Metrics()
+        self.history = history
+        self.semantic_cache = semantic_cache
         self.logger = logging.getLogger(__name__)
+        self._usage_lock = threading.Lock()
 
     def execute_chain(
-        self, chain_config: ChainConfig, initial_input: dict[str, Any]
+        self,
+        chain_config: ChainConfig,
+        initial_input: dict[str, Any],
+        deadline: Deadline | None = None,
+        execution_id: str | None = None,
+        tenant_id: str | None = None,
+        priority: str | None = None,
     ) -> dict[str, Any]:
         """
         Execute a chain of AI models as defined in the chain_config.
@@ -27,49 +107,621 @@ class ChainExecutor:
         Args:
             chain_config (ChainConfig): Configuration defining the chain of models to execute.
             initial_input (dict[str, Any]): Initial input data for the chain.
+            deadline (Deadline | None): The end-to-end deadline for the execution. Each
+                step's LLM call is limited to the remaining budget.
+            execution_id (str | None): The id to record the execution under. A random id
+                is generated if not given.
+            tenant_id (str | None): The tenant the execution's LLM calls are scheduled
+                fairly against. Defaults to the chain name.
+            priority (str | None): The priority class of the execution's LLM calls.
 
         Returns:
             dict[str, Any]: The final output of the chain after all steps have been executed.
 
         Raises:
             ValueError: If a model in the chain is not found.
+            DeadlineExceededException: If the deadline passes before the chain completes.
+            BudgetExceededException: If the chain's token or cost budget is used up.
+        """
+        execution = self.run_chain(
+            chain_config, initial_input, deadline, execution_id, tenant_id, priority
+        )
+        return execution.output  # type: ignore[no-any-return]
+
+    def run_chain(
+        self,
+        chain_config: ChainConfig,
+        initial_input: dict[str, Any],
+        deadline: Deadline | None = None,
+        execution_id: str | None = None,
+        tenant_id: str | None = None,
+        priority: str | None = None,
+    ) -> ExecutionRecord:
         """
+        Execute a chain and return its record, with the output, latency and token usage.
+
+        The execution and each of its steps are recorded in the execution history, if
+        one is configured, whether the chain succeeds or fails.
+
+        Args:
+            chain_config (ChainConfig): Configuration defining the chain of models to execute.
+            initial_input (dict[str, Any]): Initial input data for the chain.
+            deadline (Deadline | None): The end-to-end deadline for the execution.
+            execution_id (str | None): The id to record the execution under.
+            tenant_id (str | None): The tenant the execution's LLM calls are scheduled
+                fairly against. Defaults to the chain name.
+            priority (str | None): The priority class of the execution's LLM calls.
+
+        Returns:
+            ExecutionRecord: The completed execution.
+
+        Raises:
+            ValueError: If a model in the chain is not found.
+            DeadlineExceededException: If the deadline passes before the chain completes.
+            BudgetExceededException: If the chain's token or cost budget is used up.
+        """
+        deadline = deadline or Deadline()
+        budget = Budget(chain_config.token_budget, chain_config.cost_budget, MODEL_PRICES)
         self.logger.info(f"Starting chain execution with config: {chain_config}")
         self.logger.debug(f"Initial input: {initial_input}")
 
+        execution = ExecutionRecord(
+            id=execution_id or uuid.uuid4().hex,
+            chain_name=chain_config.name,
+            started_at=datetime.now(timezone.utc).isoformat(),
+            input=initial_input,
+            tenant_id=tenant_id,
+            priority=priority,
+        )
+        start = time.perf_counter()
+        try:
+            final_output = self._execute_steps(
+                chain_config, initial_input, deadline, budget, execution
+            )
+        except Exception as e:
+            execution.status = "failed"
+            execution.error = str(e)
+            raise
+        else:
+            execution.status = "completed"
+            execution.output = final_output
+        finally:
+            execution.latency_ms = (time.perf_counter() - start) * 1000
+            self._total_usage(execution)
+            if self.history:
+                self.history.record(execution)
+        self.logger.info("Chain execution completed")
+        self.logger.debug(f"Final output: {final_output}")
+
+        return execution
+
+    def call_model(
+        self,
+        model: PromptModel,
+        input_data: dict[str, Any],
+        deadline: Deadline | None = None,
+        flow: str | None = None,
+        priority: str | None = None,
+    ) -> dict[str, Any]:
+        """
+        Call a model once, outside of a chain, on the best of its backends.
+
+        The call is routed and failed over like a chain step's, see
+        `_execute_step_with_failover`, but its output is neither validated nor repaired.
+
+        Args:
+            model (PromptModel): The model to call.
+            input_data (dict[str, Any]): Validated input data for the model.
+            deadline (Deadline | None): The deadline of the call.
+            flow (str | None): The flow the call is scheduled under. Defaults to the model
+                name.
+            priority (str | None): The priority class of the call.
+
+        Returns:
+            dict[str, Any]: The output from the OpenAI API call.
+
+        Raises:
+            InvalidResponseException: If the response is not a JSON object.
+            DeadlineExceededException: If the deadline passes before the call completes.
+            TimeoutError: If the call on the last backend tried timed out.
+            RequestException: If the call on the last backend tried failed.
+        """
+        deadline = deadline or Deadline()
+        try:
+            return self._execute_step_with_failover(
+                model,
+                ChainStep(name=model.name, input_mapping={}),
+                input_data,
+                deadline,
+                repair_messages=[],
+                step_record=None,
+                max_tokens=lambda backend: None,
+                flow=flow or model.name,
+                priority=priority,
+                timeline=Timeline(),
+            )
+        except (TimeoutError, RequestException) as e:
+            if deadline.expired():
+                self.logger.error(f"Deadline exceeded calling model {model.name}: {str(e)}")
+                raise DeadlineExceededException(
+                    f"Deadline exceeded calling model {model.name}"
+                ) from e
+            raise
+
+    def _execute_steps(
+        self,
+        chain_config: ChainConfig,
+        initial_input: dict[str, Any],
+        deadline: Deadline,
+        budget: Budget,
+        execution: ExecutionRecord,
+    ) -> dict[str, Any]:
+        origin = time.perf_counter()
         current_output = initial_input
         step_outputs: list[dict[str, Any]] = []
+        # Each model version is resolved once per execution, however many steps use it.
+        models: dict[tuple[str, str | None], PromptModel | None] = {}
 
         for i, step in enumerate(chain_config.steps):
             self.logger.info(f"Executing step {i + 1}/{len(chain_config.steps)}: {step.name}")
+            step_record = StepRecord(step_index=i, model_name=step.name, input=None)
+            execution.steps.append(step_record)
+            timeline = Timeline(step_record.timeline, origin)
+            step_start = time.perf_counter()
+            try:
+                deadline.check(f"step {i + 1}/{len(chain_config.steps)}: {step.name}")
+                budget.check(execution, f"step {i + 1}/{len(chain_config.steps)}: {step.name}")
+
+                with timeline.phase("model_lookup"):
+                    model = self._resolve_model(step, models)
+
+                with timeline.phase("mapping"):
+                    step_input = self._map_input(current_output, step.input_mapping, step_outputs)
+                self.logger.debug(f"Step input after mapping: {step_input}")
+                step_record.input = step_input
+
+                validated_input = self._validate_input(model, step_input, timeline)
+                self.logger.debug(f"Validated input: {validated_input}")
+
+                if step.chunking is None:
+                    prompt_input = self._compact_input(model, step, validated_input, timeline)
+                    validated_output = self._execute_step_cached(
+                        model, step, prompt_input, deadline, budget, execution, timeline
+                    )
+                else:
+                    validated_output = self._execute_chunked_step(
+                        model,
+                        step,
+                        step.chunking,
+                        validated_input,
+                        deadline,
+                        budget,
+                        execution,
+                        models,
+                        timeline,
+                    )
+                self.logger.debug(f"Validated output: {validated_output}")
+                step_record.output = validated_output
+            except Exception as e:
+                step_record.error = str(e)
+                raise
+            finally:
+                step_record.latency_ms = (time.perf_counter() - step_start) * 1000
 
-            model = self.db_manager.get_prompt_model(step.name)
-            if not model:
-                self.logger.error(f"Model not found: {step.name}")
-                raise ValueError(f"Model not found: {step.name}")
+            step_outputs.append(validated_output)
+            current_output = {**current_output, **validated_output}
 
-            step_input = self._map_input(current_output, step.input_mapping, step_outputs)
-            self.logger.debug(f"Step input after mapping: {step_input}")
+        return self._map_input(current_output, chain_config.final_output_mapping, step_outputs)
 
-            validated_input = self._validate_input(model, step_input)
-            self.logger.debug(f"Validated input: {validated_input}")
+    def _resolve_model(
+        self, step: ChainStep, models: dict[tuple[str, str | None], PromptModel | None]
+    ) -> PromptModel:
+        """
+        Get the model version a step is pinned to, or the current version if it is not.
 
-            step_output = self._execute_step(model, validated_input)
-            self.logger.debug(f"Raw step output: {step_output}")
+        Raises:
+            ValueError: If the model or the pinned version is not found.
+        """
+        key = (step.name, step.model_version)
+        if key not in models:
+            models[key] = self.model_source.get_prompt_model(step.name, step.model_version)
+        model = models[key]
+        if not model:
+            if step.model_version:
+                self.logger.error(f"Model version not found: {step.name}@{step.model_version}")
+                raise ValueError(f"Model version not found: {step.name}@{step.model_version}")
+            self.logger.error(f"Model not found: {step.name}")
+            raise ValueError(f"Model not found: {step.name}")
+        return model
+
+    def _execute_chunked_step(
+        self,
+        model: PromptModel,
+        step: ChainStep,
+        config: ChunkingConfig,
+        input_data: dict[str, Any],
+        deadline: Deadline,
+        budget: Budget,
+        execution: ExecutionRecord,
+        models: dict[tuple[str, str | None], PromptModel | None],
+        timeline: Timeline,
+    ) -> dict[str, Any]:
+        """
+        Execute a step on chunks of a long input field in parallel, and merge the outputs.
 
-            validated_output = self._validate_output(model, step_output)
-            self.logger.debug(f"Validated output: {validated_output}")
+        The field named by the step's chunking settings is split by token budget. Each
+        chunk is sent with the rest of the input, and retried and repaired on its own like
+        any step. The outputs are merged field by field with the declared reducers, or by
+        calling the reduce model with all of them. An input that fits in one chunk is
+        executed as a normal step.
 
-            step_outputs.append(validated_output)
-            current_output = {**current_output, **validated_output}
+        Args:
+            model (PromptModel): The model to be executed.
+            step (ChainStep): The step being executed.
+            config (ChunkingConfig): The step's chunking settings.
+            input_data (dict[str, Any]): Validated input data for the model.
+            deadline (Deadline): The deadline of the chain execution.
+            budget (Budget): The token and cost budget of the chain execution.
+            execution (ExecutionRecord): The execution, whose last step is this one.
+            models (dict[tuple[str, str | None], PromptModel | None]): The models resolved
+                so far in the execution.
+            timeline (Timeline): The timeline of the step's phases.
+
+        Returns:
+            dict[str, Any]: The merged output, validated against the model's response schema.
 
-        final_output = self._map_input(
-            current_output, chain_config.final_output_mapping, step_outputs
+        Raises:
+            ValueError: If the field is not a string, or the merged output is invalid.
+        """
+        text = input_data.get(config.input_field)
+        if not isinstance(text, str):
+            raise ValueError(f"Chunked input field {config.input_field} is not a string")
+        chunks = split_text(text, config.chunk_tokens, config.overlap_tokens)
+
+        def run(chunk: str) -> dict[str, Any]:
+            prompt_input = self._compact_input(
+                model, step, {**input_data, config.input_field: chunk}, timeline
+            )
+            return self._execute_step_cached(
+                model, step, prompt_input, deadline, budget, execution, timeline
+            )
+
+        if len(chunks) == 1:
+            return run(text)
+        self.logger.info(f"Executing model {model.name} on {len(chunks)} chunks")
+        self.metrics.increment("chunking.chunks", len(chunks), model=model.name)
+        max_parallel = min(len(chunks), config.max_parallel or CHUNK_MAX_PARALLEL)
+        with ThreadPoolExecutor(max_parallel, thread_name_prefix="chunk") as pool:
+            futures = [pool.submit(run, chunk) for chunk in chunks]
+            try:
+                outputs = [future.result() for future in futures]
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        if config.reduce_model is None:
+            with timeline.phase("reduce"):
+                reduced = reduce_outputs(outputs, model.response, config.reducers)
+            return self._validate_output(model, reduced, timeline)
+        deadline.check(f"reducing step {step.name}")
+        budget.check(execution, f"reducing step {step.name}")
+        reduce_step = ChainStep(
+            name=config.reduce_model,
+            input_mapping={},
+            timeout_seconds=step.timeout_seconds,
+            max_repair_attempts=step.max_repair_attempts,
+            max_retries=step.max_retries,
         )
-        self.logger.info("Chain execution completed")
-        self.logger.debug(f"Final output: {final_output}")
+        with timeline.phase("model_lookup"):
+            reduce_model = self._resolve_model(reduce_step, models)
+        reduce_input = self._validate_input(reduce_model, {config.reduce_field: outputs}, timeline)
+        reduced = self._execute_step_cached(
+            reduce_model, reduce_step, reduce_input, deadline, budget, execution, timeline
+        )
+        return self._validate_output(model, reduced, timeline)
+
+    def _execute_step_cached(
+        self,
+        model: PromptModel,
+        step: ChainStep,
+        input_data: dict[str, Any],
+        deadline: Deadline,
+        budget: Budget,
+        execution: ExecutionRecord,
+        timeline: Timeline,
+    ) -> dict[str, Any]:
+        """
+        Execute a step, or serve the output of a near-duplicate input from the semantic cache.
+
+        On an audited hit, the step is executed anyway and the fresh output is served, and
+        counted as a false hit if it differs from the cached one. Outputs of executed steps
+        are cached, unless the step was an audited hit.
+        """
+        cache = self.semantic_cache
+        lookup = None
+        if cache is not None:
+            with timeline.phase("cache_lookup"):
+                lookup = cache.lookup(model, input_data)
+        if cache is None or lookup is None:
+            return self._execute_step_with_repair(
+                model, step, input_data, deadline, budget, execution, timeline
+            )
+        if lookup.output is not None and not lookup.audit:
+            self.logger.info(
+                f"Semantic cache hit for model {model.name} with similarity {lookup.similarity:.3f}"
+            )
+            self.metrics.increment("semantic_cache.calls_saved", model=model.name)
+            return dict(lookup.output)
+
+        output = self._execute_step_with_repair(
+            model, step, input_data, deadline, budget, execution, timeline
+        )
+        if lookup.output is None:
+            cache.store(model, lookup, output)
+        elif cache.audit(model, lookup, output):
+            self.logger.warning(
+                f"Semantic cache false hit for model {model.name} "
+                f"with similarity {lookup.similarity:.3f}"
+            )
+        return output
+
+    def _execute_step_with_repair(
+        self,
+        model: PromptModel,
+        step: ChainStep,
+        input_data: dict[str, Any],
+        deadline: Deadline,
+        budget: Budget,
+        execution: ExecutionRecord,
+        timeline: Timeline,
+    ) -> dict[str, Any]:
+        """
+        Execute a step and validate its output, asking the model to fix invalid responses.
+
+        When the response is not valid JSON or fails output validation, only this step is
+        re-sent, with the invalid response and the errors appended to the conversation.
+        This is repeated up to the step's max_repair_attempts while the deadline and
+        budget allow.
+
+        Args:
+            model (PromptModel): The model to be executed.
+            step (ChainStep): The step being executed.
+            input_data (dict[str, Any]): Validated input data for the model.
+            deadline (Deadline): The deadline of the chain execution.
+            budget (Budget): The token and cost budget of the chain execution.
+            execution (ExecutionRecord): The execution, whose last step is this one.
+            timeline (Timeline): The timeline of the step's phases.
+
+        Returns:
+            dict[str, Any]: Validated output data.
+
+        Raises:
+            ValueError: If the response is still invalid after the last repair attempt.
+            DeadlineExceededException: If the deadline passes during the step.
+            BudgetExceededException: If the budget is used up before a repair attempt.
+        """
+        max_repair_attempts = (
+            step.max_repair_attempts
+            if step.max_repair_attempts is not None
+            else self.max_repair_attempts
+        )
+        repair_messages: list[dict[str, str]] = []
+        prompt_tokens = estimate_prompt_tokens(self._build_messages(model, input_data))
+        error: ValueError
+        attempt = 0
+        while True:
+            call_tokens = prompt_tokens + estimate_message_tokens(repair_messages)
+            try:
+                step_output = self._execute_step_with_failover(
+                    model,
+                    step,
+                    input_data,
+                    deadline,
+                    repair_messages=repair_messages,
+                    step_record=execution.steps[-1],
+                    max_tokens=lambda backend: self._max_tokens(
+                        model, step, call_tokens, budget, execution, backend
+                    ),
+                    flow=execution.tenant_id or execution.chain_name,
+                    priority=execution.priority,
+                    timeline=timeline,
+                )
+            except InvalidResponseException as e:
+                content, error = e.content, e
+            except (TimeoutError, RequestException) as e:
+                if deadline.expired():
+                    self.logger.error(f"Deadline exceeded during step {step.name}: {str(e)}")
+                    raise DeadlineExceededException(
+                        f"Deadline exceeded during step {step.name}"
+                    ) from e
+                raise
+            else:
+                self.logger.debug(f"Raw step output: {step_output}")
+                try:
+                    validated_output = self._validate_output(model, step_output, timeline)
+                except ValueError as e:
+                    content, error = codec.dumps(step_output), e
+                else:
+                    if attempt:
+                        self.metrics.increment("repair.successes", model=model.name)
+                    return validated_output
+
+            if attempt >= max_repair_attempts or deadline.expired():
+                raise error
+            budget.check(execution, f"repairing step {step.name}")
+            attempt += 1
+            self.logger.warning(f"Asking model {model.name} to repair its response: {str(error)}")
+            self.metrics.increment("repair.attempts", model=model.name)
+            repair_messages = [
+                *repair_messages,
+                {"role": "assistant", "content": content},
+                {
+                    "role": "user",
+                    "content": REPAIR_PROMPT.format(
+                        error=str(error), schema=codec.dumps(model.response)
+                    ),
+                },
+            ]
+
+    def _execute_step_with_failover(
+        self,
+        model: PromptModel,
+        step: ChainStep,
+        input_data: dict[str, Any],
+        deadline: Deadline,
+        repair_messages: list[dict[str, str]],
+        step_record: StepRecord | None,
+        max_tokens: Callable[[str], int | None],
+        flow: str,
+        priority: str | None,
+        timeline: Timeline,
+    ) -> dict[str, Any]:
+        """
+        Execute a step on the best of its model's backends, failing over to the next best.
+
+        The backends are ranked by the provider's router, if it has one, or else tried in
+        their declared order. When a call fails because the backend is unhealthy, the call
+        is retried on the next backend, up to the step's max_retries while the deadline
+        allows. Each call gets the step's own timeout.
+
+        Args:
+            model (PromptModel): The model to be executed.
+            step (ChainStep): The step being executed.
+            input_data (dict[str, Any]): Validated input data for the model.
+            deadline (Deadline): The deadline of the chain execution.
+            repair_messages (list[dict[str, str]]): Earlier invalid responses and the
+                requests to fix them.
+            step_record (StepRecord | None): The record to add the token usage to.
+            max_tokens (Callable[[str], int | None]): Gives the completion token limit of
+                a call to a backend, which depends on the backend's prices.
+            flow (str): The flow the call is scheduled under, e.g. the tenant or chain.
+            priority (str | None): The priority class of the call.
+            timeline (Timeline): The timeline of the step's phases.
+
+        Returns:
+            dict[str, Any]: The output from the OpenAI API call.
 
-        return final_output
+        Raises:
+            InvalidResponseException: If the response is not a JSON object.
+            TimeoutError: If the call on the last backend tried timed out.
+            RequestException: If the call on the last backend tried failed.
+            BudgetExceededException: If the budget cannot cover a call to a backend.
+        """
+        max_retries = step.max_retries if step.max_retries is not None else self.max_retries
+        backends = model.backends or [OPENAI_MODEL]
+        router = self.provider.router
+        ranked = router.rank(backends) if router else list(dict.fromkeys(backends))
+        candidates = ranked[: max_retries + 1]
+
+        def call(backend: str) -> dict[str, Any]:
+            return self._execute_step(
+                model,
+                input_data,
+                timeout=deadline.timeout(step.timeout_seconds, action=f"calling {backend}"),
+                repair_messages=repair_messages,
+                step_record=step_record,
+                max_tokens=max_tokens(backend),
+                flow=flow,
+                priority=priority,
+                backend=backend,
+                timeline=timeline,
+            )
+
+        for backend, fallback in zip(candidates, candidates[1:]):
+            try:
+                return call(backend)
+            except (TimeoutError, RequestException) as e:
+                if deadline.expired() or not is_provider_failure(e):
+                    raise
+                self.logger.warning(
+                    f"Backend {backend} failed for model {model.name}, "
+                    f"failing over to {fallback}: {str(e)}"
+                )
+                self.metrics.increment("router.failovers", model=model.name, backend=backend)
+        return call(candidates[-1])
+
+    def _compact_input(
+        self,
+        model: PromptModel,
+        step: ChainStep,
+        input_data: dict[str, Any],
+        timeline: Timeline | None = None,
+    ) -> dict[str, Any]:
+        """
+        Apply the step's compaction settings to its validated input.
+
+        Args:
+            model (PromptModel): The model to be executed.
+            step (ChainStep): The step being executed.
+            input_data (dict[str, Any]): Validated input data for the model.
+            timeline (Timeline | None): The timeline of the step's phases.
+
+        Returns:
+            dict[str, Any]: The input to send to the model.
+        """
+        if step.compaction is None:
+            return input_data
+        with (timeline or Timeline()).phase("compaction"):
+            compacted = compact(input_data, step.compaction)
+        tokens_before, tokens_after = count_tokens(input_data), count_tokens(compacted)
+        self.logger.debug(
+            f"Compacted input for model {model.name} from {tokens_before} to {tokens_after} tokens"
+        )
+        self.metrics.increment("compaction.tokens_before", tokens_before, model=model.name)
+        self.metrics.increment("compaction.tokens_after", tokens_after, model=model.name)
+        return compacted
+
+    def _max_tokens(
+        self,
+        model: PromptModel,
+        step: ChainStep,
+        prompt_tokens: int,
+        budget: Budget,
+        execution: ExecutionRecord,
+        backend: str,
+    ) -> int | None:
+        """
+        Work out the completion token limit of a step's next LLM call.
+
+        The limit is the step's max_tokens, or else, with MAX_TOKENS_AUTO, an estimate from
+        the model's response schema, further capped by what is left of the budget. A limit
+        is never above what the backend can generate, see MODEL_MAX_OUTPUT_TOKENS. Without
+        any of these limits, none is sent and the provider's default applies.
+
+        Args:
+            model (PromptModel): The model to be executed.
+            step (ChainStep): The step being executed.
+            prompt_tokens (int): The estimated prompt tokens of the call.
+            budget (Budget): The token and cost budget of the chain execution.
+            execution (ExecutionRecord): The execution the call is made for.
+            backend (str): The provider model the call is sent to.
+
+        Returns:
+            int | None: The limit, or None to leave it to the provider.
+
+        Raises:
+            BudgetExceededException: If the budget cannot cover the prompt, or has a cost
+                limit and the backend has no price.
+        """
+        limits: list[int | None] = [step.max_tokens]
+        if step.max_tokens is None and MAX_TOKENS_AUTO:
+            limits.append(
+                estimate_completion_tokens(
+                    model.response,
+                    step.response_length_hints,
+                    default_str_tokens=MAX_TOKENS_DEFAULT_STR_TOKENS,
+                    default_list_length=MAX_TOKENS_DEFAULT_LIST_LENGTH,
+                    margin=MAX_TOKENS_MARGIN,
+                )
+            )
+        limits.append(
+            budget.completion_tokens_left(execution, prompt_tokens, f"step {step.name}", backend)
+        )
+        limit = min((limit for limit in limits if limit is not None), default=None)
+        if limit is None:
+            return None
+        return min(limit, MODEL_MAX_OUTPUT_TOKENS.get(backend, MAX_OUTPUT_TOKENS_DEFAULT))
 
     def _map_input(
         self, data: dict[str, Any], mapping: dict[str, str], step_outputs: list[dict[str, Any]]
@@ -109,13 +761,16 @@ class ChainExecutor:
         self.logger.debug(f"Mapped input result: {result}")
         return result
 
-    def _validate_input(self, model: PromptModel, input_data: dict[str, Any]) -> dict[str, Any]:
+    def _validate_input(
+        self, model: PromptModel, input_data: dict[str, Any], timeline: Timeline | None = None
+    ) -> dict[str, Any]:
         """
         Validate input data against the model's input schema.
 
         Args:
             model (PromptModel): The model whose input schema will be used for validation.
             input_data (dict[str, Any]): Input data to be validated.
+            timeline (Timeline | None): The timeline of the step's phases.
 
         Returns:
             dict[str, Any]: Validated input data.
@@ -124,69 +779,209 @@ class ChainExecutor:
             ValueError: If input validation fails.
         """
         self.logger.debug(f"Validating input for model: {model.name}")
-        input_model = DynamicModel.create_from_schema(
-            model.user_prompt, model_name=f"{model.name}_Input"
-        )
+        timeline = timeline or Timeline()
+        with timeline.phase("validator_build"):
+            validate = validator_cache.get(model.user_prompt, model_name=f"{model.name}_Input")
         try:
-            validated_data = input_model(**input_data)
-            return validated_data.model_dump()
-        except ValidationError as e:
+            with timeline.phase("input_validation"):
+                return validate(input_data)
+        except ValueError as e:
             self.logger.error(f"Input validation failed for model {model.name}: {str(e)}")
             raise ValueError(f"Input validation failed for model {model.name}: {str(e)}")
 
-    def _validate_output(self, model: PromptModel, output_data: dict[str, Any]) -> dict[str, Any]:
+    def _validate_output(
+        self, model: PromptModel, output_data: dict[str, Any], timeline: Timeline | None = None
+    ) -> dict[str, Any]:
         """
         Validate output data against the model's output schema.
 
         Args:
             model (PromptModel): The model whose output schema will be used for validation.
             output_data (dict[str, Any]): Output data to be validated.
+            timeline (Timeline | None): The timeline of the step's phases.
 
         Returns:
             dict[str, Any]: Validated output data.
 
         Raises:
-            ValueError: If output validation fails.
+            OutputValidationException: If output validation fails.
         """
         self.logger.debug(f"Validating output for model: {model.name}")
-        output_model = DynamicModel.create_from_schema(
-            model.response, model_name=f"{model.name}_Output"
-        )
+        timeline = timeline or Timeline()
+        with timeline.phase("validator_build"):
+            validate = validator_cache.get(model.response, model_name=f"{model.name}_Output")
         try:
-            validated_data = output_model(**output_data)
-            return validated_data.model_dump()
-        except ValidationError as e:
+            with timeline.phase("output_validation"):
+                return validate(output_data)
+        except ValueError as e:
             self.logger.error(f"Output validation failed for model {model.name}: {str(e)}")
-            raise ValueError(f"Output validation failed for model {model.name}: {str(e)}")
-
-    def _execute_step(self, model: PromptModel, input_data: dict[str, Any]) -> dict[str, Any]:
+            raise OutputValidationException(
+                f"Output validation failed for model {model.name}: {str(e)}"
+            )
+
+    def _execute_step(
+        self,
+        model: PromptModel,
+        input_data: dict[str, Any],
+        timeout: float | None = None,
+        repair_messages: list[dict[str, str]] | None = None,
+        step_record: StepRecord | None = None,
+        max_tokens: int | None = None,
+        flow: str = "default",
+        priority: str | None = None,
+        backend: str = OPENAI_MODEL,
+        timeline: Timeline | None = None,
+    ) -> dict[str, Any]:
         """
         Execute a single step in the chain by calling the OpenAI API.
 
+        If a hedger is configured, slow calls are hedged, and a response that is not valid
+        JSON counts as a failed attempt. The token usage of every response, including
+        hedges and invalid responses, is added to the step record.
+
         Args:
             model (PromptModel): The model to be executed.
             input_data (dict[str, Any]): Validated input data for the model.
+            timeout (float | None): The maximum time to wait for the OpenAI API call.
+            repair_messages (list[dict[str, str]] | None): Earlier invalid responses and
+                the requests to fix them, appended after the user message.
+            step_record (StepRecord | None): The record to add the token usage to.
+            max_tokens (int | None): The completion token limit of the call.
+            flow (str): The flow the call is scheduled under, e.g. the tenant or chain.
+            priority (str | None): The priority class of the call.
+            backend (str): The provider model to send the call to.
+            timeline (Timeline | None): The timeline of the step's phases.
 
         Returns:
             dict[str, Any]: The output from the OpenAI API call.
+
+        Raises:
+            InvalidResponseException: If the response is not a JSON object.
         """
-        self.logger.info(f"Executing step with model: {model.name}")
-        headers = {
-            "Authorization": f"Bearer {self._openai_api_key}",
-            "Content-Type": "application/json",
-        }
-        data = {
-            "model": "gpt-3.5-turbo",
-            "messages": [
-                {"role": "system", "content": model.system_prompt},
-                {"role": "user", "content": json.dumps(input_data)},
-            ],
+        self.logger.info(f"Executing step with model: {model.name} on backend: {backend}")
+        data: dict[str, Any] = {
+            "model": backend,
+            "messages": [*self._build_messages(model, input_data), *(repair_messages or [])],
         }
+        if max_tokens is not None:
+            data["max_tokens"] = max_tokens
+        step_timeline = timeline or Timeline()
+
+        def request() -> dict[str, Any]:
+            self.logger.debug(f"Sending request to OpenAI API for model: {model.name}")
+            with step_timeline.phase("provider_call"):
+                response = self.provider.chat(data, timeout=timeout, flow=flow, priority=priority)
+            self.logger.debug(f"Received response from OpenAI API for model: {model.name}")
+            self._record_usage(model, step_record, response.get("usage"), backend)
+            content = response["choices"][0]["message"]["content"]
+            with step_timeline.phase("parsing"):
+                return self._parse_content(model, content)
+
+        if self.hedger:
+            return self.hedger.call(model.name, request, timeout=timeout)
+        return request()
+
+    @staticmethod
+    def _build_messages(model: PromptModel, input_data: dict[str, Any]) -> list[dict[str, str]]:
+        return [
+            {"role": "system", "content": model.system_prompt},
+            {"role": "user", "content": codec.dumps(input_data)},
+        ]
+
+    def _record_usage(
+        self,
+        model: PromptModel,
+        step_record: StepRecord | None,
+        usage: dict[str, Any] | None,
+        backend: str = OPENAI_MODEL,
+    ) -> None:
+        if not usage:
+            return
+        prompt_tokens = int(usage.get("prompt_tokens", 0))
+        completion_tokens = int(usage.get("completion_tokens", 0))
+        prices = MODEL_PRICES.get(backend, {})
+        cost = (
+            prompt_tokens * prices.get("prompt", 0.0)
+            + completion_tokens * prices.get("completion", 0.0)
+        ) / 1000
+        self.metrics.increment("tokens.prompt", prompt_tokens, model=model.name)
+        self.metrics.increment("tokens.completion", completion_tokens, model=model.name)
+        self.metrics.increment("cost.usd", cost, model=model.name)
+        if step_record is None:
+            return
+        with self._usage_lock:
+            step_record.prompt_tokens = (step_record.prompt_tokens or 0) + prompt_tokens
+            step_record.completion_tokens = (step_record.completion_tokens or 0) + completion_tokens
+            step_record.cost_usd = (step_record.cost_usd or 0.0) + cost
+
+    def _total_usage(self, execution: ExecutionRecord) -> None:
+        steps = [step for step in execution.steps if step.prompt_tokens is not None]
+        if not steps:
+            return
+        with self._usage_lock:
+            execution.prompt_tokens = sum(step.prompt_tokens or 0 for step in steps)
+            execution.completion_tokens = sum(step.completion_tokens or 0 for step in steps)
+            execution.cost_usd = sum(step.cost_usd or 0.0 for step in steps)
+        chain_name = execution.chain_name
+        self.metrics.increment("tokens.prompt", execution.prompt_tokens, chain=chain_name)
+        self.metrics.increment("tokens.completion", execution.completion_tokens, chain=chain_name)
+        self.metrics.increment("cost.usd", execution.cost_usd, chain=chain_name)
+
+    def _parse_content(self, model: PromptModel, content: str) -> dict[str, Any]:
+        """
+        Parse the message content of a response as a JSON object.
 
-        self.logger.debug(f"Sending request to OpenAI API for model: {model.name}")
-        response = self.web_client.post(
-            "https://api.openai.com/v1/chat/completions", headers=headers, json=data
-        )
-        self.logger.debug(f"Received response from OpenAI API for model: {model.name}")
+        Content that is not valid JSON is fixed locally where possible, by taking the JSON
+        out of a markdown code fence or any text surrounding the outermost braces.
+
+        Args:
+            model (PromptModel): The model that produced the response.
+            content (str): The message content.
+
+        Returns:
+            dict[str, Any]: The parsed JSON object.
 
-        return cast(dict[str, Any], json.loads(response["choices"][0]["message"]["content"]))
+        Raises:
+            InvalidResponseException: If the content does not contain a JSON object.
+        """
+        try:
+            parsed = codec.loads(content)
+        except ValueError as e:
+            parsed = self._extract_json(content)
+            if parsed is None:
+                raise InvalidResponseException(
+                    f"Response is not valid JSON: {str(e)}", content
+                ) from e
+            self.logger.info(f"Extracted JSON from the response of model {model.name}")
+            self.metrics.increment("repair.local_fixes", model=model.name)
+        if not isinstance(parsed, dict):
+            raise InvalidResponseException("Response is not a JSON object", content)
+        return parsed
+
+    @staticmethod
+    def _extract_json(content: str) -> Any:
+        candidates = [match.group(1) for match in CODE_FENCE_PATTERN.finditer(content)]
+        start, end = content.find("{"), content.rfind("}")
+        if 0 <= start < end:
+            candidates.append(content[start : end + 1])
+        for candidate in candidates:
+            try:
+                return codec.loads(candidate)
+            except ValueError:
+                continue
+        return None
+
+    def precompile(self, chain_config: ChainConfig) -> None:
+        """
+        Compile the input and output validators of every step in a chain ahead of time.
+
+        Args:
+            chain_config (ChainConfig): The chain whose validators should be compiled.
+        """
+        for step in chain_config.steps:
+            model = self.model_source.get_prompt_model(step.name, step.model_version)
+            if not model:
+                self.logger.warning(f"Skipping precompile of missing model: {step.name}")
+                continue
+            validator_cache.get(model.user_prompt, model_name=f"{model.name}_Input")
+            validator_cache.get(model.response, model_name=f"{model.name}_Output")
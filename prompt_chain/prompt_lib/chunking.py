@@ -0,0 +1,124 @@
+from collections import Counter
+from collections.abc import Callable, Mapping
+from typing import Any
+
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.token_estimator import TOKEN_PATTERN, token_count
+
+# How the outputs of a chunked step are merged, field by field.
+REDUCERS: dict[str, Callable[[list[Any]], Any]] = {
+    "concat": lambda values: _concat(values),
+    "unique": lambda values: list({codec.dumps(item): item for item in _concat(values)}.values()),
+    "sum": sum,
+    "mean": lambda values: sum(values) / len(values),
+    "min": min,
+    "max": max,
+    "any": any,
+    "all": all,
+    "first": lambda values: values[0],
+    "last": lambda values: values[-1],
+    "vote": lambda values: _vote(values),
+}
+# The schema types each reducer can merge.
+REDUCER_TYPES = {
+    "concat": {"str", "list"},
+    "unique": {"list"},
+    "sum": {"int", "float"},
+    "mean": {"float"},
+    "min": {"int", "float", "str"},
+    "max": {"int", "float", "str"},
+    "any": {"bool"},
+    "all": {"bool"},
+}
+
+
+def split_text(text: str, chunk_tokens: int, overlap_tokens: int = 0) -> list[str]:
+    """
+    Split a text into chunks of about `chunk_tokens` tokens, cut between tokens.
+
+    Each chunk after the first starts with the last `overlap_tokens` tokens of the one
+    before it, so that a sentence cut at a chunk boundary is seen whole by one of them.
+    A single token longer than a chunk gets a chunk of its own.
+
+    Args:
+        text (str): The text.
+        chunk_tokens (int): The most tokens in a chunk.
+        overlap_tokens (int): The tokens each chunk repeats from the previous one.
+
+    Returns:
+        list[str]: The chunks, or just the text if it fits in one chunk.
+
+    Raises:
+        ValueError: If the overlap is not smaller than the chunks.
+    """
+    if overlap_tokens >= chunk_tokens:
+        raise ValueError(
+            f"Chunk overlap of {overlap_tokens} tokens must be less than {chunk_tokens}"
+        )
+    pieces = [
+        (match.start(), match.end(), token_count(match.group()))
+        for match in TOKEN_PATTERN.finditer(text)
+    ]
+    if sum(count for _, _, count in pieces) <= chunk_tokens:
+        return [text]
+
+    chunks = []
+    start = 0
+    while True:
+        end, tokens = start, 0
+        while end < len(pieces) and (end == start or tokens + pieces[end][2] <= chunk_tokens):
+            tokens += pieces[end][2]
+            end += 1
+        chunks.append(text[pieces[start][0] : pieces[end - 1][1]])
+        if end == len(pieces):
+            return chunks
+        # Step back over the overlap, always moving forward at least one piece.
+        next_start, overlap = end, 0
+        while next_start - 1 > start and overlap + pieces[next_start - 1][2] <= overlap_tokens:
+            next_start -= 1
+            overlap += pieces[next_start][2]
+        start = next_start
+
+
+def default_reducer(field_type: Any) -> str:
+    """The reducer of a response field that does not declare one."""
+    if isinstance(field_type, list) or field_type == "str":
+        return "concat"
+    if field_type == "bool":
+        return "any"
+    return "first"
+
+
+def reduce_outputs(
+    outputs: list[dict[str, Any]], schema: dict[str, Any], reducers: Mapping[str, str]
+) -> dict[str, Any]:
+    """
+    Merge the outputs of a step run on each chunk of its input into one output.
+
+    Args:
+        outputs (list[dict[str, Any]]): The validated outputs, in chunk order.
+        schema (dict[str, Any]): The response schema of the step's model.
+        reducers (Mapping[str, str]): The reducer of each field, by name. Other fields use
+            `default_reducer`.
+
+    Returns:
+        dict[str, Any]: The merged output.
+    """
+    return {
+        name: REDUCERS[reducers.get(name) or default_reducer(field_type)](
+            [output[name] for output in outputs]
+        )
+        for name, field_type in schema.items()
+    }
+
+
+def _concat(values: list[Any]) -> Any:
+    if all(isinstance(value, str) for value in values):
+        return "\n".join(values)
+    return [item for value in values for item in value]
+
+
+def _vote(values: list[Any]) -> Any:
+    """The most common value, the earliest of those tied."""
+    counts = Counter(codec.dumps(value) for value in values)
+    return max(values, key=lambda value: counts[codec.dumps(value)])
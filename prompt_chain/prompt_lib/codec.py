@@ -0,0 +1,85 @@
+import json
+from typing import Any, Protocol
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the installed extras
+    orjson = None  # type: ignore[assignment, unused-ignore]
+
+from prompt_chain.config import JSON_CODEC
+
+
+class JSONCodec(Protocol):
+    name: str
+
+    def dumps(self, obj: Any) -> bytes: ...
+
+    def loads(self, data: str | bytes) -> Any: ...
+
+
+class StdlibCodec:
+    """Compact JSON encoding with the standard library."""
+
+    name = "json"
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: str | bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """JSON encoding with orjson, installed with the `fast` extra."""
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise ImportError("orjson is not installed, install prompt-chain[fast] to use it")
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+
+def get_codec(name: str = "auto") -> JSONCodec:
+    """
+    Get a JSON codec by name.
+
+    Args:
+        name (str): "json", "orjson", or "auto" to use orjson when it is installed.
+
+    Returns:
+        JSONCodec: The codec.
+
+    Raises:
+        ValueError: If the codec name is unknown.
+    """
+    if name == "auto":
+        return OrjsonCodec() if orjson is not None else StdlibCodec()
+    if name == "orjson":
+        return OrjsonCodec()
+    if name == "json":
+        return StdlibCodec()
+    raise ValueError(f"Unknown JSON codec: {name}")
+
+
+codec = get_codec(JSON_CODEC)
+
+
+def dumps(obj: Any) -> str:
+    """Serialize an object to a compact JSON string with the configured codec."""
+    return codec.dumps(obj).decode("utf-8")
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Serialize an object to compact UTF-8 encoded JSON with the configured codec."""
+    return codec.dumps(obj)
+
+
+def loads(data: str | bytes) -> Any:
+    """Parse JSON with the configured codec."""
+    return codec.loads(data)
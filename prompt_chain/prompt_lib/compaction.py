@@ -0,0 +1,85 @@
+from typing import Any
+
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.models import CompactionConfig
+from prompt_chain.prompt_lib.token_estimator import TOKEN_PATTERN, estimate_tokens, token_count
+
+ELLIPSIS = "…"
+
+
+def compact(data: dict[str, Any], config: CompactionConfig) -> dict[str, Any]:
+    """
+    Compact a step's input before it is sent to the LLM.
+
+    Fields listed in `config.exclude` are dropped and strings longer than their limit in
+    `config.max_field_tokens` are truncated. Fields are addressed by dotted path, with
+    "[]" for the items of a list, e.g. "article.body" or "comments[]".
+
+    Args:
+        data (dict[str, Any]): The validated step input.
+        config (CompactionConfig): The step's compaction settings.
+
+    Returns:
+        dict[str, Any]: The compacted input. The original input is not modified.
+    """
+    return _compact(data, "", config)  # type: ignore[no-any-return]
+
+
+def count_tokens(data: Any) -> int:
+    """Estimate the tokens of a value once encoded as compact JSON."""
+    return estimate_tokens(codec.dumps(data))
+
+
+def truncate(text: str, max_tokens: int, strategy: str = "head") -> str:
+    """
+    Truncate a text to about `max_tokens` tokens.
+
+    Args:
+        text (str): The text.
+        max_tokens (int): The maximum number of tokens to keep.
+        strategy (str): "head" to keep the start of the text, or "middle" to keep its
+            start and end and cut out the middle.
+
+    Returns:
+        str: The text, with an ellipsis marking where it was cut if it was too long.
+    """
+    if _fitting_length(text, max_tokens) is None:
+        return text
+    # The ellipsis takes a token of its own.
+    if strategy == "middle":
+        head_tokens = (max_tokens - 1) // 2
+        head = _fitting_length(text, head_tokens) or 0
+        tail = _fitting_length(text[::-1], max_tokens - 1 - head_tokens) or 0
+        return f"{text[:head]}{ELLIPSIS}{text[len(text) - tail :]}"
+    return f"{text[: _fitting_length(text, max_tokens - 1)]}{ELLIPSIS}"
+
+
+def _fitting_length(text: str, max_tokens: int) -> int | None:
+    """
+    Get the length of the longest prefix of a text, ending between tokens, that fits in
+    `max_tokens`, or None if the whole text fits. Only the prefix is scanned.
+    """
+    tokens = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        tokens += token_count(match.group())
+        if tokens > max_tokens:
+            return match.start()
+    return None
+
+
+def _compact(value: Any, path: str, config: CompactionConfig) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: _compact(item, _join(path, key), config)
+            for key, item in value.items()
+            if _join(path, key) not in config.exclude
+        }
+    if isinstance(value, (list, tuple)):
+        return [_compact(item, f"{path}[]", config) for item in value]
+    if isinstance(value, str) and path in config.max_field_tokens:
+        return truncate(value, config.max_field_tokens[path], config.truncation)
+    return value
+
+
+def _join(path: str, key: str) -> str:
+    return f"{path}.{key}" if path else key
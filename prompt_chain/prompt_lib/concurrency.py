@@ -0,0 +1,103 @@
+import math
+import threading
+
+from prompt_chain.prompt_lib.metrics import Metrics
+
+# Weights of the latest latency in the long-term baseline and in the recent average.
+BASELINE_SMOOTHING = 0.05
+RECENT_SMOOTHING = 0.3
+
+
+class AIMDLimiter:
+    """
+    Adapts the number of concurrent provider calls with additive increase, multiplicative
+    decrease.
+
+    Each healthy call grows the limit by `increase / limit`, i.e. by `increase` for every
+    window of calls. A call that was rate limited or timed out, or recent latency rising
+    above `latency_tolerance` times its long-term baseline, cuts the limit by `backoff`.
+    Calls started before a cut cannot cause another one, so a burst of failures from the
+    same overload only backs off once.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 16,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        increase: float = 1.0,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+        min_samples: int = 20,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.min_samples = min_samples
+        self.metrics = metrics or Metrics()
+        self._limit = min(max_limit, max(min_limit, initial_limit))
+        self._epoch = 0
+        self._samples = 0
+        self._baseline: float | None = None
+        self._recent: float | None = None
+        self._lock = threading.Lock()
+        self.metrics.set_gauge("provider.concurrency_limit", self.limit)
+
+    @property
+    def limit(self) -> int:
+        """The current number of concurrent calls allowed."""
+        return max(self.min_limit, math.floor(self._limit))
+
+    @property
+    def epoch(self) -> int:
+        """Incremented on every cut. Pass it back with the outcome of a call."""
+        return self._epoch
+
+    def on_success(self, latency: float, epoch: int) -> None:
+        """
+        Record a successful call.
+
+        Args:
+            latency (float): The call's latency in seconds.
+            epoch (int): The limiter's epoch when the call started.
+        """
+        with self._lock:
+            self._samples += 1
+            self._recent = _smooth(self._recent, latency, RECENT_SMOOTHING)
+            self._baseline = _smooth(self._baseline, latency, BASELINE_SMOOTHING)
+            if (
+                self._samples >= self.min_samples
+                and self._recent > self.latency_tolerance * self._baseline
+            ):
+                self._decrease(epoch, "latency")
+                return
+            self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+            self.metrics.set_gauge("provider.concurrency_limit", self.limit)
+
+    def on_overload(self, epoch: int, reason: str) -> None:
+        """
+        Record a call that failed because the provider is overloaded.
+
+        Args:
+            epoch (int): The limiter's epoch when the call started.
+            reason (str): Why, e.g. "rate_limited" or "timeout", used as a metric label.
+        """
+        with self._lock:
+            self._decrease(epoch, reason)
+
+    def _decrease(self, epoch: int, reason: str) -> None:
+        if epoch != self._epoch or self._limit <= self.min_limit:
+            return
+        self._epoch += 1
+        self._limit = max(self.min_limit, self._limit * self.backoff)
+        # Latency should be judged afresh at the new limit.
+        self._recent = self._baseline
+        self.metrics.increment("provider.limit_decreases", reason=reason)
+        self.metrics.set_gauge("provider.concurrency_limit", self.limit)
+
+
+def _smooth(average: float | None, value: float, weight: float) -> float:
+    return value if average is None else weight * value + (1 - weight) * average
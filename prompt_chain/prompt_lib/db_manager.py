@@ -1,31 +1,109 @@
+import hashlib
 import json
 import logging
+import threading
 from contextlib import contextmanager
-from typing import Any, Generator
+from typing import Any, Generator, Iterator
 
 from pydantic import ValidationError
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert, inspect, select, text, update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session, sessionmaker
 
 from prompt_chain.prompt_lib.exceptions import DatabaseManagerException
-from prompt_chain.prompt_lib.models import (
+from prompt_chain.prompt_lib.models import ChainConfig, ModelInput, PromptModel
+from prompt_chain.prompt_lib.tables import (
     Base,
-    ChainConfig,
     ChainConfigTable,
-    DynamicModel,
-    PromptModel,
     PromptModelTable,
+    PromptModelVersionTable,
 )
+from prompt_chain.prompt_lib.validators import validator_cache
 
 LOGGER = logging.getLogger(__name__)
 
+# How many names are looked up per query when importing, to stay within parameter limits.
+BULK_LOOKUP_BATCH_SIZE = 500
+
+
+def model_hash(
+    system_prompt: str,
+    user_prompt: dict[str, Any],
+    response: dict[str, Any],
+    backends: list[str] | None = None,
+) -> str:
+    """Hash the content of a prompt model, which identifies its version."""
+    payload = json.dumps(
+        [system_prompt, user_prompt, response, backends or []],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 
 class DatabaseManager:
     def __init__(self, db_url: str):
         self.engine = create_engine(db_url)
         Base.metadata.create_all(self.engine)
         self.session = sessionmaker(bind=self.engine)
+        self._migrate()
+        # Versions never change, so they are cached for as long as the process runs.
+        self._versions: dict[tuple[str, str], PromptModel] = {}
+        self._versions_lock = threading.Lock()
+
+    def _migrate(self) -> None:
+        """
+        Bring tables created by an older release up to date.
+
+        `create_all` only creates missing tables, so columns added to existing tables are
+        added here, all of them nullable or with a default. Models that predate versioning
+        get their content hash and become version 1.
+        """
+        existing = inspect(self.engine)
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                if not existing.has_table(table.name):
+                    continue
+                present = {column["name"] for column in existing.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in present:
+                        continue
+                    LOGGER.info(f"Adding column {table.name}.{column.name}")
+                    quote = self.engine.dialect.identifier_preparer.quote
+                    column_type = column.type.compile(dialect=self.engine.dialect)
+                    connection.execute(
+                        text(
+                            f"ALTER TABLE {quote(table.name)} "
+                            f"ADD COLUMN {quote(column.name)} {column_type}"
+                        )
+                    )
+        with self.session_scope() as session:
+            models = session.scalars(
+                select(PromptModelTable).where(PromptModelTable.hash.is_(None))
+            ).all()
+            for model in models:
+                model.version = model.version or 1
+                model.hash = model_hash(
+                    model.system_prompt, model.user_prompt, model.response, model.backends
+                )
+                if self._model_versions(session, [model.name]).get(model.name):
+                    continue
+                session.add(
+                    PromptModelVersionTable(
+                        model_name=model.name,
+                        version=model.version,
+                        hash=model.hash,
+                        system_prompt=model.system_prompt,
+                        user_prompt=model.user_prompt,
+                        response=model.response,
+                        backends=model.backends,
+                    )
+                )
+
+    def warm_up(self) -> None:
+        """Open a pooled connection so the first request does not pay for connecting."""
+        with self.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
 
     @contextmanager
     def session_scope(self) -> Generator[Session, None, None]:
@@ -46,34 +124,138 @@ class DatabaseManager:
         system_prompt: str,
         user_prompt_schema: dict[str, Any],
         response_schema: dict[str, Any],
+        backends: list[str] | None = None,
     ) -> bool:
+        content: dict[str, Any] = {
+            "system_prompt": system_prompt,
+            "user_prompt": user_prompt_schema,
+            "response": response_schema,
+            "backends": backends or None,
+        }
+        version_hash = model_hash(**content)
         with self.session_scope() as session:
-            prompt_model = PromptModelTable(
-                name=name,
-                system_prompt=system_prompt,
-                user_prompt=user_prompt_schema,
-                response=response_schema,
+            session.add(PromptModelTable(name=name, version=1, hash=version_hash, **content))
+            session.add(
+                PromptModelVersionTable(model_name=name, version=1, hash=version_hash, **content)
             )
-            session.add(prompt_model)
         return True
 
+    def update_prompt_model(
+        self,
+        name: str,
+        system_prompt: str | None = None,
+        user_prompt_schema: dict[str, Any] | None = None,
+        response_schema: dict[str, Any] | None = None,
+        backends: list[str] | None = None,
+    ) -> PromptModel:
+        """
+        Update a prompt model, creating a new immutable version if its content changed.
+
+        Versions are identified by the hash of their content, so an update back to the
+        content of an earlier version makes that version current again.
+
+        Args:
+            name (str): The name of the model.
+            system_prompt (str | None): The new system prompt, or None to keep it.
+            user_prompt_schema (dict[str, Any] | None): The new input schema, or None.
+            response_schema (dict[str, Any] | None): The new response schema, or None.
+            backends (list[str] | None): The new backends, or None to keep them.
+
+        Returns:
+            PromptModel: The model at its current version.
+
+        Raises:
+            ValueError: If there is no model with the name.
+            DatabaseManagerException: If writing to the database fails.
+        """
+        with self.session_scope() as session:
+            model = session.scalar(select(PromptModelTable).where(PromptModelTable.name == name))
+            if model is None:
+                raise ValueError(f"No model found with name: {name}")
+            content: dict[str, Any] = {
+                "system_prompt": model.system_prompt if system_prompt is None else system_prompt,
+                "user_prompt": model.user_prompt
+                if user_prompt_schema is None
+                else user_prompt_schema,
+                "response": model.response if response_schema is None else response_schema,
+                "backends": (model.backends if backends is None else backends) or None,
+            }
+            version_hash = model_hash(**content)
+            if version_hash != model.hash:
+                versions = self._model_versions(session, [name]).get(name, {})
+                version = versions.get(version_hash)
+                if version is None:
+                    version = max(versions.values(), default=0) + 1
+                    session.add(
+                        PromptModelVersionTable(
+                            model_name=name, version=version, hash=version_hash, **content
+                        )
+                    )
+                for key, value in content.items():
+                    setattr(model, key, value)
+                model.version = version
+                model.hash = version_hash
+                session.flush()
+            return self.convert_to_dict(model)
+
     def get_all_models(self) -> list[str]:
         with self.session_scope() as session:
             models = session.query(PromptModelTable).all()
             models_dict = [self.convert_to_dict(model) for model in models]
             return [model.name for model in models_dict]
 
-    def get_prompt_model(self, model_name: str) -> PromptModel | None:
+    def get_prompt_model(self, model_name: str, version: str | None = None) -> PromptModel | None:
+        """
+        Get a prompt model at its current version, or at the version with the given hash.
+        """
+        if version is not None:
+            return self._get_prompt_model_version(model_name, version)
         with self.session_scope() as session:
             model = (
                 session.query(PromptModelTable).filter(PromptModelTable.name == model_name).first()
             )
             return self.convert_to_dict(model) if model else None
 
+    def _get_prompt_model_version(self, model_name: str, version: str) -> PromptModel | None:
+        with self._versions_lock:
+            cached = self._versions.get((model_name, version))
+        if cached is not None:
+            return cached
+        with self.session_scope() as session:
+            row = session.execute(
+                select(PromptModelVersionTable, PromptModelTable.id)
+                .join(PromptModelTable, PromptModelTable.name == PromptModelVersionTable.model_name)
+                .where(
+                    PromptModelVersionTable.model_name == model_name,
+                    PromptModelVersionTable.hash == version,
+                )
+            ).first()
+            model = self.convert_version_to_dict(*row) if row else None
+        if model is None:
+            # Models created before versioning only have their current version.
+            current = self.get_prompt_model(model_name)
+            return current if current and current.hash == version else None
+        with self._versions_lock:
+            self._versions[(model_name, version)] = model
+        return model
+
+    def get_prompt_model_versions(self, model_name: str) -> list[PromptModel]:
+        """Get every version of a prompt model, oldest first."""
+        with self.session_scope() as session:
+            rows = session.execute(
+                select(PromptModelVersionTable, PromptModelTable.id)
+                .join(PromptModelTable, PromptModelTable.name == PromptModelVersionTable.model_name)
+                .where(PromptModelVersionTable.model_name == model_name)
+                .order_by(PromptModelVersionTable.version)
+            ).all()
+            return [self.convert_version_to_dict(*row) for row in rows]
+
     def add_chain_config(self, chain_config: ChainConfig) -> bool:
+        """Store a chain config, pinning each step to its model's current version."""
         with self.session_scope() as session:
+            hashes = self._current_hashes(session, [step.name for step in chain_config.steps])
             config_entry = ChainConfigTable(
-                name=chain_config.name, config=chain_config.model_dump()
+                name=chain_config.name, config=self._pin_versions(chain_config, hashes).model_dump()
             )
             session.add(config_entry)
         return True
@@ -88,13 +270,186 @@ class DatabaseManager:
             configs = session.query(ChainConfigTable).all()
             return [config.name for config in configs]
 
+    def iter_prompt_models(self, batch_size: int = 500) -> Iterator[PromptModel]:
+        """Iterate over every prompt model, fetching them from the database in batches."""
+        with self.session_scope() as session:
+            rows = session.scalars(
+                select(PromptModelTable)
+                .order_by(PromptModelTable.id)
+                .execution_options(yield_per=batch_size)
+            )
+            for row in rows:
+                yield self.convert_to_dict(row)
+
+    def iter_chain_configs(self, batch_size: int = 500) -> Iterator[ChainConfig]:
+        """Iterate over every chain config, fetching them from the database in batches."""
+        with self.session_scope() as session:
+            rows = session.scalars(
+                select(ChainConfigTable)
+                .order_by(ChainConfigTable.id)
+                .execution_options(yield_per=batch_size)
+            )
+            for row in rows:
+                yield ChainConfig(**row.config)
+
+    def import_catalog(
+        self, models: list[ModelInput], chains: list[ChainConfig]
+    ) -> dict[str, dict[str, int]]:
+        """
+        Insert or update prompt models and chain configs by name, in a single transaction.
+
+        Existing rows are looked up in batches, then new rows are written with one bulk
+        insert and existing ones with one bulk update per table. A model whose content
+        changed gets a new version, while one whose content is the same is left as it is.
+        Chain steps without a pinned version are pinned to their model's current version,
+        after the models are imported. Either everything is written or, on an error,
+        nothing is.
+
+        Args:
+            models (list[ModelInput]): The prompt models, with unique names.
+            chains (list[ChainConfig]): The chain configs, with unique names.
+
+        Returns:
+            dict[str, dict[str, int]]: How many models and chains were created, updated
+                and left unchanged.
+
+        Raises:
+            DatabaseManagerException: If writing to the database fails.
+        """
+        with self.session_scope() as session:
+            model_counts = self._upsert_models(session, models)
+            hashes = self._current_hashes(
+                session, [step.name for chain in chains for step in chain.steps]
+            )
+            chain_rows = [
+                {"name": chain.name, "config": self._pin_versions(chain, hashes).model_dump()}
+                for chain in chains
+            ]
+            chain_counts = self._upsert_chains(session, chain_rows)
+        return {"models": model_counts, "chains": chain_counts}
+
+    def _upsert_models(self, session: Session, models: list[ModelInput]) -> dict[str, int]:
+        rows: list[dict[str, Any]] = []
+        for model in models:
+            content: dict[str, Any] = {
+                "system_prompt": model.system_prompt,
+                "user_prompt": model.user_prompt_schema,
+                "response": model.response_schema,
+                "backends": model.backends or None,
+            }
+            rows.append({"name": model.name, "hash": model_hash(**content), **content})
+
+        existing: dict[str, tuple[int, str | None]] = {}
+        for batch in _batches([row["name"] for row in rows]):
+            existing.update(
+                (name, (model_id, version_hash))
+                for name, model_id, version_hash in session.execute(
+                    select(PromptModelTable.name, PromptModelTable.id, PromptModelTable.hash).where(
+                        PromptModelTable.name.in_(batch)
+                    )
+                )
+            )
+        new_rows = [{**row, "version": 1} for row in rows if row["name"] not in existing]
+        changed = [
+            row
+            for row in rows
+            if row["name"] in existing and existing[row["name"]][1] != row["hash"]
+        ]
+        versions = self._model_versions(session, [row["name"] for row in changed])
+        new_versions = [{**row, "version": 1} for row in new_rows]
+        updated_rows = []
+        for row in changed:
+            model_versions = versions.get(row["name"], {})
+            version = model_versions.get(row["hash"])
+            if version is None:
+                version = max(model_versions.values(), default=0) + 1
+                new_versions.append({**row, "version": version})
+            updated_rows.append({**row, "id": existing[row["name"]][0], "version": version})
+
+        if new_rows:
+            session.execute(insert(PromptModelTable), new_rows)
+        if updated_rows:
+            session.execute(update(PromptModelTable), updated_rows)
+        if new_versions:
+            session.execute(
+                insert(PromptModelVersionTable),
+                [{**_without_name(row), "model_name": row["name"]} for row in new_versions],
+            )
+        return {
+            "created": len(new_rows),
+            "updated": len(updated_rows),
+            "unchanged": len(rows) - len(new_rows) - len(updated_rows),
+        }
+
+    @staticmethod
+    def _upsert_chains(session: Session, rows: list[dict[str, Any]]) -> dict[str, int]:
+        existing: dict[str, int] = {}
+        for batch in _batches([row["name"] for row in rows]):
+            existing.update(
+                session.execute(
+                    select(ChainConfigTable.name, ChainConfigTable.id).where(
+                        ChainConfigTable.name.in_(batch)
+                    )
+                ).all()
+            )
+        new_rows = [row for row in rows if row["name"] not in existing]
+        updated_rows = [
+            {**row, "id": existing[row["name"]]} for row in rows if row["name"] in existing
+        ]
+        if new_rows:
+            session.execute(insert(ChainConfigTable), new_rows)
+        if updated_rows:
+            session.execute(update(ChainConfigTable), updated_rows)
+        return {"created": len(new_rows), "updated": len(updated_rows)}
+
+    @staticmethod
+    def _model_versions(session: Session, names: list[str]) -> dict[str, dict[str, int]]:
+        """The version number of each version hash of the named models."""
+        versions: dict[str, dict[str, int]] = {}
+        for batch in _batches(names):
+            rows = session.execute(
+                select(
+                    PromptModelVersionTable.model_name,
+                    PromptModelVersionTable.hash,
+                    PromptModelVersionTable.version,
+                ).where(PromptModelVersionTable.model_name.in_(batch))
+            )
+            for name, version_hash, version in rows:
+                versions.setdefault(name, {})[version_hash] = version
+        return versions
+
+    @staticmethod
+    def _current_hashes(session: Session, names: list[str]) -> dict[str, str | None]:
+        """The hash of the current version of each of the named models that exists."""
+        hashes: dict[str, str | None] = {}
+        for batch in _batches(list(dict.fromkeys(names))):
+            hashes.update(
+                session.execute(
+                    select(PromptModelTable.name, PromptModelTable.hash).where(
+                        PromptModelTable.name.in_(batch)
+                    )
+                ).all()
+            )
+        return hashes
+
+    @staticmethod
+    def _pin_versions(chain_config: ChainConfig, hashes: dict[str, str | None]) -> ChainConfig:
+        """Pin the steps of a chain without a version to their model's current version."""
+        steps = [
+            step.model_copy(update={"model_version": hashes.get(step.name)})
+            if step.model_version is None
+            else step
+            for step in chain_config.steps
+        ]
+        return chain_config.model_copy(update={"steps": steps})
+
     def validate_user_input(self, model_name: str, user_input: dict[str, Any]) -> bool:
         prompt_model = self.get_prompt_model(model_name)
         if not prompt_model:
             raise ValueError(f"No model found with name: {model_name}")
-        user_model = DynamicModel.create_from_schema(prompt_model.user_prompt)
+        validate = validator_cache.get(prompt_model.user_prompt)
         try:
-            user_model(**user_input)
+            validate(user_input)
             return True
         except ValidationError:
             raise
@@ -103,10 +458,10 @@ class DatabaseManager:
         prompt_model = self.get_prompt_model(model_name)
         if not prompt_model:
             raise ValueError(f"No model found with name: {model_name}")
-        response_model = DynamicModel.create_from_schema(prompt_model.response)
+        validate = validator_cache.get(prompt_model.response)
         try:
             response_data = json.loads(llm_response)
-            response_model(**response_data)
+            validate(response_data)
             return True
         except ValidationError:
             raise
@@ -121,4 +476,32 @@ class DatabaseManager:
             response=model.response,
             created_at=model.created_at.isoformat(),
             updated_at=model.updated_at.isoformat(),
+            backends=model.backends or [],
+            version=model.version,
+            hash=model.hash
+            or model_hash(model.system_prompt, model.user_prompt, model.response, model.backends),
+        )
+
+    @staticmethod
+    def convert_version_to_dict(version: PromptModelVersionTable, model_id: int) -> PromptModel:
+        return PromptModel(
+            id=model_id,
+            name=version.model_name,
+            system_prompt=version.system_prompt,
+            user_prompt=version.user_prompt,
+            response=version.response,
+            created_at=version.created_at.isoformat(),
+            updated_at=version.created_at.isoformat(),
+            backends=version.backends or [],
+            version=version.version,
+            hash=version.hash,
         )
+
+
+def _batches(names: list[str]) -> Iterator[list[str]]:
+    for i in range(0, len(names), BULK_LOOKUP_BATCH_SIZE):
+        yield names[i : i + BULK_LOOKUP_BATCH_SIZE]
+
+
+def _without_name(row: dict[str, Any]) -> dict[str, Any]:
+    return {key: value for key, value in row.items() if key != "name"}
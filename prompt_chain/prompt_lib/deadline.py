@@ -0,0 +1,58 @@
+import time
+
+from prompt_chain.prompt_lib.exceptions import DeadlineExceededException
+
+
+class Deadline:
+    """
+    An end-to-end time budget for a chain execution, measured on the monotonic clock.
+
+    A deadline created without a budget never expires.
+    """
+
+    def __init__(self, seconds: float | None = None) -> None:
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+
+    def remaining(self) -> float | None:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self, action: str) -> None:
+        """
+        Raise if the deadline has passed.
+
+        Args:
+            action (str): What was about to be done, used in the error message.
+
+        Raises:
+            DeadlineExceededException: If the deadline has passed.
+        """
+        if self.expired():
+            raise DeadlineExceededException(f"Deadline exceeded before {action}")
+
+    def timeout(self, *timeouts: float | None, action: str = "the call") -> float | None:
+        """
+        Get the timeout for the next call: the smallest of the given timeouts and the
+        remaining budget.
+
+        A timeout of 0 is never returned, as `requests` rejects it with a ValueError.
+
+        Args:
+            *timeouts (float | None): Other timeouts that apply to the call, if any.
+            action (str): What the timeout is for, used in the error message.
+
+        Returns:
+            float | None: The timeout in seconds, or None if nothing limits the call.
+
+        Raises:
+            DeadlineExceededException: If the deadline has passed.
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceededException(f"Deadline exceeded before {action}")
+        candidates = [t for t in (*timeouts, remaining) if t is not None]
+        return min(candidates) if candidates else None
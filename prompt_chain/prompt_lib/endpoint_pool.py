@@ -0,0 +1,226 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from prompt_chain.prompt_lib.metrics import Metrics
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class Endpoint:
+    """A provider endpoint and the credentials to call it with."""
+
+    name: str
+    url: str
+    api_key: str | None
+    requests_per_minute: float | None = None
+    outstanding: int = 0
+    consecutive_failures: int = 0
+    ejections: int = 0
+    ejected_until: float = 0.0
+    on_probation: bool = False
+    _tokens: float = field(default=0.0, repr=False)
+    _refilled_at: float = field(default_factory=time.monotonic, repr=False)
+
+    def __post_init__(self) -> None:
+        self._tokens = self.burst
+
+    @property
+    def burst(self) -> float:
+        """The most requests the endpoint can take at once: a second's worth of its rate."""
+        if self.requests_per_minute is None:
+            return float("inf")
+        return max(1.0, self.requests_per_minute / 60)
+
+    def refill(self, now: float) -> None:
+        if self.requests_per_minute is None:
+            return
+        elapsed = now - self._refilled_at
+        self._tokens = min(self.burst, self._tokens + elapsed * self.requests_per_minute / 60)
+        self._refilled_at = now
+
+    def take(self) -> None:
+        self._tokens -= 1
+
+    def exhaust(self) -> None:
+        """Use up the remaining requests, e.g. when the endpoint says it is rate limited."""
+        self._tokens = min(self._tokens, 0.0)
+
+    def next_token_in(self) -> float:
+        """Seconds until the endpoint has a request token, assuming it was just refilled."""
+        if self._tokens >= 1 or not self.requests_per_minute:
+            return 0.0
+        return (1 - self._tokens) * 60 / self.requests_per_minute
+
+
+def endpoints_from_config(configs: list[dict[str, Any]]) -> list[Endpoint]:
+    """
+    Build endpoints from their configuration, see PROVIDER_ENDPOINTS.
+
+    Raises:
+        ValueError: If an endpoint has no URL, or its API key variable is not set.
+    """
+    endpoints = []
+    for i, config in enumerate(configs):
+        name = config.get("name", f"endpoint_{i}")
+        if "url" not in config:
+            raise ValueError(f"Endpoint {name} has no url")
+        api_key = config.get("api_key")
+        if "api_key_env" in config:
+            api_key = os.getenv(config["api_key_env"])
+            if api_key is None:
+                raise ValueError(f"Environment variable {config['api_key_env']} is not set")
+        endpoints.append(
+            Endpoint(
+                name=name,
+                url=config["url"],
+                api_key=api_key,
+                requests_per_minute=config.get("requests_per_minute"),
+            )
+        )
+    return endpoints
+
+
+class EndpointPool:
+    """
+    Spreads provider calls across a pool of endpoints and credentials.
+
+    Each call goes to the healthy endpoint with the fewest outstanding calls that is
+    within its rate limit, rotating between endpoints that tie. Each endpoint's rate limit
+    is accounted with a token bucket refilled at `requests_per_minute`; if every healthy
+    endpoint is at its limit, the call waits for the first one to free up.
+
+    An endpoint that fails `max_failures` calls in a row is ejected for `ejection_seconds`,
+    doubling with every consecutive ejection up to `max_ejection_seconds`. When it is
+    re-admitted it is on probation: a single failure ejects it again, while a success
+    restores it fully. If every endpoint is ejected, calls go to the one that is due back
+    first rather than failing outright.
+    """
+
+    def __init__(
+        self,
+        endpoints: list[Endpoint],
+        max_failures: int = 3,
+        ejection_seconds: float = 30.0,
+        max_ejection_seconds: float = 300.0,
+        metrics: Metrics | None = None,
+    ) -> None:
+        if not endpoints:
+            raise ValueError("An endpoint pool needs at least one endpoint")
+        self.endpoints = endpoints
+        self.max_failures = max_failures
+        self.ejection_seconds = ejection_seconds
+        self.max_ejection_seconds = max_ejection_seconds
+        self.metrics = metrics or Metrics()
+        self._rotation = itertools.count()
+        self._condition = threading.Condition()
+        for endpoint in endpoints:
+            self._update_gauges(endpoint)
+
+    def acquire(self, timeout: float | None = None) -> Endpoint:
+        """
+        Pick an endpoint for a call and count the call as outstanding on it.
+
+        Args:
+            timeout (float | None): The longest to wait for an endpoint within its rate limit.
+
+        Returns:
+            Endpoint: The endpoint to call. Pass it to `release` once the call is done.
+
+        Raises:
+            TimeoutError: If every endpoint stayed at its rate limit for the whole timeout.
+        """
+        expires_at = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                endpoint, wait = self._pick(now)
+                if endpoint is not None:
+                    endpoint.take()
+                    endpoint.outstanding += 1
+                    self.metrics.increment("endpoint.requests", endpoint=endpoint.name)
+                    self._update_gauges(endpoint)
+                    return endpoint
+                if expires_at is not None:
+                    if now >= expires_at:
+                        raise TimeoutError(
+                            "Timed out waiting for an endpoint within its rate limit"
+                        )
+                    wait = min(wait, expires_at - now)
+                self.metrics.increment("endpoint.rate_limited_waits")
+                self._condition.wait(wait)
+
+    def release(self, endpoint: Endpoint, success: bool, rate_limited: bool = False) -> None:
+        """
+        Record the outcome of a call made to an endpoint.
+
+        Args:
+            endpoint (Endpoint): The endpoint returned by `acquire`.
+            success (bool): Whether the endpoint handled the call. Errors caused by the
+                request itself, such as a 400, should count as a success.
+            rate_limited (bool): Whether the endpoint rejected the call for its rate limit,
+                in which case its remaining requests are used up.
+        """
+        with self._condition:
+            endpoint.outstanding -= 1
+            if rate_limited:
+                endpoint.exhaust()
+            if success:
+                endpoint.consecutive_failures = 0
+                endpoint.ejections = 0
+                endpoint.on_probation = False
+            else:
+                endpoint.consecutive_failures += 1
+                self.metrics.increment("endpoint.failures", endpoint=endpoint.name)
+                if endpoint.on_probation or endpoint.consecutive_failures >= self.max_failures:
+                    self._eject(endpoint)
+            self._update_gauges(endpoint)
+            self._condition.notify_all()
+
+    def _pick(self, now: float) -> tuple[Endpoint | None, float]:
+        """Pick the endpoint for the next call, or say how long to wait for one."""
+        healthy = []
+        for endpoint in self.endpoints:
+            if endpoint.ejected_until > now:
+                continue
+            if endpoint.ejected_until:
+                LOGGER.info(f"Re-admitting endpoint {endpoint.name} on probation")
+                endpoint.ejected_until = 0.0
+                endpoint.on_probation = True
+                self._update_gauges(endpoint)
+            healthy.append(endpoint)
+        if not healthy:
+            # Fail open: better to try an endpoint that may have recovered than to fail.
+            healthy = [min(self.endpoints, key=lambda endpoint: endpoint.ejected_until)]
+
+        for endpoint in healthy:
+            endpoint.refill(now)
+        available = [endpoint for endpoint in healthy if endpoint.next_token_in() == 0]
+        if not available:
+            return None, min(endpoint.next_token_in() for endpoint in healthy)
+        least = min(endpoint.outstanding for endpoint in available)
+        tied = [endpoint for endpoint in available if endpoint.outstanding == least]
+        return tied[next(self._rotation) % len(tied)], 0.0
+
+    def _eject(self, endpoint: Endpoint) -> None:
+        duration = min(self.max_ejection_seconds, self.ejection_seconds * 2**endpoint.ejections)
+        LOGGER.warning(
+            f"Ejecting endpoint {endpoint.name} for {duration:.0f}s after "
+            f"{endpoint.consecutive_failures} failure(s)"
+        )
+        endpoint.ejections += 1
+        endpoint.ejected_until = time.monotonic() + duration
+        endpoint.on_probation = False
+        endpoint.consecutive_failures = 0
+        self.metrics.increment("endpoint.ejections", endpoint=endpoint.name)
+
+    def _update_gauges(self, endpoint: Endpoint) -> None:
+        self.metrics.set_gauge("endpoint.outstanding", endpoint.outstanding, endpoint=endpoint.name)
+        self.metrics.set_gauge(
+            "endpoint.healthy", 0 if endpoint.ejected_until else 1, endpoint=endpoint.name
+        )
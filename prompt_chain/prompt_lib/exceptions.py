@@ -1,2 +1,54 @@
 class DatabaseManagerException(Exception):
     pass
+
+
+class SchemaValidationException(ValueError):
+    pass
+
+
+class DeadlineExceededException(TimeoutError):
+    pass
+
+
+class InvalidResponseException(ValueError):
+    def __init__(self, message: str, content: str) -> None:
+        super().__init__(message)
+        self.content = content
+
+
+class OutputValidationException(ValueError):
+    pass
+
+
+class BudgetExceededException(Exception):
+    pass
+
+
+class IdempotencyKeyMismatchException(ValueError):
+    pass
+
+
+class IdempotencyKeyInProgressException(Exception):
+    pass
+
+
+class OverloadedException(Exception):
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CatalogImportException(ValueError):
+    def __init__(self, message: str, errors: list[str]) -> None:
+        super().__init__(message)
+        self.errors = errors
+
+
+class ChainTypeException(ValueError):
+    def __init__(self, message: str, errors: list[str]) -> None:
+        super().__init__(message)
+        self.errors = errors
+
+
+class CassetteMissException(LookupError):
+    pass
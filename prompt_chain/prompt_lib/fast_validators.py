@@ -0,0 +1,225 @@
+import math
+import re
+from collections.abc import Callable
+from typing import Any
+
+from prompt_chain.prompt_lib.exceptions import SchemaValidationException
+
+# A location is a linked list of (parent, key) pairs, only flattened when reporting errors.
+Location = tuple[Any, str | int] | None
+# A compiled check takes a value, its location and a list to collect errors into. It
+# returns the coerced value, or None after recording an error.
+Check = Callable[[Any, Location, list[tuple[Location, str]]], Any]
+
+INT_PATTERN = re.compile(r"[+-]?[0-9]+(?:_[0-9]+)*(?:\.0+)?", re.ASCII)
+FLOAT_PATTERN = re.compile(
+    r"[+-]?(?:(?:[0-9]+(?:_[0-9]+)*)(?:\.(?:[0-9]+(?:_[0-9]+)*)?)?|\.[0-9]+(?:_[0-9]+)*)"
+    r"(?:[eE][+-]?[0-9]+(?:_[0-9]+)*)?",
+    re.ASCII,
+)
+FLOAT_SPECIALS = {
+    "inf",
+    "+inf",
+    "-inf",
+    "infinity",
+    "+infinity",
+    "-infinity",
+    "nan",
+    "+nan",
+    "-nan",
+}
+TRUE_STRINGS = {"1", "true", "t", "yes", "y", "on"}
+FALSE_STRINGS = {"0", "false", "f", "no", "n", "off"}
+PASSTHROUGH_TYPES = {"str": str, "int": int, "float": float, "bool": bool}
+# Floats are only coerced to ints inside the signed 64-bit range, as pydantic does.
+INT_FROM_FLOAT_LIMIT = 2.0**63
+
+
+def compile_fast_validator(
+    schema: dict[str, Any], model_name: str = "DynamicModel"
+) -> Callable[[dict[str, Any]], dict[str, Any]]:
+    """
+    Compile a DynamicModel schema into a plain validation function.
+
+    The function type checks and coerces JSON-shaped data the same way as the pydantic
+    model built by DynamicModel.create_from_schema in lax mode, and returns what that
+    model's `model_dump` would, without creating any pydantic models.
+
+    Args:
+        schema (dict[str, Any]): The schema, in the format expected by DynamicModel.
+        model_name (str): The name used in validation error messages.
+
+    Returns:
+        Callable[[dict[str, Any]], dict[str, Any]]: The validation function. It raises a
+            SchemaValidationException listing every error if validation fails.
+
+    Raises:
+        ValueError: If the schema uses an unsupported type.
+    """
+    check_object = _compile_object(schema, model_name)
+
+    def validate(data: dict[str, Any]) -> dict[str, Any]:
+        errors: list[tuple[Location, str]] = []
+        result = check_object(data, None, errors)
+        if errors:
+            raise SchemaValidationException(_format_errors(model_name, errors))
+        return result  # type: ignore[no-any-return]
+
+    return validate
+
+
+def _compile(field_type: Any, field_name: str) -> Check:
+    if isinstance(field_type, str):
+        return _compile_primitive(field_type)
+    elif isinstance(field_type, dict):
+        return _compile_object(field_type, f"NestedModel_{field_name}")
+    elif isinstance(field_type, list):
+        return _compile_list(field_type, field_name)
+    elif isinstance(field_type, tuple):
+        return _compile_tuple(field_type, field_name)
+    else:
+        raise ValueError(f"Unsupported field type for '{field_name}': {field_type}")
+
+
+def _compile_object(schema: dict[str, Any], model_name: str) -> Check:
+    # Values already of the exact target primitive type pass through without a call.
+    fields = [
+        (name, _compile(field_type, name), _passthrough_type(field_type))
+        for name, field_type in schema.items()
+    ]
+
+    def check(value: Any, loc: Location, errors: list[Any]) -> Any:
+        if not isinstance(value, dict):
+            errors.append((loc, f"Input should be a valid dictionary or instance of {model_name}"))
+            return None
+        result = {}
+        for name, check_field, passthrough_type in fields:
+            try:
+                field_value = value[name]
+            except KeyError:
+                errors.append(((loc, name), "Field required"))
+                continue
+            if type(field_value) is passthrough_type:
+                result[name] = field_value
+            else:
+                result[name] = check_field(field_value, (loc, name), errors)
+        return result
+
+    return check
+
+
+def _passthrough_type(field_type: Any) -> type | None:
+    return PASSTHROUGH_TYPES.get(field_type) if isinstance(field_type, str) else None
+
+
+def _compile_list(field_type: list[Any], field_name: str) -> Check:
+    check_item = _compile(field_type[0], f"{field_name}_item") if field_type else None
+
+    def check(value: Any, loc: Location, errors: list[Any]) -> Any:
+        if not isinstance(value, (list, tuple, set, frozenset)):
+            errors.append((loc, "Input should be a valid list"))
+            return None
+        if check_item is None:
+            return list(value)
+        return [check_item(item, (loc, i), errors) for i, item in enumerate(value)]
+
+    return check
+
+
+def _compile_tuple(field_type: tuple[Any, ...], field_name: str) -> Check:
+    checks = [_compile(t, f"{field_name}_item_{i}") for i, t in enumerate(field_type)]
+
+    def check(value: Any, loc: Location, errors: list[Any]) -> Any:
+        if not isinstance(value, (list, tuple)):
+            errors.append((loc, "Input should be a valid tuple"))
+            return None
+        if len(value) != len(checks):
+            errors.append((loc, f"Tuple should have {len(checks)} items, got {len(value)}"))
+            return None
+        return tuple(
+            check_item(item, (loc, i), errors)
+            for i, (check_item, item) in enumerate(zip(checks, value))
+        )
+
+    return check
+
+
+def _compile_primitive(field_type: str) -> Check:
+    if field_type == "str":
+        return _check_str
+    elif field_type == "int":
+        return _check_int
+    elif field_type == "float":
+        return _check_float
+    elif field_type == "bool":
+        return _check_bool
+    elif field_type == "any":
+        return _check_any
+    else:
+        raise ValueError(f"Unsupported primitive type: {field_type}")
+
+
+def _check_str(value: Any, loc: Location, errors: list[Any]) -> Any:
+    if isinstance(value, str):
+        return value
+    errors.append((loc, "Input should be a valid string"))
+    return None
+
+
+def _check_int(value: Any, loc: Location, errors: list[Any]) -> Any:
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        if value.is_integer() and -INT_FROM_FLOAT_LIMIT < value < INT_FROM_FLOAT_LIMIT:
+            return int(value)
+    elif isinstance(value, str):
+        stripped = value.strip()
+        if INT_PATTERN.fullmatch(stripped):
+            return int(stripped.split(".", 1)[0])
+    errors.append((loc, "Input should be a valid integer"))
+    return None
+
+
+def _check_float(value: Any, loc: Location, errors: list[Any]) -> Any:
+    try:
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            stripped = value.strip()
+            if FLOAT_PATTERN.fullmatch(stripped) or stripped.lower() in FLOAT_SPECIALS:
+                return float(stripped)
+    except OverflowError:
+        pass
+    errors.append((loc, "Input should be a valid number"))
+    return None
+
+
+def _check_bool(value: Any, loc: Location, errors: list[Any]) -> Any:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and (value == 0 or value == 1) and not math.isnan(value):
+        return bool(value)
+    if isinstance(value, str):
+        lowered = value.lower()
+        if lowered in TRUE_STRINGS:
+            return True
+        if lowered in FALSE_STRINGS:
+            return False
+    errors.append((loc, "Input should be a valid boolean"))
+    return None
+
+
+def _check_any(value: Any, loc: Location, errors: list[Any]) -> Any:
+    return value
+
+
+def _format_errors(model_name: str, errors: list[tuple[Location, str]]) -> str:
+    lines = [f"{len(errors)} validation error{'s' if len(errors) > 1 else ''} for {model_name}"]
+    for loc, message in errors:
+        parts: list[str] = []
+        while loc is not None:
+            loc, key = loc
+            parts.append(str(key))
+        lines.append(".".join(reversed(parts)))
+        lines.append(f"  {message}")
+    return "\n".join(lines)
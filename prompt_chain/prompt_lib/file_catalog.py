@@ -0,0 +1,272 @@
+import logging
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any
+
+try:
+    import yaml  # type: ignore[import-untyped, unused-ignore]
+except ImportError:  # pragma: no cover - depends on the installed extras
+    yaml = None  # type: ignore[assignment, unused-ignore]
+
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.catalog import MAX_REPORTED_ERRORS, parse_entry
+from prompt_chain.prompt_lib.db_manager import model_hash
+from prompt_chain.prompt_lib.exceptions import CatalogImportException, ChainTypeException
+from prompt_chain.prompt_lib.metrics import Metrics
+from prompt_chain.prompt_lib.models import ChainConfig, ModelInput, PromptModel
+from prompt_chain.prompt_lib.type_checker import check_chain
+
+LOGGER = logging.getLogger(__name__)
+
+CATALOG_SUFFIXES = {".json", ".jsonl", ".yaml", ".yml"}
+
+# The path, modification time and size of every catalog file, to tell when one changed.
+Snapshot = tuple[tuple[str, int, int], ...]
+
+
+@dataclass(frozen=True)
+class CatalogIndex:
+    """An immutable index of the prompt models and chain configs of a catalog."""
+
+    models: Mapping[str, PromptModel]
+    chains: Mapping[str, ChainConfig]
+
+
+def load_catalog(directory: Path) -> CatalogIndex:
+    """
+    Load and validate every catalog file in a directory and its subdirectories.
+
+    A .json or .yaml file holds one entry or a list of entries, and a .jsonl file one
+    entry per line, in the format read by `parse_catalog`. Chain steps must refer to
+    models in the catalog, and steps without a `model_version` are pinned to the
+    version of the model in the catalog. Every chain is type checked with `check_chain`.
+
+    Args:
+        directory (Path): The catalog directory.
+
+    Returns:
+        CatalogIndex: The models and chains of the catalog.
+
+    Raises:
+        CatalogImportException: If any entry is invalid, or a name appears twice.
+    """
+    errors: list[str] = []
+    models: dict[str, PromptModel] = {}
+    chains: dict[str, ChainConfig] = {}
+    sources: dict[tuple[str, str], str] = {}
+    for path in _catalog_files(directory):
+        updated_at = datetime.fromtimestamp(path.stat().st_mtime, timezone.utc).isoformat()
+        try:
+            entries = _read_entries(path, errors)
+        except ValueError as e:
+            errors.append(f"{path}: {str(e)}")
+            continue
+        for location, data in entries:
+            if not isinstance(data, dict):
+                errors.append(f"{path}{location}: Expected an object")
+                continue
+            try:
+                kind, entry = parse_entry(data)
+            except ValueError as e:
+                errors.append(f"{path}{location}: {str(e)}")
+                continue
+            first = sources.setdefault((kind, entry.name), f"{path}{location}")
+            if first != f"{path}{location}":
+                errors.append(f"{path}{location}: duplicate {kind} {entry.name}, first in {first}")
+            elif isinstance(entry, ModelInput):
+                models[entry.name] = _to_prompt_model(entry, len(models) + 1, updated_at)
+            else:
+                chains[entry.name] = entry
+
+    for name, chain in chains.items():
+        try:
+            chains[name] = _pin_versions(chain, models)
+            check_chain(chains[name], lambda model_name, version: models.get(model_name))
+        except ChainTypeException as e:
+            errors.extend(f"{sources[('chain', name)]}: {error}" for error in e.errors)
+        except ValueError as e:
+            errors.append(f"{sources[('chain', name)]}: {str(e)}")
+
+    if errors:
+        raise CatalogImportException(
+            f"Catalog in {directory} has {len(errors)} error(s)", errors[:MAX_REPORTED_ERRORS]
+        )
+    return CatalogIndex(MappingProxyType(models), MappingProxyType(chains))
+
+
+def _catalog_files(directory: Path) -> list[Path]:
+    if not directory.is_dir():
+        raise CatalogImportException(f"Catalog directory {directory} does not exist", [])
+    return sorted(
+        path
+        for path in directory.rglob("*")
+        if path.suffix in CATALOG_SUFFIXES and path.is_file() and not path.name.startswith(".")
+    )
+
+
+def _read_entries(path: Path, errors: list[str]) -> list[tuple[str, Any]]:
+    """Read the entries of a catalog file, each with where it is in the file."""
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".jsonl":
+        entries = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                entries.append((f":{number}", codec.loads(line)))
+            except ValueError as e:
+                errors.append(f"{path}:{number}: Invalid JSON: {str(e)}")
+        return entries
+    if path.suffix == ".json":
+        data = codec.loads(text)
+    elif yaml is None:
+        raise ValueError("PyYAML is not installed, install prompt-chain[yaml] to load YAML")
+    else:
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ValueError(str(e)) from e
+    if isinstance(data, list):
+        return [(f"[{i}]", entry) for i, entry in enumerate(data)]
+    return [("", data)]
+
+
+def _to_prompt_model(model: ModelInput, model_id: int, updated_at: str) -> PromptModel:
+    return PromptModel(
+        id=model_id,
+        name=model.name,
+        system_prompt=model.system_prompt,
+        user_prompt=model.user_prompt_schema,
+        response=model.response_schema,
+        created_at=updated_at,
+        updated_at=updated_at,
+        backends=model.backends,
+        version=1,
+        hash=model_hash(
+            model.system_prompt, model.user_prompt_schema, model.response_schema, model.backends
+        ),
+    )
+
+
+def _pin_versions(chain: ChainConfig, models: Mapping[str, PromptModel]) -> ChainConfig:
+    steps = []
+    for step in chain.steps:
+        model = models.get(step.name)
+        if model is None:
+            raise ValueError(f"Chain {chain.name} uses unknown model {step.name}")
+        if step.model_version not in (None, model.hash):
+            raise ValueError(
+                f"Chain {chain.name} pins model {step.name} to version {step.model_version}, "
+                f"but the catalog has version {model.hash}"
+            )
+        steps.append(step.model_copy(update={"model_version": model.hash}))
+    return chain.model_copy(update={"steps": steps})
+
+
+def _snapshot(directory: Path) -> Snapshot:
+    try:
+        files = _catalog_files(directory)
+        return tuple(
+            (str(path), stat.st_mtime_ns, stat.st_size)
+            for path, stat in ((path, path.stat()) for path in files)
+        )
+    except (OSError, CatalogImportException):
+        return ()
+
+
+class FileCatalog:
+    """
+    Serves prompt models and chain configs from a directory of JSON, JSONL or YAML files.
+
+    The whole catalog is loaded and validated into an immutable in-memory index when it
+    is created, so reads never touch the disk or the database. If `reload_interval` is
+    set, a background thread checks the files for changes that often, and loads them
+    into a new index that replaces the old one in a single step. A catalog that fails
+    validation is not loaded, and the last valid one keeps being served.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        reload_interval: float = 2.0,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.reload_interval = reload_interval
+        self.metrics = metrics or Metrics()
+        self._snapshot = _snapshot(self.directory)
+        self._index = load_catalog(self.directory)
+        self.metrics.set_gauge("catalog.models", len(self._index.models))
+        self.metrics.set_gauge("catalog.chains", len(self._index.chains))
+        self._reload_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        if reload_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="catalog-reload", daemon=True)
+            self._thread.start()
+
+    @property
+    def index(self) -> CatalogIndex:
+        """The current catalog. Hold on to it to read several entries consistently."""
+        return self._index
+
+    def get_prompt_model(self, model_name: str, version: str | None = None) -> PromptModel | None:
+        model = self._index.models.get(model_name)
+        if model is None or version not in (None, model.hash):
+            return None
+        return model
+
+    def get_all_models(self) -> list[str]:
+        return list(self._index.models)
+
+    def get_chain_config(self, name: str) -> ChainConfig | None:
+        return self._index.chains.get(name)
+
+    def get_all_chain_configs(self) -> list[str]:
+        return list(self._index.chains)
+
+    def reload(self) -> bool:
+        """
+        Load the catalog again if any of its files changed.
+
+        Returns:
+            bool: Whether a new catalog was loaded.
+        """
+        with self._reload_lock:
+            snapshot = _snapshot(self.directory)
+            if snapshot == self._snapshot:
+                return False
+            # Taken before loading, so changes made during the load are picked up next time.
+            self._snapshot = snapshot
+            try:
+                index = load_catalog(self.directory)
+            except (CatalogImportException, OSError) as e:
+                errors = getattr(e, "errors", [])
+                LOGGER.error(f"Failed to reload catalog, keeping the last valid one: {str(e)}")
+                for error in errors:
+                    LOGGER.error(f"  {error}")
+                self.metrics.increment("catalog.reloads", status="failed")
+                return False
+            self._index = index
+        LOGGER.info(
+            f"Reloaded catalog from {self.directory}: "
+            f"{len(index.models)} models, {len(index.chains)} chains"
+        )
+        self.metrics.increment("catalog.reloads", status="ok")
+        self.metrics.set_gauge("catalog.models", len(index.models))
+        self.metrics.set_gauge("catalog.chains", len(index.chains))
+        return True
+
+    def close(self) -> None:
+        """Stop checking the files for changes."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.reload_interval):
+            self.reload()
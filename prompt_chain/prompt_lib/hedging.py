@@ -0,0 +1,157 @@
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import TypeVar
+
+from prompt_chain.prompt_lib.metrics import Metrics
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Keeps a sliding window of recent call latencies per key."""
+
+    def __init__(self, window: int = 200) -> None:
+        self._latencies: defaultdict[str, deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, key: str, latency: float) -> None:
+        with self._lock:
+            self._latencies[key].append(latency)
+
+    def percentile(self, key: str, percentile: float, min_samples: int = 1) -> float | None:
+        """
+        Get a percentile of the recent latencies for a key.
+
+        Args:
+            key (str): The key the latencies were recorded under.
+            percentile (float): The percentile to compute, between 0 and 1.
+            min_samples (int): The number of samples required to compute the percentile.
+
+        Returns:
+            float | None: The latency in seconds, or None if there are too few samples.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies[key])
+        if not latencies or len(latencies) < min_samples:
+            return None
+        index = min(len(latencies) - 1, max(0, math.ceil(percentile * len(latencies)) - 1))
+        return latencies[index]
+
+
+class Hedger:
+    """
+    Sends a duplicate of a slow call and returns whichever copy succeeds first.
+
+    A call is hedged once it has been running longer than the given percentile of recent
+    latencies for its key. The number of hedges is capped at `max_hedge_rate` of all calls
+    by a token bucket, so a provider-wide slowdown cannot double the load on it. The
+    losing call is cancelled if it has not started yet; an in-flight HTTP request cannot be
+    aborted, so its result is simply discarded.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        max_hedge_rate: float = 0.05,
+        min_samples: int = 20,
+        max_workers: int = 32,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self.min_samples = min_samples
+        self.latencies = LatencyTracker()
+        self.metrics = metrics or Metrics()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._tokens = 1.0
+        self._max_tokens = max(1.0, max_hedge_rate * 100)
+        self._lock = threading.Lock()
+
+    def call(self, key: str, fn: Callable[[], T], timeout: float | None = None) -> T:
+        """
+        Call a function, hedging it if it is slower than usual.
+
+        Args:
+            key (str): The key to track latencies under, e.g. the model name.
+            fn (Callable[[], T]): The call to make. Any exception it raises counts as a
+                failed attempt, so it should also raise on invalid responses.
+            timeout (float | None): The total time to wait for a successful attempt.
+
+        Returns:
+            T: The result of the first attempt that succeeded.
+
+        Raises:
+            TimeoutError: If no attempt succeeded within the timeout.
+        """
+        self.metrics.increment("hedging.calls", model=key)
+        with self._lock:
+            self._tokens = min(self._max_tokens, self._tokens + self.max_hedge_rate)
+        delay = self.latencies.percentile(key, self.percentile, self.min_samples)
+        if delay is None or (timeout is not None and delay >= timeout):
+            return self._timed(key, fn)
+
+        expires_at = time.monotonic() + timeout if timeout is not None else None
+        primary = self._executor.submit(self._timed, key, fn)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeoutError:
+            pass
+        if not self._take_token():
+            return primary.result(timeout=_remaining(expires_at))
+
+        LOGGER.info(f"Hedging call for {key} after {delay:.2f}s")
+        self.metrics.increment("hedging.hedges_sent", model=key)
+        hedge = self._executor.submit(self._timed, key, fn)
+        return self._first_success(key, primary, hedge, expires_at)
+
+    def _first_success(
+        self, key: str, primary: Future[T], hedge: Future[T], expires_at: float | None
+    ) -> T:
+        pending = {primary, hedge}
+        errors: list[BaseException] = []
+        while pending:
+            done, pending = wait(
+                pending, timeout=_remaining(expires_at), return_when=FIRST_COMPLETED
+            )
+            if not done:
+                for other in pending:
+                    other.cancel()
+                raise TimeoutError(f"Call for {key} timed out")
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    for other in pending:
+                        other.cancel()
+                    if future is hedge:
+                        self.metrics.increment("hedging.hedges_won", model=key)
+                    return future.result()
+                errors.append(error)
+        raise errors[0]
+
+    def _timed(self, key: str, fn: Callable[[], T]) -> T:
+        start = time.monotonic()
+        result = fn()
+        self.latencies.record(key, time.monotonic() - start)
+        return result
+
+    def _take_token(self) -> bool:
+        with self._lock:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _remaining(expires_at: float | None) -> float | None:
+    return max(0.0, expires_at - time.monotonic()) if expires_at is not None else None
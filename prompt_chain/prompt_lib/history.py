@@ -0,0 +1,289 @@
+import logging
+import threading
+import zlib
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import func, insert, select
+
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.db_manager import DatabaseManager
+from prompt_chain.prompt_lib.exceptions import DatabaseManagerException
+from prompt_chain.prompt_lib.metrics import Metrics
+from prompt_chain.prompt_lib.models import ExecutionRecord, StepRecord, TimelinePhase
+from prompt_chain.prompt_lib.tables import ExecutionTable, StepExecutionTable
+
+LOGGER = logging.getLogger(__name__)
+
+TRUNCATION_MARKER = b"...[truncated]"
+
+
+class ExecutionHistory:
+    """
+    Records chain executions and their steps with write-behind bulk inserts.
+
+    Recording an execution only appends it to an in-memory buffer. A background thread
+    flushes the buffer in a single transaction every `flush_interval` seconds, or as soon
+    as it holds `flush_size` executions, so the request path never waits on a commit.
+    If the database falls behind and the buffer reaches `max_buffer_size`, the oldest
+    executions are dropped rather than growing memory without bound.
+
+    Payloads are stored as JSON, cut to `max_payload_bytes` and optionally compressed
+    with zlib. Truncated payloads are returned as strings when read back.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        flush_interval: float = 1.0,
+        flush_size: int = 100,
+        max_buffer_size: int = 10000,
+        max_payload_bytes: int | None = 16384,
+        compress: bool = False,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.db_manager = db_manager
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_buffer_size = max_buffer_size
+        self.max_payload_bytes = max_payload_bytes
+        self.compress = compress
+        self.metrics = metrics or Metrics()
+        self._buffer: list[ExecutionRecord] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def record(self, execution: ExecutionRecord) -> None:
+        """
+        Buffer an execution to be written by the next flush.
+
+        Args:
+            execution (ExecutionRecord): The finished execution, including its steps.
+        """
+        with self._lock:
+            self._buffer.append(execution)
+            if len(self._buffer) > self.max_buffer_size:
+                del self._buffer[0]
+                self.metrics.increment("history.dropped")
+            if len(self._buffer) >= self.flush_size:
+                self._wake.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="history-flush", daemon=True)
+                self._thread.start()
+
+    def flush(self) -> int:
+        """
+        Write all buffered executions to the database in one transaction.
+
+        Returns:
+            int: The number of executions written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                executions, self._buffer = self._buffer, []
+            if not executions:
+                return 0
+            execution_rows = [self._execution_row(execution) for execution in executions]
+            step_rows = [
+                self._step_row(execution.id, step)
+                for execution in executions
+                for step in execution.steps
+            ]
+            try:
+                with self.db_manager.session_scope() as session:
+                    session.execute(insert(ExecutionTable), execution_rows)
+                    if step_rows:
+                        session.execute(insert(StepExecutionTable), step_rows)
+            except DatabaseManagerException as e:
+                LOGGER.error(f"Failed to write {len(executions)} execution(s): {str(e)}")
+                self.metrics.increment("history.dropped", len(executions))
+                return 0
+            self.metrics.increment("history.written", len(executions))
+            return len(executions)
+
+    def get_recent_executions(self, chain_name: str, limit: int = 20) -> list[ExecutionRecord]:
+        """
+        Get the most recent recorded executions of a chain, newest first.
+
+        Executions still waiting in the buffer are not included.
+
+        Args:
+            chain_name (str): The name of the chain.
+            limit (int): The maximum number of executions to return.
+
+        Returns:
+            list[ExecutionRecord]: The executions, including their steps.
+        """
+        with self.db_manager.session_scope() as session:
+            executions = session.scalars(
+                select(ExecutionTable)
+                .where(ExecutionTable.chain_name == chain_name)
+                .order_by(ExecutionTable.started_at.desc())
+                .limit(limit)
+            ).all()
+            steps = session.scalars(
+                select(StepExecutionTable)
+                .where(StepExecutionTable.execution_id.in_([e.id for e in executions]))
+                .order_by(StepExecutionTable.execution_id, StepExecutionTable.step_index)
+            ).all()
+            steps_by_execution: dict[str, list[StepRecord]] = {}
+            for step in steps:
+                steps_by_execution.setdefault(step.execution_id, []).append(
+                    self.convert_step_to_dict(step)
+                )
+            return [
+                self.convert_to_dict(execution, steps_by_execution.get(execution.id, []))
+                for execution in executions
+            ]
+
+    def get_busiest_chains(self, limit: int, since: datetime | None = None) -> list[str]:
+        """
+        Get the chains with the most recorded executions, busiest first.
+
+        Args:
+            limit (int): The maximum number of chains to return.
+            since (datetime | None): Only count executions started at or after this time.
+
+        Returns:
+            list[str]: The chain names.
+        """
+        executions = func.count(ExecutionTable.id)
+        query = select(ExecutionTable.chain_name).group_by(ExecutionTable.chain_name)
+        if since is not None:
+            query = query.where(ExecutionTable.started_at >= since)
+        with self.db_manager.session_scope() as session:
+            return list(
+                session.scalars(
+                    query.order_by(executions.desc(), ExecutionTable.chain_name).limit(limit)
+                ).all()
+            )
+
+    def get_execution(self, execution_id: str) -> ExecutionRecord | None:
+        """
+        Get a recorded execution by its id, including one still waiting in the buffer.
+
+        Args:
+            execution_id (str): The id of the execution.
+
+        Returns:
+            ExecutionRecord | None: The execution, including its steps, or None if it was not
+                recorded.
+        """
+        with self._lock:
+            for execution in self._buffer:
+                if execution.id == execution_id:
+                    return execution
+        with self.db_manager.session_scope() as session:
+            row = session.get(ExecutionTable, execution_id)
+            if row is None:
+                return None
+            steps = session.scalars(
+                select(StepExecutionTable)
+                .where(StepExecutionTable.execution_id == execution_id)
+                .order_by(StepExecutionTable.step_index)
+            ).all()
+            return self.convert_to_dict(row, [self.convert_step_to_dict(step) for step in steps])
+
+    def close(self) -> None:
+        """Stop the flush thread and write any buffered executions."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _execution_row(self, execution: ExecutionRecord) -> dict[str, Any]:
+        return {
+            "id": execution.id,
+            "chain_name": execution.chain_name,
+            "status": execution.status,
+            "input": self._encode(execution.input),
+            "output": self._encode(execution.output),
+            "error": execution.error,
+            "compressed": self.compress,
+            "latency_ms": execution.latency_ms,
+            "prompt_tokens": execution.prompt_tokens,
+            "completion_tokens": execution.completion_tokens,
+            "cost_usd": execution.cost_usd,
+            "tenant_id": execution.tenant_id,
+            "priority": execution.priority,
+            "started_at": datetime.fromisoformat(execution.started_at),
+        }
+
+    def _step_row(self, execution_id: str, step: StepRecord) -> dict[str, Any]:
+        return {
+            "execution_id": execution_id,
+            "step_index": step.step_index,
+            "model_name": step.model_name,
+            "input": self._encode(step.input),
+            "output": self._encode(step.output),
+            "error": step.error,
+            "compressed": self.compress,
+            "latency_ms": step.latency_ms,
+            "prompt_tokens": step.prompt_tokens,
+            "completion_tokens": step.completion_tokens,
+            "cost_usd": step.cost_usd,
+            "timeline": [asdict(phase) for phase in step.timeline] or None,
+        }
+
+    def _encode(self, payload: Any) -> bytes | None:
+        if payload is None:
+            return None
+        data = codec.dumps_bytes(payload)
+        if self.max_payload_bytes is not None and len(data) > self.max_payload_bytes:
+            data = data[: self.max_payload_bytes] + TRUNCATION_MARKER
+        return zlib.compress(data) if self.compress else data
+
+    @staticmethod
+    def _decode(data: bytes | None, compressed: bool) -> Any:
+        if data is None:
+            return None
+        if compressed:
+            data = zlib.decompress(data)
+        if data.endswith(TRUNCATION_MARKER):
+            return data.decode("utf-8", errors="ignore")
+        return codec.loads(data)
+
+    @classmethod
+    def convert_to_dict(cls, execution: ExecutionTable, steps: list[StepRecord]) -> ExecutionRecord:
+        return ExecutionRecord(
+            id=execution.id,
+            chain_name=execution.chain_name,
+            started_at=execution.started_at.isoformat(),
+            input=cls._decode(execution.input, execution.compressed),
+            status=execution.status,
+            output=cls._decode(execution.output, execution.compressed),
+            error=execution.error,
+            latency_ms=execution.latency_ms,
+            prompt_tokens=execution.prompt_tokens,
+            completion_tokens=execution.completion_tokens,
+            cost_usd=execution.cost_usd,
+            tenant_id=execution.tenant_id,
+            priority=execution.priority,
+            steps=steps,
+        )
+
+    @classmethod
+    def convert_step_to_dict(cls, step: StepExecutionTable) -> StepRecord:
+        return StepRecord(
+            step_index=step.step_index,
+            model_name=step.model_name,
+            input=cls._decode(step.input, step.compressed),
+            output=cls._decode(step.output, step.compressed),
+            error=step.error,
+            latency_ms=step.latency_ms,
+            prompt_tokens=step.prompt_tokens,
+            completion_tokens=step.completion_tokens,
+            cost_usd=step.cost_usd,
+            timeline=[TimelinePhase(**phase) for phase in step.timeline or []],
+        )
@@ -0,0 +1,310 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Protocol
+
+from sqlalchemy import delete, select, update
+
+from prompt_chain.prompt_lib.db_manager import DatabaseManager
+from prompt_chain.prompt_lib.exceptions import (
+    DatabaseManagerException,
+    IdempotencyKeyInProgressException,
+    IdempotencyKeyMismatchException,
+)
+from prompt_chain.prompt_lib.metrics import Metrics
+from prompt_chain.prompt_lib.models import IdempotencyRecord
+from prompt_chain.prompt_lib.tables import IdempotencyKeyTable
+
+LOGGER = logging.getLogger(__name__)
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+# A handler's result: the HTTP status code and the JSON body of its response.
+Response = tuple[int, Any]
+
+# Client errors that a retry of the same request would get again: an unknown chain or
+# model, or invalid input. Other errors, such as a rejected budget or an invalid model
+# response, may not recur, so their requests run again when retried.
+STORED_CLIENT_ERRORS = frozenset({404, 422})
+
+
+def fingerprint(endpoint: str, body: Any) -> str:
+    """Hash an endpoint and request body, so a key cannot be reused for another request."""
+    payload = json.dumps([endpoint, body], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore(Protocol):
+    """
+    Stores the state of idempotency keys.
+
+    A key is claimed while its request is in progress and holds the response once it has
+    completed. In-progress claims expire after `lock_timeout` seconds, so a key is not
+    stuck if the process running its request dies, and completed responses after `ttl`.
+    """
+
+    def claim(self, key: str, fingerprint: str) -> IdempotencyRecord | None:
+        """
+        Claim a key for a new request.
+
+        Returns:
+            IdempotencyRecord | None: None if the key was claimed, or the unexpired record
+                of the request that already holds it.
+        """
+        ...
+
+    def complete(self, key: str, status_code: int, response: Any) -> None:
+        """Store the response of a claimed key, keeping it for the retention window."""
+        ...
+
+    def release(self, key: str) -> None:
+        """Release a claimed key without a response, so the request can be retried."""
+        ...
+
+
+class InMemoryIdempotencyStore:
+    """Keeps idempotency keys in memory. Keys are only shared within a single process."""
+
+    def __init__(self, ttl: float = 86400, lock_timeout: float = 600) -> None:
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self._records: dict[str, IdempotencyRecord] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key: str, fingerprint: str) -> IdempotencyRecord | None:
+        now = time.time()
+        with self._lock:
+            existing = self._records.get(key)
+            if existing is not None and existing.expires_at > now:
+                return existing
+            self._prune(now)
+            self._records[key] = IdempotencyRecord(
+                key=key,
+                fingerprint=fingerprint,
+                status=IN_PROGRESS,
+                expires_at=now + self.lock_timeout,
+            )
+            return None
+
+    def complete(self, key: str, status_code: int, response: Any) -> None:
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                return
+            record.status = COMPLETED
+            record.status_code = status_code
+            record.response = response
+            record.expires_at = time.time() + self.ttl
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._records.pop(key, None)
+
+    def _prune(self, now: float) -> None:
+        expired = [key for key, record in self._records.items() if record.expires_at <= now]
+        for key in expired:
+            del self._records[key]
+
+
+class DatabaseIdempotencyStore:
+    """
+    Keeps idempotency keys in the database, so they are shared by every API process.
+
+    A key is claimed by inserting its row; the primary key makes sure only one request
+    can hold it at a time.
+    """
+
+    def __init__(
+        self, db_manager: DatabaseManager, ttl: float = 86400, lock_timeout: float = 600
+    ) -> None:
+        self.db_manager = db_manager
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+
+    def claim(self, key: str, fingerprint: str) -> IdempotencyRecord | None:
+        now = time.time()
+        with self.db_manager.session_scope() as session:
+            session.execute(
+                delete(IdempotencyKeyTable).where(IdempotencyKeyTable.expires_at <= now)
+            )
+            row = session.get(IdempotencyKeyTable, key)
+            if row is not None:
+                return self.convert_to_dict(row)
+        try:
+            with self.db_manager.session_scope() as session:
+                session.add(
+                    IdempotencyKeyTable(
+                        key=key,
+                        fingerprint=fingerprint,
+                        status=IN_PROGRESS,
+                        expires_at=now + self.lock_timeout,
+                    )
+                )
+            return None
+        except DatabaseManagerException:
+            # Another request claimed the key between the lookup and the insert.
+            existing = self.get(key)
+            if existing is None:
+                raise
+            return existing
+
+    def get(self, key: str) -> IdempotencyRecord | None:
+        with self.db_manager.session_scope() as session:
+            row = session.scalar(select(IdempotencyKeyTable).where(IdempotencyKeyTable.key == key))
+            return self.convert_to_dict(row) if row else None
+
+    def complete(self, key: str, status_code: int, response: Any) -> None:
+        with self.db_manager.session_scope() as session:
+            session.execute(
+                update(IdempotencyKeyTable)
+                .where(IdempotencyKeyTable.key == key)
+                .values(
+                    status=COMPLETED,
+                    status_code=status_code,
+                    response=response,
+                    expires_at=time.time() + self.ttl,
+                )
+            )
+
+    def release(self, key: str) -> None:
+        with self.db_manager.session_scope() as session:
+            session.execute(delete(IdempotencyKeyTable).where(IdempotencyKeyTable.key == key))
+
+    @staticmethod
+    def convert_to_dict(row: IdempotencyKeyTable) -> IdempotencyRecord:
+        return IdempotencyRecord(
+            key=row.key,
+            fingerprint=row.fingerprint,
+            status=row.status,
+            expires_at=row.expires_at,
+            status_code=row.status_code,
+            response=row.response,
+        )
+
+
+class IdempotencyManager:
+    """
+    Runs a request at most once per idempotency key.
+
+    A duplicate of a request still in progress in this process attaches to it and gets
+    the same response; a duplicate of one in progress in another process polls the store
+    until it completes. A duplicate of a completed request gets the stored response
+    without running it again. Only successful responses and deterministic client errors
+    (`STORED_CLIENT_ERRORS`) are stored, so a request that failed on anything else, such
+    as a server error, timeout or budget rejection, runs again when retried.
+    """
+
+    def __init__(
+        self,
+        store: IdempotencyStore,
+        wait_timeout: float = 120,
+        poll_interval: float = 0.25,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.store = store
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.metrics = metrics or Metrics()
+        self._in_flight: dict[str, tuple[str, Future[Response]]] = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: str, fingerprint: str, handler: Callable[[], Response]) -> Response:
+        """
+        Run a request unless a request with the same idempotency key already ran.
+
+        Args:
+            key (str): The idempotency key sent by the client.
+            fingerprint (str): The fingerprint of the request, see `fingerprint`.
+            handler (Callable[[], Response]): Runs the request and returns its status code
+                and response body.
+
+        Returns:
+            Response: The status code and response body, either fresh or stored.
+
+        Raises:
+            IdempotencyKeyMismatchException: If the key was used for a different request.
+            IdempotencyKeyInProgressException: If the request holding the key did not
+                complete within `wait_timeout`.
+        """
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                future: Future[Response] = Future()
+                self._in_flight[key] = (fingerprint, future)
+        if in_flight is not None:
+            return self._attach(key, fingerprint, *in_flight)
+
+        try:
+            response = self._run_once(key, fingerprint, handler)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def _attach(
+        self, key: str, fingerprint: str, running_fingerprint: str, future: Future[Response]
+    ) -> Response:
+        if fingerprint != running_fingerprint:
+            raise IdempotencyKeyMismatchException(
+                f"Idempotency key {key} was already used for a different request"
+            )
+        self.metrics.increment("idempotency.attached")
+        try:
+            return future.result(timeout=self.wait_timeout)
+        except FutureTimeoutError:
+            raise IdempotencyKeyInProgressException(
+                f"Request with idempotency key {key} is still in progress"
+            )
+
+    def _run_once(self, key: str, fingerprint: str, handler: Callable[[], Response]) -> Response:
+        expires_at = time.monotonic() + self.wait_timeout
+        while True:
+            existing = self.store.claim(key, fingerprint)
+            if existing is None:
+                return self._run_claimed(key, handler)
+            if existing.fingerprint != fingerprint:
+                raise IdempotencyKeyMismatchException(
+                    f"Idempotency key {key} was already used for a different request"
+                )
+            if existing.status == COMPLETED:
+                self.metrics.increment("idempotency.replayed")
+                return existing.status_code or 200, existing.response
+            if time.monotonic() >= expires_at:
+                raise IdempotencyKeyInProgressException(
+                    f"Request with idempotency key {key} is still in progress"
+                )
+            time.sleep(self.poll_interval)
+
+    def _run_claimed(self, key: str, handler: Callable[[], Response]) -> Response:
+        try:
+            status_code, body = handler()
+        except BaseException:
+            self._release(key)
+            raise
+        if not (200 <= status_code < 300 or status_code in STORED_CLIENT_ERRORS):
+            self._release(key)
+            return status_code, body
+        try:
+            self.store.complete(key, status_code, body)
+        except DatabaseManagerException as e:
+            # The request succeeded, so its response is returned even if it is not stored.
+            LOGGER.error(f"Failed to store response for idempotency key {key}: {str(e)}")
+            self._release(key)
+        return status_code, body
+
+    def _release(self, key: str) -> None:
+        try:
+            self.store.release(key)
+        except DatabaseManagerException as e:
+            LOGGER.error(f"Failed to release idempotency key {key}: {str(e)}")
@@ -0,0 +1,45 @@
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """
+    A thread-safe registry of counters and gauges, exposed by the API on /metrics.
+
+    Metrics are identified by a name and optional labels, rendered in the Prometheus
+    style, e.g. `hedging.hedges_sent{model=crime_detector}`.
+    """
+
+    def __init__(self) -> None:
+        self._counters: defaultdict[str, float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = self.key(name, labels)
+        with self._lock:
+            self._counters[key] += value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        key = self.key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def counter(self, name: str, **labels: str) -> float:
+        with self._lock:
+            return self._counters.get(self.key(name, labels), 0.0)
+
+    def gauge(self, name: str, **labels: str) -> float | None:
+        with self._lock:
+            return self._gauges.get(self.key(name, labels))
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {"counters": dict(self._counters), "gauges": dict(self._gauges)}
+
+    @staticmethod
+    def key(name: str, labels: dict[str, str]) -> str:
+        if not labels:
+            return name
+        rendered = ",".join(f"{label}={value}" for label, value in sorted(labels.items()))
+        return f"{name}{{{rendered}}}"
@@ -0,0 +1,27 @@
+from typing import Protocol
+
+from prompt_chain.prompt_lib.models import ChainConfig, PromptModel
+
+
+class ModelSource(Protocol):
+    """
+    Where prompt models and chain configs are read from when chains are executed.
+
+    Implemented by `DatabaseManager`, and by `FileCatalog` for catalogs kept as files.
+    """
+
+    def get_prompt_model(self, model_name: str, version: str | None = None) -> PromptModel | None:
+        """Get a prompt model at its current version, or at the version with the given hash."""
+        ...
+
+    def get_all_models(self) -> list[str]:
+        """Get the names of every prompt model."""
+        ...
+
+    def get_chain_config(self, name: str) -> ChainConfig | None:
+        """Get a chain config by name."""
+        ...
+
+    def get_all_chain_configs(self) -> list[str]:
+        """Get the names of every chain config."""
+        ...
@@ -1,28 +1,7 @@
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Any
+from dataclasses import dataclass, field
+from typing import Any, Literal
 
 from pydantic import BaseModel, Field, create_model
-from sqlalchemy import JSON, DateTime, Integer, String
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy.sql import func
-
-
-class Base(DeclarativeBase):
-    pass
-
-
-class PromptModelTable(Base):
-    __tablename__ = "prompt_models"
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    name: Mapped[str] = mapped_column(String, unique=True, index=True)
-    system_prompt: Mapped[str] = mapped_column(String)
-    user_prompt: Mapped[dict[str, Any]] = mapped_column(JSON)
-    response: Mapped[dict[str, Any]] = mapped_column(JSON)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
-    updated_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
-    )
 
 
 @dataclass
@@ -34,11 +13,18 @@ class PromptModel:
     response: dict[str, Any]
     created_at: str
     updated_at: str
+    # Equivalent provider models to serve the prompt model with, in order of preference.
+    backends: list[str] = field(default_factory=list)
+    # The version number, and the hash of the content that identifies the version.
+    version: int | None = None
+    hash: str | None = None
 
 
 class OpenAIRequest(BaseModel):
     name: str
     user_input: dict[str, Any]
+    tenant_id: str | None = None
+    priority: str | None = None
 
 
 class ChainExecutionRequest(BaseModel):
@@ -46,6 +32,65 @@ class ChainExecutionRequest(BaseModel):
     initial_input: dict[str, Any] = Field(
         ..., description="The initial input data to be provided to the chain"
     )
+    deadline_seconds: float | None = Field(
+        None,
+        gt=0,
+        description="The end-to-end time budget for the execution. Defaults to CHAIN_DEADLINE_SECONDS.",
+    )
+    tenant_id: str | None = Field(
+        None,
+        description="The tenant the LLM calls are scheduled fairly against. Defaults to the chain name.",
+    )
+    priority: str | None = Field(
+        None,
+        description="The priority class of the LLM calls. Defaults to SCHEDULER_DEFAULT_PRIORITY.",
+    )
+
+
+class CompactionConfig(BaseModel):
+    exclude: list[str] = Field(
+        default_factory=list,
+        description="Input fields, by dotted path, that are validated but not sent to the model",
+    )
+    max_field_tokens: dict[str, int] = Field(
+        default_factory=dict,
+        description="Token limits for string input fields by dotted path, with '[]' for list items",
+    )
+    truncation: Literal["head", "middle"] = Field(
+        "head",
+        description="Keep the start of truncated fields, or their start and end",
+    )
+
+
+class ChunkingConfig(BaseModel):
+    input_field: str = Field(
+        ..., description="The string input field to split into chunks when it is too long"
+    )
+    chunk_tokens: int = Field(..., gt=0, description="The most tokens of the field in a chunk")
+    overlap_tokens: int = Field(
+        0, ge=0, description="How many tokens each chunk repeats from the end of the previous one"
+    )
+    max_parallel: int | None = Field(
+        None,
+        gt=0,
+        description="The most chunks run at once. Defaults to CHUNK_MAX_PARALLEL",
+    )
+    reducers: dict[
+        str,
+        Literal[
+            "concat", "unique", "sum", "mean", "min", "max", "any", "all", "first", "last", "vote"
+        ],
+    ] = Field(
+        default_factory=dict,
+        description="How each response field of the chunks is merged. Defaults to concat for strings and lists, any for bools and first otherwise",
+    )
+    reduce_model: str | None = Field(
+        None,
+        description="A model that merges the outputs of the chunks instead of the reducers, given them as a list in reduce_field",
+    )
+    reduce_field: str = Field(
+        "outputs", description="The input field of the reduce model that takes the chunk outputs"
+    )
 
 
 class ChainStep(BaseModel):
@@ -56,6 +101,41 @@ class ChainStep(BaseModel):
         ...,
         description="A mapping of this step's input fields to data sources. Can reference 'initial_input' or outputs from previous steps.",
     )
+    timeout_seconds: float | None = Field(
+        None,
+        gt=0,
+        description="The maximum time for this step's LLM call, capped by the chain's remaining deadline",
+    )
+    model_version: str | None = Field(
+        None,
+        description="The hash of the model version this step runs. Pinned to the model's current version when the chain is created",
+    )
+    max_repair_attempts: int | None = Field(
+        None,
+        ge=0,
+        description="How many times an invalid response is sent back to the model to be fixed. Defaults to REPAIR_MAX_ATTEMPTS",
+    )
+    max_retries: int | None = Field(
+        None,
+        ge=0,
+        description="How many times a failed LLM call is retried on another of the model's backends. Defaults to STEP_MAX_RETRIES",
+    )
+    max_tokens: int | None = Field(
+        None,
+        gt=0,
+        description="The completion token limit for this step. Estimated from the model's response schema if not set",
+    )
+    response_length_hints: dict[str, int] = Field(
+        default_factory=dict,
+        description="Expected sizes of response fields by dotted path, in tokens for strings and items for lists, used to estimate max_tokens",
+    )
+    compaction: CompactionConfig | None = Field(
+        None, description="How to shrink this step's input before it is sent to the model"
+    )
+    chunking: ChunkingConfig | None = Field(
+        None,
+        description="How to split a long input field into chunks that are run in parallel and merged",
+    )
 
 
 class ChainConfig(BaseModel):
@@ -67,17 +147,78 @@ class ChainConfig(BaseModel):
         ...,
         description="A mapping that defines how to construct the final output of the chain from the results of its steps",
     )
+    token_budget: int | None = Field(
+        None,
+        gt=0,
+        description="The maximum number of prompt and completion tokens an execution may use",
+    )
+    cost_budget: float | None = Field(
+        None,
+        gt=0,
+        description="The maximum cost in USD an execution may incur, priced per backend with MODEL_PRICES",
+    )
 
 
-class ChainConfigTable(Base):
-    __tablename__ = "chain_configs"
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    name: Mapped[str] = mapped_column(String, unique=True, index=True)
-    config: Mapped[dict[str, Any]] = mapped_column(JSON)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
-    updated_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
-    )
+@dataclass
+class WorkItem:
+    id: int
+    chain_name: str
+    initial_input: dict[str, Any]
+    status: str
+    worker_id: str | None
+    attempts: int
+    result: dict[str, Any] | None
+    error: str | None
+
+
+@dataclass
+class IdempotencyRecord:
+    key: str
+    fingerprint: str
+    status: str
+    expires_at: float
+    status_code: int | None = None
+    response: Any = None
+
+
+@dataclass
+class TimelinePhase:
+    # What the step was doing, e.g. "provider_call", and when, in ms from the execution start.
+    phase: str
+    start_ms: float
+    duration_ms: float
+
+
+@dataclass
+class StepRecord:
+    step_index: int
+    model_name: str
+    input: Any
+    output: Any = None
+    error: str | None = None
+    latency_ms: float = 0.0
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    cost_usd: float | None = None
+    timeline: list[TimelinePhase] = field(default_factory=list)
+
+
+@dataclass
+class ExecutionRecord:
+    id: str
+    chain_name: str
+    started_at: str
+    input: Any
+    status: str = "running"
+    output: Any = None
+    error: str | None = None
+    latency_ms: float = 0.0
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    cost_usd: float | None = None
+    tenant_id: str | None = None
+    priority: str | None = None
+    steps: list[StepRecord] = field(default_factory=list)
 
 
 class DynamicModel(BaseModel):
@@ -139,8 +280,24 @@ class DynamicModel(BaseModel):
             raise ValueError(f"Unsupported primitive type: {field_type}")
 
 
+class ModelUpdate(BaseModel):
+    name: str = Field(..., description="The name of the model to update")
+    system_prompt: str | None = Field(None, description="The new system prompt, if it changes")
+    user_prompt_schema: dict[str, Any] | None = Field(
+        None, description="The new schema for user prompts, if it changes"
+    )
+    response_schema: dict[str, Any] | None = Field(
+        None, description="The new schema for model responses, if it changes"
+    )
+    backends: list[str] | None = Field(None, description="The new backends, if they change")
+
+
 class ModelInput(BaseModel):
     name: str = Field(..., description="The name of the model")
     system_prompt: str = Field(..., description="The system prompt for the model")
     user_prompt_schema: dict[str, Any] = Field(..., description="The schema for user prompts")
     response_schema: dict[str, Any] = Field(..., description="The schema for model responses")
+    backends: list[str] = Field(
+        default_factory=list,
+        description="Equivalent provider models to serve this model with, in order of preference. Defaults to gpt-3.5-turbo",
+    )
@@ -0,0 +1,155 @@
+import time
+from typing import Any
+
+import requests
+
+from prompt_chain.config import OPENAI_API_URL
+from prompt_chain.prompt_lib.concurrency import AIMDLimiter
+from prompt_chain.prompt_lib.deadline import Deadline
+from prompt_chain.prompt_lib.endpoint_pool import EndpointPool
+from prompt_chain.prompt_lib.router import BackendRouter
+from prompt_chain.prompt_lib.scheduler import FairScheduler
+from prompt_chain.prompt_lib.web_client import WebClient
+
+# Provider responses that mean it is overloaded, and fewer concurrent calls should be made.
+OVERLOAD_STATUS_CODES = {429, 503}
+
+
+class ProviderClient:
+    """
+    Sends chat completion requests to the LLM provider.
+
+    Every provider call made by the chain executor and the API goes through this client,
+    so that calls from all chains and tenants share one scheduler. If a limiter is given,
+    the outcome of every call is reported to it and the scheduler's capacity follows its
+    limit. If an endpoint pool is given, calls are spread across its endpoints and
+    credentials instead of going to `url` with `api_key`. If a router is given, the
+    latency and outcome of every call is recorded against the backend, i.e. the model,
+    it was sent to.
+    """
+
+    def __init__(
+        self,
+        web_client: WebClient,
+        api_key: str | None,
+        url: str = OPENAI_API_URL,
+        scheduler: FairScheduler | None = None,
+        limiter: AIMDLimiter | None = None,
+        pool: EndpointPool | None = None,
+        router: BackendRouter | None = None,
+    ) -> None:
+        self.web_client = web_client
+        self.api_key = api_key
+        self.url = url
+        self.scheduler = scheduler
+        self.limiter = limiter
+        self.pool = pool
+        self.router = router
+        self._sync_capacity()
+
+    def chat(
+        self,
+        data: dict[str, Any],
+        timeout: float | None = None,
+        flow: str = "default",
+        priority: str | None = None,
+    ) -> dict[str, Any]:
+        """
+        Send a chat completion request, waiting for a scheduler slot first if there is one.
+
+        Args:
+            data (dict[str, Any]): The request body, with the model and messages.
+            timeout (float | None): The longest to wait for a slot and the response in total.
+            flow (str): The flow to schedule the call under, e.g. a tenant id or chain name.
+            priority (str | None): The priority class of the call, or None for the default.
+
+        Returns:
+            dict[str, Any]: The provider's response.
+
+        Raises:
+            ValueError: If the priority is not a configured class.
+            TimeoutError: If no scheduler slot or endpoint was free within the timeout, or
+                the timeout ran out waiting for one.
+            requests.RequestException: If the request fails.
+        """
+        if self.scheduler is None:
+            return self._send(data, timeout)
+        deadline = Deadline(timeout)
+        with self.scheduler.slot(flow, priority, timeout):
+            # The time spent waiting for the slot counts against the timeout.
+            return self._send(data, deadline.timeout(action="sending the request"))
+
+    def _send(self, data: dict[str, Any], timeout: float | None) -> dict[str, Any]:
+        if self.router is None:
+            return self._send_to_endpoint(data, timeout)
+        backend = data["model"]
+        start = time.monotonic()
+        try:
+            response = self._send_to_endpoint(data, timeout)
+        except Exception as e:
+            self.router.record(backend, None, success=not is_provider_failure(e))
+            raise
+        self.router.record(backend, time.monotonic() - start, success=True)
+        return response
+
+    def _send_to_endpoint(self, data: dict[str, Any], timeout: float | None) -> dict[str, Any]:
+        if self.pool is None:
+            return self._post(self.url, self.api_key, data, timeout)
+        deadline = Deadline(timeout)
+        endpoint = self.pool.acquire(timeout)
+        try:
+            response = self._post(
+                endpoint.url, endpoint.api_key, data, deadline.timeout(action="sending the request")
+            )
+        except Exception as e:
+            self.pool.release(
+                endpoint, success=not is_provider_failure(e), rate_limited=_status(e) == 429
+            )
+            raise
+        self.pool.release(endpoint, success=True)
+        return response
+
+    def _post(
+        self, url: str, api_key: str | None, data: dict[str, Any], timeout: float | None
+    ) -> dict[str, Any]:
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+        if self.limiter is None:
+            return self.web_client.post(url, headers=headers, json=data, timeout=timeout)
+
+        epoch = self.limiter.epoch
+        start = time.monotonic()
+        try:
+            response = self.web_client.post(url, headers=headers, json=data, timeout=timeout)
+        except requests.HTTPError as e:
+            if _status(e) in OVERLOAD_STATUS_CODES:
+                self.limiter.on_overload(epoch, "rate_limited")
+                self._sync_capacity()
+            raise
+        except requests.Timeout:
+            self.limiter.on_overload(epoch, "timeout")
+            self._sync_capacity()
+            raise
+        self.limiter.on_success(time.monotonic() - start, epoch)
+        self._sync_capacity()
+        return response
+
+    def _sync_capacity(self) -> None:
+        if self.scheduler and self.limiter and self.scheduler.capacity != self.limiter.limit:
+            self.scheduler.capacity = self.limiter.limit
+
+
+def _status(error: Exception) -> int | None:
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code
+    return None
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """Whether an error means the provider is unhealthy, rather than the request invalid."""
+    status = _status(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, (requests.RequestException, ValueError))
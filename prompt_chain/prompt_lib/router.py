@@ -0,0 +1,99 @@
+import threading
+import time
+from dataclasses import dataclass
+
+from prompt_chain.prompt_lib.metrics import Metrics
+
+
+@dataclass
+class BackendStats:
+    """Smoothed latency and error rate of a backend."""
+
+    latency: float | None = None
+    error_rate: float = 0.0
+    failed_at: float = 0.0
+
+
+class BackendRouter:
+    """
+    Orders a model's equivalent backends by how fast and healthy they currently are.
+
+    The router keeps an exponentially weighted moving average of the latency and error
+    rate of every backend. Healthy backends are ranked fastest first, and a backend that
+    has not been called yet ranks ahead of them, so each one is tried once and gets a
+    latency to compare. A backend whose error rate reaches `max_error_rate` ranks after
+    all healthy ones until `cooldown_seconds` have passed since its last failure, when it
+    is ranked on its latency again so that a single call can probe whether it recovered.
+    Ties keep the order the backends were declared in.
+    """
+
+    def __init__(
+        self,
+        smoothing: float = 0.2,
+        max_error_rate: float = 0.5,
+        cooldown_seconds: float = 30.0,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.smoothing = smoothing
+        self.max_error_rate = max_error_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.metrics = metrics or Metrics()
+        self._stats: dict[str, BackendStats] = {}
+        self._lock = threading.Lock()
+
+    def stats(self, backend: str) -> BackendStats:
+        """A copy of a backend's current statistics."""
+        with self._lock:
+            stats = self._stats.get(backend, BackendStats())
+            return BackendStats(stats.latency, stats.error_rate, stats.failed_at)
+
+    def rank(self, backends: list[str]) -> list[str]:
+        """
+        Order backends from the one to call first to the one to call last.
+
+        Args:
+            backends (list[str]): The equivalent backends, in their declared order.
+
+        Returns:
+            list[str]: The same backends, healthy ones first and fastest first.
+        """
+        now = time.monotonic()
+        with self._lock:
+
+            def key(backend: str) -> tuple[bool, float]:
+                stats = self._stats.get(backend, BackendStats())
+                return (not self._healthy(stats, now), stats.latency or 0.0)
+
+            return sorted(dict.fromkeys(backends), key=key)
+
+    def record(self, backend: str, latency: float | None, success: bool) -> None:
+        """
+        Record the outcome of a call to a backend.
+
+        Args:
+            backend (str): The backend that was called.
+            latency (float | None): How long the call took in seconds, or None if it did
+                not complete.
+            success (bool): Whether the backend handled the call. Errors caused by the
+                request itself, such as a 400, should count as a success.
+        """
+        with self._lock:
+            stats = self._stats.setdefault(backend, BackendStats())
+            if latency is not None:
+                stats.latency = _smooth(stats.latency, latency, self.smoothing)
+            stats.error_rate = _smooth(stats.error_rate, 0.0 if success else 1.0, self.smoothing)
+            if not success:
+                stats.failed_at = time.monotonic()
+            self.metrics.increment("router.calls", backend=backend)
+            if stats.latency is not None:
+                self.metrics.set_gauge("router.latency_ms", stats.latency * 1000, backend=backend)
+            self.metrics.set_gauge("router.error_rate", stats.error_rate, backend=backend)
+
+    def _healthy(self, stats: BackendStats, now: float) -> bool:
+        return (
+            stats.error_rate < self.max_error_rate or now - stats.failed_at >= self.cooldown_seconds
+        )
+
+
+def _smooth(average: float | None, value: float, weight: float) -> float:
+    return value if average is None else weight * value + (1 - weight) * average
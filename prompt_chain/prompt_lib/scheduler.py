@@ -0,0 +1,170 @@
+import heapq
+import itertools
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from prompt_chain.prompt_lib.metrics import Metrics
+
+
+@dataclass(order=True)
+class _Waiter:
+    start_tag: float
+    sequence: int
+    flow: str = field(compare=False)
+    ready: threading.Event = field(compare=False, default_factory=threading.Event)
+    cancelled: bool = field(compare=False, default=False)
+
+
+class FairScheduler:
+    """
+    Orders provider calls across priority classes and, within a class, across flows.
+
+    At most `capacity` calls run at once. When a slot frees up it goes to the class with
+    waiting calls that has the fewest calls in flight for its share, so each class gets at
+    least its share of the capacity under contention, while a class can use any capacity
+    the others leave idle.
+
+    Within a class, calls are ordered by start-time fair queuing over flows, e.g. tenants
+    or chains: each call of a flow is tagged `1 / weight` after the previous one, so a
+    flow that sends a large batch only gets its weighted turn instead of starving the
+    other flows queued behind it.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 16,
+        class_shares: dict[str, float] | None = None,
+        flow_weights: dict[str, float] | None = None,
+        default_priority: str = "interactive",
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.class_shares = class_shares or {"interactive": 3.0, "batch": 1.0}
+        if default_priority not in self.class_shares:
+            raise ValueError(f"Unknown default priority class: {default_priority}")
+        self.flow_weights = flow_weights or {}
+        self.default_priority = default_priority
+        self.metrics = metrics or Metrics()
+        self._capacity = capacity
+        self._in_flight = dict.fromkeys(self.class_shares, 0)
+        self._queues: dict[str, list[_Waiter]] = {name: [] for name in self.class_shares}
+        self._virtual_time = dict.fromkeys(self.class_shares, 0.0)
+        self._last_tag: dict[str, dict[str, float]] = {name: {} for name in self.class_shares}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @capacity.setter
+    def capacity(self, capacity: int) -> None:
+        """Change the number of concurrent calls, starting queued calls if it grew."""
+        with self._lock:
+            self._capacity = capacity
+            self._dispatch()
+
+    def priority_class(self, priority: str | None) -> str:
+        """
+        Resolve a requested priority to a priority class.
+
+        Raises:
+            ValueError: If the priority is not a configured class.
+        """
+        if priority is None:
+            return self.default_priority
+        if priority not in self.class_shares:
+            raise ValueError(
+                f"Unknown priority class: {priority}. "
+                f"Expected one of: {', '.join(self.class_shares)}"
+            )
+        return priority
+
+    @contextmanager
+    def slot(
+        self, flow: str, priority: str | None = None, timeout: float | None = None
+    ) -> Iterator[None]:
+        """
+        Hold a call slot for the duration of the block.
+
+        Args:
+            flow (str): The flow the call belongs to, e.g. a tenant id or chain name.
+            priority (str | None): The priority class, or None for the default class.
+            timeout (float | None): The longest to wait for a slot.
+
+        Raises:
+            ValueError: If the priority is not a configured class.
+            TimeoutError: If no slot was free within the timeout.
+        """
+        priority_class = self.priority_class(priority)
+        self.acquire(flow, priority_class, timeout)
+        try:
+            yield
+        finally:
+            self.release(priority_class)
+
+    def acquire(self, flow: str, priority_class: str, timeout: float | None = None) -> None:
+        start = time.monotonic()
+        with self._lock:
+            waiter = self._enqueue(flow, priority_class)
+            self._dispatch()
+            self._update_gauges(priority_class)
+        if not waiter.ready.wait(timeout):
+            with self._lock:
+                # The slot may have been handed over just as the wait ran out.
+                if not waiter.ready.is_set():
+                    waiter.cancelled = True
+                    self._update_gauges(priority_class)
+                    raise TimeoutError(f"Timed out waiting for a provider call slot for {flow}")
+        self.metrics.increment("scheduler.calls", priority=priority_class)
+        self.metrics.increment(
+            "scheduler.wait_ms", (time.monotonic() - start) * 1000, priority=priority_class
+        )
+
+    def release(self, priority_class: str) -> None:
+        with self._lock:
+            self._in_flight[priority_class] -= 1
+            self._dispatch()
+            self._update_gauges(priority_class)
+
+    def _enqueue(self, flow: str, priority_class: str) -> _Waiter:
+        last_tags = self._last_tag[priority_class]
+        start_tag = max(self._virtual_time[priority_class], last_tags.get(flow, 0.0))
+        last_tags[flow] = start_tag + 1.0 / self.flow_weights.get(flow, 1.0)
+        waiter = _Waiter(start_tag, next(self._sequence), flow)
+        heapq.heappush(self._queues[priority_class], waiter)
+        return waiter
+
+    def _dispatch(self) -> None:
+        while sum(self._in_flight.values()) < self._capacity:
+            candidates = [
+                name for name, queue in self._queues.items() if self._drop_cancelled(queue)
+            ]
+            if not candidates:
+                return
+            priority_class = min(
+                candidates, key=lambda name: self._in_flight[name] / self.class_shares[name]
+            )
+            waiter = heapq.heappop(self._queues[priority_class])
+            self._virtual_time[priority_class] = waiter.start_tag
+            if not self._queues[priority_class]:
+                # Flows idle from here on should not keep credit or debt from the past.
+                self._last_tag[priority_class].clear()
+            self._in_flight[priority_class] += 1
+            waiter.ready.set()
+            self._update_gauges(priority_class)
+
+    @staticmethod
+    def _drop_cancelled(queue: list[_Waiter]) -> bool:
+        while queue and queue[0].cancelled:
+            heapq.heappop(queue)
+        return bool(queue)
+
+    def _update_gauges(self, priority_class: str) -> None:
+        queued = sum(not waiter.cancelled for waiter in self._queues[priority_class])
+        self.metrics.set_gauge(
+            "scheduler.in_flight", self._in_flight[priority_class], priority=priority_class
+        )
+        self.metrics.set_gauge("scheduler.queue_depth", queued, priority=priority_class)
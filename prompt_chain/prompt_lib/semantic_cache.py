@@ -0,0 +1,297 @@
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict, deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - depends on the installed extras
+    numpy = None  # type: ignore[assignment, unused-ignore]
+
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.metrics import Metrics
+from prompt_chain.prompt_lib.models import PromptModel
+
+WORD_PATTERN = re.compile(r"\w+")
+# Strings with fewer words than this must match exactly for a cache hit.
+FUZZY_MIN_WORDS = 20
+
+# A sparse embedding: the weight of each dimension that is not zero.
+Embedding = dict[int, float]
+
+
+def embed(text: str, dimensions: int = 1024, ngram: int = 3) -> Embedding:
+    """
+    Embed a text as a normalized vector of hashed word n-gram counts.
+
+    Texts that share most of their word n-grams, such as an article and a lightly edited
+    copy of it, get a cosine similarity close to 1, while unrelated texts on the same
+    topic share few n-grams and stay far apart. Each n-gram is hashed to a dimension and
+    a sign, so collisions tend to cancel out rather than add up.
+
+    Args:
+        text (str): The text.
+        dimensions (int): The size of the vector.
+        ngram (int): The number of words in each n-gram.
+
+    Returns:
+        Embedding: The non-zero dimensions of the unit-length vector.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if not words:
+        return {}
+    shingles = Counter(
+        " ".join(words[i : i + ngram]) for i in range(max(1, len(words) - ngram + 1))
+    )
+    vector: Embedding = {}
+    for shingle, count in shingles.items():
+        digest = zlib.crc32(shingle.encode("utf-8"))
+        index = digest % dimensions
+        vector[index] = vector.get(index, 0.0) + (count if digest & 0x80000000 else -count)
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {index: weight / norm for index, weight in vector.items() if weight} if norm else {}
+
+
+def split_input(data: Any) -> tuple[str, str]:
+    """
+    Split a step input into the part matched by similarity and the part matched exactly.
+
+    Returns:
+        tuple[str, str]: The long strings of the input joined together, and a hash of the
+            rest of the input with the long strings left out.
+    """
+    texts: list[str] = []
+
+    def exact(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {key: exact(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [exact(item) for item in value]
+        if isinstance(value, str) and len(WORD_PATTERN.findall(value)) >= FUZZY_MIN_WORDS:
+            texts.append(value)
+            return None
+        return value
+
+    rest = codec.dumps(exact(data))
+    return "\n".join(texts), hashlib.sha256(rest.encode("utf-8")).hexdigest()
+
+
+class VectorIndex(Protocol):
+    def add(self, vector: Embedding, value: Any) -> None: ...
+
+    def search(self, vector: Embedding) -> tuple[float, Any] | None: ...
+
+    def __len__(self) -> int: ...
+
+
+class NumpyIndex:
+    """A fixed-size ring of dense vectors, searched with a single matrix product."""
+
+    def __init__(self, capacity: int, dimensions: int) -> None:
+        if numpy is None:
+            raise ImportError("numpy is not installed, install prompt-chain[semantic] to use it")
+        self._vectors = numpy.zeros((capacity, dimensions), dtype=numpy.float32)
+        self._values: list[Any] = [None] * capacity
+        self._count = 0
+        self._next = 0
+
+    def add(self, vector: Embedding, value: Any) -> None:
+        row = self._vectors[self._next]
+        row[:] = 0
+        if vector:
+            row[list(vector)] = list(vector.values())
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._values)
+        self._count = min(self._count + 1, len(self._values))
+
+    def search(self, vector: Embedding) -> tuple[float, Any] | None:
+        if not self._count or not vector:
+            return None
+        indices = list(vector)
+        scores = self._vectors[: self._count, indices] @ numpy.array(
+            list(vector.values()), dtype=numpy.float32
+        )
+        best = int(scores.argmax())
+        return float(scores[best]), self._values[best]
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class PythonIndex:
+    """A fixed-size queue of sparse vectors, searched one by one. Used without numpy."""
+
+    def __init__(self, capacity: int, dimensions: int) -> None:
+        self._entries: deque[tuple[Embedding, Any]] = deque(maxlen=capacity)
+
+    def add(self, vector: Embedding, value: Any) -> None:
+        self._entries.append((vector, value))
+
+    def search(self, vector: Embedding) -> tuple[float, Any] | None:
+        best: tuple[float, Any] | None = None
+        for entry, value in self._entries:
+            score = sum(weight * entry.get(index, 0.0) for index, weight in vector.items())
+            if best is None or score > best[0]:
+                best = (score, value)
+        return best
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@dataclass
+class CacheEntry:
+    output: dict[str, Any]
+    expires_at: float
+
+
+@dataclass
+class CacheLookup:
+    """The result of looking up a step input: a cached output, or where to store one."""
+
+    output: dict[str, Any] | None
+    similarity: float
+    audit: bool
+    namespace: tuple[str, str]
+    vector: Embedding
+
+
+class SemanticCache:
+    """
+    Caches step outputs by the similarity of their inputs, to skip near-duplicate calls.
+
+    A step input is split into its long strings, which are embedded with `embed`, and
+    the rest, which must match exactly. A cached output is served when an input of the
+    same model version with the same exact part has long strings at least as similar as
+    the model's threshold. Each model version keeps its own index of at most
+    `max_entries` entries, dropping the oldest first. Inputs without long strings are
+    matched exactly, as a hit of similarity 1, in a separate map of at most `max_entries`
+    entries.
+
+    A share `audit_rate` of the hits is audited: the caller makes the call anyway, and
+    reports the fresh output with `audit`, which counts a false hit when it is not
+    similar to the cached one. Hits, misses, audits and false hits are counted per model
+    in the metrics, as `semantic_cache.*`.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        thresholds: dict[str, float] | None = None,
+        max_entries: int = 1000,
+        ttl_seconds: float | None = 3600.0,
+        dimensions: int = 1024,
+        audit_rate: float = 0.01,
+        metrics: Metrics | None = None,
+        index_factory: Callable[[int, int], VectorIndex] | None = None,
+    ) -> None:
+        self.threshold = threshold
+        self.thresholds = thresholds or {}
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.dimensions = dimensions
+        self.audit_rate = audit_rate
+        self.metrics = metrics or Metrics()
+        self.index_factory = index_factory or (NumpyIndex if numpy is not None else PythonIndex)
+        self._indexes: dict[tuple[str, str], VectorIndex] = {}
+        self._exact: OrderedDict[tuple[str, str], CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def threshold_for(self, model_name: str) -> float:
+        """The similarity threshold of a model. One above 1 disables caching for it."""
+        return self.thresholds.get(model_name, self.threshold)
+
+    def lookup(self, model: PromptModel, input_data: dict[str, Any]) -> CacheLookup | None:
+        """
+        Look up the cached output for a step input.
+
+        Args:
+            model (PromptModel): The step's model version.
+            input_data (dict[str, Any]): The input the model would be sent.
+
+        Returns:
+            CacheLookup | None: The lookup, with the cached output on a hit, or None if
+                caching is disabled for the model.
+        """
+        threshold = self.threshold_for(model.name)
+        if threshold > 1:
+            return None
+        text, exact_key = split_input(input_data)
+        namespace = (f"{model.name}@{_model_version(model)}", exact_key)
+        vector = embed(text, self.dimensions)
+        with self._lock:
+            if vector:
+                index = self._indexes.get(namespace)
+                found = index.search(vector) if index is not None else None
+            else:
+                exact = self._exact.get(namespace)
+                found = (1.0, exact) if exact is not None else None
+        score, entry = found if found is not None else (0.0, None)
+        if entry is not None and score >= threshold and entry.expires_at > time.monotonic():
+            audit = random.random() < self.audit_rate
+            self.metrics.increment(
+                "semantic_cache.audits" if audit else "semantic_cache.hits", model=model.name
+            )
+            return CacheLookup(entry.output, score, audit, namespace, vector)
+        self.metrics.increment("semantic_cache.misses", model=model.name)
+        return CacheLookup(None, score, False, namespace, vector)
+
+    def store(self, model: PromptModel, lookup: CacheLookup, output: dict[str, Any]) -> None:
+        """Cache the output of a step whose lookup missed."""
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else math.inf
+        entry = CacheEntry(output, expires_at)
+        with self._lock:
+            if lookup.vector:
+                index = self._indexes.get(lookup.namespace)
+                if index is None:
+                    index = self._indexes[lookup.namespace] = self.index_factory(
+                        self.max_entries, self.dimensions
+                    )
+                index.add(lookup.vector, entry)
+            else:
+                self._exact[lookup.namespace] = entry
+                self._exact.move_to_end(lookup.namespace)
+                while len(self._exact) > self.max_entries:
+                    self._exact.popitem(last=False)
+            entries = sum(
+                len(entries)
+                for namespace, entries in self._indexes.items()
+                if namespace[0] == lookup.namespace[0]
+            ) + sum(1 for namespace in self._exact if namespace[0] == lookup.namespace[0])
+        self.metrics.set_gauge("semantic_cache.entries", entries, model=model.name)
+
+    def audit(self, model: PromptModel, lookup: CacheLookup, output: dict[str, Any]) -> bool:
+        """
+        Compare a fresh output with the cached output of an audited hit.
+
+        Returns:
+            bool: Whether the hit was false, i.e. the outputs are not similar.
+        """
+        cached_text, cached_key = split_input(lookup.output)
+        text, key = split_input(output)
+        similarity = _similarity(embed(cached_text, self.dimensions), embed(text, self.dimensions))
+        false_hit = key != cached_key or similarity < self.threshold_for(model.name)
+        if false_hit:
+            self.metrics.increment("semantic_cache.false_hits", model=model.name)
+        return false_hit
+
+
+def _similarity(a: Embedding, b: Embedding) -> float:
+    if not a and not b:
+        return 1.0
+    return sum(weight * b.get(index, 0.0) for index, weight in a.items())
+
+
+def _model_version(model: PromptModel) -> str:
+    """The hash of a model version, or of its prompt and schemas if it has none."""
+    if model.hash:
+        return model.hash
+    content = codec.dumps([model.system_prompt, model.user_prompt, model.response])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
@@ -0,0 +1,60 @@
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from prompt_chain.prompt_lib.models import TimelinePhase
+
+# The phases a step's time is broken down into, in the order they run.
+PHASES = (
+    "model_lookup",
+    "mapping",
+    "validator_build",
+    "input_validation",
+    "compaction",
+    "cache_lookup",
+    "provider_call",
+    "parsing",
+    "output_validation",
+    "reduce",
+)
+
+
+class Timeline:
+    """
+    Times the phases of a chain execution's step, such as the provider call or parsing.
+
+    Each phase is appended to `phases`, usually the step record's timeline, with its start
+    relative to `origin`, the start of the execution on the performance counter. Phases of
+    a step's chunks and hedged calls run at once, so they may overlap.
+    """
+
+    def __init__(self, phases: list[TimelinePhase] | None = None, origin: float | None = None):
+        self.phases = phases if phases is not None else []
+        self.origin = origin if origin is not None else time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the body of the `with` statement as a phase, whether it raises or not."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            start_ms, duration_ms = (
+                (start - self.origin) * 1000,
+                (time.perf_counter() - start) * 1000,
+            )
+            self.phases.append(TimelinePhase(name, round(start_ms, 3), round(duration_ms, 3)))
+
+
+def phase_totals(phases: list[TimelinePhase]) -> dict[str, float]:
+    """
+    Add up the time spent in each phase.
+
+    Returns:
+        dict[str, float]: The total milliseconds of each phase that ran, in `PHASES` order.
+    """
+    totals: dict[str, float] = {}
+    order = {name: index for index, name in enumerate(PHASES)}
+    for phase in sorted(phases, key=lambda phase: order.get(phase.phase, len(order))):
+        totals[phase.phase] = totals.get(phase.phase, 0.0) + phase.duration_ms
+    return totals
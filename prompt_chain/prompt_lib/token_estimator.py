@@ -0,0 +1,119 @@
+import math
+import re
+from typing import Any
+
+# Roughly how BPE tokenizers split text: runs of letters, runs of digits, and single
+# punctuation characters. Long words are split further, at about 6 characters a token.
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+|\d+|\S")
+CHARS_PER_TOKEN = 6
+DIGITS_PER_TOKEN = 3
+# Chat formatting adds a few tokens around every message and before the reply.
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+# Completion tokens assumed for a value of each primitive type, including its separator.
+PRIMITIVE_TOKENS = {"int": 4, "float": 6, "bool": 2}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text without a tokenizer.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The estimated token count, which tends to slightly overestimate for English
+            prose and JSON.
+    """
+    return sum(token_count(match.group()) for match in TOKEN_PATTERN.finditer(text))
+
+
+def token_count(piece: str) -> int:
+    """Estimate the tokens of a single piece of text matched by TOKEN_PATTERN."""
+    if len(piece) <= DIGITS_PER_TOKEN:
+        return 1
+    if piece.isdigit():
+        return math.ceil(len(piece) / DIGITS_PER_TOKEN)
+    return math.ceil(len(piece) / CHARS_PER_TOKEN)
+
+
+def estimate_prompt_tokens(messages: list[dict[str, str]]) -> int:
+    """
+    Estimate the number of prompt tokens of a chat completion request.
+
+    Args:
+        messages (list[dict[str, str]]): The messages, each with a role and content.
+
+    Returns:
+        int: The estimated prompt token count.
+    """
+    return TOKENS_PER_REPLY + estimate_message_tokens(messages)
+
+
+def estimate_message_tokens(messages: list[dict[str, str]]) -> int:
+    """Estimate the tokens taken by messages, without the tokens that prime the reply."""
+    return sum(TOKENS_PER_MESSAGE + estimate_tokens(message["content"]) for message in messages)
+
+
+def estimate_completion_tokens(
+    schema: dict[str, Any],
+    length_hints: dict[str, int] | None = None,
+    default_str_tokens: int = 128,
+    default_list_length: int = 8,
+    margin: float = 0.25,
+) -> int:
+    """
+    Estimate the largest number of completion tokens a JSON response to a schema needs.
+
+    Keys, quotes and punctuation are counted exactly from the schema. Strings and "any"
+    values are assumed to take `default_str_tokens`, and lists `default_list_length`
+    items, unless a length hint is given for the field.
+
+    Args:
+        schema (dict[str, Any]): The response schema, in the format expected by DynamicModel.
+        length_hints (dict[str, int] | None): Per-field hints keyed by dotted field path,
+            e.g. "address.street", with "[]" for list items, e.g. "tags[]". For strings
+            and "any" values the hint is a number of tokens, for lists a number of items.
+        default_str_tokens (int): The tokens assumed for a string without a hint.
+        default_list_length (int): The items assumed for a list without a hint.
+        margin (float): The safety margin added on top of the estimate, as a fraction.
+
+    Returns:
+        int: The completion token ceiling.
+    """
+    estimator = _CompletionEstimator(length_hints or {}, default_str_tokens, default_list_length)
+    return math.ceil(estimator.estimate(schema, "") * (1 + margin)) + TOKENS_PER_REPLY
+
+
+class _CompletionEstimator:
+    def __init__(
+        self, length_hints: dict[str, int], default_str_tokens: int, default_list_length: int
+    ) -> None:
+        self.length_hints = length_hints
+        self.default_str_tokens = default_str_tokens
+        self.default_list_length = default_list_length
+
+    def estimate(self, field_type: Any, path: str) -> int:
+        if isinstance(field_type, dict):
+            # Braces, plus the quoted key, colon and comma of every field.
+            return 2 + sum(
+                estimate_tokens(name) + 3 + self.estimate(value, _join(path, name))
+                for name, value in field_type.items()
+            )
+        if isinstance(field_type, list):
+            length = self.length_hints.get(path, self.default_list_length)
+            item_tokens = self.estimate(field_type[0], f"{path}[]") if field_type else 1
+            return 2 + length * (item_tokens + 1)
+        if isinstance(field_type, tuple):
+            return 2 + sum(
+                self.estimate(item, _join(path, str(i))) + 1 for i, item in enumerate(field_type)
+            )
+        if field_type in PRIMITIVE_TOKENS:
+            return PRIMITIVE_TOKENS[field_type]
+        # Strings and "any" values, with their quotes.
+        return self.length_hints.get(path, self.default_str_tokens) + 2
+
+
+def _join(path: str, name: str) -> str:
+    return f"{path}.{name}" if path else name
@@ -0,0 +1,226 @@
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from prompt_chain.prompt_lib.chunking import REDUCER_TYPES
+from prompt_chain.prompt_lib.exceptions import ChainTypeException
+from prompt_chain.prompt_lib.models import ChainConfig, ChunkingConfig, PromptModel
+
+# Coercions that always succeed in lax mode, from a source type to the targets accepting it.
+WIDENINGS = {"int": {"float"}, "bool": {"int", "float"}}
+
+
+@dataclass
+class ChainSignature:
+    """The inferred schemas of what a chain takes and returns, in the DynamicModel format."""
+
+    input_schema: dict[str, Any] = field(default_factory=dict)
+    output_schema: dict[str, Any] = field(default_factory=dict)
+
+
+def check_chain(
+    chain_config: ChainConfig, get_model: Callable[[str, str | None], PromptModel | None]
+) -> ChainSignature:
+    """
+    Check that every step of a chain gets the input its model expects, without running it.
+
+    The chain is walked step by step, resolving every `input_mapping` source to the
+    type declared by the response schema of the step it comes from, and checking it
+    against the field of the step's user prompt schema it is mapped to. A source is
+    compatible if every value it can hold validates against the target, so an int may
+    feed a float field, but a str may not feed an int field even though a numeric string
+    would validate. Sources from `initial_input` take the type of the fields they feed,
+    which makes up the chain's inferred input schema. The chunking settings of a step are
+    checked against its model, its reducers and its reduce model.
+
+    Args:
+        chain_config (ChainConfig): The chain to check.
+        get_model (Callable[[str, str | None], PromptModel | None]): Looks up a model by
+            name and version hash, e.g. `DatabaseManager.get_prompt_model`.
+
+    Returns:
+        ChainSignature: The inferred input and output schemas of the chain.
+
+    Raises:
+        ChainTypeException: With every error found, if any step would get invalid input.
+    """
+    errors: list[str] = []
+    signature = ChainSignature()
+    step_outputs: list[dict[str, Any] | None] = []
+    for i, step in enumerate(chain_config.steps):
+        model = get_model(step.name, step.model_version)
+        if model is None:
+            errors.append(f"Step {i}: model {step.name} not found")
+            step_outputs.append(None)
+            continue
+        for name in model.user_prompt:
+            if name not in step.input_mapping:
+                errors.append(f"Step {i} ({step.name}): required input {name} is not mapped")
+        for name, source in step.input_mapping.items():
+            if name not in model.user_prompt:
+                continue
+            target = model.user_prompt[name]
+            where = f"Step {i} ({step.name}) input {name}"
+            source_type = _resolve(
+                source, target, signature.input_schema, step_outputs, where, errors
+            )
+            if source_type is not None:
+                for error in _incompatibilities(source_type, target, name):
+                    errors.append(f"{where}: {source} {error}")
+        if step.chunking is not None:
+            errors.extend(
+                f"Step {i} ({step.name}) chunking: {error}"
+                for error in _chunking_errors(step.chunking, model, get_model)
+            )
+        step_outputs.append(model.response)
+
+    for name, source in chain_config.final_output_mapping.items():
+        where = f"Final output {name}"
+        source_type = _resolve(source, "any", signature.input_schema, step_outputs, where, errors)
+        signature.output_schema[name] = "any" if source_type is None else source_type
+
+    if errors:
+        raise ChainTypeException(
+            f"Chain {chain_config.name} has {len(errors)} type error(s)", errors
+        )
+    return signature
+
+
+def _chunking_errors(
+    config: ChunkingConfig,
+    model: PromptModel,
+    get_model: Callable[[str, str | None], PromptModel | None],
+) -> list[str]:
+    """Check that a step's input can be chunked and its outputs merged."""
+    errors = []
+    field_type = model.user_prompt.get(config.input_field)
+    if field_type is None:
+        errors.append(f"{config.input_field} is not an input of {model.name}")
+    elif field_type not in ("str", "any"):
+        errors.append(f"{config.input_field} is {_describe(field_type)}, only str can be chunked")
+    if config.overlap_tokens >= config.chunk_tokens:
+        errors.append("overlap_tokens must be less than chunk_tokens")
+    for name, reducer in config.reducers.items():
+        if name not in model.response:
+            errors.append(f"{name} is not in the response of {model.name}")
+            continue
+        kind = "list" if isinstance(model.response[name], list) else model.response[name]
+        if reducer in REDUCER_TYPES and kind not in REDUCER_TYPES[reducer] | {"any"}:
+            errors.append(f"{reducer} cannot merge {name}, which is {_describe(kind)}")
+
+    if config.reduce_model is None:
+        return errors
+    reduce_model = get_model(config.reduce_model, None)
+    if reduce_model is None:
+        errors.append(f"reduce model {config.reduce_model} not found")
+        return errors
+    for name in reduce_model.user_prompt:
+        if name != config.reduce_field:
+            errors.append(f"reduce model input {name} is not mapped")
+    if config.reduce_field not in reduce_model.user_prompt:
+        errors.append(f"{config.reduce_field} is not an input of {reduce_model.name}")
+    else:
+        target = reduce_model.user_prompt[config.reduce_field]
+        errors.extend(
+            f"the chunk outputs {error}"
+            for error in _incompatibilities([model.response], target, config.reduce_field)
+        )
+    for name, field_type in model.response.items():
+        if name not in reduce_model.response:
+            errors.append(f"{reduce_model.name} does not return {name}")
+        else:
+            errors.extend(
+                f"the reduced {name} {error}"
+                for error in _incompatibilities(reduce_model.response[name], field_type, name)
+            )
+    return errors
+
+
+def _resolve(
+    source: str,
+    target: Any,
+    input_schema: dict[str, Any],
+    step_outputs: list[dict[str, Any] | None],
+    where: str,
+    errors: list[str],
+) -> Any:
+    """The type of a mapping source, or None if it is unknown or an error was recorded."""
+    prefix, _, key = source.partition(".")
+    if not key:
+        errors.append(f"{where}: invalid mapping {source}")
+        return None
+    if prefix == "initial_input":
+        if key not in input_schema or input_schema[key] == "any":
+            input_schema[key] = target
+        return input_schema[key]
+
+    if prefix == "previous_step":
+        index = len(step_outputs) - 1
+    elif prefix.startswith("step_") and prefix[5:].isdigit():
+        index = int(prefix[5:])
+    else:
+        errors.append(f"{where}: invalid mapping {source}")
+        return None
+    if not 0 <= index < len(step_outputs):
+        errors.append(f"{where}: {source} refers to a step that has not run yet")
+        return None
+    response = step_outputs[index]
+    if response is None:
+        return None
+    if key not in response:
+        errors.append(f"{where}: {source} is not in the response of step {index}")
+        return None
+    return response[key]
+
+
+def _incompatibilities(source: Any, target: Any, path: str) -> list[str]:
+    """Describe why values of the source type may not validate against the target type."""
+    if target == "any" or source == "any":
+        return []
+    if isinstance(target, str):
+        if source == target or (isinstance(source, str) and target in WIDENINGS.get(source, ())):
+            return []
+        return [f"is {_describe(source)}, but {path} expects {target}"]
+    if isinstance(target, dict):
+        if not isinstance(source, dict):
+            return [f"is {_describe(source)}, but {path} expects an object"]
+        problems = []
+        for name, field_type in target.items():
+            if name not in source:
+                problems.append(f"has no field {path}.{name}")
+            else:
+                problems.extend(_incompatibilities(source[name], field_type, f"{path}.{name}"))
+        return problems
+    if isinstance(target, list):
+        if isinstance(source, tuple):
+            items = list(source)
+        elif isinstance(source, list):
+            # An empty list schema holds any items.
+            items = source[:1]
+        else:
+            return [f"is {_describe(source)}, but {path} expects a list"]
+        item_target = target[0] if target else "any"
+        return [
+            problem
+            for item in items
+            for problem in _incompatibilities(item, item_target, f"{path}[]")
+        ]
+    if isinstance(target, tuple):
+        if not isinstance(source, tuple) or len(source) != len(target):
+            return [f"is {_describe(source)}, but {path} expects a tuple of {len(target)}"]
+        return [
+            problem
+            for i, (item, item_target) in enumerate(zip(source, target))
+            for problem in _incompatibilities(item, item_target, f"{path}[{i}]")
+        ]
+    return []
+
+
+def _describe(field_type: Any) -> str:
+    if isinstance(field_type, str):
+        return field_type
+    if isinstance(field_type, dict):
+        return "an object"
+    if isinstance(field_type, tuple):
+        return f"a tuple of {len(field_type)}"
+    return "a list"
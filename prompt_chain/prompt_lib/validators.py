@@ -0,0 +1,107 @@
+import json
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+from prompt_chain.config import VALIDATION_ENGINE
+from prompt_chain.prompt_lib.fast_validators import compile_fast_validator
+from prompt_chain.prompt_lib.models import DynamicModel
+
+Validator = Callable[[dict[str, Any]], dict[str, Any]]
+
+
+class ValidatorCache:
+    """
+    An LRU cache of compiled schema validators.
+
+    Building a pydantic model from a schema is far more expensive than validating data
+    with it, so validators are compiled once per distinct schema and reused.
+    """
+
+    def __init__(self, max_size: int = 1024, engine: str = "pydantic") -> None:
+        self.max_size = max_size
+        self.engine = engine
+        self._validators: OrderedDict[tuple[str, str], Validator] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, schema: dict[str, Any], model_name: str = "DynamicModel") -> Validator:
+        """
+        Get the validator for a schema, compiling it on first use.
+
+        Args:
+            schema (dict[str, Any]): The schema, in the format expected by DynamicModel.
+            model_name (str): The name given to the generated model.
+
+        Returns:
+            Validator: A function validating a dict against the schema and returning the
+                validated data. Raises a ValueError if validation fails.
+        """
+        key = (schema_key(schema), model_name)
+        with self._lock:
+            validator = self._validators.get(key)
+            if validator is not None:
+                self._validators.move_to_end(key)
+                return validator
+
+        validator = compile_validator(schema, model_name, engine=self.engine)
+        with self._lock:
+            self._validators[key] = validator
+            if len(self._validators) > self.max_size:
+                self._validators.popitem(last=False)
+        return validator
+
+    def __len__(self) -> int:
+        return len(self._validators)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._validators.clear()
+
+
+def compile_validator(
+    schema: dict[str, Any], model_name: str = "DynamicModel", engine: str = "pydantic"
+) -> Validator:
+    """
+    Compile a validator for a schema with the given engine.
+
+    Args:
+        schema (dict[str, Any]): The schema, in the format expected by DynamicModel.
+        model_name (str): The name given to the generated model.
+        engine (str): "pydantic" to validate with a DynamicModel, or "fast" to validate
+            with plain functions compiled from the schema. Both return the same results.
+
+    Returns:
+        Validator: The validation function.
+
+    Raises:
+        ValueError: If the engine is unknown or the schema uses an unsupported type.
+    """
+    if engine == "fast":
+        return compile_fast_validator(schema, model_name)
+    if engine != "pydantic":
+        raise ValueError(f"Unknown validation engine: {engine}")
+    model = DynamicModel.create_from_schema(schema, model_name=model_name)
+
+    def validate(data: dict[str, Any]) -> dict[str, Any]:
+        return model.model_validate(data).model_dump()
+
+    return validate
+
+
+def schema_key(schema: Any) -> str:
+    """Build a canonical key for a schema, keeping tuples distinct from lists."""
+    return json.dumps(_tag_tuples(schema), sort_keys=True)
+
+
+def _tag_tuples(schema: Any) -> Any:
+    if isinstance(schema, dict):
+        return {key: _tag_tuples(value) for key, value in schema.items()}
+    if isinstance(schema, list):
+        return [_tag_tuples(item) for item in schema]
+    if isinstance(schema, tuple):
+        return {"__tuple__": [_tag_tuples(item) for item in schema]}
+    return schema
+
+
+validator_cache = ValidatorCache(engine=VALIDATION_ENGINE)
@@ -4,16 +4,22 @@ from typing import Any
 
 import requests
 
+from prompt_chain.prompt_lib import codec
+
 logger: Logger = getLogger(__name__)
 
 
 class WebClient:
-    def __init__(self, timeout: int = 120):
+    def __init__(self, timeout: float = 120):
         self.client: requests.Session = requests.Session()
-        self._timeout: int = timeout
+        self._timeout: float = timeout
 
     def post(
-        self, url: str, headers: Mapping[str, str], json: dict[str, Any] | None = None
+        self,
+        url: str,
+        headers: Mapping[str, str],
+        json: dict[str, Any] | None = None,
+        timeout: float | None = None,
     ) -> dict[str, Any] | Any:
         """
         Make a POST request to the specified URL.
@@ -22,23 +28,43 @@ class WebClient:
             url (str): The URL to send the POST request to.
             headers (Mapping[str, str]): The headers to include in the request.
             json (dict | None, optional): The JSON payload to send with the request. Defaults to None.
+            timeout (float | None, optional): The timeout for this request. Defaults to the
+                client's timeout.
 
         Returns:
             dict[str, Any]: The JSON response from the server.
 
         Raises:
             requests.RequestException: If an error occurs during the request.
+            ValueError: If the response body is not valid JSON.
         """
         try:
             response: requests.Response = self.client.post(
-                url, headers=headers, json=json, timeout=self._timeout
+                url,
+                headers={"Content-Type": "application/json", **headers},
+                data=codec.dumps_bytes(json) if json is not None else None,
+                timeout=timeout if timeout is not None else self._timeout,
             )
             response.raise_for_status()
-            return response.json()
+            return codec.loads(response.content)
         except requests.RequestException as e:
             logger.error(f"An error occurred: {e}")
             raise
 
+    def warm_up(self, url: str, timeout: float | None = None) -> None:
+        """
+        Open a pooled connection to the given URL ahead of the first real request.
+
+        Args:
+            url (str): A URL on the host to connect to. Any HTTP response is accepted.
+            timeout (float | None, optional): The timeout for the request. Defaults to the
+                client's timeout.
+        """
+        try:
+            self.client.head(url, timeout=timeout if timeout is not None else self._timeout)
+        except requests.RequestException as e:
+            logger.warning(f"Failed to warm up connection to {url}: {e}")
+
     def close(self) -> None:
         """Close the client session."""
         self.client.close()
@@ -0,0 +1,200 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from prompt_chain.prompt_lib.db_manager import DatabaseManager
+from prompt_chain.prompt_lib.models import WorkItem
+from prompt_chain.prompt_lib.tables import WorkItemTable
+
+LOGGER = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Dialects that support ``SELECT ... FOR UPDATE SKIP LOCKED``.
+SKIP_LOCKED_DIALECTS = {"postgresql", "mysql", "oracle"}
+
+
+class WorkQueue:
+    """
+    A database-backed queue of chain executions shared by any number of workers.
+
+    Workers claim pending items with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+    database supports it, so concurrent claims never block on each other. On SQLite the
+    claim falls back to a compare-and-set update on the item's status.
+
+    A claimed item is leased to its worker for as long as the worker keeps sending
+    heartbeats. Items whose heartbeat is older than the lease timeout are reclaimed and
+    handed to another worker, up to ``max_attempts`` claims in total.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, max_attempts: int = 3) -> None:
+        self.db_manager = db_manager
+        self.max_attempts = max_attempts
+        self._skip_locked = db_manager.engine.dialect.name in SKIP_LOCKED_DIALECTS
+
+    def enqueue(self, chain_name: str, initial_input: dict[str, Any]) -> int:
+        with self.db_manager.session_scope() as session:
+            item = WorkItemTable(chain_name=chain_name, initial_input=initial_input, status=PENDING)
+            session.add(item)
+            session.flush()
+            return item.id
+
+    def get(self, item_id: int) -> WorkItem | None:
+        with self.db_manager.session_scope() as session:
+            item = session.get(WorkItemTable, item_id)
+            return self.convert_to_dict(item) if item else None
+
+    def claim(self, worker_id: str) -> WorkItem | None:
+        """
+        Claim the oldest pending work item for the given worker.
+
+        Args:
+            worker_id (str): Identifier of the worker claiming the item.
+
+        Returns:
+            WorkItem | None: The claimed item, or None if the queue is empty.
+        """
+        with self.db_manager.session_scope() as session:
+            if self._skip_locked:
+                return self._claim_skip_locked(session, worker_id)
+            return self._claim_compare_and_set(session, worker_id)
+
+    def _claim_skip_locked(self, session: Session, worker_id: str) -> WorkItem | None:
+        item = session.scalars(
+            select(WorkItemTable)
+            .where(WorkItemTable.status == PENDING)
+            .order_by(WorkItemTable.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if item is None:
+            return None
+        item.status = RUNNING
+        item.worker_id = worker_id
+        item.attempts += 1
+        item.heartbeat_at = _now()
+        session.flush()
+        return self.convert_to_dict(item)
+
+    def _claim_compare_and_set(self, session: Session, worker_id: str) -> WorkItem | None:
+        while True:
+            item_id = session.scalars(
+                select(WorkItemTable.id)
+                .where(WorkItemTable.status == PENDING)
+                .order_by(WorkItemTable.id)
+                .limit(1)
+            ).first()
+            if item_id is None:
+                return None
+            claimed = session.execute(
+                update(WorkItemTable)
+                .where(WorkItemTable.id == item_id, WorkItemTable.status == PENDING)
+                .values(
+                    status=RUNNING,
+                    worker_id=worker_id,
+                    attempts=WorkItemTable.attempts + 1,
+                    heartbeat_at=_now(),
+                )
+            )
+            if claimed.rowcount == 1:  # type: ignore[attr-defined]
+                item = session.get(WorkItemTable, item_id, populate_existing=True)
+                return self.convert_to_dict(item) if item else None
+            LOGGER.debug(f"Work item {item_id} was claimed by another worker, retrying")
+
+    def heartbeat(self, item_id: int, worker_id: str) -> bool:
+        """
+        Extend the lease on a running work item.
+
+        Returns:
+            bool: False if the worker no longer owns the item, e.g. because it was reclaimed.
+        """
+        with self.db_manager.session_scope() as session:
+            result = session.execute(
+                update(WorkItemTable)
+                .where(
+                    WorkItemTable.id == item_id,
+                    WorkItemTable.worker_id == worker_id,
+                    WorkItemTable.status == RUNNING,
+                )
+                .values(heartbeat_at=_now())
+            )
+            return bool(result.rowcount == 1)  # type: ignore[attr-defined]
+
+    def complete(self, item_id: int, worker_id: str, result: dict[str, Any]) -> bool:
+        return self._finish(item_id, worker_id, status=COMPLETED, result=result)
+
+    def fail(self, item_id: int, worker_id: str, error: str) -> bool:
+        return self._finish(item_id, worker_id, status=FAILED, error=error)
+
+    def _finish(self, item_id: int, worker_id: str, **values: Any) -> bool:
+        with self.db_manager.session_scope() as session:
+            result = session.execute(
+                update(WorkItemTable)
+                .where(
+                    WorkItemTable.id == item_id,
+                    WorkItemTable.worker_id == worker_id,
+                    WorkItemTable.status == RUNNING,
+                )
+                .values(**values)
+            )
+            finished = bool(result.rowcount == 1)  # type: ignore[attr-defined]
+        if not finished:
+            LOGGER.warning(f"Worker {worker_id} no longer owns work item {item_id}")
+        return finished
+
+    def reclaim_expired(self, lease_timeout: float) -> int:
+        """
+        Return running items whose worker stopped heartbeating to the queue.
+
+        Items that have already been claimed ``max_attempts`` times are marked as failed
+        instead, so a poison item cannot take down workers forever.
+
+        Args:
+            lease_timeout (float): Seconds without a heartbeat after which a lease expires.
+
+        Returns:
+            int: The number of items reclaimed or failed.
+        """
+        cutoff = _now() - timedelta(seconds=lease_timeout)
+        expired = (
+            WorkItemTable.status == RUNNING,
+            WorkItemTable.heartbeat_at < cutoff,
+        )
+        with self.db_manager.session_scope() as session:
+            failed = session.execute(
+                update(WorkItemTable)
+                .where(*expired, WorkItemTable.attempts >= self.max_attempts)
+                .values(status=FAILED, error="Worker lease expired too many times")
+            )
+            requeued = session.execute(
+                update(WorkItemTable)
+                .where(*expired)
+                .values(status=PENDING, worker_id=None, heartbeat_at=None)
+            )
+            count = int(failed.rowcount + requeued.rowcount)  # type: ignore[attr-defined]
+        if count:
+            LOGGER.info(f"Reclaimed {count} expired work item(s)")
+        return count
+
+    @staticmethod
+    def convert_to_dict(item: WorkItemTable) -> WorkItem:
+        return WorkItem(
+            id=item.id,
+            chain_name=item.chain_name,
+            initial_input=item.initial_input,
+            status=item.status,
+            worker_id=item.worker_id,
+            attempts=item.attempts,
+            result=item.result,
+            error=item.error,
+        )
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
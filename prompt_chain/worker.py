@@ -0,0 +1,120 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+
+from prompt_chain.config import (
+    WORKER_HEARTBEAT_INTERVAL,
+    WORKER_LEASE_TIMEOUT,
+    WORKER_POLL_INTERVAL,
+)
+from prompt_chain.dependencies import DependencyManager
+from prompt_chain.prompt_lib.models import WorkItem
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Worker:
+    """
+    Claims queued chain executions from the shared work queue and runs them.
+
+    Any number of workers, on any number of hosts, can point at the same database.
+    """
+
+    def __init__(
+        self,
+        manager: DependencyManager,
+        worker_id: str | None = None,
+        poll_interval: float = WORKER_POLL_INTERVAL,
+        heartbeat_interval: float = WORKER_HEARTBEAT_INTERVAL,
+        lease_timeout: float = WORKER_LEASE_TIMEOUT,
+    ) -> None:
+        self.manager = manager
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.lease_timeout = lease_timeout
+        self._stopped = threading.Event()
+
+    def run_forever(self) -> None:
+        LOGGER.info(f"Worker {self.worker_id} started")
+        while not self._stopped.is_set():
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                # Keep the worker alive through transient failures, such as a lost database connection.
+                LOGGER.error(f"Worker {self.worker_id} failed to poll the work queue: {str(e)}")
+                processed = False
+            if not processed:
+                self._stopped.wait(self.poll_interval)
+        LOGGER.info(f"Worker {self.worker_id} stopped")
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def run_once(self) -> bool:
+        """
+        Reclaim expired leases, then claim and execute a single work item.
+
+        Returns:
+            bool: True if a work item was processed, False if the queue was empty.
+        """
+        queue = self.manager.work_queue
+        queue.reclaim_expired(self.lease_timeout)
+        item = queue.claim(self.worker_id)
+        if item is None:
+            return False
+        self._process(item)
+        return True
+
+    def _process(self, item: WorkItem) -> None:
+        queue = self.manager.work_queue
+        LOGGER.info(f"Worker {self.worker_id} executing work item {item.id} ({item.chain_name})")
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(item.id, done), daemon=True)
+        heartbeat.start()
+        try:
+            chain_config = self.manager.model_source.get_chain_config(item.chain_name)
+            if not chain_config:
+                raise ValueError(f"No chain found with name: {item.chain_name}")
+            result = self.manager.chain_executor.execute_chain(chain_config, item.initial_input)
+        except Exception as e:
+            LOGGER.error(f"Work item {item.id} failed: {str(e)}")
+            queue.fail(item.id, self.worker_id, str(e))
+        else:
+            queue.complete(item.id, self.worker_id, result)
+        finally:
+            done.set()
+            heartbeat.join()
+
+    def _heartbeat(self, item_id: int, done: threading.Event) -> None:
+        while not done.wait(self.heartbeat_interval):
+            try:
+                renewed = self.manager.work_queue.heartbeat(item_id, self.worker_id)
+            except Exception as e:
+                # Retried on the next beat, the lease only expires after WORKER_LEASE_TIMEOUT.
+                LOGGER.error(f"Heartbeat for work item {item_id} failed: {str(e)}")
+                continue
+            if not renewed:
+                LOGGER.warning(f"Lost lease on work item {item_id}")
+                return
+
+
+def run() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    manager = DependencyManager()
+    worker = Worker(manager)
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        worker.stop()
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    run()
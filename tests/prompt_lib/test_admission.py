@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from prompt_chain.prompt_lib.admission import AdmissionController
+from prompt_chain.prompt_lib.exceptions import OverloadedException
+
+
+def wait_for_queue_depth(controller, depth):
+    deadline = time.monotonic() + 5
+    while controller.metrics.gauge("admission.queue_depth") != depth:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_admits_up_to_max_in_flight():
+    controller = AdmissionController(max_in_flight=2, max_queue_size=0)
+    controller.acquire()
+    controller.acquire()
+
+    with pytest.raises(OverloadedException):
+        controller.acquire()
+
+    assert controller.metrics.gauge("admission.in_flight") == 2
+    assert controller.metrics.counter("admission.admitted") == 2
+    assert controller.metrics.counter("admission.rejected", reason="queue_full") == 1
+
+
+def test_release_frees_slot():
+    controller = AdmissionController(max_in_flight=1, max_queue_size=0)
+    with controller.admit():
+        pass
+    with controller.admit():
+        pass
+
+    assert controller.metrics.gauge("admission.in_flight") == 0
+
+
+def test_release_hands_slot_to_oldest_waiter():
+    controller = AdmissionController(max_in_flight=1, max_queue_size=2, max_queue_age=5)
+    controller.acquire()
+    admitted = []
+
+    def wait_in_queue(name):
+        controller.acquire()
+        admitted.append(name)
+
+    first = threading.Thread(target=wait_in_queue, args=("first",))
+    first.start()
+    wait_for_queue_depth(controller, 1)
+    second = threading.Thread(target=wait_in_queue, args=("second",))
+    second.start()
+    wait_for_queue_depth(controller, 2)
+
+    controller.release()
+    first.join()
+    assert admitted == ["first"]
+    controller.release()
+    second.join()
+    assert admitted == ["first", "second"]
+    assert controller.metrics.gauge("admission.in_flight") == 1
+    assert controller.metrics.gauge("admission.queue_depth") == 0
+
+
+def test_rejects_requests_queued_too_long():
+    controller = AdmissionController(max_in_flight=1, max_queue_size=1, max_queue_age=0.01)
+    controller.acquire()
+
+    with pytest.raises(OverloadedException):
+        controller.acquire()
+
+    assert controller.metrics.counter("admission.rejected", reason="queue_timeout") == 1
+    assert controller.metrics.gauge("admission.queue_depth") == 0
+    controller.release()
+    assert controller.metrics.gauge("admission.in_flight") == 0
+
+
+def test_queue_wait_bounded_by_timeout():
+    controller = AdmissionController(max_in_flight=1, max_queue_size=1, max_queue_age=5)
+    controller.acquire()
+
+    start = time.monotonic()
+    with pytest.raises(OverloadedException):
+        controller.acquire(timeout=0.01)
+    assert time.monotonic() - start < 1
+
+
+def test_retry_after_follows_execution_time():
+    controller = AdmissionController(max_in_flight=1, max_queue_size=0)
+    controller.acquire()
+    controller.release(duration=3.0)
+    controller.acquire()
+
+    with pytest.raises(OverloadedException) as exc_info:
+        controller.acquire()
+
+    assert exc_info.value.retry_after == 3
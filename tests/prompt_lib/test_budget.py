@@ -0,0 +1,70 @@
+import pytest
+
+from prompt_chain.prompt_lib.budget import Budget
+from prompt_chain.prompt_lib.exceptions import BudgetExceededException
+from prompt_chain.prompt_lib.models import ExecutionRecord, StepRecord
+
+
+def make_execution(*usages):
+    return ExecutionRecord(
+        id="abc",
+        chain_name="test_chain",
+        started_at="2024-01-01T00:00:00",
+        input={},
+        steps=[
+            StepRecord(
+                step_index=i,
+                model_name="test_model",
+                input={},
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                cost_usd=cost_usd,
+            )
+            for i, (prompt_tokens, completion_tokens, cost_usd) in enumerate(usages)
+        ],
+    )
+
+
+def test_budget_without_limits_is_never_exceeded():
+    Budget().check(make_execution((10_000, 10_000, 100.0)), "step 2")
+
+
+def test_token_budget():
+    budget = Budget(max_tokens=100)
+
+    budget.check(make_execution((50, 10, 0.0), (None, None, None)), "step 3")
+    with pytest.raises(
+        BudgetExceededException, match="Token budget of 100 exhausted before step 3"
+    ):
+        budget.check(make_execution((50, 10, 0.0), (30, 10, 0.0)), "step 3")
+
+
+def test_cost_budget():
+    budget = Budget(max_cost=0.01)
+
+    budget.check(make_execution((50, 10, 0.005)), "step 2")
+    with pytest.raises(BudgetExceededException, match="Cost budget of \\$0.01 exhausted"):
+        budget.check(make_execution((50, 10, 0.005), (50, 10, 0.006)), "step 3")
+
+
+def test_completion_tokens_left():
+    execution = make_execution((50, 10, 0.0))
+
+    assert Budget().completion_tokens_left(execution, 20, "step 2", "gpt-4") is None
+    assert Budget(max_tokens=100).completion_tokens_left(execution, 20, "step 2", "gpt-4") == 20
+    with pytest.raises(BudgetExceededException, match="Budget too small for the prompt of step 2"):
+        Budget(max_tokens=100).completion_tokens_left(execution, 40, "step 2", "gpt-4")
+
+
+def test_completion_tokens_left_from_cost():
+    budget = Budget(
+        max_cost=1.0,
+        prices={"gpt-4": {"prompt": 1.0, "completion": 2.0}, "gpt-3.5-turbo": {"prompt": 0.5}},
+    )
+    execution = make_execution((100, 100, 0.3))
+
+    # $0.70 left, $0.20 of it for the prompt, at $0.002 per completion token.
+    assert budget.completion_tokens_left(execution, 200, "step 2", "gpt-4") == 250
+    assert budget.completion_tokens_left(execution, 200, "step 2", "gpt-3.5-turbo") is None
+    with pytest.raises(BudgetExceededException, match="No price for backend claude"):
+        budget.completion_tokens_left(execution, 200, "step 2", "claude")
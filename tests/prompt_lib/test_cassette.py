@@ -0,0 +1,137 @@
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+
+from prompt_chain.prompt_lib.cassette import CassetteWebClient, request_key
+from prompt_chain.prompt_lib.chain_executor import ChainExecutor
+from prompt_chain.prompt_lib.exceptions import CassetteMissException
+from prompt_chain.prompt_lib.models import ChainConfig, ChainStep, PromptModel
+
+URL = "http://provider/chat"
+HEADERS = {"Authorization": "Bearer secret"}
+REQUEST = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Hi"}]}
+
+
+def http_response(status, body):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body.encode("utf-8")
+    return response
+
+
+def recorder(path, *responses):
+    client = CassetteWebClient(path, "record")
+    client.client = Mock()
+    client.client.post.side_effect = list(responses)
+    return client
+
+
+@pytest.mark.parametrize("name", ["calls.jsonl", "calls.jsonl.gz"])
+def test_replays_recorded_responses_in_order(tmp_path, name):
+    path = tmp_path / name
+    with recorder(
+        path, http_response(200, '{"answer": 1}'), http_response(200, '{"answer": 2}')
+    ) as client:
+        assert client.post(URL, HEADERS, REQUEST) == {"answer": 1}
+        assert client.post(URL, HEADERS, REQUEST) == {"answer": 2}
+
+    replay = CassetteWebClient(path, "replay", latency_scale=0)
+    assert replay.post("http://other/chat", {}, REQUEST) == {"answer": 1}
+    assert replay.post(URL, HEADERS, REQUEST) == {"answer": 2}
+    assert replay.post(URL, HEADERS, REQUEST) == {"answer": 1}
+
+
+def test_cassette_does_not_record_credentials(tmp_path):
+    path = tmp_path / "calls.jsonl"
+    with recorder(path, http_response(200, "{}")) as client:
+        client.post(URL, HEADERS, REQUEST)
+
+    assert "secret" not in path.read_text()
+    assert request_key(REQUEST) in path.read_text()
+
+
+def test_replays_recorded_errors(tmp_path):
+    path = tmp_path / "calls.jsonl"
+    requests_ = [{**REQUEST, "n": i} for i in range(3)]
+    with recorder(
+        path,
+        http_response(429, "slow down"),
+        requests.Timeout("read timed out"),
+        http_response(200, "not json"),
+    ) as client:
+        with pytest.raises(requests.HTTPError):
+            client.post(URL, HEADERS, requests_[0])
+        with pytest.raises(requests.Timeout):
+            client.post(URL, HEADERS, requests_[1])
+        with pytest.raises(ValueError):
+            client.post(URL, HEADERS, requests_[2])
+
+    replay = CassetteWebClient(path, "replay", latency_scale=0)
+    with pytest.raises(requests.HTTPError) as exc_info:
+        replay.post(URL, HEADERS, requests_[0])
+    assert exc_info.value.response.status_code == 429
+    assert exc_info.value.response.text == "slow down"
+    with pytest.raises(requests.Timeout):
+        replay.post(URL, HEADERS, requests_[1])
+    with pytest.raises(ValueError):
+        replay.post(URL, HEADERS, requests_[2])
+
+
+def test_replay_scales_the_recorded_latency(tmp_path):
+    path = tmp_path / "calls.jsonl"
+    path.write_text(f'{{"key": "{request_key(REQUEST)}", "response": {{}}, "latency_ms": 800}}\n')
+    replay = CassetteWebClient(path, "replay", latency_scale=0.5)
+
+    with patch("prompt_chain.prompt_lib.cassette.time.sleep") as sleep:
+        replay.post(URL, HEADERS, REQUEST)
+        sleep.assert_called_once_with(0.4)
+
+        with pytest.raises(requests.Timeout):
+            replay.post(URL, HEADERS, REQUEST, timeout=0.1)
+        sleep.assert_called_with(0.1)
+
+
+def test_replay_raises_for_unrecorded_requests(tmp_path):
+    path = tmp_path / "calls.jsonl"
+    path.write_text("")
+    replay = CassetteWebClient(path, "replay")
+
+    with pytest.raises(CassetteMissException):
+        replay.post(URL, HEADERS, REQUEST)
+
+
+def test_rejects_unknown_modes(tmp_path):
+    with pytest.raises(ValueError, match="Unknown cassette mode"):
+        CassetteWebClient(tmp_path / "calls.jsonl", "rewind")
+
+
+def test_chain_replays_offline(tmp_path):
+    path = tmp_path / "calls.jsonl.gz"
+    db_manager = Mock()
+    db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="",
+        updated_at="",
+    )
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[ChainStep(name="test_model", input_mapping={"input": "initial_input.text"})],
+        final_output_mapping={"result": "step_0.output"},
+    )
+    body = '{"choices": [{"message": {"content": "{\\"output\\": \\"Recorded\\"}"}}]}'
+    with recorder(path, http_response(200, body)) as client:
+        ChainExecutor(db_manager, client, "fake_api_key").execute_chain(
+            chain_config, {"text": "Hello"}
+        )
+
+    with CassetteWebClient(path, "replay", latency_scale=0) as replay:
+        result = ChainExecutor(db_manager, replay, None).execute_chain(
+            chain_config, {"text": "Hello"}
+        )
+
+    assert result == {"result": "Recorded"}
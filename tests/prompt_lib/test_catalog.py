@@ -0,0 +1,125 @@
+import json
+
+import pytest
+
+from prompt_chain.prompt_lib.catalog import dump_catalog, parse_catalog
+from prompt_chain.prompt_lib.db_manager import DatabaseManager
+from prompt_chain.prompt_lib.exceptions import CatalogImportException
+from prompt_chain.prompt_lib.tables import Base
+from tests.conftest import TEST_DB_URL
+
+MODEL = {
+    "kind": "model",
+    "name": "summarizer",
+    "system_prompt": "Summarize the text",
+    "user_prompt_schema": {"text": "str"},
+    "response_schema": {"summary": "str"},
+}
+CHAIN = {
+    "kind": "chain",
+    "name": "summary_chain",
+    "steps": [{"name": "summarizer", "input_mapping": {"text": "initial_input.text"}}],
+    "final_output_mapping": {"summary": "step_0.summary"},
+}
+
+
+def jsonl(*entries):
+    return [json.dumps(entry) for entry in entries]
+
+
+@pytest.fixture
+def db_manager():
+    manager = DatabaseManager(TEST_DB_URL)
+    yield manager
+    Base.metadata.drop_all(manager.engine)
+
+
+def test_parse_catalog():
+    catalog = parse_catalog([*jsonl(MODEL), "", *jsonl(CHAIN)])
+
+    assert [model.name for model in catalog.models] == ["summarizer"]
+    assert catalog.models[0].user_prompt_schema == {"text": "str"}
+    assert [chain.name for chain in catalog.chains] == ["summary_chain"]
+
+
+def test_parse_catalog_reports_every_invalid_line():
+    lines = [
+        "not json",
+        *jsonl(
+            {**MODEL, "user_prompt_schema": {"text": "string"}},
+            {"kind": "prompt", "name": "x"},
+            {**CHAIN, "steps": "summarizer"},
+            MODEL,
+            MODEL,
+        ),
+    ]
+
+    with pytest.raises(CatalogImportException) as exc_info:
+        parse_catalog(lines)
+
+    errors = exc_info.value.errors
+    assert len(errors) == 5
+    assert errors[0].startswith("Line 1:")
+    assert "Unsupported primitive type: string" in errors[1]
+    assert "Unknown kind: prompt" in errors[2]
+    assert errors[3].startswith("Line 4:")
+    assert errors[4] == "Line 6: duplicate model summarizer, first on line 5"
+
+
+def test_import_catalog_creates_and_updates(db_manager):
+    db_manager.add_prompt_model("summarizer", "Old prompt", {"text": "str"}, {"summary": "str"})
+    catalog = parse_catalog(
+        jsonl(MODEL, {**MODEL, "name": "translator", "backends": ["gpt-4o-mini"]}, CHAIN)
+    )
+
+    counts = db_manager.import_catalog(catalog.models, catalog.chains)
+
+    assert counts == {
+        "models": {"created": 1, "updated": 1, "unchanged": 0},
+        "chains": {"created": 1, "updated": 0},
+    }
+    summarizer = db_manager.get_prompt_model("summarizer")
+    assert summarizer.system_prompt == "Summarize the text"
+    assert summarizer.version == 2
+    assert db_manager.get_prompt_model("translator").backends == ["gpt-4o-mini"]
+    step = db_manager.get_chain_config("summary_chain").steps[0]
+    assert step.name == "summarizer"
+    assert step.model_version == summarizer.hash
+
+
+def test_import_catalog_handles_many_entries(db_manager):
+    models = [{**MODEL, "name": f"model_{i}"} for i in range(1200)]
+    catalog = parse_catalog(jsonl(*models))
+
+    db_manager.import_catalog(catalog.models, [])
+    counts = db_manager.import_catalog(catalog.models, [])
+
+    assert counts["models"] == {"created": 0, "updated": 0, "unchanged": 1200}
+    assert len(db_manager.get_all_models()) == 1200
+
+
+def test_import_catalog_versions_changed_models(db_manager):
+    catalog = parse_catalog(jsonl(MODEL))
+    db_manager.import_catalog(catalog.models, [])
+    changed = parse_catalog(jsonl({**MODEL, "system_prompt": "Summarize briefly"}))
+
+    db_manager.import_catalog(changed.models, [])
+    counts = db_manager.import_catalog(catalog.models, [])
+
+    assert counts["models"] == {"created": 0, "updated": 1, "unchanged": 0}
+    versions = db_manager.get_prompt_model_versions("summarizer")
+    assert [version.version for version in versions] == [1, 2]
+    assert db_manager.get_prompt_model("summarizer").version == 1
+
+
+def test_dump_catalog_round_trips(db_manager):
+    catalog = parse_catalog(jsonl({**MODEL, "backends": ["gpt-4o-mini"]}, CHAIN))
+    db_manager.import_catalog(catalog.models, catalog.chains)
+
+    lines = list(dump_catalog(db_manager))
+
+    assert all(line.endswith(b"\n") for line in lines)
+    exported = parse_catalog(lines)
+    assert exported.models == catalog.models
+    assert exported.chains == [db_manager.get_chain_config("summary_chain")]
+    assert exported.chains[0].steps[0].model_version is not None
@@ -1,9 +1,28 @@
-from unittest.mock import Mock
+import threading
+import time
+from unittest.mock import Mock, patch
 
 import pytest
+from requests import HTTPError, Timeout
 
+from prompt_chain.prompt_lib import codec
 from prompt_chain.prompt_lib.chain_executor import ChainExecutor
-from prompt_chain.prompt_lib.models import ChainConfig, ChainStep, PromptModel
+from prompt_chain.prompt_lib.deadline import Deadline
+from prompt_chain.prompt_lib.exceptions import (
+    BudgetExceededException,
+    DeadlineExceededException,
+    InvalidResponseException,
+)
+from prompt_chain.prompt_lib.models import (
+    ChainConfig,
+    ChainStep,
+    ChunkingConfig,
+    CompactionConfig,
+    PromptModel,
+)
+from prompt_chain.prompt_lib.provider_client import ProviderClient
+from prompt_chain.prompt_lib.router import BackendRouter
+from prompt_chain.prompt_lib.token_estimator import estimate_completion_tokens
 
 
 @pytest.fixture
@@ -141,3 +160,1001 @@ def test_execute_step(chain_executor, mock_web_client):
 
     assert result == {"output": "Test output"}
     mock_web_client.post.assert_called_once()
+
+
+def test_execute_step_with_hedger(mock_db_manager, mock_web_client):
+    hedger = Mock()
+    hedger.call.side_effect = lambda key, request, timeout: request()
+    chain_executor = ChainExecutor(mock_db_manager, mock_web_client, "fake_api_key", hedger=hedger)
+    model = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"output": "Test output"}'}}]
+    }
+
+    result = chain_executor._execute_step(model, {"input": "Test input"})
+
+    assert result == {"output": "Test output"}
+    assert hedger.call.call_args.args[0] == "test_model"
+
+
+def test_execute_chain_passes_step_timeout(chain_executor, mock_db_manager, mock_web_client):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"output": "Test output"}'}}]
+    }
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(
+                name="test_model",
+                input_mapping={"input": "initial_input.test_input"},
+                timeout_seconds=5,
+            )
+        ],
+        final_output_mapping={"result": "step_0.output"},
+    )
+
+    chain_executor.execute_chain(chain_config, {"test_input": "Test input"}, Deadline(60))
+
+    assert mock_web_client.post.call_args.kwargs["timeout"] == 5
+
+
+@pytest.mark.parametrize(
+    ("tenant_id", "priority", "flow"),
+    [("acme", "batch", "acme"), (None, None, "test_chain")],
+)
+def test_run_chain_schedules_calls_by_tenant(
+    mock_db_manager, mock_web_client, tenant_id, priority, flow
+):
+    provider = Mock(router=None)
+    provider.chat.return_value = {
+        "choices": [{"message": {"content": '{"output": "Test output"}'}}]
+    }
+    chain_executor = ChainExecutor(
+        mock_db_manager, mock_web_client, "fake_api_key", provider=provider
+    )
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[ChainStep(name="test_model", input_mapping={"input": "initial_input.test_input"})],
+        final_output_mapping={"result": "step_0.output"},
+    )
+
+    execution = chain_executor.run_chain(
+        chain_config, {"test_input": "Test input"}, tenant_id=tenant_id, priority=priority
+    )
+
+    assert provider.chat.call_args.kwargs["flow"] == flow
+    assert provider.chat.call_args.kwargs["priority"] == priority
+    assert execution.tenant_id == tenant_id
+    mock_web_client.post.assert_not_called()
+
+
+def test_execute_chain_deadline_exceeded(chain_executor, mock_db_manager, mock_web_client):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.side_effect = Timeout("Read timed out")
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[ChainStep(name="test_model", input_mapping={"input": "initial_input.test_input"})],
+        final_output_mapping={"result": "step_0.output"},
+    )
+    deadline = Mock(spec=Deadline)
+    deadline.timeout.return_value = 0.5
+    deadline.expired.return_value = True
+
+    with pytest.raises(DeadlineExceededException, match="Deadline exceeded during step test_model"):
+        chain_executor.execute_chain(chain_config, {"test_input": "Test input"}, deadline)
+
+
+def test_execute_chain_deadline_passed_before_the_call(
+    chain_executor, mock_db_manager, mock_web_client
+):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[ChainStep(name="test_model", input_mapping={"input": "initial_input.test_input"})],
+        final_output_mapping={"result": "step_0.output"},
+    )
+    # The deadline passes after the step's checks, right before its call is sent.
+    deadline = Deadline(60)
+    deadline.check = Mock()
+    deadline.expires_at = time.monotonic() - 1
+
+    with pytest.raises(DeadlineExceededException, match="Deadline exceeded during step test_model"):
+        chain_executor.execute_chain(chain_config, {"test_input": "Test input"}, deadline)
+    mock_web_client.post.assert_not_called()
+
+
+def test_execute_chain_step_timeout_without_deadline(
+    chain_executor, mock_db_manager, mock_web_client
+):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.side_effect = Timeout("Read timed out")
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[ChainStep(name="test_model", input_mapping={"input": "initial_input.test_input"})],
+        final_output_mapping={"result": "step_0.output"},
+    )
+
+    with pytest.raises(Timeout):
+        chain_executor.execute_chain(chain_config, {"test_input": "Test input"})
+
+
+def test_execute_step_strips_code_fence(chain_executor, mock_web_client):
+    model = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {
+        "choices": [
+            {"message": {"content": 'Here you go:\n```json\n{"output": "Test output"}\n```'}}
+        ]
+    }
+
+    result = chain_executor._execute_step(model, {"input": "Test input"})
+
+    assert result == {"output": "Test output"}
+    assert chain_executor.metrics.counter("repair.local_fixes", model="test_model") == 1
+
+
+def test_execute_step_invalid_json(chain_executor, mock_web_client):
+    model = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {"choices": [{"message": {"content": "Sorry, no."}}]}
+
+    with pytest.raises(InvalidResponseException) as exc_info:
+        chain_executor._execute_step(model, {"input": "Test input"})
+
+    assert exc_info.value.content == "Sorry, no."
+
+
+def test_execute_chain_repairs_invalid_output(chain_executor, mock_db_manager, mock_web_client):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.side_effect = [
+        {"choices": [{"message": {"content": '{"result": "Wrong field"}'}}]},
+        {"choices": [{"message": {"content": '{"output": "Test output"}'}}]},
+    ]
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[ChainStep(name="test_model", input_mapping={"input": "initial_input.test_input"})],
+        final_output_mapping={"result": "step_0.output"},
+    )
+
+    result = chain_executor.execute_chain(chain_config, {"test_input": "Test input"})
+
+    assert result == {"result": "Test output"}
+    messages = mock_web_client.post.call_args.kwargs["json"]["messages"]
+    assert [message["role"] for message in messages] == ["system", "user", "assistant", "user"]
+    assert messages[2]["content"] == '{"result":"Wrong field"}'
+    assert "output" in messages[3]["content"] and "Field required" in messages[3]["content"]
+    assert chain_executor.metrics.counter("repair.attempts", model="test_model") == 1
+    assert chain_executor.metrics.counter("repair.successes", model="test_model") == 1
+
+
+def test_execute_chain_repair_attempts_exhausted(mock_db_manager, mock_web_client):
+    chain_executor = ChainExecutor(
+        mock_db_manager, mock_web_client, "fake_api_key", max_repair_attempts=2
+    )
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {"choices": [{"message": {"content": "not json"}}]}
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[ChainStep(name="test_model", input_mapping={"input": "initial_input.test_input"})],
+        final_output_mapping={"result": "step_0.output"},
+    )
+
+    with pytest.raises(InvalidResponseException):
+        chain_executor.execute_chain(chain_config, {"test_input": "Test input"})
+
+    assert mock_web_client.post.call_count == 3
+
+
+def test_execute_chain_step_disables_repair(chain_executor, mock_db_manager, mock_web_client):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"result": "Wrong field"}'}}]
+    }
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(
+                name="test_model",
+                input_mapping={"input": "initial_input.test_input"},
+                max_repair_attempts=0,
+            )
+        ],
+        final_output_mapping={"result": "step_0.output"},
+    )
+
+    with pytest.raises(ValueError, match="Output validation failed for model test_model"):
+        chain_executor.execute_chain(chain_config, {"test_input": "Test input"})
+
+    mock_web_client.post.assert_called_once()
+
+
+def test_execute_chain_no_repair_after_deadline(chain_executor, mock_db_manager, mock_web_client):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {"choices": [{"message": {"content": "not json"}}]}
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[ChainStep(name="test_model", input_mapping={"input": "initial_input.test_input"})],
+        final_output_mapping={"result": "step_0.output"},
+    )
+    deadline = Mock(spec=Deadline)
+    deadline.timeout.return_value = 0.5
+    deadline.expired.return_value = True
+
+    with pytest.raises(InvalidResponseException):
+        chain_executor.execute_chain(chain_config, {"test_input": "Test input"}, deadline)
+
+    mock_web_client.post.assert_called_once()
+
+
+def test_execute_chain_records_history(mock_db_manager, mock_web_client):
+    history = Mock()
+    chain_executor = ChainExecutor(
+        mock_db_manager, mock_web_client, "fake_api_key", history=history
+    )
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"output": "Test output"}'}}]
+    }
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[ChainStep(name="test_model", input_mapping={"input": "initial_input.test_input"})],
+        final_output_mapping={"result": "step_0.output"},
+    )
+
+    chain_executor.execute_chain(chain_config, {"test_input": "Test input"}, execution_id="abc")
+
+    execution = history.record.call_args.args[0]
+    assert execution.id == "abc"
+    assert execution.chain_name == "test_chain"
+    assert execution.status == "completed"
+    assert execution.input == {"test_input": "Test input"}
+    assert execution.output == {"result": "Test output"}
+    assert len(execution.steps) == 1
+    assert execution.steps[0].input == {"input": "Test input"}
+    assert execution.steps[0].output == {"output": "Test output"}
+
+
+def test_execute_chain_records_failed_history(mock_db_manager, mock_web_client):
+    history = Mock()
+    chain_executor = ChainExecutor(
+        mock_db_manager, mock_web_client, "fake_api_key", history=history
+    )
+    mock_db_manager.get_prompt_model.return_value = None
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(name="missing_model", input_mapping={"input": "initial_input.test_input"})
+        ],
+        final_output_mapping={"result": "step_0.output"},
+    )
+
+    with pytest.raises(ValueError):
+        chain_executor.execute_chain(chain_config, {"test_input": "Test input"})
+
+    execution = history.record.call_args.args[0]
+    assert execution.status == "failed"
+    assert execution.error == "Model not found: missing_model"
+    assert execution.steps[0].error == "Model not found: missing_model"
+
+
+def test_run_chain_records_token_usage(chain_executor, mock_db_manager, mock_web_client):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"output": "Test output"}'}}],
+        "usage": {"prompt_tokens": 1000, "completion_tokens": 200, "total_tokens": 1200},
+    }
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(name="test_model", input_mapping={"input": "initial_input.test_input"}),
+            ChainStep(name="test_model", input_mapping={"input": "previous_step.output"}),
+        ],
+        final_output_mapping={"result": "step_1.output"},
+    )
+
+    with patch(
+        "prompt_chain.prompt_lib.chain_executor.MODEL_PRICES",
+        {"gpt-3.5-turbo": {"prompt": 0.5, "completion": 1.5}},
+    ):
+        execution = chain_executor.run_chain(chain_config, {"test_input": "Test input"})
+
+    assert execution.output == {"result": "Test output"}
+    assert [step.prompt_tokens for step in execution.steps] == [1000, 1000]
+    assert [step.cost_usd for step in execution.steps] == [0.8, 0.8]
+    assert execution.prompt_tokens == 2000
+    assert execution.completion_tokens == 400
+    assert execution.cost_usd == pytest.approx(1.6)
+    metrics = chain_executor.metrics
+    assert metrics.counter("tokens.prompt", model="test_model") == 2000
+    assert metrics.counter("tokens.completion", chain="test_chain") == 400
+    assert metrics.counter("cost.usd", chain="test_chain") == pytest.approx(1.6)
+
+
+def test_execute_chain_stops_at_token_budget(chain_executor, mock_db_manager, mock_web_client):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"output": "Test output"}'}}],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 20},
+    }
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(name="test_model", input_mapping={"input": "initial_input.test_input"}),
+            ChainStep(name="test_model", input_mapping={"input": "previous_step.output"}),
+        ],
+        final_output_mapping={"result": "step_1.output"},
+        token_budget=100,
+    )
+
+    with pytest.raises(BudgetExceededException, match="before step 2/2"):
+        chain_executor.execute_chain(chain_config, {"test_input": "Test input"})
+
+    mock_web_client.post.assert_called_once()
+
+
+def test_repair_counts_towards_budget(chain_executor, mock_db_manager, mock_web_client):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": "not json"}}],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 20},
+    }
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[ChainStep(name="test_model", input_mapping={"input": "initial_input.test_input"})],
+        final_output_mapping={"result": "step_0.output"},
+        token_budget=100,
+    )
+
+    with pytest.raises(BudgetExceededException, match="before repairing step test_model"):
+        chain_executor.execute_chain(chain_config, {"test_input": "Test input"})
+
+    mock_web_client.post.assert_called_once()
+
+
+def test_execute_chain_sends_estimated_max_tokens(chain_executor, mock_db_manager, mock_web_client):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"crime_detected": "bool", "explanation": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"crime_detected": false, "explanation": "None"}'}}]
+    }
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(
+                name="test_model",
+                input_mapping={"input": "initial_input.test_input"},
+                response_length_hints={"explanation": 40},
+            )
+        ],
+        final_output_mapping={"result": "step_0.explanation"},
+    )
+
+    chain_executor.execute_chain(chain_config, {"test_input": "Test input"})
+
+    expected = estimate_completion_tokens(
+        {"crime_detected": "bool", "explanation": "str"}, {"explanation": 40}, margin=0.5
+    )
+    assert mock_web_client.post.call_args.kwargs["json"]["max_tokens"] == expected
+
+    with patch("prompt_chain.prompt_lib.chain_executor.MAX_TOKENS_AUTO", False):
+        chain_executor.execute_chain(chain_config, {"test_input": "Test input"})
+    assert "max_tokens" not in mock_web_client.post.call_args.kwargs["json"]
+
+
+def test_execute_chain_step_max_tokens_capped_by_budget(
+    chain_executor, mock_db_manager, mock_web_client
+):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"output": "Test output"}'}}]
+    }
+
+    def run(max_tokens, token_budget):
+        chain_config = ChainConfig(
+            name="test_chain",
+            steps=[
+                ChainStep(
+                    name="test_model",
+                    input_mapping={"input": "initial_input.test_input"},
+                    max_tokens=max_tokens,
+                )
+            ],
+            final_output_mapping={"result": "step_0.output"},
+            token_budget=token_budget,
+        )
+        chain_executor.execute_chain(chain_config, {"test_input": "Test input"})
+        return mock_web_client.post.call_args.kwargs["json"]["max_tokens"]
+
+    assert run(max_tokens=500, token_budget=None) == 500
+    assert run(max_tokens=500, token_budget=1000) == 500
+    assert run(max_tokens=500, token_budget=100) < 100
+    assert run(max_tokens=10_000, token_budget=None) == 4096
+    with patch.dict(
+        "prompt_chain.prompt_lib.chain_executor.MODEL_MAX_OUTPUT_TOKENS", {"gpt-3.5-turbo": 300}
+    ):
+        assert run(max_tokens=500, token_budget=None) == 300
+
+
+def test_execute_chain_prices_the_backend_called(chain_executor, mock_db_manager, mock_web_client):
+    model = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+        backends=["gpt-4"],
+    )
+    mock_db_manager.get_prompt_model.return_value = model
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"output": "Test output"}'}}],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 100},
+    }
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(
+                name="test_model",
+                input_mapping={"input": "initial_input.test_input"},
+                max_tokens=1000,
+            )
+        ],
+        final_output_mapping={"result": "step_0.output"},
+        cost_budget=0.01,
+    )
+    prices = {
+        "gpt-3.5-turbo": {"prompt": 0.0005, "completion": 0.0015},
+        "gpt-4": {"prompt": 0.03, "completion": 0.06},
+    }
+
+    with patch("prompt_chain.prompt_lib.chain_executor.MODEL_PRICES", prices):
+        execution = chain_executor.run_chain(chain_config, {"test_input": "Test input"})
+
+    assert mock_web_client.post.call_args.kwargs["json"]["model"] == "gpt-4"
+    assert mock_web_client.post.call_args.kwargs["json"]["max_tokens"] < 200
+    assert execution.cost_usd == pytest.approx(0.009)
+
+    mock_web_client.post.reset_mock()
+    model.backends = ["unpriced-model"]
+    with patch("prompt_chain.prompt_lib.chain_executor.MODEL_PRICES", prices):
+        with pytest.raises(BudgetExceededException, match="No price for backend unpriced-model"):
+            chain_executor.execute_chain(chain_config, {"test_input": "Test input"})
+    mock_web_client.post.assert_not_called()
+
+
+def test_execute_step_without_max_tokens(chain_executor, mock_web_client):
+    model = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"output": "Test output"}'}}]
+    }
+
+    chain_executor._execute_step(model, {"input": "Test input"})
+
+    assert "max_tokens" not in mock_web_client.post.call_args.kwargs["json"]
+
+
+def test_execute_chain_compacts_step_input(chain_executor, mock_db_manager, mock_web_client):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str", "source": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+    )
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"output": "Test output"}'}}]
+    }
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(
+                name="test_model",
+                input_mapping={"input": "initial_input.text", "source": "initial_input.source"},
+                compaction=CompactionConfig(exclude=["source"], max_field_tokens={"input": 5}),
+            )
+        ],
+        final_output_mapping={"result": "step_0.output"},
+    )
+    text = " ".join(["lorem ipsum"] * 100)
+
+    chain_executor.execute_chain(chain_config, {"text": text, "source": "web"})
+
+    user_message = mock_web_client.post.call_args.kwargs["json"]["messages"][1]["content"]
+    assert user_message == '{"input":"lorem ipsum lorem ipsum …"}'
+    metrics = chain_executor.metrics
+    assert metrics.counter("compaction.tokens_before", model="test_model") > 200
+    assert metrics.counter("compaction.tokens_after", model="test_model") < 15
+
+
+@pytest.fixture
+def routed_model():
+    return PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+        backends=["primary", "secondary"],
+    )
+
+
+def routed_chain(max_retries=None):
+    return ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(
+                name="test_model",
+                input_mapping={"input": "initial_input.test_input"},
+                max_retries=max_retries,
+            )
+        ],
+        final_output_mapping={"result": "step_0.output"},
+    )
+
+
+def test_execute_chain_fails_over_to_next_backend(
+    chain_executor, mock_db_manager, mock_web_client, routed_model
+):
+    mock_db_manager.get_prompt_model.return_value = routed_model
+    mock_web_client.post.side_effect = [
+        Timeout("Read timed out"),
+        {"choices": [{"message": {"content": '{"output": "Test output"}'}}]},
+    ]
+
+    result = chain_executor.execute_chain(routed_chain(), {"test_input": "Test input"})
+
+    assert result == {"result": "Test output"}
+    models = [call.kwargs["json"]["model"] for call in mock_web_client.post.call_args_list]
+    assert models == ["primary", "secondary"]
+    assert (
+        chain_executor.metrics.counter("router.failovers", model="test_model", backend="primary")
+        == 1
+    )
+
+
+def test_execute_chain_fails_over_within_retry_budget(
+    chain_executor, mock_db_manager, mock_web_client, routed_model
+):
+    mock_db_manager.get_prompt_model.return_value = routed_model
+    mock_web_client.post.side_effect = Timeout("Read timed out")
+
+    with pytest.raises(Timeout):
+        chain_executor.execute_chain(routed_chain(max_retries=0), {"test_input": "Test input"})
+
+    assert mock_web_client.post.call_count == 1
+
+
+def test_execute_chain_does_not_fail_over_invalid_requests(
+    chain_executor, mock_db_manager, mock_web_client, routed_model
+):
+    mock_db_manager.get_prompt_model.return_value = routed_model
+    response = Mock(status_code=400)
+    mock_web_client.post.side_effect = HTTPError(response=response)
+
+    with pytest.raises(HTTPError):
+        chain_executor.execute_chain(routed_chain(), {"test_input": "Test input"})
+
+    assert mock_web_client.post.call_count == 1
+
+
+def test_call_model_fails_over_and_reports_the_deadline(
+    chain_executor, mock_web_client, routed_model
+):
+    mock_web_client.post.side_effect = [
+        HTTPError(response=Mock(status_code=503)),
+        {"choices": [{"message": {"content": '{"output": "Test output"}'}}]},
+    ]
+    assert chain_executor.call_model(routed_model, {"input": "Test input"}) == {
+        "output": "Test output"
+    }
+
+    deadline = Deadline(10)
+
+    def time_out(*args, **kwargs):
+        deadline.expires_at = time.monotonic()
+        raise Timeout("Read timed out")
+
+    mock_web_client.post.side_effect = time_out
+    with pytest.raises(DeadlineExceededException, match="calling model test_model"):
+        chain_executor.call_model(routed_model, {"input": "Test input"}, deadline=deadline)
+
+
+def test_execute_chain_routes_to_fastest_backend(mock_db_manager, mock_web_client, routed_model):
+    router = BackendRouter()
+    router.record("primary", 2.0, success=True)
+    router.record("secondary", 0.5, success=True)
+    provider = ProviderClient(mock_web_client, "fake_api_key", router=router)
+    chain_executor = ChainExecutor(
+        mock_db_manager, mock_web_client, "fake_api_key", provider=provider
+    )
+    mock_db_manager.get_prompt_model.return_value = routed_model
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"output": "Test output"}'}}]
+    }
+
+    chain_executor.execute_chain(routed_chain(), {"test_input": "Test input"})
+
+    assert mock_web_client.post.call_args.kwargs["json"]["model"] == "secondary"
+    assert router.metrics.counter("router.calls", backend="secondary") == 2
+
+
+def test_execute_chain_resolves_each_model_version_once(
+    chain_executor, mock_db_manager, mock_web_client
+):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-01T00:00:00",
+        version=2,
+        hash="abc",
+    )
+    mock_web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"output": "Test output"}'}}]
+    }
+    step = ChainStep(
+        name="test_model", input_mapping={"input": "initial_input.input"}, model_version="abc"
+    )
+    chain_config = ChainConfig(name="test_chain", steps=[step, step, step], final_output_mapping={})
+
+    chain_executor.execute_chain(chain_config, {"input": "Test input"})
+
+    mock_db_manager.get_prompt_model.assert_called_once_with("test_model", "abc")
+
+
+def test_execute_chain_pinned_version_not_found(chain_executor, mock_db_manager):
+    mock_db_manager.get_prompt_model.return_value = None
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(
+                name="test_model",
+                input_mapping={"input": "initial_input.input"},
+                model_version="abc",
+            )
+        ],
+        final_output_mapping={},
+    )
+
+    with pytest.raises(ValueError, match="Model version not found: test_model@abc"):
+        chain_executor.execute_chain(chain_config, {"input": "Test input"})
+
+
+def chunked_models():
+    return {
+        "summarizer": PromptModel(
+            id=1,
+            name="summarizer",
+            system_prompt="Summarize",
+            user_prompt={"text": "str", "topic": "str"},
+            response={"summary": "str", "mentions": "int"},
+            created_at="2023-01-01T00:00:00",
+            updated_at="2023-01-01T00:00:00",
+        ),
+        "merger": PromptModel(
+            id=2,
+            name="merger",
+            system_prompt="Merge the summaries",
+            user_prompt={"outputs": [{"summary": "str", "mentions": "int"}]},
+            response={"summary": "str", "mentions": "int"},
+            created_at="2023-01-01T00:00:00",
+            updated_at="2023-01-01T00:00:00",
+        ),
+    }
+
+
+def chunked_chain(**chunking):
+    return ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(
+                name="summarizer",
+                input_mapping={"text": "initial_input.text", "topic": "initial_input.topic"},
+                chunking=ChunkingConfig(input_field="text", chunk_tokens=4, **chunking),
+            )
+        ],
+        final_output_mapping={"summary": "step_0.summary", "mentions": "step_0.mentions"},
+    )
+
+
+def summarize_chunk(*args, json, **kwargs):
+    step_input = codec.loads(json["messages"][1]["content"])
+    if "outputs" in step_input:
+        summaries = [output["summary"] for output in step_input["outputs"]]
+        content = {"summary": " | ".join(summaries), "mentions": len(summaries)}
+    else:
+        content = {"summary": step_input["text"].upper(), "mentions": 1}
+    return {"choices": [{"message": {"content": codec.dumps(content)}}]}
+
+
+def test_execute_chain_chunks_long_input(chain_executor, mock_db_manager, mock_web_client):
+    models = chunked_models()
+    mock_db_manager.get_prompt_model.side_effect = lambda name, version=None: models[name]
+    mock_web_client.post.side_effect = summarize_chunk
+
+    result = chain_executor.execute_chain(
+        chunked_chain(reducers={"mentions": "sum"}),
+        {"text": "one two three four five six seven", "topic": "news"},
+    )
+
+    assert result == {"summary": "ONE TWO THREE FOUR\nFIVE SIX SEVEN", "mentions": 2}
+    sent = [
+        call.kwargs["json"]["messages"][1]["content"]
+        for call in mock_web_client.post.call_args_list
+    ]
+    assert sorted(sent) == [
+        '{"text":"five six seven","topic":"news"}',
+        '{"text":"one two three four","topic":"news"}',
+    ]
+    assert chain_executor.metrics.counter("chunking.chunks", model="summarizer") == 2
+
+
+def test_execute_chain_reduces_chunks_with_a_model(
+    chain_executor, mock_db_manager, mock_web_client
+):
+    models = chunked_models()
+    mock_db_manager.get_prompt_model.side_effect = lambda name, version=None: models[name]
+    mock_web_client.post.side_effect = summarize_chunk
+
+    result = chain_executor.execute_chain(
+        chunked_chain(reduce_model="merger"),
+        {"text": "one two three four five six seven", "topic": "news"},
+    )
+
+    assert result == {"summary": "ONE TWO THREE FOUR | FIVE SIX SEVEN", "mentions": 2}
+    assert mock_web_client.post.call_count == 3
+
+
+def test_execute_chain_runs_short_input_as_one_chunk(
+    chain_executor, mock_db_manager, mock_web_client
+):
+    models = chunked_models()
+    mock_db_manager.get_prompt_model.side_effect = lambda name, version=None: models[name]
+    mock_web_client.post.side_effect = summarize_chunk
+
+    result = chain_executor.execute_chain(
+        chunked_chain(reduce_model="merger"), {"text": "one two", "topic": "news"}
+    )
+
+    assert result == {"summary": "ONE TWO", "mentions": 1}
+    assert mock_web_client.post.call_count == 1
+
+
+def test_execute_chain_runs_chunks_in_parallel(chain_executor, mock_db_manager, mock_web_client):
+    models = chunked_models()
+    mock_db_manager.get_prompt_model.side_effect = lambda name, version=None: models[name]
+    barrier = threading.Barrier(3, timeout=5)
+
+    def post(*args, **kwargs):
+        barrier.wait()
+        return summarize_chunk(*args, **kwargs)
+
+    mock_web_client.post.side_effect = post
+
+    result = chain_executor.execute_chain(
+        chunked_chain(max_parallel=3),
+        {"text": "one two three four five six seven eight nine ten", "topic": "news"},
+    )
+
+    assert result["mentions"] == 1
+    assert mock_web_client.post.call_count == 3
+
+
+def test_execute_chain_fails_when_a_chunk_fails(chain_executor, mock_db_manager, mock_web_client):
+    models = chunked_models()
+    mock_db_manager.get_prompt_model.side_effect = lambda name, version=None: models[name]
+
+    def post(*args, json, **kwargs):
+        if "five" in json["messages"][1]["content"]:
+            raise HTTPError("400 Client Error")
+        return summarize_chunk(json=json)
+
+    mock_web_client.post.side_effect = post
+
+    with pytest.raises(HTTPError):
+        chain_executor.execute_chain(
+            chunked_chain(), {"text": "one two three four five six seven", "topic": "news"}
+        )
+
+
+def test_run_chain_records_step_timeline(chain_executor, mock_db_manager, mock_web_client):
+    mock_db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="System prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="",
+        updated_at="",
+    )
+
+    def slow_post(*args, **kwargs):
+        time.sleep(0.02)
+        return {"choices": [{"message": {"content": '{"output": "Test output"}'}}]}
+
+    mock_web_client.post.side_effect = slow_post
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(name="test_model", input_mapping={"input": "initial_input.text"}),
+            ChainStep(name="test_model", input_mapping={"input": "previous_step.output"}),
+        ],
+        final_output_mapping={"result": "step_1.output"},
+    )
+
+    execution = chain_executor.run_chain(chain_config, {"text": "Hello"})
+
+    first, second = execution.steps
+    assert [phase.phase for phase in first.timeline] == [
+        "model_lookup",
+        "mapping",
+        "validator_build",
+        "input_validation",
+        "provider_call",
+        "parsing",
+        "validator_build",
+        "output_validation",
+    ]
+    provider_call = first.timeline[4]
+    assert provider_call.duration_ms >= 20
+    assert provider_call.duration_ms > first.latency_ms / 2
+    assert second.timeline[0].start_ms >= provider_call.start_ms + provider_call.duration_ms
@@ -0,0 +1,71 @@
+import pytest
+
+from prompt_chain.prompt_lib.chunking import reduce_outputs, split_text
+from prompt_chain.prompt_lib.token_estimator import estimate_tokens
+
+
+def test_split_text_keeps_short_text_whole():
+    assert split_text("A short text.", 10) == ["A short text."]
+
+
+def test_split_text_by_token_budget():
+    text = " ".join(f"word{i}" for i in range(100))
+
+    chunks = split_text(text, 30)
+
+    assert all(estimate_tokens(chunk) <= 30 for chunk in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_split_text_with_overlap():
+    text = "one two three four five six seven eight"
+
+    assert split_text(text, 4, overlap_tokens=2) == [
+        "one two three four",
+        "three four five six",
+        "five six seven eight",
+    ]
+
+
+def test_split_text_gives_an_overlong_token_its_own_chunk():
+    text = "a " + "x" * 60 + " b"
+
+    assert split_text(text, 3) == ["a", "x" * 60, "b"]
+
+
+def test_split_text_rejects_overlap_as_large_as_chunks():
+    with pytest.raises(ValueError, match="must be less than"):
+        split_text("text", 4, overlap_tokens=4)
+
+
+def test_reduce_outputs_with_default_reducers():
+    schema = {"summary": "str", "tags": ["str"], "found": "bool", "score": "float"}
+    outputs = [
+        {"summary": "First part.", "tags": ["a"], "found": False, "score": 0.5},
+        {"summary": "Second part.", "tags": ["b", "a"], "found": True, "score": 0.9},
+    ]
+
+    assert reduce_outputs(outputs, schema, {}) == {
+        "summary": "First part.\nSecond part.",
+        "tags": ["a", "b", "a"],
+        "found": True,
+        "score": 0.5,
+    }
+
+
+def test_reduce_outputs_with_declared_reducers():
+    schema = {"tags": ["str"], "count": "int", "score": "float", "label": "str", "ok": "bool"}
+    outputs = [
+        {"tags": ["a"], "count": 2, "score": 0.5, "label": "crime", "ok": True},
+        {"tags": ["b", "a"], "count": 3, "score": 1.0, "label": "sports", "ok": False},
+        {"tags": [], "count": 1, "score": 0.0, "label": "crime", "ok": True},
+    ]
+    reducers = {"tags": "unique", "count": "sum", "score": "mean", "label": "vote", "ok": "all"}
+
+    assert reduce_outputs(outputs, schema, reducers) == {
+        "tags": ["a", "b"],
+        "count": 6,
+        "score": 0.5,
+        "label": "crime",
+        "ok": False,
+    }
@@ -0,0 +1,45 @@
+import pytest
+
+from prompt_chain.prompt_lib.codec import OrjsonCodec, StdlibCodec, get_codec
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CODECS = [
+    StdlibCodec,
+    pytest.param(
+        OrjsonCodec, marks=pytest.mark.skipif(orjson is None, reason="orjson not installed")
+    ),
+]
+
+
+@pytest.mark.parametrize("codec_class", CODECS)
+def test_round_trip(codec_class):
+    codec = codec_class()
+    data = {"text": "Café ☕", "scores": [1, 2.5], "nested": {"flag": True, "empty": None}}
+
+    encoded = codec.dumps(data)
+
+    assert isinstance(encoded, bytes)
+    assert codec.loads(encoded) == data
+    assert codec.loads(encoded.decode("utf-8")) == data
+
+
+@pytest.mark.parametrize("codec_class", CODECS)
+def test_dumps_is_compact(codec_class):
+    assert codec_class().dumps({"a": [1, 2], "b": "é"}) == '{"a":[1,2],"b":"é"}'.encode()
+
+
+@pytest.mark.parametrize("codec_class", CODECS)
+def test_loads_invalid_json_raises_value_error(codec_class):
+    with pytest.raises(ValueError):
+        codec_class().loads("not json")
+
+
+def test_get_codec():
+    assert get_codec("json").name == "json"
+    assert get_codec("auto").name == ("orjson" if orjson is not None else "json")
+    with pytest.raises(ValueError, match="Unknown JSON codec: yaml"):
+        get_codec("yaml")
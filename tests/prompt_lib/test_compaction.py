@@ -0,0 +1,47 @@
+from prompt_chain.prompt_lib.compaction import compact, count_tokens, truncate
+from prompt_chain.prompt_lib.models import CompactionConfig
+from prompt_chain.prompt_lib.token_estimator import estimate_tokens
+
+DOCUMENT = " ".join(f"word{i}" for i in range(200))
+
+
+def test_compact_without_settings_keeps_input():
+    data = {"article": DOCUMENT, "meta": {"source": "web"}}
+
+    assert compact(data, CompactionConfig()) == data
+
+
+def test_compact_excludes_fields():
+    data = {"article": "text", "meta": {"source": "web", "raw_html": "<p>text</p>"}, "id": 1}
+    config = CompactionConfig(exclude=["id", "meta.raw_html"])
+
+    assert compact(data, config) == {"article": "text", "meta": {"source": "web"}}
+    assert "raw_html" in data["meta"]
+
+
+def test_compact_truncates_fields():
+    data = {"article": DOCUMENT, "comments": [DOCUMENT, "short"], "title": DOCUMENT}
+    config = CompactionConfig(max_field_tokens={"article": 20, "comments[]": 10})
+
+    result = compact(data, config)
+
+    assert estimate_tokens(result["article"]) <= 20
+    assert result["article"].startswith("word0 word1")
+    assert result["article"].endswith("…")
+    assert estimate_tokens(result["comments"][0]) <= 10
+    assert result["comments"][1] == "short"
+    assert result["title"] == DOCUMENT
+    assert count_tokens(result) < count_tokens(data)
+
+
+def test_truncate_short_text_is_unchanged():
+    assert truncate("a short text", 10) == "a short text"
+
+
+def test_truncate_middle_keeps_start_and_end():
+    result = truncate(DOCUMENT, 20, "middle")
+
+    assert result.startswith("word0 ")
+    assert result.endswith(" word199")
+    assert "…" in result
+    assert estimate_tokens(result) <= 20
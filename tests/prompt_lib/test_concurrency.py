@@ -0,0 +1,57 @@
+from prompt_chain.prompt_lib.concurrency import AIMDLimiter
+
+
+def test_limit_grows_additively_while_healthy():
+    limiter = AIMDLimiter(initial_limit=4, max_limit=10)
+
+    # About one more concurrent call for every window of `limit` successes.
+    for _ in range(5):
+        limiter.on_success(0.1, limiter.epoch)
+
+    assert limiter.limit == 5
+    assert limiter.metrics.gauge("provider.concurrency_limit") == 5
+
+
+def test_limit_is_capped():
+    limiter = AIMDLimiter(initial_limit=4, max_limit=5)
+
+    for _ in range(100):
+        limiter.on_success(0.1, limiter.epoch)
+
+    assert limiter.limit == 5
+
+
+def test_overload_cuts_limit_multiplicatively():
+    limiter = AIMDLimiter(initial_limit=16, min_limit=2, backoff=0.5)
+
+    limiter.on_overload(limiter.epoch, "rate_limited")
+    assert limiter.limit == 8
+    for _ in range(5):
+        limiter.on_overload(limiter.epoch, "timeout")
+
+    assert limiter.limit == 2
+    assert limiter.metrics.counter("provider.limit_decreases", reason="rate_limited") == 1
+    assert limiter.metrics.counter("provider.limit_decreases", reason="timeout") == 2
+
+
+def test_calls_started_before_a_cut_do_not_cut_again():
+    limiter = AIMDLimiter(initial_limit=16)
+    epoch = limiter.epoch
+
+    for _ in range(10):
+        limiter.on_overload(epoch, "rate_limited")
+
+    assert limiter.limit == 8
+
+
+def test_latency_inflation_cuts_limit():
+    limiter = AIMDLimiter(initial_limit=16, latency_tolerance=2.0, min_samples=10)
+    for _ in range(20):
+        limiter.on_success(0.1, limiter.epoch)
+    limit = limiter.limit
+
+    for _ in range(5):
+        limiter.on_success(1.0, limiter.epoch)
+
+    assert limiter.limit < limit
+    assert limiter.metrics.counter("provider.limit_decreases", reason="latency") >= 1
@@ -1,10 +1,14 @@
+from unittest.mock import patch
+
 import pytest
 from pydantic import ValidationError
+from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
 
-from prompt_chain.prompt_lib.db_manager import DatabaseManager
+from prompt_chain.prompt_lib.db_manager import DatabaseManager, model_hash
 from prompt_chain.prompt_lib.exceptions import DatabaseManagerException
-from prompt_chain.prompt_lib.models import Base, ChainConfig, PromptModel, PromptModelTable
+from prompt_chain.prompt_lib.models import ChainConfig, ChainStep, PromptModel
+from prompt_chain.prompt_lib.tables import Base, PromptModelTable
 from tests.conftest import TEST_DB_URL
 
 
@@ -42,6 +46,20 @@ def test_get_prompt_model(db_manager):
     assert model.system_prompt == "This is a test system prompt"
     assert model.user_prompt == {"input": "str"}
     assert model.response == {"output": "str"}
+    assert model.backends == []
+
+
+def test_get_prompt_model_backends(db_manager):
+    db_manager.add_prompt_model(
+        name="test_model",
+        system_prompt="This is a test system prompt",
+        user_prompt_schema={"input": "str"},
+        response_schema={"output": "str"},
+        backends=["gpt-4o-mini", "gpt-3.5-turbo"],
+    )
+
+    model = db_manager.get_prompt_model("test_model")
+    assert model.backends == ["gpt-4o-mini", "gpt-3.5-turbo"]
 
 
 def test_get_nonexistent_prompt_model(db_manager):
@@ -72,6 +90,122 @@ def test_get_nonexistent_chain_config(db_manager):
     assert config is None
 
 
+def add_test_model(db_manager):
+    db_manager.add_prompt_model(
+        name="test_model",
+        system_prompt="This is a test system prompt",
+        user_prompt_schema={"input": "str"},
+        response_schema={"output": "str"},
+    )
+
+
+def test_update_prompt_model_creates_version(db_manager):
+    add_test_model(db_manager)
+    first = db_manager.get_prompt_model("test_model")
+
+    updated = db_manager.update_prompt_model("test_model", system_prompt="A better prompt")
+
+    assert (first.version, updated.version) == (1, 2)
+    assert updated.hash != first.hash
+    assert updated.user_prompt == {"input": "str"}
+    assert db_manager.get_prompt_model("test_model").system_prompt == "A better prompt"
+    pinned = db_manager.get_prompt_model("test_model", first.hash)
+    assert pinned.system_prompt == "This is a test system prompt"
+    assert pinned.version == 1
+
+
+def test_update_prompt_model_without_changes_keeps_version(db_manager):
+    add_test_model(db_manager)
+
+    updated = db_manager.update_prompt_model("test_model", response_schema={"output": "str"})
+
+    assert updated.version == 1
+    assert len(db_manager.get_prompt_model_versions("test_model")) == 1
+
+
+def test_update_prompt_model_back_to_earlier_content(db_manager):
+    add_test_model(db_manager)
+    db_manager.update_prompt_model("test_model", system_prompt="A better prompt")
+
+    reverted = db_manager.update_prompt_model(
+        "test_model", system_prompt="This is a test system prompt"
+    )
+
+    assert reverted.version == 1
+    versions = db_manager.get_prompt_model_versions("test_model")
+    assert [version.version for version in versions] == [1, 2]
+
+
+def test_update_nonexistent_prompt_model(db_manager):
+    with pytest.raises(ValueError):
+        db_manager.update_prompt_model("nonexistent_model", system_prompt="Prompt")
+
+
+def test_get_nonexistent_prompt_model_version(db_manager):
+    add_test_model(db_manager)
+    assert db_manager.get_prompt_model("test_model", "0" * 64) is None
+
+
+def test_prompt_model_versions_are_cached(db_manager):
+    add_test_model(db_manager)
+    version_hash = db_manager.get_prompt_model("test_model").hash
+    model = db_manager.get_prompt_model("test_model", version_hash)
+
+    with patch.object(db_manager, "session_scope") as session_scope:
+        assert db_manager.get_prompt_model("test_model", version_hash) is model
+    session_scope.assert_not_called()
+
+
+def test_migrates_tables_of_an_older_release(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'old.db'}"
+    engine = create_engine(db_url)
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE prompt_models (id INTEGER PRIMARY KEY, name VARCHAR UNIQUE, "
+                "system_prompt VARCHAR, user_prompt JSON, response JSON, "
+                "created_at DATETIME DEFAULT CURRENT_TIMESTAMP, "
+                "updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO prompt_models (name, system_prompt, user_prompt, response) "
+                """VALUES ('old_model', 'Prompt', '{"input": "str"}', '{"output": "str"}')"""
+            )
+        )
+    engine.dispose()
+
+    db_manager = DatabaseManager(db_url)
+    model = db_manager.get_prompt_model("old_model")
+    assert model.version == 1
+    assert model.hash == model_hash("Prompt", {"input": "str"}, {"output": "str"})
+    assert db_manager.get_prompt_model("old_model", model.hash).version == 1
+
+    updated = db_manager.update_prompt_model("old_model", system_prompt="New prompt")
+    assert updated.version == 2
+    assert DatabaseManager(db_url).get_prompt_model("old_model").version == 2
+
+
+def test_add_chain_config_pins_model_versions(db_manager):
+    add_test_model(db_manager)
+    version_hash = db_manager.get_prompt_model("test_model").hash
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(name="test_model", input_mapping={"input": "initial_input.input"}),
+            ChainStep(name="missing_model", input_mapping={"input": "initial_input.input"}),
+        ],
+        final_output_mapping={},
+    )
+
+    db_manager.add_chain_config(chain_config)
+    db_manager.update_prompt_model("test_model", system_prompt="A better prompt")
+
+    steps = db_manager.get_chain_config("test_chain").steps
+    assert [step.model_version for step in steps] == [version_hash, None]
+
+
 def test_validate_user_input(db_manager):
     db_manager.add_prompt_model(
         name="test_model",
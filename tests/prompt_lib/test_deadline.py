@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+from prompt_chain.prompt_lib.deadline import Deadline
+from prompt_chain.prompt_lib.exceptions import DeadlineExceededException
+
+
+def test_deadline_without_budget_never_expires():
+    deadline = Deadline()
+
+    assert deadline.remaining() is None
+    assert deadline.expired() is False
+    assert deadline.timeout() is None
+    assert deadline.timeout(5.0, None) == 5.0
+    deadline.check("step 1")
+
+
+def test_deadline_timeout_is_capped_by_remaining_budget():
+    deadline = Deadline(10.0)
+
+    assert deadline.timeout(5.0) == 5.0
+    assert 9.0 < deadline.timeout(30.0) <= 10.0
+    assert 9.0 < deadline.timeout(None) <= 10.0
+
+
+def test_expired_deadline():
+    deadline = Deadline(0.01)
+    time.sleep(0.02)
+
+    assert deadline.expired() is True
+    assert deadline.remaining() == 0.0
+    with pytest.raises(DeadlineExceededException, match="Deadline exceeded before step 2"):
+        deadline.check("step 2")
+
+
+def test_expired_deadline_never_gives_a_zero_timeout():
+    deadline = Deadline(0.01)
+    time.sleep(0.02)
+
+    with pytest.raises(DeadlineExceededException, match="Deadline exceeded before the call"):
+        deadline.timeout(5.0)
+    with pytest.raises(DeadlineExceededException, match="before calling gpt-4o"):
+        deadline.timeout(action="calling gpt-4o")
@@ -0,0 +1,233 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from prompt_chain.prompt_lib.endpoint_pool import Endpoint, EndpointPool, endpoints_from_config
+from prompt_chain.prompt_lib.provider_client import ProviderClient
+from prompt_chain.prompt_lib.web_client import WebClient
+
+
+class StubProvider:
+    """A local chat completions endpoint that answers with a fixed status."""
+
+    def __init__(self, status=200):
+        self.status = status
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                stub.requests.append((self.headers["Authorization"], json.loads(body)))
+                payload = json.dumps(
+                    {"choices": [{"message": {"content": '{"output": "ok"}'}}]}
+                ).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/chat/completions"
+        threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        ).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stubs():
+    providers = []
+
+    def start(status=200):
+        provider = StubProvider(status)
+        providers.append(provider)
+        return provider
+
+    yield start
+    for provider in providers:
+        provider.close()
+
+
+def make_pool(*names, **kwargs):
+    return EndpointPool(
+        [Endpoint(name, f"http://{name}", f"key_{name}") for name in names], **kwargs
+    )
+
+
+def test_picks_endpoint_with_fewest_outstanding_calls():
+    pool = make_pool("a", "b")
+
+    first = pool.acquire()
+    second = pool.acquire()
+    pool.release(first, success=True)
+    third = pool.acquire()
+
+    assert {first.name, second.name} == {"a", "b"}
+    assert third is first
+
+
+def test_rotates_between_idle_endpoints():
+    pool = make_pool("a", "b", "c")
+    names = []
+    for _ in range(6):
+        endpoint = pool.acquire()
+        names.append(endpoint.name)
+        pool.release(endpoint, success=True)
+
+    assert sorted(names) == ["a", "a", "b", "b", "c", "c"]
+
+
+def test_rate_limited_endpoint_is_skipped():
+    pool = EndpointPool(
+        [
+            Endpoint("slow", "http://slow", "key", requests_per_minute=60),
+            Endpoint("fast", "http://fast", "key"),
+        ]
+    )
+    pool.acquire()
+    names = {pool.acquire().name for _ in range(3)}
+
+    assert names == {"fast"}
+
+
+def test_waits_for_rate_limit_and_times_out():
+    pool = EndpointPool([Endpoint("a", "http://a", "key", requests_per_minute=60)])
+    pool.acquire()
+
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    assert time.monotonic() - start < 1
+    assert pool.metrics.counter("endpoint.rate_limited_waits") >= 1
+
+
+def test_429_uses_up_remaining_requests():
+    pool = EndpointPool([Endpoint("a", "http://a", "key", requests_per_minute=600)])
+    endpoint = pool.acquire()
+    pool.release(endpoint, success=False, rate_limited=True)
+
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.01)
+
+
+def test_ejects_failing_endpoint_and_readmits_on_probation():
+    pool = make_pool("bad", "good", max_failures=2, ejection_seconds=0.05)
+    bad = pool.endpoints[0]
+    for _ in range(2):
+        bad.outstanding += 1
+        pool.release(bad, success=False)
+
+    assert pool.metrics.gauge("endpoint.healthy", endpoint="bad") == 0
+    assert {pool.acquire().name for _ in range(4)} == {"good"}
+
+    time.sleep(0.06)
+    pool.acquire()
+    assert bad.on_probation
+    assert pool.metrics.gauge("endpoint.healthy", endpoint="bad") == 1
+
+    # A single failure on probation ejects it again, for twice as long.
+    bad.outstanding += 1
+    pool.release(bad, success=False)
+    assert bad.ejected_until - time.monotonic() > 0.05
+    assert pool.metrics.counter("endpoint.ejections", endpoint="bad") == 2
+
+
+def test_success_on_probation_restores_endpoint():
+    pool = make_pool("a", max_failures=1, ejection_seconds=0.01)
+    endpoint = pool.acquire()
+    pool.release(endpoint, success=False)
+    time.sleep(0.02)
+
+    endpoint = pool.acquire()
+    pool.release(endpoint, success=True)
+
+    assert not endpoint.on_probation
+    assert endpoint.ejections == 0
+
+
+def test_fails_open_when_every_endpoint_is_ejected():
+    pool = make_pool("a", "b", max_failures=1, ejection_seconds=60)
+    for endpoint in pool.endpoints:
+        endpoint.outstanding += 1
+        pool.release(endpoint, success=False)
+
+    assert pool.acquire().name == "a"
+
+
+def test_endpoints_from_config(monkeypatch):
+    monkeypatch.setenv("SECOND_KEY", "key_2")
+
+    endpoints = endpoints_from_config(
+        [
+            {"url": "http://a", "api_key": "key_1", "requests_per_minute": 3500},
+            {"name": "backup", "url": "http://b", "api_key_env": "SECOND_KEY"},
+        ]
+    )
+
+    assert [(e.name, e.url, e.api_key) for e in endpoints] == [
+        ("endpoint_0", "http://a", "key_1"),
+        ("backup", "http://b", "key_2"),
+    ]
+    assert endpoints[0].requests_per_minute == 3500
+    with pytest.raises(ValueError):
+        endpoints_from_config([{"api_key": "key"}])
+
+
+def test_provider_client_spreads_calls_across_stub_endpoints(stubs):
+    first, second = stubs(), stubs()
+    pool = EndpointPool(
+        [Endpoint("first", first.url, "key_1"), Endpoint("second", second.url, "key_2")]
+    )
+    client = ProviderClient(WebClient(), None, pool=pool)
+
+    for _ in range(4):
+        client.chat({"model": "test", "messages": []}, timeout=5)
+
+    assert len(first.requests) == 2
+    assert len(second.requests) == 2
+    assert {auth for auth, _ in first.requests} == {"Bearer key_1"}
+    assert {auth for auth, _ in second.requests} == {"Bearer key_2"}
+
+
+def test_provider_client_routes_around_failing_stub_endpoint(stubs):
+    broken, healthy = stubs(status=500), stubs()
+    pool = EndpointPool(
+        [Endpoint("broken", broken.url, "key"), Endpoint("healthy", healthy.url, "key")],
+        max_failures=2,
+    )
+    client = ProviderClient(WebClient(), None, pool=pool)
+
+    failures = 0
+    for _ in range(8):
+        try:
+            client.chat({"model": "test", "messages": []}, timeout=5)
+        except requests.HTTPError:
+            failures += 1
+
+    assert failures == 2
+    assert len(broken.requests) == 2
+    assert len(healthy.requests) == 6
+    assert pool.metrics.counter("endpoint.ejections", endpoint="broken") == 1
+
+
+def test_client_errors_do_not_eject_endpoint(stubs):
+    stub = stubs(status=400)
+    pool = EndpointPool([Endpoint("a", stub.url, "key")], max_failures=1)
+    client = ProviderClient(WebClient(), None, pool=pool)
+
+    with pytest.raises(requests.HTTPError):
+        client.chat({"model": "test", "messages": []}, timeout=5)
+
+    assert pool.metrics.gauge("endpoint.healthy", endpoint="a") == 1
@@ -0,0 +1,129 @@
+import math
+import random
+
+import pytest
+
+from prompt_chain.prompt_lib.exceptions import SchemaValidationException
+from prompt_chain.prompt_lib.fast_validators import compile_fast_validator
+from prompt_chain.prompt_lib.validators import compile_validator
+
+PRIMITIVE_VALUES = [
+    *[True, False, None, 0, 1, 2, -1, 1.0, 0.0, 1.5, -0.0, 2.0**62, 2.0**63, -(2.0**63)],
+    *[10**30, 10**400, math.inf, -math.inf, math.nan],
+    *["", "  ", "abc", "1", "0", "-1", "+1", " 1 ", "01", "1_000", "1__0", "_1", "1_"],
+    *["1.0", "1.00", "1.", ".5", "5.", "1.5", "1e3", "1E-2", "1.0e0", "0x10", "1,000", "١"],
+    *["inf", "-Infinity", "NaN", "nan ", "infinit", "1e400"],
+    *["true", "True", "YES", "off", "t", "f", "y", "n", "on", "no", "false", " true"],
+    *[[], [1], {}, {"a": 1}],
+]
+
+SCHEMAS = [
+    {"value": "str"},
+    {"value": "int"},
+    {"value": "float"},
+    {"value": "bool"},
+    {"value": "any"},
+    {"value": ["int"]},
+    {"value": []},
+    {"value": ("int", "str")},
+    {"value": ()},
+    {"value": {"inner": "bool"}},
+]
+
+
+def assert_same(expected, actual):
+    """Compare values including their types, since 1 == 1.0 == True."""
+    assert type(expected) is type(actual), (expected, actual)
+    if isinstance(expected, dict):
+        assert expected.keys() == actual.keys()
+        for key in expected:
+            assert_same(expected[key], actual[key])
+    elif isinstance(expected, (list, tuple)):
+        assert len(expected) == len(actual)
+        for expected_item, actual_item in zip(expected, actual):
+            assert_same(expected_item, actual_item)
+    elif isinstance(expected, float) and math.isnan(expected):
+        assert math.isnan(actual)
+    else:
+        assert expected == actual
+
+
+def assert_engines_agree(schema, data):
+    pydantic_validator = compile_validator(schema, engine="pydantic")
+    fast_validator = compile_validator(schema, engine="fast")
+    try:
+        expected = pydantic_validator(data)
+    except ValueError:
+        with pytest.raises(SchemaValidationException):
+            fast_validator(data)
+    else:
+        assert_same(expected, fast_validator(data))
+
+
+@pytest.mark.parametrize("schema", SCHEMAS)
+@pytest.mark.parametrize("value", PRIMITIVE_VALUES, ids=repr)
+def test_engines_agree_on_values(schema, value):
+    assert_engines_agree(schema, {"value": value})
+
+
+def random_schema(rng, depth=0):
+    kind = rng.choice(
+        ["str", "int", "float", "bool", "any", "list", "tuple", "dict"][: 5 + 3 * (depth < 2)]
+    )
+    if kind == "list":
+        return [random_schema(rng, depth + 1)] if rng.random() < 0.9 else []
+    if kind == "tuple":
+        return tuple(random_schema(rng, depth + 1) for _ in range(rng.randint(0, 3)))
+    if kind == "dict":
+        return {f"field_{i}": random_schema(rng, depth + 1) for i in range(rng.randint(0, 3))}
+    return kind
+
+
+def random_value(rng, schema):
+    """Generate a value that mostly matches the schema, with occasional mismatches."""
+    if rng.random() < 0.1:
+        return rng.choice(PRIMITIVE_VALUES)
+    if isinstance(schema, dict):
+        value = {key: random_value(rng, field) for key, field in schema.items()}
+        if value and rng.random() < 0.1:
+            value.pop(rng.choice(list(value)))
+        if rng.random() < 0.1:
+            value["extra"] = "ignored"
+        return value
+    if isinstance(schema, list):
+        items = [
+            random_value(rng, schema[0] if schema else "any") for _ in range(rng.randint(0, 3))
+        ]
+        return tuple(items) if rng.random() < 0.2 else items
+    if isinstance(schema, tuple):
+        items = [random_value(rng, item) for item in schema]
+        if rng.random() < 0.1:
+            items.append(1)
+        return items
+    return rng.choice(PRIMITIVE_VALUES)
+
+
+def test_engines_agree_on_random_schemas():
+    rng = random.Random(1234)
+    for _ in range(300):
+        schema = {f"field_{i}": random_schema(rng) for i in range(rng.randint(1, 4))}
+        for _ in range(5):
+            assert_engines_agree(schema, random_value(rng, schema))
+
+
+def test_fast_validator_reports_all_errors():
+    validate = compile_fast_validator({"name": "str", "scores": ["float"]}, "test_model_Input")
+
+    with pytest.raises(SchemaValidationException) as exc_info:
+        validate({"scores": [1.0, "high"]})
+
+    assert str(exc_info.value) == (
+        "2 validation errors for test_model_Input\n"
+        "name\n  Field required\n"
+        "scores.1\n  Input should be a valid number"
+    )
+
+
+def test_fast_validator_unsupported_type():
+    with pytest.raises(ValueError, match="Unsupported primitive type: date"):
+        compile_fast_validator({"when": "date"})
@@ -0,0 +1,216 @@
+import json
+import os
+from unittest.mock import Mock, patch
+
+import pytest
+
+from prompt_chain.prompt_lib.chain_executor import ChainExecutor
+from prompt_chain.prompt_lib.db_manager import model_hash
+from prompt_chain.prompt_lib.exceptions import CatalogImportException
+from prompt_chain.prompt_lib.file_catalog import FileCatalog, load_catalog
+from prompt_chain.prompt_lib.metrics import Metrics
+
+MODEL = {
+    "kind": "model",
+    "name": "summarizer",
+    "system_prompt": "Summarize the text",
+    "user_prompt_schema": {"text": "str"},
+    "response_schema": {"summary": "str"},
+}
+CHAIN = {
+    "kind": "chain",
+    "name": "summary_chain",
+    "steps": [{"name": "summarizer", "input_mapping": {"text": "initial_input.text"}}],
+    "final_output_mapping": {"summary": "step_0.summary"},
+}
+MODEL_HASH = model_hash("Summarize the text", {"text": "str"}, {"summary": "str"}, [])
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content if isinstance(content, str) else json.dumps(content))
+
+
+def touch_later(path):
+    """Move a file's modification time forward, so a rewrite is seen as a change."""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_load_catalog_reads_json_jsonl_and_nested_files(tmp_path):
+    write(tmp_path / "models.jsonl", json.dumps(MODEL) + "\n\n")
+    write(tmp_path / "chains" / "summary.json", [CHAIN])
+    write(tmp_path / "README.md", "not a catalog file")
+
+    index = load_catalog(tmp_path)
+
+    model = index.models["summarizer"]
+    assert model.user_prompt == {"text": "str"}
+    assert model.version == 1
+    assert model.hash == MODEL_HASH
+    assert list(index.chains) == ["summary_chain"]
+
+
+def test_load_catalog_pins_steps_to_the_catalog_version(tmp_path):
+    write(tmp_path / "catalog.json", [MODEL, CHAIN])
+
+    index = load_catalog(tmp_path)
+
+    assert index.chains["summary_chain"].steps[0].model_version == MODEL_HASH
+
+
+def test_load_catalog_reports_every_error(tmp_path):
+    write(tmp_path / "a.json", [MODEL, {**MODEL, "user_prompt_schema": {"text": "string"}}])
+    write(tmp_path / "b.jsonl", json.dumps(MODEL) + "\nnot json\n")
+    write(tmp_path / "c.json", {**CHAIN, "steps": [{"name": "unknown", "input_mapping": {}}]})
+    write(tmp_path / "d.json", "[1]")
+
+    with pytest.raises(CatalogImportException) as exc_info:
+        load_catalog(tmp_path)
+
+    errors = exc_info.value.errors
+    assert len(errors) == 5
+    assert errors[0].startswith(f"{tmp_path / 'a.json'}[1]: ")
+    assert errors[1].startswith(f"{tmp_path / 'b.jsonl'}:2: Invalid JSON")
+    assert "duplicate model summarizer" in errors[2]
+    assert errors[3] == f"{tmp_path / 'd.json'}[0]: Expected an object"
+    assert "uses unknown model unknown" in errors[4]
+
+
+def test_load_catalog_rejects_a_pin_to_another_version(tmp_path):
+    pinned = {**CHAIN, "steps": [{**CHAIN["steps"][0], "model_version": "abc"}]}
+    write(tmp_path / "catalog.json", [MODEL, pinned])
+
+    with pytest.raises(CatalogImportException) as exc_info:
+        load_catalog(tmp_path)
+
+    assert "pins model summarizer to version abc" in exc_info.value.errors[0]
+
+
+def test_load_catalog_type_checks_chains(tmp_path):
+    mistyped = {
+        **CHAIN,
+        "final_output_mapping": {},
+        "steps": [{"name": "summarizer", "input_mapping": {}}],
+    }
+    write(tmp_path / "catalog.json", [MODEL, mistyped])
+
+    with pytest.raises(CatalogImportException) as exc_info:
+        load_catalog(tmp_path)
+
+    assert exc_info.value.errors == [
+        f"{tmp_path / 'catalog.json'}[1]: Step 0 (summarizer): required input text is not mapped"
+    ]
+
+
+def test_load_catalog_rejects_a_missing_directory(tmp_path):
+    with pytest.raises(CatalogImportException, match="does not exist"):
+        load_catalog(tmp_path / "missing")
+
+
+def test_load_catalog_reads_yaml(tmp_path):
+    pytest.importorskip("yaml")
+    write(
+        tmp_path / "summarizer.yaml",
+        "kind: model\n"
+        "name: summarizer\n"
+        "system_prompt: Summarize the text\n"
+        "user_prompt_schema: {text: str}\n"
+        "response_schema: {summary: str}\n",
+    )
+
+    assert load_catalog(tmp_path).models["summarizer"].hash == MODEL_HASH
+
+
+def test_load_catalog_reports_yaml_without_pyyaml(tmp_path):
+    write(tmp_path / "summarizer.yml", "kind: model")
+
+    with patch("prompt_chain.prompt_lib.file_catalog.yaml", None):
+        with pytest.raises(CatalogImportException) as exc_info:
+            load_catalog(tmp_path)
+
+    assert "PyYAML is not installed" in exc_info.value.errors[0]
+
+
+def test_file_catalog_serves_the_index(tmp_path):
+    write(tmp_path / "catalog.json", [MODEL, CHAIN])
+    catalog = FileCatalog(tmp_path, reload_interval=0)
+
+    assert catalog.get_all_models() == ["summarizer"]
+    assert catalog.get_prompt_model("summarizer").hash == MODEL_HASH
+    assert catalog.get_prompt_model("summarizer", MODEL_HASH).name == "summarizer"
+    assert catalog.get_prompt_model("summarizer", "other") is None
+    assert catalog.get_prompt_model("unknown") is None
+    assert catalog.get_all_chain_configs() == ["summary_chain"]
+    assert catalog.get_chain_config("summary_chain").name == "summary_chain"
+
+
+def test_file_catalog_raises_on_an_invalid_catalog(tmp_path):
+    write(tmp_path / "catalog.json", [CHAIN])
+
+    with pytest.raises(CatalogImportException):
+        FileCatalog(tmp_path, reload_interval=0)
+
+
+def test_reload_swaps_in_changed_files(tmp_path):
+    path = tmp_path / "catalog.json"
+    write(path, [MODEL, CHAIN])
+    metrics = Metrics()
+    catalog = FileCatalog(tmp_path, reload_interval=0, metrics=metrics)
+    old_index = catalog.index
+
+    assert catalog.reload() is False
+
+    write(path, [{**MODEL, "system_prompt": "Summarize briefly"}, CHAIN])
+    touch_later(path)
+    assert catalog.reload() is True
+
+    assert catalog.get_prompt_model("summarizer").system_prompt == "Summarize briefly"
+    assert old_index.models["summarizer"].system_prompt == "Summarize the text"
+    new_hash = catalog.get_prompt_model("summarizer").hash
+    assert catalog.get_chain_config("summary_chain").steps[0].model_version == new_hash
+    assert metrics.counter("catalog.reloads", status="ok") == 1
+
+
+def test_reload_keeps_the_last_valid_catalog(tmp_path):
+    path = tmp_path / "catalog.json"
+    write(path, [MODEL, CHAIN])
+    metrics = Metrics()
+    catalog = FileCatalog(tmp_path, reload_interval=0, metrics=metrics)
+
+    write(path, [CHAIN])
+    touch_later(path)
+    assert catalog.reload() is False
+
+    assert catalog.get_prompt_model("summarizer").hash == MODEL_HASH
+    assert metrics.counter("catalog.reloads", status="failed") == 1
+
+
+def test_file_catalog_reloads_in_the_background(tmp_path):
+    path = tmp_path / "catalog.json"
+    write(path, [MODEL])
+    catalog = FileCatalog(tmp_path, reload_interval=0.01)
+    try:
+        write(tmp_path / "chains.json", [CHAIN])
+        touch_later(tmp_path / "chains.json")
+        for _ in range(500):
+            if catalog.get_chain_config("summary_chain"):
+                break
+            catalog._stopped.wait(0.01)
+        assert catalog.get_chain_config("summary_chain") is not None
+    finally:
+        catalog.close()
+
+
+def test_executor_reads_models_from_the_file_catalog(tmp_path):
+    write(tmp_path / "catalog.json", [MODEL, CHAIN])
+    catalog = FileCatalog(tmp_path, reload_interval=0)
+    db_manager = Mock()
+    web_client = Mock()
+    web_client.post.return_value = {"choices": [{"message": {"content": '{"summary": "Short"}'}}]}
+    executor = ChainExecutor(db_manager, web_client, "fake_api_key", model_source=catalog)
+
+    result = executor.execute_chain(catalog.get_chain_config("summary_chain"), {"text": "Long"})
+
+    assert result == {"summary": "Short"}
+    db_manager.get_prompt_model.assert_not_called()
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from prompt_chain.prompt_lib.hedging import Hedger, LatencyTracker
+from prompt_chain.prompt_lib.metrics import Metrics
+
+
+@pytest.fixture
+def hedger():
+    hedger = Hedger(percentile=0.9, max_hedge_rate=1.0, min_samples=5, metrics=Metrics())
+    for _ in range(10):
+        hedger.latencies.record("test_model", 0.01)
+    yield hedger
+    hedger.close()
+
+
+def test_latency_tracker_percentile():
+    tracker = LatencyTracker(window=10)
+    assert tracker.percentile("model", 0.5) is None
+
+    for latency in range(1, 21):
+        tracker.record("model", latency)
+
+    assert tracker.percentile("model", 0.5) == 15
+    assert tracker.percentile("model", 1.0) == 20
+    assert tracker.percentile("model", 0.5, min_samples=11) is None
+
+
+def test_call_without_enough_samples_is_not_hedged():
+    hedger = Hedger(min_samples=5)
+
+    assert hedger.call("test_model", lambda: "result") == "result"
+    assert hedger.metrics.counter("hedging.hedges_sent", model="test_model") == 0
+    assert hedger.latencies.percentile("test_model", 1.0) is not None
+
+
+def test_fast_call_is_not_hedged(hedger):
+    assert hedger.call("test_model", lambda: "result") == "result"
+    assert hedger.metrics.counter("hedging.hedges_sent", model="test_model") == 0
+
+
+def test_slow_call_is_hedged_and_hedge_wins(hedger):
+    calls = []
+    release_primary = threading.Event()
+
+    def call():
+        calls.append(None)
+        if len(calls) == 1:
+            release_primary.wait(1)
+            return "primary"
+        return "hedge"
+
+    assert hedger.call("test_model", call) == "hedge"
+    release_primary.set()
+    assert hedger.metrics.counter("hedging.hedges_sent", model="test_model") == 1
+    assert hedger.metrics.counter("hedging.hedges_won", model="test_model") == 1
+
+
+def test_failed_hedge_falls_back_to_primary(hedger):
+    calls = []
+
+    def call():
+        calls.append(None)
+        if len(calls) == 1:
+            time.sleep(0.1)
+            return "primary"
+        raise ValueError("Invalid response")
+
+    assert hedger.call("test_model", call) == "primary"
+    assert hedger.metrics.counter("hedging.hedges_won", model="test_model") == 0
+
+
+def test_both_attempts_failing_raises(hedger):
+    def call():
+        time.sleep(0.05)
+        raise ValueError("Invalid response")
+
+    with pytest.raises(ValueError, match="Invalid response"):
+        hedger.call("test_model", call)
+
+
+def test_hedge_rate_is_capped():
+    hedger = Hedger(percentile=0.5, max_hedge_rate=0.0, min_samples=1)
+    hedger.latencies.record("test_model", 0.001)
+    hedger._tokens = 0.0
+
+    def call():
+        time.sleep(0.02)
+        return "result"
+
+    assert hedger.call("test_model", call) == "result"
+    assert hedger.metrics.counter("hedging.hedges_sent", model="test_model") == 0
+    hedger.close()
+
+
+def test_hedged_call_times_out(hedger):
+    def call():
+        time.sleep(0.2)
+        return "result"
+
+    with pytest.raises(TimeoutError):
+        hedger.call("test_model", call, timeout=0.05)
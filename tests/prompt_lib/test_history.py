@@ -0,0 +1,160 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from prompt_chain.prompt_lib.db_manager import DatabaseManager
+from prompt_chain.prompt_lib.history import ExecutionHistory
+from prompt_chain.prompt_lib.models import ExecutionRecord, StepRecord, TimelinePhase
+from prompt_chain.prompt_lib.tables import Base, ExecutionTable
+from tests.conftest import TEST_DB_URL
+
+
+@pytest.fixture(scope="function")
+def db_manager():
+    manager = DatabaseManager(TEST_DB_URL)
+    yield manager
+    Base.metadata.drop_all(manager.engine)
+
+
+@pytest.fixture
+def history(db_manager):
+    return ExecutionHistory(db_manager, flush_interval=60, flush_size=100)
+
+
+def make_execution(execution_id, chain_name="test_chain", started_at="2024-01-01T00:00:00"):
+    return ExecutionRecord(
+        id=execution_id,
+        chain_name=chain_name,
+        started_at=started_at,
+        input={"text": "hello"},
+        status="completed",
+        output={"result": "world"},
+        latency_ms=12.5,
+        tenant_id="acme",
+        priority="batch",
+        steps=[
+            StepRecord(
+                step_index=0,
+                model_name="test_model",
+                input={"input": "hello"},
+                output={"output": "world"},
+                latency_ms=10.0,
+            )
+        ],
+    )
+
+
+def test_record_is_buffered_until_flush(history):
+    history.record(make_execution("a"))
+
+    assert history.get_recent_executions("test_chain") == []
+    assert history.flush() == 1
+
+    executions = history.get_recent_executions("test_chain")
+    assert executions == [make_execution("a")]
+    assert history.metrics.counter("history.written") == 1
+
+
+def test_get_execution_with_its_timeline(history):
+    execution = make_execution("a")
+    execution.steps[0].timeline = [
+        TimelinePhase("model_lookup", 0.1, 0.5),
+        TimelinePhase("provider_call", 0.9, 8.2),
+    ]
+    history.record(execution)
+
+    assert history.get_execution("a") is execution
+    history.flush()
+    assert history.get_execution("a") == execution
+    assert history.get_execution("missing") is None
+
+
+def test_get_recent_executions_newest_first(history):
+    history.record(make_execution("a", started_at="2024-01-01T00:00:00"))
+    history.record(make_execution("b", started_at="2024-01-02T00:00:00"))
+    history.record(make_execution("c", started_at="2024-01-03T00:00:00"))
+    history.record(make_execution("d", chain_name="other_chain"))
+    history.flush()
+
+    executions = history.get_recent_executions("test_chain", limit=2)
+
+    assert [execution.id for execution in executions] == ["c", "b"]
+    assert all(len(execution.steps) == 1 for execution in executions)
+
+
+def test_get_busiest_chains(history):
+    for i, chain_name in enumerate(["a", "b", "b", "c", "c", "c"]):
+        history.record(make_execution(str(i), chain_name, f"2024-01-0{i + 1}T00:00:00"))
+    history.record(make_execution("old", "a", "2023-12-01T00:00:00"))
+    history.record(make_execution("older", "a", "2023-11-01T00:00:00"))
+    history.flush()
+
+    assert history.get_busiest_chains(2) == ["a", "c"]
+    assert history.get_busiest_chains(2, since=datetime(2024, 1, 1)) == ["c", "b"]
+
+
+def test_flush_writes_in_one_transaction(history, db_manager):
+    for i in range(10):
+        history.record(make_execution(str(i)))
+    history.flush()
+
+    with db_manager.session_scope() as session:
+        assert session.query(ExecutionTable).count() == 10
+
+
+def test_payload_truncation(db_manager):
+    history = ExecutionHistory(db_manager, flush_interval=60, max_payload_bytes=10)
+    history.record(make_execution("a"))
+    history.flush()
+
+    execution = history.get_recent_executions("test_chain")[0]
+
+    assert execution.input == '{"text":"h...[truncated]'
+    assert execution.steps[0].output == '{"output":...[truncated]'
+
+
+def test_payload_compression(db_manager):
+    history = ExecutionHistory(db_manager, flush_interval=60, compress=True)
+    history.record(make_execution("a"))
+    history.flush()
+
+    with db_manager.session_scope() as session:
+        row = session.get(ExecutionTable, "a")
+        assert row.compressed is True
+        assert row.input != b'{"text":"hello"}'
+    assert history.get_recent_executions("test_chain") == [make_execution("a")]
+
+
+def test_buffer_drops_oldest_when_full(history):
+    history.max_buffer_size = 2
+    for execution_id in ["a", "b", "c"]:
+        history.record(make_execution(execution_id))
+    history.flush()
+
+    ids = {execution.id for execution in history.get_recent_executions("test_chain")}
+    assert ids == {"b", "c"}
+    assert history.metrics.counter("history.dropped") == 1
+
+
+def test_background_flush_on_size_threshold(tmp_path):
+    db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'history.db'}")
+    history = ExecutionHistory(db_manager, flush_interval=60, flush_size=2)
+
+    history.record(make_execution("a"))
+    history.record(make_execution("b"))
+    deadline = time.monotonic() + 5
+    while history.metrics.counter("history.written") < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert len(history.get_recent_executions("test_chain")) == 2
+
+
+def test_close_flushes_buffer(tmp_path):
+    db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'history.db'}")
+    history = ExecutionHistory(db_manager, flush_interval=60)
+
+    history.record(make_execution("a"))
+    history.close()
+
+    assert len(history.get_recent_executions("test_chain")) == 1
@@ -0,0 +1,163 @@
+import threading
+import time
+
+import pytest
+
+from prompt_chain.prompt_lib.db_manager import DatabaseManager
+from prompt_chain.prompt_lib.exceptions import (
+    IdempotencyKeyInProgressException,
+    IdempotencyKeyMismatchException,
+)
+from prompt_chain.prompt_lib.idempotency import (
+    COMPLETED,
+    IN_PROGRESS,
+    DatabaseIdempotencyStore,
+    IdempotencyManager,
+    InMemoryIdempotencyStore,
+    fingerprint,
+)
+
+
+@pytest.fixture(params=["memory", "db"])
+def store(request, tmp_path):
+    if request.param == "db":
+        # A file database, since requests running in other threads share the store.
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'idempotency.db'}")
+        return DatabaseIdempotencyStore(db_manager, ttl=60, lock_timeout=60)
+    return InMemoryIdempotencyStore(ttl=60, lock_timeout=60)
+
+
+def test_fingerprint_ignores_key_order():
+    assert fingerprint("execute_chain", {"a": 1, "b": 2}) == fingerprint(
+        "execute_chain", {"b": 2, "a": 1}
+    )
+    assert fingerprint("execute_chain", {"a": 1}) != fingerprint("call_openai", {"a": 1})
+
+
+def test_store_claim_complete_release(store):
+    assert store.claim("key", "fp") is None
+
+    existing = store.claim("key", "fp")
+    assert existing.status == IN_PROGRESS
+
+    store.complete("key", 200, {"result": "ok"})
+    existing = store.claim("key", "fp")
+    assert existing.status == COMPLETED
+    assert existing.status_code == 200
+    assert existing.response == {"result": "ok"}
+
+    store.release("key")
+    assert store.claim("key", "fp") is None
+
+
+def test_store_expired_claim_can_be_reclaimed(store):
+    store.lock_timeout = 0
+    assert store.claim("key", "fp") is None
+    assert store.claim("key", "fp") is None
+
+
+def test_store_completed_response_expires(store):
+    store.ttl = 0
+    store.claim("key", "fp")
+    store.complete("key", 200, {"result": "ok"})
+
+    assert store.claim("key", "fp") is None
+
+
+def test_manager_replays_completed_response(store):
+    manager = IdempotencyManager(store)
+    calls = []
+
+    def handler():
+        calls.append(1)
+        return 200, {"result": len(calls)}
+
+    assert manager.run("key", "fp", handler) == (200, {"result": 1})
+    assert manager.run("key", "fp", handler) == (200, {"result": 1})
+    assert len(calls) == 1
+    assert manager.metrics.counter("idempotency.replayed") == 1
+
+
+def test_manager_rejects_key_reused_for_another_request(store):
+    manager = IdempotencyManager(store)
+    manager.run("key", "fp", lambda: (200, {}))
+
+    with pytest.raises(IdempotencyKeyMismatchException):
+        manager.run("key", "other", lambda: (200, {}))
+
+
+def test_manager_stores_deterministic_client_errors_only(store):
+    manager = IdempotencyManager(store)
+
+    assert manager.run("client", "fp", lambda: (404, {"detail": "missing"})) == (
+        404,
+        {"detail": "missing"},
+    )
+    assert manager.run("client", "fp", lambda: (200, {})) == (404, {"detail": "missing"})
+
+    assert manager.run("server", "fp", lambda: (504, {"detail": "timeout"}))[0] == 504
+    assert manager.run("server", "fp", lambda: (200, {})) == (200, {})
+
+    assert manager.run("budget", "fp", lambda: (402, {"detail": "budget"}))[0] == 402
+    assert manager.run("budget", "fp", lambda: (200, {})) == (200, {})
+
+
+def test_manager_releases_key_when_handler_raises(store):
+    manager = IdempotencyManager(store)
+
+    def handler():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        manager.run("key", "fp", handler)
+    assert manager.run("key", "fp", lambda: (200, {"ok": True})) == (200, {"ok": True})
+
+
+def test_manager_attaches_duplicate_to_running_request():
+    manager = IdempotencyManager(InMemoryIdempotencyStore())
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def handler():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 200, {"result": "ok"}
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(manager.run("key", "fp", handler)))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: results.append(manager.run("key", "fp", handler)))
+    second.start()
+    while manager.metrics.counter("idempotency.attached") < 1:
+        time.sleep(0.01)
+    release.set()
+    first.join()
+    second.join()
+
+    assert results == [(200, {"result": "ok"}), (200, {"result": "ok"})]
+    assert len(calls) == 1
+
+
+def test_manager_polls_request_running_in_another_process(store):
+    # A claim made directly on the store stands in for another API process.
+    store.claim("key", "fp")
+    manager = IdempotencyManager(store, wait_timeout=5, poll_interval=0.01)
+    timer = threading.Timer(0.05, store.complete, ("key", 200, {"result": "ok"}))
+    timer.start()
+
+    assert manager.run("key", "fp", lambda: (200, {"result": "again"})) == (
+        200,
+        {"result": "ok"},
+    )
+    timer.join()
+
+
+def test_manager_gives_up_waiting(store):
+    store.claim("key", "fp")
+    manager = IdempotencyManager(store, wait_timeout=0.05, poll_interval=0.01)
+
+    with pytest.raises(IdempotencyKeyInProgressException):
+        manager.run("key", "fp", lambda: (200, {}))
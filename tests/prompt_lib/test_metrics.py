@@ -0,0 +1,22 @@
+from prompt_chain.prompt_lib.metrics import Metrics
+
+
+def test_counters_and_gauges():
+    metrics = Metrics()
+
+    metrics.increment("calls", model="test_model")
+    metrics.increment("calls", 2, model="test_model")
+    metrics.set_gauge("limit", 8)
+
+    assert metrics.counter("calls", model="test_model") == 3
+    assert metrics.counter("calls", model="other_model") == 0
+    assert metrics.gauge("limit") == 8
+    assert metrics.snapshot() == {
+        "counters": {"calls{model=test_model}": 3},
+        "gauges": {"limit": 8},
+    }
+
+
+def test_key_sorts_labels():
+    assert Metrics.key("calls", {"model": "m", "chain": "c"}) == "calls{chain=c,model=m}"
+    assert Metrics.key("calls", {}) == "calls"
@@ -0,0 +1,141 @@
+import time
+from contextlib import contextmanager
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from prompt_chain.prompt_lib.concurrency import AIMDLimiter
+from prompt_chain.prompt_lib.exceptions import DeadlineExceededException
+from prompt_chain.prompt_lib.provider_client import ProviderClient
+from prompt_chain.prompt_lib.router import BackendRouter
+from prompt_chain.prompt_lib.scheduler import FairScheduler
+
+
+def test_chat_posts_request():
+    web_client = Mock()
+    web_client.post.return_value = {"choices": []}
+    client = ProviderClient(web_client, "fake_api_key", "http://provider/chat")
+
+    assert client.chat({"model": "test"}, timeout=5) == {"choices": []}
+
+    web_client.post.assert_called_once_with(
+        "http://provider/chat",
+        headers={"Authorization": "Bearer fake_api_key", "Content-Type": "application/json"},
+        json={"model": "test"},
+        timeout=5,
+    )
+
+
+def test_chat_holds_scheduler_slot():
+    scheduler = FairScheduler(capacity=1)
+    web_client = Mock()
+    web_client.post.side_effect = lambda *args, **kwargs: {
+        "in_flight": scheduler.metrics.gauge("scheduler.in_flight", priority="batch")
+    }
+    client = ProviderClient(web_client, "fake_api_key", scheduler=scheduler)
+
+    response = client.chat({"model": "test"}, timeout=5, flow="acme", priority="batch")
+
+    assert response == {"in_flight": 1}
+    assert scheduler.metrics.gauge("scheduler.in_flight", priority="batch") == 0
+    assert web_client.post.call_args.kwargs["timeout"] <= 5
+
+
+def test_chat_times_out_if_the_slot_wait_uses_up_the_timeout():
+    @contextmanager
+    def slow_slot(*args):
+        time.sleep(0.02)
+        yield
+
+    scheduler = Mock(spec=FairScheduler)
+    scheduler.slot.side_effect = slow_slot
+    web_client = Mock()
+    client = ProviderClient(web_client, "fake_api_key", scheduler=scheduler)
+
+    with pytest.raises(DeadlineExceededException):
+        client.chat({"model": "test"}, timeout=0.01)
+    web_client.post.assert_not_called()
+
+
+def test_chat_rejects_unknown_priority():
+    client = ProviderClient(Mock(), "fake_api_key", scheduler=FairScheduler())
+
+    with pytest.raises(ValueError):
+        client.chat({"model": "test"}, priority="urgent")
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(response=response)
+
+
+@pytest.mark.parametrize(
+    ("error", "reason"),
+    [(http_error(429), "rate_limited"), (requests.Timeout("Read timed out"), "timeout")],
+)
+def test_overload_shrinks_scheduler_capacity(error, reason):
+    scheduler = FairScheduler(capacity=16)
+    limiter = AIMDLimiter(initial_limit=8)
+    web_client = Mock()
+    web_client.post.side_effect = error
+    client = ProviderClient(web_client, "fake_api_key", scheduler=scheduler, limiter=limiter)
+    assert scheduler.capacity == 8
+
+    with pytest.raises(requests.RequestException):
+        client.chat({"model": "test"})
+
+    assert scheduler.capacity == 4
+    assert limiter.metrics.counter("provider.limit_decreases", reason=reason) == 1
+
+
+def test_other_errors_leave_capacity_unchanged():
+    scheduler = FairScheduler(capacity=8)
+    limiter = AIMDLimiter(initial_limit=8)
+    web_client = Mock()
+    web_client.post.side_effect = http_error(400)
+    client = ProviderClient(web_client, "fake_api_key", scheduler=scheduler, limiter=limiter)
+
+    with pytest.raises(requests.HTTPError):
+        client.chat({"model": "test"})
+
+    assert scheduler.capacity == 8
+
+
+def test_successes_grow_scheduler_capacity():
+    scheduler = FairScheduler(capacity=2)
+    limiter = AIMDLimiter(initial_limit=2)
+    web_client = Mock()
+    web_client.post.return_value = {"choices": []}
+    client = ProviderClient(web_client, "fake_api_key", scheduler=scheduler, limiter=limiter)
+
+    for _ in range(3):
+        client.chat({"model": "test"})
+
+    assert scheduler.capacity == 3
+
+
+def test_router_records_latency_per_backend():
+    router = BackendRouter()
+    web_client = Mock()
+    web_client.post.return_value = {"choices": []}
+    client = ProviderClient(web_client, "fake_api_key", router=router)
+
+    client.chat({"model": "gpt-4o-mini"})
+
+    assert router.stats("gpt-4o-mini").latency is not None
+    assert router.metrics.counter("router.calls", backend="gpt-4o-mini") == 1
+
+
+@pytest.mark.parametrize(("error", "error_rate"), [(http_error(503), 0.2), (http_error(400), 0.0)])
+def test_router_only_counts_provider_failures(error, error_rate):
+    router = BackendRouter(smoothing=0.2)
+    web_client = Mock()
+    web_client.post.side_effect = error
+    client = ProviderClient(web_client, "fake_api_key", router=router)
+
+    with pytest.raises(requests.HTTPError):
+        client.chat({"model": "gpt-4o-mini"})
+
+    assert router.stats("gpt-4o-mini").error_rate == error_rate
@@ -0,0 +1,69 @@
+from unittest.mock import patch
+
+from prompt_chain.prompt_lib.router import BackendRouter
+
+
+def test_untried_backends_keep_declared_order():
+    router = BackendRouter()
+
+    assert router.rank(["primary", "secondary", "primary"]) == ["primary", "secondary"]
+
+
+def test_untried_backend_is_tried_before_known_ones():
+    router = BackendRouter()
+    router.record("primary", 0.5, success=True)
+
+    assert router.rank(["primary", "secondary"]) == ["secondary", "primary"]
+
+
+def test_fastest_backend_ranks_first():
+    router = BackendRouter()
+    router.record("primary", 2.0, success=True)
+    router.record("secondary", 0.5, success=True)
+
+    assert router.rank(["primary", "secondary"]) == ["secondary", "primary"]
+    assert router.metrics.gauge("router.latency_ms", backend="secondary") == 500
+
+
+def test_latency_is_smoothed():
+    router = BackendRouter(smoothing=0.5)
+    router.record("primary", 1.0, success=True)
+    router.record("primary", 3.0, success=True)
+
+    assert router.stats("primary").latency == 2.0
+
+
+def test_failing_backend_ranks_last():
+    router = BackendRouter(smoothing=0.5, max_error_rate=0.5)
+    router.record("primary", 0.1, success=True)
+    router.record("secondary", 1.0, success=True)
+
+    router.record("primary", None, success=False)
+
+    assert router.stats("primary").error_rate == 0.5
+    assert router.rank(["primary", "secondary"]) == ["secondary", "primary"]
+    assert router.metrics.gauge("router.error_rate", backend="primary") == 0.5
+
+
+def test_failing_backend_is_probed_after_cooldown():
+    router = BackendRouter(smoothing=0.5, cooldown_seconds=30)
+    router.record("primary", 0.1, success=True)
+    router.record("secondary", 1.0, success=True)
+    with patch("prompt_chain.prompt_lib.router.time.monotonic", return_value=100.0):
+        router.record("primary", None, success=False)
+
+    with patch("prompt_chain.prompt_lib.router.time.monotonic", return_value=129.0):
+        assert router.rank(["primary", "secondary"]) == ["secondary", "primary"]
+    with patch("prompt_chain.prompt_lib.router.time.monotonic", return_value=130.0):
+        assert router.rank(["primary", "secondary"]) == ["primary", "secondary"]
+
+
+def test_successes_restore_health():
+    router = BackendRouter(smoothing=0.5, cooldown_seconds=3600)
+    router.record("primary", 0.1, success=True)
+    router.record("secondary", 1.0, success=True)
+    router.record("primary", None, success=False)
+
+    router.record("primary", 0.1, success=True)
+
+    assert router.rank(["primary", "secondary"]) == ["primary", "secondary"]
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from prompt_chain.prompt_lib.scheduler import FairScheduler
+
+
+def queued(scheduler):
+    return sum(
+        scheduler.metrics.gauge("scheduler.queue_depth", priority=name) or 0
+        for name in scheduler.class_shares
+    )
+
+
+def queue_calls(scheduler, calls):
+    """Queue calls one at a time, each recording its flow once it gets a slot."""
+    order = []
+    threads = []
+
+    def call(flow, priority):
+        with scheduler.slot(flow, priority, timeout=5):
+            order.append(flow)
+
+    for flow, priority in calls:
+        expected = queued(scheduler) + 1
+        thread = threading.Thread(target=call, args=(flow, priority))
+        thread.start()
+        threads.append(thread)
+        deadline = time.monotonic() + 5
+        while queued(scheduler) < expected:
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+    return order, threads
+
+
+def run_queued(scheduler, calls):
+    scheduler.acquire("holder", "interactive")
+    order, threads = queue_calls(scheduler, calls)
+    scheduler.release("interactive")
+    for thread in threads:
+        thread.join()
+    return order
+
+
+def test_calls_under_capacity_start_immediately():
+    scheduler = FairScheduler(capacity=2)
+    with scheduler.slot("a"), scheduler.slot("b"):
+        assert scheduler.metrics.gauge("scheduler.in_flight", priority="interactive") == 2
+    assert scheduler.metrics.gauge("scheduler.in_flight", priority="interactive") == 0
+    assert scheduler.metrics.counter("scheduler.calls", priority="interactive") == 2
+
+
+def test_interactive_calls_go_before_batch_calls():
+    scheduler = FairScheduler(capacity=1, class_shares={"interactive": 3, "batch": 1})
+
+    order = run_queued(scheduler, [("bulk", "batch"), ("bulk", "batch"), ("chat", "interactive")])
+
+    assert order == ["chat", "bulk", "bulk"]
+
+
+def test_class_gets_its_share_under_contention():
+    scheduler = FairScheduler(capacity=4, class_shares={"interactive": 1, "batch": 1})
+    for _ in range(4):
+        scheduler.acquire("bulk", "batch")
+
+    order, threads = queue_calls(
+        scheduler, [("bulk", "batch"), ("chat", "interactive"), ("chat", "interactive")]
+    )
+    scheduler.capacity = 5
+    for thread in threads:
+        thread.join()
+
+    # Freed slots go to the class furthest below its share, not to the oldest call.
+    assert order == ["chat", "chat", "bulk"]
+
+
+def test_flows_take_turns_within_a_class():
+    scheduler = FairScheduler(capacity=1)
+
+    order = run_queued(scheduler, [("bulk", None), ("bulk", None), ("bulk", None), ("other", None)])
+
+    assert order == ["bulk", "other", "bulk", "bulk"]
+
+
+def test_flow_weights():
+    scheduler = FairScheduler(capacity=1, flow_weights={"heavy": 2})
+
+    order = run_queued(
+        scheduler,
+        [("light", None), ("light", None), ("heavy", None), ("heavy", None), ("heavy", None)],
+    )
+
+    assert order == ["light", "heavy", "heavy", "light", "heavy"]
+
+
+def test_timeout_gives_up_without_taking_a_slot():
+    scheduler = FairScheduler(capacity=1)
+    scheduler.acquire("holder", "interactive")
+
+    with pytest.raises(TimeoutError):
+        scheduler.acquire("late", "interactive", timeout=0.01)
+
+    assert scheduler.metrics.gauge("scheduler.queue_depth", priority="interactive") == 0
+    scheduler.release("interactive")
+    with scheduler.slot("next", timeout=1):
+        pass
+
+
+def test_unknown_priority():
+    scheduler = FairScheduler()
+
+    with pytest.raises(ValueError, match="Unknown priority class: urgent"):
+        with scheduler.slot("a", "urgent"):
+            pass
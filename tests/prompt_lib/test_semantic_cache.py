@@ -0,0 +1,194 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from prompt_chain.prompt_lib import codec
+from prompt_chain.prompt_lib.chain_executor import ChainExecutor
+from prompt_chain.prompt_lib.metrics import Metrics
+from prompt_chain.prompt_lib.models import ChainConfig, ChainStep, PromptModel
+from prompt_chain.prompt_lib.semantic_cache import (
+    NumpyIndex,
+    PythonIndex,
+    SemanticCache,
+    embed,
+    split_input,
+)
+
+ARTICLE = (
+    "Local police reported a break-in at the downtown jewelry store late last night. "
+    "Officers arrived within minutes of the alarm and found the front window shattered. "
+    "Several display cases were emptied and the suspects fled in a dark sedan heading north. "
+    "Detectives are reviewing footage from nearby cameras and asking witnesses to come forward."
+)
+EDITED = ARTICLE.replace("late last night", "last night").replace("dark sedan", "dark car")
+UNRELATED = (
+    "The city council approved the new budget for the public library on Tuesday evening. "
+    "The plan adds weekend opening hours, funds a children's reading program, and replaces "
+    "the heating system in the old branch building before the start of the winter season."
+)
+MODEL = PromptModel(
+    id=1,
+    name="summarizer",
+    system_prompt="Summarize the article",
+    user_prompt={"article": "str", "language": "str"},
+    response={"summary": "str"},
+    created_at="",
+    updated_at="",
+    hash="abc123",
+)
+
+
+def similarity(a, b):
+    return sum(weight * b.get(index, 0.0) for index, weight in a.items())
+
+
+def test_embedding_separates_near_duplicates_from_unrelated_texts():
+    vector = embed(ARTICLE)
+
+    assert similarity(vector, vector) == pytest.approx(1.0)
+    assert similarity(vector, embed(EDITED)) > 0.8
+    assert similarity(vector, embed(UNRELATED)) < 0.2
+    assert embed("") == {}
+
+
+def test_split_input_matches_short_fields_exactly():
+    text, key = split_input({"article": ARTICLE, "language": "en", "limit": 3})
+
+    assert text == ARTICLE
+    assert split_input({"article": EDITED, "language": "en", "limit": 3})[1] == key
+    assert split_input({"article": ARTICLE, "language": "fr", "limit": 3})[1] != key
+
+
+@pytest.mark.parametrize("index_factory", [PythonIndex, NumpyIndex])
+def test_indexes_find_the_most_similar_vector(index_factory):
+    if index_factory is NumpyIndex:
+        pytest.importorskip("numpy")
+    index = index_factory(2, 1024)
+    index.add(embed(ARTICLE), "article")
+    index.add(embed(UNRELATED), "unrelated")
+
+    score, value = index.search(embed(EDITED))
+    assert value == "article"
+    assert score > 0.8
+
+    index.add(embed("Something else entirely, with no words in common at all."), "other")
+    assert len(index) == 2
+    assert index.search(embed(EDITED))[1] == "unrelated"
+
+
+def test_serves_near_duplicate_inputs_of_the_same_model_version():
+    metrics = Metrics()
+    cache = SemanticCache(threshold=0.8, audit_rate=0, metrics=metrics)
+    lookup = cache.lookup(MODEL, {"article": ARTICLE, "language": "en"})
+    assert lookup.output is None
+    cache.store(MODEL, lookup, {"summary": "A break-in."})
+
+    assert cache.lookup(MODEL, {"article": EDITED, "language": "en"}).output == {
+        "summary": "A break-in."
+    }
+    assert cache.lookup(MODEL, {"article": EDITED, "language": "fr"}).output is None
+    assert cache.lookup(MODEL, {"article": UNRELATED, "language": "en"}).output is None
+    new_version = PromptModel(**{**MODEL.__dict__, "hash": "def456"})
+    assert cache.lookup(new_version, {"article": ARTICLE, "language": "en"}).output is None
+
+    assert metrics.counter("semantic_cache.hits", model="summarizer") == 1
+    assert metrics.counter("semantic_cache.misses", model="summarizer") == 4
+    assert metrics.gauge("semantic_cache.entries", model="summarizer") == 1
+
+
+def test_serves_exact_repeats_of_inputs_without_long_strings():
+    metrics = Metrics()
+    cache = SemanticCache(threshold=0.8, max_entries=2, audit_rate=0, metrics=metrics)
+    for article in ("A short note.", "A short note.", "Another note.", "A third note."):
+        lookup = cache.lookup(MODEL, {"article": article, "language": "en"})
+        if lookup.output is None:
+            cache.store(MODEL, lookup, {"summary": article})
+
+    lookup = cache.lookup(MODEL, {"article": "Another note.", "language": "en"})
+    assert lookup.output == {"summary": "Another note."}
+    assert lookup.similarity == 1.0
+    assert cache.lookup(MODEL, {"article": "A short note.", "language": "en"}).output is None
+    assert cache.lookup(MODEL, {"article": "Another note", "language": "en"}).output is None
+
+    assert metrics.counter("semantic_cache.hits", model="summarizer") == 2
+    assert metrics.gauge("semantic_cache.entries", model="summarizer") == 2
+
+
+def test_per_model_thresholds_and_expiry():
+    cache = SemanticCache(threshold=0.8, thresholds={"summarizer": 1.1}, audit_rate=0)
+    assert cache.lookup(MODEL, {"article": ARTICLE, "language": "en"}) is None
+
+    cache = SemanticCache(threshold=0.8, ttl_seconds=60, audit_rate=0)
+    with patch("prompt_chain.prompt_lib.semantic_cache.time.monotonic", return_value=0):
+        cache.store(MODEL, cache.lookup(MODEL, {"article": ARTICLE, "language": "en"}), {})
+    with patch("prompt_chain.prompt_lib.semantic_cache.time.monotonic", return_value=61):
+        assert cache.lookup(MODEL, {"article": ARTICLE, "language": "en"}).output is None
+
+
+def test_audits_count_false_hits():
+    metrics = Metrics()
+    cache = SemanticCache(threshold=0.8, audit_rate=1, metrics=metrics)
+    cache.store(MODEL, cache.lookup(MODEL, {"article": ARTICLE, "language": "en"}), {"n": 1})
+
+    lookup = cache.lookup(MODEL, {"article": EDITED, "language": "en"})
+    assert lookup.audit
+    assert not cache.audit(MODEL, lookup, {"n": 1})
+    assert cache.audit(MODEL, lookup, {"n": 2})
+
+    assert metrics.counter("semantic_cache.audits", model="summarizer") == 1
+    assert metrics.counter("semantic_cache.false_hits", model="summarizer") == 1
+
+
+def chain_executor(cache, *summaries):
+    db_manager = Mock()
+    db_manager.get_prompt_model.return_value = MODEL
+    web_client = Mock()
+    web_client.post.side_effect = [
+        {"choices": [{"message": {"content": codec.dumps({"summary": summary})}}]}
+        for summary in summaries
+    ]
+    return ChainExecutor(
+        db_manager, web_client, "fake_api_key", metrics=cache.metrics, semantic_cache=cache
+    )
+
+
+CHAIN = ChainConfig(
+    name="summarize",
+    steps=[
+        ChainStep(
+            name="summarizer",
+            input_mapping={"article": "initial_input.article", "language": "initial_input.lang"},
+        )
+    ],
+    final_output_mapping={"summary": "step_0.summary"},
+)
+
+
+def test_executor_skips_calls_for_near_duplicate_inputs():
+    cache = SemanticCache(threshold=0.8, audit_rate=0)
+    executor = chain_executor(cache, "A break-in.", "A budget.")
+
+    assert executor.execute_chain(CHAIN, {"article": ARTICLE, "lang": "en"}) == {
+        "summary": "A break-in."
+    }
+    assert executor.execute_chain(CHAIN, {"article": EDITED, "lang": "en"}) == {
+        "summary": "A break-in."
+    }
+    assert executor.execute_chain(CHAIN, {"article": UNRELATED, "lang": "en"}) == {
+        "summary": "A budget."
+    }
+
+    assert executor.web_client.post.call_count == 2
+    assert executor.metrics.counter("semantic_cache.calls_saved", model="summarizer") == 1
+
+
+def test_executor_serves_fresh_outputs_of_audited_hits():
+    cache = SemanticCache(threshold=0.8, audit_rate=1)
+    executor = chain_executor(cache, "A break-in.", "A robbery.")
+
+    executor.execute_chain(CHAIN, {"article": ARTICLE, "lang": "en"})
+    result = executor.execute_chain(CHAIN, {"article": EDITED, "lang": "en"})
+
+    assert result == {"summary": "A robbery."}
+    assert executor.web_client.post.call_count == 2
+    assert executor.metrics.counter("semantic_cache.false_hits", model="summarizer") == 1
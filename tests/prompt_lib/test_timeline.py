@@ -0,0 +1,35 @@
+from unittest.mock import patch
+
+import pytest
+
+from prompt_chain.prompt_lib.models import TimelinePhase
+from prompt_chain.prompt_lib.timeline import Timeline, phase_totals
+
+
+def test_phases_are_timed_from_the_origin():
+    with patch("prompt_chain.prompt_lib.timeline.time.perf_counter", side_effect=[1.5, 1.75]):
+        timeline = Timeline(origin=1.0)
+        with timeline.phase("provider_call"):
+            pass
+
+    assert timeline.phases == [TimelinePhase("provider_call", 500.0, 250.0)]
+
+
+def test_phases_are_recorded_when_they_raise():
+    phases = []
+    timeline = Timeline(phases)
+    with pytest.raises(ValueError):
+        with timeline.phase("parsing"):
+            raise ValueError("Not JSON")
+
+    assert [phase.phase for phase in phases] == ["parsing"]
+
+
+def test_phase_totals_in_execution_order():
+    phases = [
+        TimelinePhase("provider_call", 2.0, 10.0),
+        TimelinePhase("model_lookup", 0.0, 1.0),
+        TimelinePhase("provider_call", 3.0, 12.5),
+    ]
+
+    assert list(phase_totals(phases).items()) == [("model_lookup", 1.0), ("provider_call", 22.5)]
@@ -0,0 +1,75 @@
+import pytest
+
+from prompt_chain.prompt_lib.token_estimator import (
+    estimate_completion_tokens,
+    estimate_prompt_tokens,
+    estimate_tokens,
+)
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("", 0),
+        ("Hello world", 2),
+        ('{"crime_detected": true}', 10),
+        ("12345678", 3),
+        ("a b c", 3),
+    ],
+)
+def test_estimate_tokens(text, expected):
+    assert estimate_tokens(text) == expected
+
+
+def test_estimate_prompt_tokens():
+    messages = [
+        {"role": "system", "content": "Hello world"},
+        {"role": "user", "content": "a b c"},
+    ]
+
+    assert estimate_prompt_tokens(messages) == 3 + (4 + 2) + (4 + 3)
+
+
+def test_estimate_completion_tokens_primitives():
+    schema = {"flag": "bool", "count": "int", "score": "float"}
+
+    # Braces, then each key with its quotes and colon and the value, then the reply.
+    assert estimate_completion_tokens(schema, margin=0) == 2 + (4 + 2) + (4 + 4) + (4 + 6) + 3
+
+
+def test_estimate_completion_tokens_uses_length_hints():
+    schema = {"summary": "str", "tags": ["str"], "address": {"city": "str"}}
+    hints = {"summary": 50, "tags": 3, "tags[]": 4, "address.city": 5}
+
+    without_hints = estimate_completion_tokens(schema, default_str_tokens=100, margin=0)
+    with_hints = estimate_completion_tokens(schema, hints, default_str_tokens=100, margin=0)
+
+    assert with_hints < without_hints
+    assert (
+        with_hints
+        == 2
+        + (
+            (estimate_tokens("summary") + 3 + 52)
+            + (estimate_tokens("tags") + 3 + 2 + 3 * (6 + 1))
+            + (estimate_tokens("address") + 3 + 2 + (estimate_tokens("city") + 3 + 7))
+        )
+        + 3
+    )
+
+
+def test_estimate_completion_tokens_margin():
+    schema = {"explanation": "str"}
+
+    base = estimate_completion_tokens(schema, margin=0)
+    assert estimate_completion_tokens(schema, margin=0.5) == pytest.approx(
+        (base - 3) * 1.5 + 3, abs=1
+    )
+
+
+def test_estimate_completion_tokens_tuple():
+    schema = {"flags": ("bool", "str")}
+
+    assert (
+        estimate_completion_tokens(schema, {"flags.1": 10}, margin=0)
+        == 2 + (estimate_tokens("flags") + 3 + 2 + (2 + 1) + (12 + 1)) + 3
+    )
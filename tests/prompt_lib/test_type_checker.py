@@ -0,0 +1,210 @@
+import pytest
+
+from prompt_chain.prompt_lib.exceptions import ChainTypeException
+from prompt_chain.prompt_lib.models import ChainConfig, ChainStep, ChunkingConfig, PromptModel
+from prompt_chain.prompt_lib.type_checker import check_chain
+
+
+def model(name, user_prompt, response):
+    return PromptModel(
+        id=1,
+        name=name,
+        system_prompt="",
+        user_prompt=user_prompt,
+        response=response,
+        created_at="",
+        updated_at="",
+    )
+
+
+MODELS = {
+    "extractor": model(
+        "extractor",
+        {"text": "str"},
+        {"entities": [{"name": "str", "score": "int"}], "count": "int", "summary": "str"},
+    ),
+    "ranker": model(
+        "ranker",
+        {"entities": [{"name": "str", "score": "float"}], "limit": "int"},
+        {"ranked": ["str"], "best": ("str", "float")},
+    ),
+    "strict_ranker": model(
+        "strict_ranker", {"entities": [{"name": "str", "score": "bool", "id": "int"}]}, {}
+    ),
+    "scorer": model("scorer", {"score": "float", "data": "any"}, {"ok": "bool"}),
+    "counter": model("counter", {"flag": "int", "items": []}, {}),
+    "merger": model(
+        "merger",
+        {"outputs": [{"entities": [{"name": "str", "score": "int"}]}], "style": "str"},
+        {"entities": ["str"], "count": "int"},
+    ),
+}
+
+
+def get_model(name, version):
+    return MODELS.get(name)
+
+
+def chain(steps, final_output_mapping=None):
+    return ChainConfig(
+        name="test_chain",
+        steps=[ChainStep(name=name, input_mapping=mapping) for name, mapping in steps],
+        final_output_mapping=final_output_mapping or {},
+    )
+
+
+def errors_of(chain_config):
+    with pytest.raises(ChainTypeException) as exc_info:
+        check_chain(chain_config, get_model)
+    return exc_info.value.errors
+
+
+def test_check_chain_infers_input_and_output_schemas():
+    chain_config = chain(
+        [
+            ("extractor", {"text": "initial_input.article"}),
+            ("ranker", {"entities": "previous_step.entities", "limit": "step_0.count"}),
+        ],
+        {"best": "step_1.best", "article": "initial_input.article", "n": "initial_input.n"},
+    )
+
+    signature = check_chain(chain_config, get_model)
+
+    assert signature.input_schema == {"article": "str", "n": "any"}
+    assert signature.output_schema == {"best": ("str", "float"), "article": "str", "n": "any"}
+
+
+def test_check_chain_rejects_incompatible_types():
+    errors = errors_of(
+        chain(
+            [
+                ("extractor", {"text": "initial_input.article"}),
+                ("ranker", {"entities": "step_0.summary", "limit": "step_0.summary"}),
+            ]
+        )
+    )
+
+    assert errors == [
+        "Step 1 (ranker) input entities: step_0.summary is str, but entities expects a list",
+        "Step 1 (ranker) input limit: step_0.summary is str, but limit expects int",
+    ]
+
+
+def test_check_chain_checks_nested_fields():
+    errors = errors_of(
+        chain(
+            [
+                ("extractor", {"text": "initial_input.article"}),
+                ("strict_ranker", {"entities": "previous_step.entities"}),
+            ]
+        )
+    )
+
+    assert errors == [
+        "Step 1 (strict_ranker) input entities: previous_step.entities is int, "
+        "but entities[].score expects bool",
+        "Step 1 (strict_ranker) input entities: previous_step.entities has no field entities[].id",
+    ]
+
+
+def test_check_chain_rejects_missing_fields_and_bad_references():
+    errors = errors_of(
+        chain(
+            [
+                ("extractor", {"text": "previous_step.text"}),
+                ("ranker", {"entities": "step_0.people", "limit": "step_2.count"}),
+                ("unknown", {}),
+            ],
+            {"result": "output.ranked"},
+        )
+    )
+
+    assert errors == [
+        "Step 0 (extractor) input text: previous_step.text refers to a step that has not run yet",
+        "Step 1 (ranker) input entities: step_0.people is not in the response of step 0",
+        "Step 1 (ranker) input limit: step_2.count refers to a step that has not run yet",
+        "Step 2: model unknown not found",
+        "Final output result: invalid mapping output.ranked",
+    ]
+
+
+def test_check_chain_rejects_unmapped_inputs():
+    errors = errors_of(chain([("ranker", {"entities": "initial_input.entities"})]))
+
+    assert errors == ["Step 0 (ranker): required input limit is not mapped"]
+
+
+def test_check_chain_rejects_conflicting_initial_input_types():
+    errors = errors_of(
+        chain(
+            [
+                ("extractor", {"text": "initial_input.value"}),
+                ("ranker", {"entities": "initial_input.entities", "limit": "initial_input.value"}),
+            ]
+        )
+    )
+
+    assert errors == [
+        "Step 1 (ranker) input limit: initial_input.value is str, but limit expects int"
+    ]
+
+
+def test_check_chain_allows_widening_and_any():
+    signature = check_chain(
+        chain(
+            [
+                ("extractor", {"text": "initial_input.text"}),
+                ("scorer", {"score": "step_0.count", "data": "step_0.entities"}),
+                ("counter", {"flag": "previous_step.ok", "items": "step_0.entities"}),
+            ]
+        ),
+        get_model,
+    )
+
+    assert signature.input_schema == {"text": "str"}
+
+
+def test_check_chain_checks_chunking():
+    chunking = ChunkingConfig(
+        input_field="text",
+        chunk_tokens=100,
+        overlap_tokens=100,
+        reducers={"count": "all", "missing": "sum"},
+    )
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(
+                name="extractor", input_mapping={"text": "initial_input.text"}, chunking=chunking
+            )
+        ],
+        final_output_mapping={},
+    )
+
+    assert errors_of(chain_config) == [
+        "Step 0 (extractor) chunking: overlap_tokens must be less than chunk_tokens",
+        "Step 0 (extractor) chunking: all cannot merge count, which is int",
+        "Step 0 (extractor) chunking: missing is not in the response of extractor",
+    ]
+
+
+def test_check_chain_checks_the_reduce_model():
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(
+                name="extractor",
+                input_mapping={"text": "initial_input.text"},
+                chunking=ChunkingConfig(
+                    input_field="text", chunk_tokens=100, reduce_model="merger"
+                ),
+            )
+        ],
+        final_output_mapping={},
+    )
+
+    assert errors_of(chain_config) == [
+        "Step 0 (extractor) chunking: reduce model input style is not mapped",
+        "Step 0 (extractor) chunking: the reduced entities is str, but entities[] expects an object",
+        "Step 0 (extractor) chunking: merger does not return summary",
+    ]
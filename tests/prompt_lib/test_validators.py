@@ -0,0 +1,31 @@
+import pytest
+
+from prompt_chain.prompt_lib.validators import ValidatorCache, schema_key
+
+
+def test_validator_cache_reuses_validators():
+    cache = ValidatorCache()
+
+    validator = cache.get({"input": "str"}, model_name="test_model_Input")
+
+    assert cache.get({"input": "str"}, model_name="test_model_Input") is validator
+    assert cache.get({"input": "int"}, model_name="test_model_Input") is not validator
+    assert validator({"input": "Test input"}) == {"input": "Test input"}
+    with pytest.raises(ValueError):
+        validator({"invalid_key": "Test input"})
+
+
+def test_validator_cache_evicts_least_recently_used():
+    cache = ValidatorCache(max_size=2)
+    first = cache.get({"a": "str"})
+    cache.get({"b": "str"})
+    cache.get({"a": "str"})
+    cache.get({"c": "str"})
+
+    assert len(cache) == 2
+    assert cache.get({"a": "str"}) is first
+
+
+def test_schema_key_distinguishes_tuples_from_lists():
+    assert schema_key({"a": ["int", "int"]}) != schema_key({"a": ("int", "int")})
+    assert schema_key({"a": "str", "b": "int"}) == schema_key({"b": "int", "a": "str"})
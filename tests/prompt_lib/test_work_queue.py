@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+
+from prompt_chain.prompt_lib.db_manager import DatabaseManager
+from prompt_chain.prompt_lib.tables import Base, WorkItemTable
+from prompt_chain.prompt_lib.work_queue import WorkQueue
+from tests.conftest import TEST_DB_URL
+
+
+@pytest.fixture(scope="function")
+def db_manager():
+    manager = DatabaseManager(TEST_DB_URL)
+    yield manager
+    Base.metadata.drop_all(manager.engine)
+
+
+@pytest.fixture
+def work_queue(db_manager):
+    return WorkQueue(db_manager, max_attempts=2)
+
+
+def expire_heartbeat(db_manager, item_id):
+    with db_manager.session_scope() as session:
+        session.execute(
+            update(WorkItemTable)
+            .where(WorkItemTable.id == item_id)
+            .values(heartbeat_at=datetime.now(timezone.utc) - timedelta(hours=1))
+        )
+
+
+def test_enqueue_and_get(work_queue):
+    item_id = work_queue.enqueue("test_chain", {"input": "value"})
+
+    item = work_queue.get(item_id)
+    assert item.chain_name == "test_chain"
+    assert item.initial_input == {"input": "value"}
+    assert item.status == "pending"
+
+
+def test_get_nonexistent_item(work_queue):
+    assert work_queue.get(42) is None
+
+
+def test_claim_in_order_and_only_once(work_queue):
+    first = work_queue.enqueue("test_chain", {})
+    second = work_queue.enqueue("test_chain", {})
+
+    claimed_first = work_queue.claim("worker-a")
+    claimed_second = work_queue.claim("worker-b")
+
+    assert claimed_first.id == first
+    assert claimed_first.status == "running"
+    assert claimed_first.worker_id == "worker-a"
+    assert claimed_first.attempts == 1
+    assert claimed_second.id == second
+    assert work_queue.claim("worker-c") is None
+
+
+def test_complete_and_fail(work_queue):
+    completed_id = work_queue.enqueue("test_chain", {})
+    failed_id = work_queue.enqueue("test_chain", {})
+    work_queue.claim("worker-a")
+    work_queue.claim("worker-a")
+
+    assert work_queue.complete(completed_id, "worker-a", {"output": "done"}) is True
+    assert work_queue.fail(failed_id, "worker-a", "boom") is True
+
+    assert work_queue.get(completed_id).result == {"output": "done"}
+    assert work_queue.get(failed_id).status == "failed"
+    assert work_queue.get(failed_id).error == "boom"
+
+
+def test_only_owner_can_finish(work_queue):
+    item_id = work_queue.enqueue("test_chain", {})
+    work_queue.claim("worker-a")
+
+    assert work_queue.heartbeat(item_id, "worker-b") is False
+    assert work_queue.complete(item_id, "worker-b", {}) is False
+    assert work_queue.get(item_id).status == "running"
+
+
+def test_reclaim_expired(db_manager, work_queue):
+    item_id = work_queue.enqueue("test_chain", {})
+    work_queue.claim("worker-a")
+    assert work_queue.reclaim_expired(lease_timeout=60) == 0
+
+    expire_heartbeat(db_manager, item_id)
+    assert work_queue.reclaim_expired(lease_timeout=60) == 1
+    assert work_queue.heartbeat(item_id, "worker-a") is False
+
+    reclaimed = work_queue.claim("worker-b")
+    assert reclaimed.id == item_id
+    assert reclaimed.attempts == 2
+
+
+def test_reclaim_fails_after_max_attempts(db_manager, work_queue):
+    item_id = work_queue.enqueue("test_chain", {})
+    for worker_id in ("worker-a", "worker-b"):
+        work_queue.claim(worker_id)
+        expire_heartbeat(db_manager, item_id)
+        work_queue.reclaim_expired(lease_timeout=60)
+
+    item = work_queue.get(item_id)
+    assert item.status == "failed"
+    assert work_queue.claim("worker-c") is None
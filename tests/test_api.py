@@ -1,21 +1,42 @@
 import json
-from unittest.mock import MagicMock, patch
+import threading
+from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 from fastapi.testclient import TestClient
+from requests import HTTPError
 
 from prompt_chain.api import app
-from prompt_chain.prompt_lib.exceptions import DatabaseManagerException
-from prompt_chain.prompt_lib.models import ChainConfig, PromptModel
+from prompt_chain.prompt_lib.admission import AdmissionController
+from prompt_chain.prompt_lib.chain_executor import ChainExecutor
+from prompt_chain.prompt_lib.exceptions import (
+    BudgetExceededException,
+    DatabaseManagerException,
+    DeadlineExceededException,
+    OutputValidationException,
+)
+from prompt_chain.prompt_lib.idempotency import IdempotencyManager, InMemoryIdempotencyStore
+from prompt_chain.prompt_lib.models import (
+    ChainConfig,
+    ChainStep,
+    ExecutionRecord,
+    PromptModel,
+    StepRecord,
+    TimelinePhase,
+    WorkItem,
+)
+from prompt_chain.prompt_lib.provider_client import ProviderClient
 
 
 @pytest.fixture
 def mock_dependency_manager():
     with patch("prompt_chain.api.manager") as mock_manager:
         mock_manager.db_manager = MagicMock()
+        mock_manager.model_source = mock_manager.db_manager
         mock_manager.web_client = MagicMock()
         mock_manager.chain_executor = MagicMock()
         mock_manager.openai_api_key = "fake_api_key"
+        mock_manager.provider = ProviderClient(mock_manager.web_client, "fake_api_key")
         yield mock_manager
 
 
@@ -24,6 +45,17 @@ def client(mock_dependency_manager):
     return TestClient(app)
 
 
+@pytest.fixture
+def chain_executor(mock_dependency_manager):
+    mock_dependency_manager.chain_executor = ChainExecutor(
+        mock_dependency_manager.db_manager,
+        mock_dependency_manager.web_client,
+        "fake_api_key",
+        provider=mock_dependency_manager.provider,
+    )
+    return mock_dependency_manager.chain_executor
+
+
 def test_root(client):
     response = client.get("/")
     assert response.status_code == 200
@@ -101,7 +133,7 @@ def test_create_model_exception(client, mock_dependency_manager):
     assert response.json() == {"message": "Error: Test error"}
 
 
-def test_call_openai_success(client, mock_dependency_manager):
+def test_call_openai_success(client, mock_dependency_manager, chain_executor):
     mock_model = PromptModel(
         id=1,
         name="test_model",
@@ -121,6 +153,123 @@ def test_call_openai_success(client, mock_dependency_manager):
     assert json.loads(response.json()["response"]) == {"output": "Test output"}
 
 
+def test_call_openai_idempotency_key_replays_response(
+    client, mock_dependency_manager, chain_executor
+):
+    mock_dependency_manager.idempotency = IdempotencyManager(InMemoryIdempotencyStore())
+    mock_dependency_manager.db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="Test prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="",
+        updated_at="",
+    )
+    mock_dependency_manager.web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"output": "Test output"}'}}]
+    }
+    request_data = {"name": "test_model", "user_input": {"input": "Test input"}}
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = client.post("/call_openai", json=request_data, headers=headers)
+    second = client.post("/call_openai", json=request_data, headers=headers)
+
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert mock_dependency_manager.web_client.post.call_count == 1
+
+
+def test_call_openai_fails_over_to_the_next_backend(
+    client, mock_dependency_manager, chain_executor
+):
+    mock_dependency_manager.db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="Test prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="",
+        updated_at="",
+        backends=["primary", "secondary"],
+    )
+    mock_dependency_manager.web_client.post.side_effect = [
+        HTTPError(response=Mock(status_code=503)),
+        {"choices": [{"message": {"content": '{"output": "Test output"}'}}]},
+    ]
+    request_data = {"name": "test_model", "user_input": {"input": "Test input"}}
+
+    response = client.post("/call_openai", json=request_data)
+
+    assert response.status_code == 200
+    assert json.loads(response.json()["response"]) == {"output": "Test output"}
+    calls = mock_dependency_manager.web_client.post.call_args_list
+    assert [call.kwargs["json"]["model"] for call in calls] == ["primary", "secondary"]
+
+
+def test_call_openai_deadline_exceeded(client, mock_dependency_manager):
+    mock_dependency_manager.db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="Test prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="",
+        updated_at="",
+    )
+    mock_dependency_manager.chain_executor.call_model.side_effect = DeadlineExceededException(
+        "Deadline exceeded calling model test_model"
+    )
+    request_data = {"name": "test_model", "user_input": {"input": "Test input"}}
+
+    response = client.post("/call_openai", json=request_data)
+
+    assert response.status_code == 504
+    assert response.json()["detail"] == "Deadline exceeded calling model test_model"
+
+
+def test_call_openai_provider_failure(client, mock_dependency_manager, chain_executor):
+    mock_dependency_manager.db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="Test prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="",
+        updated_at="",
+    )
+    mock_dependency_manager.web_client.post.side_effect = HTTPError(
+        "503 Server Error: secret upstream detail", response=Mock(status_code=503)
+    )
+    request_data = {"name": "test_model", "user_input": {"input": "Test input"}}
+
+    response = client.post("/call_openai", json=request_data)
+
+    assert response.status_code == 502
+    assert response.json()["detail"] == "The provider call for model test_model failed"
+
+
+def test_call_openai_invalid_response(client, mock_dependency_manager, chain_executor):
+    mock_dependency_manager.db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="Test prompt",
+        user_prompt={"input": "str"},
+        response={"output": "str"},
+        created_at="",
+        updated_at="",
+    )
+    mock_dependency_manager.web_client.post.return_value = {
+        "choices": [{"message": {"content": '{"unexpected": "field"}'}}]
+    }
+    request_data = {"name": "test_model", "user_input": {"input": "Test input"}}
+
+    response = client.post("/call_openai", json=request_data)
+
+    assert response.status_code == 502
+    assert "invalid response" in response.json()["detail"]
+
+
 def test_call_openai_model_not_found(client, mock_dependency_manager):
     mock_dependency_manager.db_manager.get_prompt_model.return_value = None
     request_data = {"name": "nonexistent_model", "user_input": {"input": "Test input"}}
@@ -140,11 +289,10 @@ def test_call_openai_invalid_input(client, mock_dependency_manager):
         updated_at="",
     )
     mock_dependency_manager.db_manager.get_prompt_model.return_value = mock_model
-    mock_dependency_manager.db_manager.validate_user_input.side_effect = ValueError("Invalid input")
     request_data = {"name": "test_model", "user_input": {"invalid": "input"}}
     response = client.post("/call_openai", json=request_data)
     assert response.status_code == 422
-    assert "Invalid input" in response.json()["detail"]
+    assert "input" in response.json()["detail"]
 
 
 def test_create_chain_success(client, mock_dependency_manager):
@@ -155,6 +303,56 @@ def test_create_chain_success(client, mock_dependency_manager):
     assert response.json() == {"message": "Chain created successfully"}
 
 
+def test_create_chain_type_error(client, mock_dependency_manager):
+    mock_dependency_manager.db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="Test prompt",
+        user_prompt={"count": "int"},
+        response={"output": "str"},
+        created_at="",
+        updated_at="",
+    )
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[
+            ChainStep(name="test_model", input_mapping={"count": "initial_input.count"}),
+            ChainStep(name="test_model", input_mapping={"count": "previous_step.output"}),
+        ],
+        final_output_mapping={},
+    )
+
+    response = client.post("/create_chain", json=chain_config.model_dump())
+
+    assert response.status_code == 422
+    assert response.json()["detail"]["errors"] == [
+        "Step 1 (test_model) input count: previous_step.output is str, but count expects int"
+    ]
+    mock_dependency_manager.db_manager.add_chain_config.assert_not_called()
+
+
+def test_check_chain(client, mock_dependency_manager):
+    mock_dependency_manager.db_manager.get_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="Test prompt",
+        user_prompt={"text": "str"},
+        response={"output": "str"},
+        created_at="",
+        updated_at="",
+    )
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[ChainStep(name="test_model", input_mapping={"text": "initial_input.text"})],
+        final_output_mapping={"result": "step_0.output"},
+    )
+
+    response = client.post("/check_chain", json=chain_config.model_dump())
+
+    assert response.status_code == 200
+    assert response.json() == {"input_schema": {"text": "str"}, "output_schema": {"result": "str"}}
+
+
 def test_create_chain_failure(client, mock_dependency_manager):
     mock_dependency_manager.db_manager.add_chain_config.return_value = False
     chain_config = ChainConfig(name="test_chain", steps=[], final_output_mapping={})
@@ -198,11 +396,102 @@ def test_get_chain_nonexistent(client, mock_dependency_manager):
 def test_execute_chain_success(client, mock_dependency_manager):
     mock_chain = ChainConfig(name="test_chain", steps=[], final_output_mapping={})
     mock_dependency_manager.db_manager.get_chain_config.return_value = mock_chain
-    mock_dependency_manager.chain_executor.execute_chain.return_value = {"result": "Test output"}
+    mock_dependency_manager.chain_executor.run_chain.return_value = ExecutionRecord(
+        id="abc",
+        chain_name="test_chain",
+        started_at="2024-01-01T00:00:00",
+        input={"input": "Test input"},
+        status="completed",
+        output={"result": "Test output"},
+        latency_ms=12.5,
+        prompt_tokens=100,
+        completion_tokens=20,
+        cost_usd=0.00008,
+    )
     request_data = {"chain_name": "test_chain", "initial_input": {"input": "Test input"}}
     response = client.post("/execute_chain", json=request_data)
     assert response.status_code == 200
-    assert response.json() == {"result": {"result": "Test output"}}
+    assert response.json() == {
+        "result": {"result": "Test output"},
+        "metadata": {
+            "execution_id": "abc",
+            "latency_ms": 12.5,
+            "prompt_tokens": 100,
+            "completion_tokens": 20,
+            "cost_usd": 0.00008,
+        },
+    }
+
+
+def test_execute_chain_idempotency_key_replays_response(client, mock_dependency_manager):
+    mock_dependency_manager.idempotency = IdempotencyManager(InMemoryIdempotencyStore())
+    mock_chain = ChainConfig(name="test_chain", steps=[], final_output_mapping={})
+    mock_dependency_manager.db_manager.get_chain_config.return_value = mock_chain
+    mock_dependency_manager.chain_executor.run_chain.return_value = ExecutionRecord(
+        id="abc",
+        chain_name="test_chain",
+        started_at="2024-01-01T00:00:00",
+        input={"input": "Test input"},
+        status="completed",
+        output={"result": "Test output"},
+    )
+    request_data = {"chain_name": "test_chain", "initial_input": {"input": "Test input"}}
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = client.post("/execute_chain", json=request_data, headers=headers)
+    second = client.post("/execute_chain", json=request_data, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert second.json()["metadata"]["execution_id"] == "abc"
+    assert mock_dependency_manager.chain_executor.run_chain.call_count == 1
+
+
+def test_execute_chain_idempotency_key_replays_client_error(client, mock_dependency_manager):
+    mock_dependency_manager.idempotency = IdempotencyManager(InMemoryIdempotencyStore())
+    mock_dependency_manager.db_manager.get_chain_config.return_value = None
+    request_data = {"chain_name": "nonexistent_chain", "initial_input": {}}
+    headers = {"Idempotency-Key": "retry-1"}
+
+    client.post("/execute_chain", json=request_data, headers=headers)
+    response = client.post("/execute_chain", json=request_data, headers=headers)
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "No chain found with name: nonexistent_chain"}
+    assert mock_dependency_manager.db_manager.get_chain_config.call_count == 1
+
+
+def test_execute_chain_idempotency_key_reruns_invalid_model_response(
+    client, mock_dependency_manager
+):
+    mock_dependency_manager.idempotency = IdempotencyManager(InMemoryIdempotencyStore())
+    mock_chain = ChainConfig(name="test_chain", steps=[], final_output_mapping={})
+    mock_dependency_manager.db_manager.get_chain_config.return_value = mock_chain
+    mock_dependency_manager.chain_executor.run_chain.side_effect = OutputValidationException(
+        "Output validation failed for model test_model"
+    )
+    request_data = {"chain_name": "test_chain", "initial_input": {}}
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = client.post("/execute_chain", json=request_data, headers=headers)
+    second = client.post("/execute_chain", json=request_data, headers=headers)
+
+    assert first.status_code == second.status_code == 502
+    assert mock_dependency_manager.chain_executor.run_chain.call_count == 2
+
+
+def test_execute_chain_idempotency_key_reused_for_another_request(client, mock_dependency_manager):
+    mock_dependency_manager.idempotency = IdempotencyManager(InMemoryIdempotencyStore())
+    mock_dependency_manager.db_manager.get_chain_config.return_value = None
+    headers = {"Idempotency-Key": "retry-1"}
+
+    client.post("/execute_chain", json={"chain_name": "a", "initial_input": {}}, headers=headers)
+    response = client.post(
+        "/execute_chain", json={"chain_name": "b", "initial_input": {}}, headers=headers
+    )
+
+    assert response.status_code == 422
+    assert "already used" in response.json()["detail"]
 
 
 def test_execute_chain_not_found(client, mock_dependency_manager):
@@ -216,8 +505,315 @@ def test_execute_chain_not_found(client, mock_dependency_manager):
 def test_execute_chain_exception(client, mock_dependency_manager):
     mock_chain = ChainConfig(name="test_chain", steps=[], final_output_mapping={})
     mock_dependency_manager.db_manager.get_chain_config.return_value = mock_chain
-    mock_dependency_manager.chain_executor.execute_chain.side_effect = ValueError("Test error")
+    mock_dependency_manager.chain_executor.run_chain.side_effect = ValueError("Test error")
     request_data = {"chain_name": "test_chain", "initial_input": {"input": "Test input"}}
     response = client.post("/execute_chain", json=request_data)
     assert response.status_code == 422
     assert "Test error" in response.json()["detail"]
+
+
+def test_queue_chain_success(client, mock_dependency_manager):
+    mock_chain = ChainConfig(name="test_chain", steps=[], final_output_mapping={})
+    mock_dependency_manager.db_manager.get_chain_config.return_value = mock_chain
+    mock_dependency_manager.work_queue.enqueue.return_value = 7
+    request_data = {"chain_name": "test_chain", "initial_input": {"input": "Test input"}}
+    response = client.post("/queue_chain", json=request_data)
+    assert response.status_code == 200
+    assert response.json() == {"id": 7, "status": "pending"}
+    mock_dependency_manager.work_queue.enqueue.assert_called_once_with(
+        "test_chain", {"input": "Test input"}
+    )
+
+
+def test_queue_chain_not_found(client, mock_dependency_manager):
+    mock_dependency_manager.db_manager.get_chain_config.return_value = None
+    request_data = {"chain_name": "nonexistent_chain", "initial_input": {}}
+    response = client.post("/queue_chain", json=request_data)
+    assert response.status_code == 404
+
+
+def test_get_queued_chain(client, mock_dependency_manager):
+    mock_dependency_manager.work_queue.get.return_value = WorkItem(
+        id=7,
+        chain_name="test_chain",
+        initial_input={},
+        status="completed",
+        worker_id="worker-a",
+        attempts=1,
+        result={"result": "Test output"},
+        error=None,
+    )
+    response = client.get("/get_queued_chain/7")
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": 7,
+        "status": "completed",
+        "result": {"result": "Test output"},
+        "error": None,
+    }
+
+
+def test_get_queued_chain_not_found(client, mock_dependency_manager):
+    mock_dependency_manager.work_queue.get.return_value = None
+    response = client.get("/get_queued_chain/7")
+    assert response.status_code == 404
+
+
+def test_ready(client, mock_dependency_manager):
+    mock_dependency_manager.ready = True
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready"}
+
+
+def test_not_ready(client, mock_dependency_manager):
+    mock_dependency_manager.ready = False
+    response = client.get("/ready")
+    assert response.status_code == 503
+
+
+def test_ready_once_the_background_warm_up_completes(mock_dependency_manager):
+    mock_dependency_manager.ready = False
+    release = threading.Event()
+    warmed_up = threading.Event()
+
+    def warm_up():
+        release.wait(5)
+        mock_dependency_manager.ready = True
+        warmed_up.set()
+
+    mock_dependency_manager.warm_up.side_effect = warm_up
+    with patch("prompt_chain.api.WARMUP_ENABLED", True), TestClient(app) as client:
+        assert client.get("/ready").status_code == 503
+        release.set()
+        assert warmed_up.wait(5)
+        assert client.get("/ready").status_code == 200
+
+
+def test_metrics(client, mock_dependency_manager):
+    mock_dependency_manager.metrics.snapshot.return_value = {"counters": {"calls": 1}, "gauges": {}}
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.json() == {"counters": {"calls": 1}, "gauges": {}}
+
+
+def test_execute_chain_deadline_exceeded(client, mock_dependency_manager):
+    mock_chain = ChainConfig(name="test_chain", steps=[], final_output_mapping={})
+    mock_dependency_manager.db_manager.get_chain_config.return_value = mock_chain
+    mock_dependency_manager.chain_executor.run_chain.side_effect = DeadlineExceededException(
+        "Deadline exceeded during step test_model"
+    )
+    request_data = {
+        "chain_name": "test_chain",
+        "initial_input": {"input": "Test input"},
+        "deadline_seconds": 1.5,
+    }
+    response = client.post("/execute_chain", json=request_data)
+    assert response.status_code == 504
+    assert (
+        mock_dependency_manager.chain_executor.run_chain.call_args.kwargs["deadline"].expires_at
+        is not None
+    )
+
+
+def test_get_executions(client, mock_dependency_manager):
+    mock_dependency_manager.history.get_recent_executions.return_value = [
+        ExecutionRecord(
+            id="abc",
+            chain_name="test_chain",
+            started_at="2024-01-01T00:00:00",
+            input={"text": "hello"},
+            status="completed",
+            output={"result": "world"},
+            latency_ms=12.5,
+            steps=[StepRecord(step_index=0, model_name="test_model", input={"input": "hello"})],
+        )
+    ]
+    response = client.get("/get_executions/test_chain?limit=5")
+    assert response.status_code == 200
+    executions = response.json()["executions"]
+    assert executions[0]["id"] == "abc"
+    assert executions[0]["steps"][0]["model_name"] == "test_model"
+    mock_dependency_manager.history.get_recent_executions.assert_called_once_with("test_chain", 5)
+
+
+def test_get_execution_timeline(client, mock_dependency_manager):
+    mock_dependency_manager.history.get_execution.return_value = ExecutionRecord(
+        id="abc",
+        chain_name="test_chain",
+        started_at="2024-01-01T00:00:00",
+        input={"text": "hello"},
+        status="completed",
+        latency_ms=20.0,
+        steps=[
+            StepRecord(
+                step_index=0,
+                model_name="test_model",
+                input={"input": "hello"},
+                latency_ms=19.0,
+                timeline=[
+                    TimelinePhase("output_validation", 15.0, 1.0),
+                    TimelinePhase("provider_call", 2.0, 10.0),
+                    TimelinePhase("provider_call", 5.0, 9.0),
+                    TimelinePhase("model_lookup", 0.0, 1.5),
+                ],
+            )
+        ],
+    )
+    response = client.get("/executions/abc/timeline")
+
+    assert response.status_code == 200
+    step = response.json()["steps"][0]
+    assert [phase["phase"] for phase in step["phases"]] == [
+        "model_lookup",
+        "provider_call",
+        "provider_call",
+        "output_validation",
+    ]
+    assert step["phases"][1] == {"phase": "provider_call", "start_ms": 2.0, "duration_ms": 10.0}
+    assert step["totals"] == {"model_lookup": 1.5, "provider_call": 19.0, "output_validation": 1.0}
+    mock_dependency_manager.history.get_execution.assert_called_once_with("abc")
+
+
+def test_get_execution_timeline_not_found(client, mock_dependency_manager):
+    mock_dependency_manager.history.get_execution.return_value = None
+    assert client.get("/executions/missing/timeline").status_code == 404
+
+    mock_dependency_manager.history = None
+    assert client.get("/executions/abc/timeline").status_code == 404
+
+
+def test_get_executions_history_disabled(client, mock_dependency_manager):
+    mock_dependency_manager.history = None
+    response = client.get("/get_executions/test_chain")
+    assert response.status_code == 404
+
+
+def test_execute_chain_shed_when_overloaded(client, mock_dependency_manager):
+    mock_dependency_manager.admission = AdmissionController(max_in_flight=1, max_queue_size=0)
+    mock_dependency_manager.admission.acquire()
+    mock_chain = ChainConfig(name="test_chain", steps=[], final_output_mapping={})
+    mock_dependency_manager.db_manager.get_chain_config.return_value = mock_chain
+    request_data = {"chain_name": "test_chain", "initial_input": {"input": "Test input"}}
+
+    response = client.post("/execute_chain", json=request_data)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    mock_dependency_manager.chain_executor.run_chain.assert_not_called()
+
+
+def test_execute_chain_budget_exceeded(client, mock_dependency_manager):
+    mock_chain = ChainConfig(name="test_chain", steps=[], final_output_mapping={})
+    mock_dependency_manager.db_manager.get_chain_config.return_value = mock_chain
+    mock_dependency_manager.chain_executor.run_chain.side_effect = BudgetExceededException(
+        "Token budget of 100 exhausted before step 2/2: test_model (120 used)"
+    )
+    request_data = {"chain_name": "test_chain", "initial_input": {"input": "Test input"}}
+    response = client.post("/execute_chain", json=request_data)
+    assert response.status_code == 402
+    assert "Token budget" in response.json()["detail"]
+
+
+def test_import_catalog(client, mock_dependency_manager):
+    counts = {"models": {"created": 1, "updated": 0}, "chains": {"created": 0, "updated": 0}}
+    mock_dependency_manager.db_manager.import_catalog.return_value = counts
+    body = (
+        '{"kind": "model", "name": "summarizer", "system_prompt": "Summarize", '
+        '"user_prompt_schema": {"text": "str"}, "response_schema": {"summary": "str"}}\n'
+    )
+
+    response = client.post("/import", content=body)
+
+    assert response.status_code == 200
+    assert response.json() == counts
+    models, chains = mock_dependency_manager.db_manager.import_catalog.call_args.args
+    assert [model.name for model in models] == ["summarizer"]
+    assert chains == []
+
+
+def test_import_catalog_invalid(client, mock_dependency_manager):
+    response = client.post("/import", content='{"kind": "model"}\nnot json')
+
+    assert response.status_code == 422
+    assert len(response.json()["detail"]["errors"]) == 2
+    mock_dependency_manager.db_manager.import_catalog.assert_not_called()
+
+
+def test_writes_rejected_when_catalog_is_loaded_from_files(client, mock_dependency_manager):
+    with patch("prompt_chain.api.CATALOG_DIR", "/etc/prompt-chain/catalog"):
+        response = client.post("/import", content='{"kind": "model"}')
+
+    assert response.status_code == 409
+    assert "/etc/prompt-chain/catalog" in response.json()["detail"]
+    mock_dependency_manager.db_manager.import_catalog.assert_not_called()
+
+
+def test_export_catalog(client, mock_dependency_manager):
+    mock_dependency_manager.db_manager.iter_prompt_models.return_value = [
+        PromptModel(
+            id=1,
+            name="summarizer",
+            system_prompt="Summarize",
+            user_prompt={"text": "str"},
+            response={"summary": "str"},
+            created_at="2023-01-01T00:00:00",
+            updated_at="2023-01-01T00:00:00",
+        )
+    ]
+    mock_dependency_manager.db_manager.iter_chain_configs.return_value = [
+        ChainConfig(name="test_chain", steps=[], final_output_mapping={})
+    ]
+
+    response = client.get("/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["kind"], line["name"]) for line in lines] == [
+        ("model", "summarizer"),
+        ("chain", "test_chain"),
+    ]
+
+
+def test_update_model(client, mock_dependency_manager):
+    mock_dependency_manager.db_manager.update_prompt_model.return_value = PromptModel(
+        id=1,
+        name="test_model",
+        system_prompt="A better prompt",
+        user_prompt={},
+        response={},
+        created_at="2023-01-01T00:00:00",
+        updated_at="2023-01-02T00:00:00",
+        version=2,
+        hash="abc",
+    )
+
+    response = client.post(
+        "/update_model", json={"name": "test_model", "system_prompt": "A better prompt"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert response.json()["hash"] == "abc"
+    kwargs = mock_dependency_manager.db_manager.update_prompt_model.call_args.kwargs
+    assert kwargs["system_prompt"] == "A better prompt"
+    assert kwargs["response_schema"] is None
+
+
+def test_update_model_not_found(client, mock_dependency_manager):
+    mock_dependency_manager.db_manager.update_prompt_model.side_effect = ValueError(
+        "No model found with name: test_model"
+    )
+
+    response = client.post("/update_model", json={"name": "test_model", "system_prompt": "x"})
+
+    assert response.status_code == 404
+
+
+def test_get_model_versions_not_found(client, mock_dependency_manager):
+    mock_dependency_manager.db_manager.get_prompt_model_versions.return_value = []
+
+    response = client.get("/get_model_versions/test_model")
+
+    assert response.status_code == 404
@@ -0,0 +1,106 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from prompt_chain.dependencies import DependencyManager
+from prompt_chain.prompt_lib.models import ChainConfig, ChainStep
+
+
+@pytest.fixture
+def manager():
+    manager = DependencyManager()
+    manager._db_manager = MagicMock()
+    manager._web_client = MagicMock()
+    manager._chain_executor = MagicMock()
+    return manager
+
+
+def test_warm_up(manager):
+    chain_config = ChainConfig(
+        name="test_chain",
+        steps=[ChainStep(name="test_model", input_mapping={"input": "initial_input.input"})],
+        final_output_mapping={},
+    )
+    manager._history = MagicMock()
+    manager._history.get_busiest_chains.return_value = ["test_chain"]
+    manager._db_manager.get_chain_config.return_value = chain_config
+
+    assert manager.ready is False
+    manager.warm_up()
+
+    assert manager.ready is True
+    manager._db_manager.warm_up.assert_called_once()
+    manager._web_client.warm_up.assert_called_once_with(
+        "https://api.openai.com/v1/chat/completions", timeout=2.0
+    )
+    manager._chain_executor.precompile.assert_called_once_with(chain_config)
+    manager._history.get_busiest_chains.assert_called_once()
+
+
+def test_warm_up_configured_chains(manager):
+    manager._history = MagicMock()
+    with patch("prompt_chain.dependencies.WARMUP_CHAINS", ["hot_chain"]):
+        manager.warm_up()
+
+    manager._history.get_busiest_chains.assert_not_called()
+    manager._db_manager.get_chain_config.assert_called_once_with("hot_chain")
+
+
+def test_warm_up_without_history(manager):
+    with patch("prompt_chain.dependencies.HISTORY_ENABLED", False):
+        manager.warm_up()
+
+    assert manager.ready is True
+    manager._db_manager.get_chain_config.assert_not_called()
+
+
+def test_warm_up_without_api_key(manager):
+    manager._chain_executor = None
+    manager._openai_api_key = None
+
+    manager.warm_up()
+
+    assert manager.ready is True
+    manager._db_manager.get_all_chain_configs.assert_not_called()
+
+
+def test_close_flushes_history(manager):
+    manager._history = MagicMock()
+
+    manager.close()
+
+    manager._history.close.assert_called_once()
+
+
+def test_replay_uses_cassette_without_api_key(tmp_path):
+    cassette = tmp_path / "calls.jsonl"
+    cassette.write_text("")
+    manager = DependencyManager()
+    manager._openai_api_key = None
+    with (
+        patch("prompt_chain.dependencies.CASSETTE_MODE", "replay"),
+        patch("prompt_chain.dependencies.CASSETTE_PATH", str(cassette)),
+    ):
+        provider = manager.provider
+
+    assert provider.web_client.mode == "replay"
+    assert provider.api_key is None
+    manager.close()
+
+
+def test_semantic_cache_is_shared_with_the_executor():
+    manager = DependencyManager()
+    manager._db_manager = MagicMock()
+    manager._web_client = MagicMock()
+    manager._provider = MagicMock()
+    assert manager.semantic_cache is None
+
+    with (
+        patch("prompt_chain.dependencies.SEMANTIC_CACHE_ENABLED", True),
+        patch("prompt_chain.dependencies.SEMANTIC_CACHE_THRESHOLDS", {"summarizer": 0.97}),
+    ):
+        executor = manager.chain_executor
+
+    assert executor.semantic_cache is manager.semantic_cache
+    assert executor.semantic_cache.threshold_for("summarizer") == 0.97
+    assert executor.semantic_cache.metrics is manager.metrics
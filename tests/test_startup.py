@@ -0,0 +1,14 @@
+import subprocess
+import sys
+
+LAZY_MODULES = ["sqlalchemy", "requests", "uvicorn", "prompt_chain.prompt_lib.db_manager"]
+
+
+def test_api_import_is_lazy():
+    snippet = "import sys, prompt_chain.api; print(','.join(sorted(sys.modules)))"
+    output = subprocess.run(
+        [sys.executable, "-c", snippet], capture_output=True, text=True, check=True
+    ).stdout
+    loaded = set(output.strip().split(","))
+
+    assert [module for module in LAZY_MODULES if module in loaded] == []
@@ -0,0 +1,100 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from prompt_chain.prompt_lib.models import ChainConfig, WorkItem
+from prompt_chain.worker import Worker
+
+
+@pytest.fixture
+def manager():
+    manager = MagicMock()
+    manager.model_source = manager.db_manager
+    manager.db_manager.get_chain_config.return_value = ChainConfig(
+        name="test_chain", steps=[], final_output_mapping={}
+    )
+    return manager
+
+
+@pytest.fixture
+def worker(manager):
+    return Worker(manager, worker_id="worker-a", heartbeat_interval=0.01)
+
+
+def work_item(item_id=1):
+    return WorkItem(
+        id=item_id,
+        chain_name="test_chain",
+        initial_input={"input": "Test input"},
+        status="running",
+        worker_id="worker-a",
+        attempts=1,
+        result=None,
+        error=None,
+    )
+
+
+def test_run_once_empty_queue(worker, manager):
+    manager.work_queue.claim.return_value = None
+
+    assert worker.run_once() is False
+    manager.work_queue.reclaim_expired.assert_called_once_with(worker.lease_timeout)
+    manager.chain_executor.execute_chain.assert_not_called()
+
+
+def test_run_once_completes_item(worker, manager):
+    manager.work_queue.claim.return_value = work_item()
+    manager.chain_executor.execute_chain.return_value = {"result": "Test output"}
+
+    assert worker.run_once() is True
+    manager.work_queue.complete.assert_called_once_with(1, "worker-a", {"result": "Test output"})
+
+
+def test_run_once_fails_item(worker, manager):
+    manager.work_queue.claim.return_value = work_item()
+    manager.chain_executor.execute_chain.side_effect = ValueError("Test error")
+
+    assert worker.run_once() is True
+    manager.work_queue.fail.assert_called_once_with(1, "worker-a", "Test error")
+
+
+def test_run_once_missing_chain(worker, manager):
+    manager.work_queue.claim.return_value = work_item()
+    manager.db_manager.get_chain_config.return_value = None
+
+    worker.run_once()
+    manager.work_queue.fail.assert_called_once_with(
+        1, "worker-a", "No chain found with name: test_chain"
+    )
+
+
+def test_run_forever_survives_poll_failure(manager):
+    worker = Worker(manager, worker_id="worker-a", poll_interval=0)
+    manager.work_queue.claim.return_value = None
+
+    def reclaim_expired(lease_timeout):
+        if manager.work_queue.reclaim_expired.call_count == 1:
+            raise RuntimeError("Database unavailable")
+        worker.stop()
+
+    manager.work_queue.reclaim_expired.side_effect = reclaim_expired
+
+    worker.run_forever()
+    assert manager.work_queue.reclaim_expired.call_count == 2
+
+
+def test_heartbeat_survives_failure(worker, manager):
+    manager.work_queue.claim.return_value = work_item()
+
+    def heartbeat(item_id, worker_id):
+        if manager.work_queue.heartbeat.call_count == 1:
+            raise RuntimeError("Database unavailable")
+        return True
+
+    manager.work_queue.heartbeat.side_effect = heartbeat
+    manager.chain_executor.execute_chain.side_effect = lambda *args: time.sleep(0.05) or {}
+
+    assert worker.run_once() is True
+    assert manager.work_queue.heartbeat.call_count >= 2
+    manager.work_queue.complete.assert_called_once_with(1, "worker-a", {})